@@ -3,46 +3,73 @@
 """
 Script para analizar problemas en los datos de Spotify
 Nivel: Desarrollador
+
+Por defecto los nulos, rangos, fechas y géneros se estiman con una
+muestra aleatoria de cada archivo (perfil_rapido.py) y las filas se
+cuentan sin parsear el archivo. Con --full se carga cada archivo entero,
+los números son exactos y también se cuentan los duplicados.
 """
 
 import pandas as pd
 import numpy as np
 import os
 
-def analizar_calidad_datos(archivo):
-    """Función para analizar la calidad de un archivo CSV"""
+from esquema import leer_csv
+from perfil_rapido import perfilar_csv, escalar
+
+def analizar_calidad_datos(archivo, completo=False):
+    """Función para analizar la calidad de un archivo CSV
+    
+    Con completo=False los números salen de una muestra (marcados con ~).
+    Devuelve la cantidad de filas del archivo, o None si no se pudo leer.
+    """
     print(f"\n=== ANALISIS DE CALIDAD: {archivo} ===")
     
     try:
-        # Cargar el archivo
-        df = pd.read_csv(archivo)
+        if completo:
+            # Cargar el archivo
+            df = leer_csv(archivo, uso='completo')
+            filas = len(df)
+            aprox = ""
+            contar = int
+        else:
+            perfil = perfilar_csv(archivo)
+            df = perfil['muestra']
+            filas = perfil['filas']
+            aprox = "~"
+            contar = lambda cantidad: escalar(cantidad, perfil)
+            print(f"(estimado con una muestra de {len(df):,} de {filas:,} filas; usa --full para valores exactos)")
         
         # 1. Valores nulos
         print("\n1. VALORES NULOS:")
         nulos = df.isnull().sum()
-        porcentaje_nulos = (nulos / len(df)) * 100
+        porcentaje_nulos = (nulos / max(len(df), 1)) * 100
         
         hay_nulos = False
         for columna in df.columns:
             if nulos[columna] > 0:
                 hay_nulos = True
-                print(f"  {columna}: {nulos[columna]} nulos ({porcentaje_nulos[columna]:.1f}%)")
+                print(f"  {columna}: {aprox}{contar(nulos[columna])} nulos ({porcentaje_nulos[columna]:.1f}%)")
         
         if not hay_nulos:
             print("  ¡Excelente! No hay valores nulos")
         
         # 2. Duplicados
         print(f"\n2. DUPLICADOS:")
-        duplicados_totales = df.duplicated().sum()
-        print(f"  Filas duplicadas exactas: {duplicados_totales}")
-        
-        # Verificar duplicados por identificador único si existe
-        if 'uri' in df.columns:
-            duplicados_uri = df.duplicated(subset=['uri']).sum()
-            print(f"  Duplicados por URI: {duplicados_uri}")
-        elif 'track_id' in df.columns:
-            duplicados_id = df.duplicated(subset=['track_id']).sum()
-            print(f"  Duplicados por track_id: {duplicados_id}")
+        if completo:
+            duplicados_totales = df.duplicated().sum()
+            print(f"  Filas duplicadas exactas: {duplicados_totales}")
+            
+            # Verificar duplicados por identificador único si existe
+            if 'uri' in df.columns:
+                duplicados_uri = df.duplicated(subset=['uri']).sum()
+                print(f"  Duplicados por URI: {duplicados_uri}")
+            elif 'track_id' in df.columns:
+                duplicados_id = df.duplicated(subset=['track_id']).sum()
+                print(f"  Duplicados por track_id: {duplicados_id}")
+        else:
+            # En una muestra casi nunca aparecen los dos lados de un duplicado
+            print("  (se cuentan solo con --full)")
         
         # 3. Información de columnas numéricas importantes
         print(f"\n3. INFORMACION DE COLUMNAS NUMERICAS IMPORTANTES:")
@@ -55,7 +82,7 @@ def analizar_calidad_datos(archivo):
             # Verificar si energy está en rango correcto (0-1)
             energy_fuera_rango = ((df['energy'] < 0) | (df['energy'] > 1)).sum()
             if energy_fuera_rango > 0:
-                print(f"    ADVERTENCIA: {energy_fuera_rango} valores de energy fuera de rango (0-1)")
+                print(f"    ADVERTENCIA: {aprox}{contar(energy_fuera_rango)} valores de energy fuera de rango (0-1)")
         
         # Verificar loudness
         if 'loudness' in df.columns:
@@ -65,7 +92,7 @@ def analizar_calidad_datos(archivo):
             # Verificar si loudness está en rango razonable (-60 a 0)
             loudness_fuera_rango = ((df['loudness'] < -60) | (df['loudness'] > 0)).sum()
             if loudness_fuera_rango > 0:
-                print(f"    ADVERTENCIA: {loudness_fuera_rango} valores de loudness fuera de rango (-60 a 0)")
+                print(f"    ADVERTENCIA: {aprox}{contar(loudness_fuera_rango)} valores de loudness fuera de rango (-60 a 0)")
         
         # Verificar tempo
         if 'tempo' in df.columns:
@@ -75,7 +102,7 @@ def analizar_calidad_datos(archivo):
             # Verificar si tempo está en rango razonable (40-200 BPM)
             tempo_fuera_rango = ((df['tempo'] < 40) | (df['tempo'] > 200)).sum()
             if tempo_fuera_rango > 0:
-                print(f"    ADVERTENCIA: {tempo_fuera_rango} valores de tempo fuera de rango (40-200 BPM)")
+                print(f"    ADVERTENCIA: {aprox}{contar(tempo_fuera_rango)} valores de tempo fuera de rango (40-200 BPM)")
         
         # 4. Información de fechas si existe
         print(f"\n4. INFORMACION DE FECHAS:")
@@ -88,32 +115,35 @@ def analizar_calidad_datos(archivo):
             fechas_muy_antiguas = (df['year'] < 1920).sum()
             
             if fechas_futuras > 0:
-                print(f"    ADVERTENCIA: {fechas_futuras} canciones con fechas futuras (>2024)")
+                print(f"    ADVERTENCIA: {aprox}{contar(fechas_futuras)} canciones con fechas futuras (>2024)")
             if fechas_muy_antiguas > 0:
-                print(f"    ADVERTENCIA: {fechas_muy_antiguas} canciones con fechas muy antiguas (<1920)")
+                print(f"    ADVERTENCIA: {aprox}{contar(fechas_muy_antiguas)} canciones con fechas muy antiguas (<1920)")
         
         # 5. Información de géneros si existe
         print(f"\n5. INFORMACION DE GENEROS:")
         if 'genre' in df.columns:
             generos_unicos = df['genre'].nunique()
-            print(f"  Géneros únicos: {generos_unicos}")
+            print(f"  Géneros únicos{'' if completo else ' en la muestra'}: {generos_unicos}")
             
             # Top 10 géneros más frecuentes
             top_generos = df['genre'].value_counts().head(10)
             print(f"  Top 10 géneros:")
             for genero, cantidad in top_generos.items():
-                print(f"    {genero}: {cantidad} canciones")
+                print(f"    {genero}: {aprox}{contar(cantidad)} canciones")
         
-        return df
+        return filas
         
     except Exception as e:
         print(f"ERROR al analizar {archivo}: {str(e)}")
         return None
 
-def analizar_todos_los_archivos():
-    """Analizar todos los archivos CSV"""
+def analizar_todos_los_archivos(completo=False):
+    """Analizar todos los archivos CSV
     
-    print("ANALIZANDO PROBLEMAS EN LOS DATOS")
+    completo=True carga cada archivo entero en vez de usar una muestra.
+    """
+    
+    print("ANALIZANDO PROBLEMAS EN LOS DATOS" + ("" if completo else " (perfil rápido)"))
     print("=" * 50)
     
     # Lista de archivos CSV
@@ -131,9 +161,9 @@ def analizar_todos_los_archivos():
     resultados = {}
     for archivo in archivos:
         if os.path.exists(archivo):
-            df = analizar_calidad_datos(archivo)
-            if df is not None:
-                resultados[archivo] = df
+            filas = analizar_calidad_datos(archivo, completo)
+            if filas is not None:
+                resultados[archivo] = filas
         else:
             print(f"ERROR: {archivo} no encontrado")
     
@@ -142,12 +172,14 @@ def analizar_todos_los_archivos():
     print("=" * 50)
     
     total_canciones = 0
-    for archivo, df in resultados.items():
-        total_canciones += len(df)
-        print(f"{archivo}: {len(df):,} canciones")
+    for archivo, filas in resultados.items():
+        total_canciones += filas
+        print(f"{archivo}: {filas:,} canciones")
     
     print(f"\nTOTAL DE CANCIONES: {total_canciones:,}")
     print("\nAnalisis de problemas completado!")
 
 if __name__ == "__main__":
-    analizar_todos_los_archivos()
+    import sys
+    
+    analizar_todos_los_archivos(completo='--full' in sys.argv[1:])
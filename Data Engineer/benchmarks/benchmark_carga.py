@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: recargar el dataset final desde CSV, Parquet y Arrow con memory map
+Nivel: Desarrollador
+
+Mide cuánto tarda abrir el dataset guardado por el pipeline en cada
+formato y cuánta memoria propia (no compartida) queda en el proceso.
+Con Arrow la mayor parte de los datos queda en el archivo mapeado, que
+el sistema operativo comparte entre procesos.
+
+Uso (desde la carpeta "Data Engineer", después de ejecutar el pipeline):
+    python benchmarks/benchmark_carga.py
+    python benchmarks/benchmark_carga.py --repeticiones 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_arrow import RUTA_ARROW, cargar_dataset_arrow
+from dataset_particionado import DIRECTORIO_DATASET, leer_dataset
+
+RUTA_CSV = 'data/processed/spotify_music_intensity_clean.csv'
+
+def memoria_propia_mb():
+    """Memoria privada del proceso (sin las páginas compartidas de archivos)"""
+
+    try:
+        with open('/proc/self/status') as estado:
+            for linea in estado:
+                if linea.startswith('RssAnon:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+def medir_carga(nombre, cargar, repeticiones):
+    """Cargar varias veces y quedarse con el mejor tiempo"""
+
+    tiempos = []
+    for _ in range(repeticiones):
+        antes = memoria_propia_mb()
+        inicio = time.perf_counter()
+        df = cargar()
+        tiempos.append(time.perf_counter() - inicio)
+        memoria = memoria_propia_mb() - antes
+        del df
+
+    print(f"  {nombre:<26} {min(tiempos):8.3f} s   {memoria:8.1f} MB de memoria propia")
+    return min(tiempos)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga del dataset final")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    opciones = parser.parse_args()
+
+    if not os.path.exists(RUTA_ARROW):
+        print(f"ERROR: no existe {RUTA_ARROW}; ejecuta primero pipeline_completo.py")
+        sys.exit(1)
+
+    print(f"=== Carga del dataset final ({len(cargar_dataset_arrow()):,} filas) ===")
+
+    if os.path.exists(RUTA_CSV):
+        medir_carga('CSV', lambda: pd.read_csv(RUTA_CSV), opciones.repeticiones)
+    medir_carga('Parquet particionado', lambda: leer_dataset(directorio=DIRECTORIO_DATASET), opciones.repeticiones)
+    medir_carga('Arrow (memory map)', cargar_dataset_arrow, opciones.repeticiones)
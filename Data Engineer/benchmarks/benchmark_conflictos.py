@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark y verificación de resolver_conflictos()
+Nivel: Desarrollador
+
+Compara la versión actual de combinar_archivos.resolver_conflictos() con
+la anterior (groupby de todo el dataset con lambdas por grupo). Se prueban
+las dos formas de identificar duplicados: track_id y nombre + artista.
+Termina con error si los resultados no son idénticos.
+
+Uso (desde la carpeta "Data Engineer", con los CSV en data/raw):
+    python benchmarks/benchmark_conflictos.py
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limpiar_datos import limpiar_todos_los_archivos
+from combinar_archivos import combinar_archivos_simple, resolver_conflictos
+
+def resolver_conflictos_anterior(df):
+    """Versión anterior: agrupar todo el dataset con lambdas por grupo"""
+
+    if 'track_id' in df.columns:
+        claves = ['track_id']
+        agregaciones = {'track_name': 'first', 'artist_name': 'first'}
+    else:
+        claves = ['track_name', 'artist_name']
+        agregaciones = {}
+
+    agregaciones.update({
+        'energy': 'mean',
+        'loudness': 'mean',
+        'loudness_normalized': 'mean',
+        'release_date': 'min',
+        'release_year': 'min',
+        'release_decade': 'first',
+        'genre': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown',
+        'main_genre': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Other',
+        'data_source': lambda x: ', '.join(x.unique()),
+        'danceability': 'mean',
+        'valence': 'mean',
+        'tempo': 'mean',
+        'duration_ms': 'mean'
+    })
+
+    # duration_ms se leía como int64: su promedio quedaba en float64
+    df = df.astype({'duration_ms': 'float64'})
+
+    return df.groupby(claves).agg(agregaciones).reset_index()
+
+def medir(nombre, funcion):
+    """Ejecutar una vez (sin mostrar sus mensajes) y medir el tiempo"""
+
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        resultado = funcion()
+    segundos = time.perf_counter() - inicio
+
+    print(f"  {nombre:<22} {segundos:8.2f} s   {len(resultado):,} filas")
+    return resultado, segundos
+
+def comparar(df, titulo):
+    """Comparar la versión anterior con la actual; devuelve True si coinciden"""
+
+    print(f"\n=== {titulo} ({len(df):,} filas) ===")
+
+    anterior, t_anterior = medir('versión anterior', lambda: resolver_conflictos_anterior(df))
+    actual, t_actual = medir('versión actual', lambda: resolver_conflictos(df))
+    print(f"  -> {t_anterior / t_actual:.1f}x más rápido")
+
+    try:
+        pd.testing.assert_frame_equal(anterior, actual)
+    except AssertionError as e:
+        print(f"ERROR: los resultados no coinciden\n{e}")
+        return False
+
+    print("  Resultados idénticos")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de resolución de conflictos")
+    parser.parse_args()
+
+    print("Cargando y combinando archivos...")
+    with redirect_stdout(io.StringIO()):
+        df_combinado = combinar_archivos_simple(limpiar_todos_los_archivos())
+
+    iguales = comparar(df_combinado, 'duplicados por track_id')
+    iguales &= comparar(df_combinado.drop(columns=['track_id']), 'duplicados por nombre + artista')
+
+    if not iguales:
+        sys.exit(1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del servicio de consultas (servicio_consultas.py)
+Nivel: Desarrollador
+
+Mide consultas típicas de un tablero sobre el dataset procesado:
+- la primera vez (sin caché, leyendo el Parquet) y la segunda (desde la
+  caché), en milisegundos
+- lo mismo con pandas cargando el dataset entero con leer_dataset, que
+  es lo que hacía cada tablero antes.
+
+Termina con código 1 si alguna consulta sin caché tarda más que
+--limite milisegundos.
+
+Uso (desde la carpeta donde está data/processed, después del pipeline):
+    python "Data Engineer/benchmarks/benchmark_consultas.py"
+    python "Data Engineer/benchmarks/benchmark_consultas.py" --limite 50 --sin-pandas
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicio_consultas import configurar_servicio, consultar, consultar_tabla, limpiar_cache_consultas
+
+CONSULTAS = {
+    'latin_90s_tempo_140': {
+        'filtros': [['main_genre', '=', 'Latin'], ['release_decade', '=', '1990s'], ['tempo', '>', 140]],
+        'medidas': {'intensity_weighted': ['mean']}
+    },
+    'intensidad_por_decada': {
+        'agrupar': ['release_decade'],
+        'medidas': {'intensity_weighted': ['mean', 'std', 'min', 'max']}
+    },
+    'decada_genero': {
+        'agrupar': ['release_decade', 'main_genre'],
+        'medidas': {'intensity_weighted': ['mean'], 'energy': ['mean'], 'loudness': ['mean']}
+    },
+    'niveles_2010s': {
+        'filtros': [['release_decade', '=', '2010s']],
+        'agrupar': ['intensity_category'],
+        'medidas': {'energy': ['mean'], 'danceability': ['mean']}
+    },
+    'rock_muy_alta': {
+        'filtros': [['main_genre', '=', 'Rock'], ['intensity_category', '=', 'Muy Alta']],
+        'agrupar': ['release_decade']
+    }
+}
+
+def en_milisegundos(funcion):
+    """Ejecutar una función y devolver los milisegundos"""
+
+    inicio = time.perf_counter()
+    funcion()
+    return (time.perf_counter() - inicio) * 1000
+
+def consulta_pandas(consulta):
+    """La misma consulta con pandas, cargando el dataset entero (como antes)"""
+
+    from dataset_particionado import leer_dataset
+    from resumenes import nivel_intensidad
+
+    df = leer_dataset()
+    df['intensity_category'] = nivel_intensidad(df['intensity_weighted'])
+    for columna, operador, valor in consulta.get('filtros', []):
+        df = df[df[columna] == valor] if operador == '=' else df[df[columna] > valor]
+
+    medidas = consulta.get('medidas', {})
+    if not consulta.get('agrupar'):
+        return df[list(medidas)].agg(medidas) if medidas else len(df)
+    return df.groupby(consulta['agrupar'], observed=True).agg(
+        {'track_id': 'count', **medidas} if medidas else {'track_id': 'count'})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del servicio de consultas")
+    parser.add_argument('--directorio', default=None, help="dataset Parquet particionado (por defecto el del pipeline)")
+    parser.add_argument('--limite', type=float, default=100.0, help="milisegundos máximos sin caché")
+    parser.add_argument('--sin-pandas', action='store_true', help="no medir la carga con pandas")
+    opciones = parser.parse_args()
+
+    configurar_servicio(directorio=opciones.directorio)
+
+    print(f"{'Consulta':<24} {'Filas':>6} {'Sin caché':>11} {'Con caché':>11} {'pandas':>11}")
+    print("-" * 67)
+
+    todo_ok = True
+    for nombre, consulta in CONSULTAS.items():
+        limpiar_cache_consultas()
+        frio = en_milisegundos(lambda: consultar_tabla(consulta))
+        resultado, desde_cache = consultar_tabla(consulta)
+        caliente = en_milisegundos(lambda: consultar(consulta))
+        pandas = '-' if opciones.sin_pandas else f"{en_milisegundos(lambda: consulta_pandas(consulta)):.1f} ms"
+
+        todo_ok &= frio <= opciones.limite and desde_cache
+        print(f"{nombre:<24} {resultado.num_rows:>6} {frio:>8.1f} ms {caliente:>8.2f} ms {pandas:>11}")
+
+    print()
+    print(f"OK: todas las consultas en menos de {opciones.limite:.0f} ms" if todo_ok
+          else f"ERROR: alguna consulta tardó más de {opciones.limite:.0f} ms sin caché")
+    sys.exit(0 if todo_ok else 1)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de todas las etapas del pipeline con datos sintéticos
+Nivel: Desarrollador
+
+Genera los CSV con generar_datos.py en un directorio de trabajo y mide,
+una por una y sin caché, las funciones de cada etapa:
+limpiar_archivo (cada archivo), organizar_generos, combinar_archivos_simple,
+resolver_conflictos, crear_variables_intensidad, crear_cubo y
+calcular_resumenes, verificar_calidad y cada escritura de resultados.
+
+Para cada función se guarda el tiempo, el pico de memoria (RSS) y las
+filas que devolvió. Cada ejecución se agrega al historial JSON junto con
+la máquina y el commit, y se compara con la última ejecución igual
+(mismas filas, duplicados y máquina): si una etapa tarda más que
+--umbral veces lo de antes, el script termina con código 1.
+
+El pico de memoria se mide por etapa reiniciando el máximo del proceso
+(VmHWM) antes de cada una; eso necesita Linux. En otros sistemas se
+guarda el pico de todo el proceso.
+
+Uso (desde la carpeta "Data Engineer"):
+    python benchmarks/benchmark_etapas.py --filas 100k
+    python benchmarks/benchmark_etapas.py --filas 1M --duplicados 0.10
+    python benchmarks/benchmark_etapas.py --filas 100k 1M 10M --umbral 1.5
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+DIRECTORIO_CODIGO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO_CODIGO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from generar_datos import generar_datos, leer_cantidad
+
+RUTA_HISTORIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'historial_benchmarks.json')
+
+# Diferencia mínima en segundos para considerar que una etapa empeoró
+# (las etapas muy cortas varían mucho de una ejecución a otra)
+SEGUNDOS_MINIMOS_REGRESION = 0.05
+
+def leer_estado_memoria(campo):
+    """Valor en MB de un campo de /proc/self/status (VmRSS, VmHWM), o None"""
+
+    try:
+        with open('/proc/self/status') as estado:
+            for linea in estado:
+                if linea.startswith(campo + ':'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def reiniciar_pico_memoria():
+    """Reiniciar el pico de memoria del proceso (VmHWM) al uso actual
+
+    Devuelve False si el sistema no lo permite.
+    """
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as archivo:
+            archivo.write('5')
+        return True
+    except OSError:
+        return False
+
+def pico_memoria_mb():
+    """Pico de memoria del proceso desde el último reinicio"""
+
+    pico = leer_estado_memoria('VmHWM')
+    if pico is not None:
+        return pico
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 1024**2 if sys.platform == 'darwin' else maximo / 1024
+
+def contar_filas(resultado):
+    """Filas del resultado de una etapa (la primera tabla si hay varias)"""
+
+    if isinstance(resultado, tuple):
+        resultado = resultado[0]
+    if isinstance(resultado, dict):
+        return sum(len(tabla) for tabla in resultado.values() if hasattr(tabla, 'columns'))
+    if hasattr(resultado, 'columns'):
+        return len(resultado)
+    return None
+
+def medir(mediciones, nombre, funcion, *argumentos, **opciones):
+    """Ejecutar una etapa sin mostrar su salida y anotar tiempo, memoria y filas"""
+
+    reiniciar_pico_memoria()
+    memoria_antes = leer_estado_memoria('VmRSS')
+
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        resultado = funcion(*argumentos, **opciones)
+    segundos = time.perf_counter() - inicio
+
+    medicion = {
+        'etapa': nombre,
+        'segundos': round(segundos, 4),
+        'pico_rss_mb': round(pico_memoria_mb(), 1),
+        'rss_antes_mb': round(memoria_antes, 1) if memoria_antes is not None else None,
+        'filas': contar_filas(resultado)
+    }
+    mediciones.append(medicion)
+
+    filas = f"{medicion['filas']:,}" if medicion['filas'] is not None else '-'
+    print(f"  {nombre:<40} {segundos:8.3f} s  {medicion['pico_rss_mb']:9.1f} MB  {filas:>12} filas")
+    return resultado
+
+def medir_etapas(filas, tasa_duplicados, semilla, directorio):
+    """Generar los datos en directorio y medir cada etapa
+
+    Devuelve la lista de mediciones.
+    """
+
+    from cache_etapas import configurar_cache
+    from limpiar_datos import ARCHIVOS_CSV, limpiar_archivo, organizar_generos
+    from combinar_archivos import combinar_archivos_simple, resolver_conflictos
+    from crear_intensidad import crear_variables_intensidad
+    from resumenes import crear_cubo, calcular_resumenes
+    from verificar_calidad import verificar_calidad
+    from dataset_particionado import guardar_dataset_particionado
+    from dataset_arrow import guardar_dataset_arrow
+    from escribir_csv import escribir_csv_por_lotes
+    from guardar_resultados import guardar_todos_los_resultados
+    from linaje import crear_linaje, tabla_linaje
+
+    configurar_cache(activa=False)
+    mediciones = []
+
+    print(f"\nGenerando {filas:,} filas ({tasa_duplicados:.0%} duplicadas) en {directorio}")
+    inicio = time.perf_counter()
+    generar_datos(directorio, filas, tasa_duplicados, semilla)
+    print(f"  Datos generados en {time.perf_counter() - inicio:.1f} s\n")
+
+    directorio_anterior = os.getcwd()
+    os.chdir(directorio)
+    try:
+        # Limpieza, archivo por archivo
+        datos_limpios = {}
+        linajes = {}
+        for archivo in ARCHIVOS_CSV:
+            linajes[archivo] = crear_linaje()
+            datos_limpios[archivo] = medir(mediciones, f"limpiar_archivo({os.path.basename(archivo)})",
+                                           limpiar_archivo, archivo, linaje=linajes[archivo])
+
+        # organizar_generos ya corrió dentro de la limpieza; se mide aparte sobre spotify_data
+        spotify_data = datos_limpios[ARCHIVOS_CSV[-1]]
+        medir(mediciones, 'organizar_generos', organizar_generos, spotify_data.copy())
+
+        df_combinado = medir(mediciones, 'combinar_archivos_simple', combinar_archivos_simple, datos_limpios)
+        del datos_limpios, spotify_data
+        df_resuelto = medir(mediciones, 'resolver_conflictos', resolver_conflictos, df_combinado)
+        del df_combinado
+
+        resultado = medir(mediciones, 'crear_variables_intensidad', crear_variables_intensidad, df_resuelto)
+        df_final = resultado[0]
+        del df_resuelto
+
+        # Resúmenes por separado (crear_variables_intensidad ya los incluye)
+        medir(mediciones, 'crear_cubo', crear_cubo, df_final)
+        resumenes = medir(mediciones, 'calcular_resumenes', calcular_resumenes, df_final)
+        medir(mediciones, 'verificar_calidad', verificar_calidad, df_final)
+
+        # Escrituras
+        os.makedirs('data/processed', exist_ok=True)
+        medir(mediciones, 'guardar_dataset_particionado', guardar_dataset_particionado, df_final,
+              'data/processed/spotify_music_intensity')
+        medir(mediciones, 'guardar_dataset_arrow', guardar_dataset_arrow, df_final,
+              'data/processed/spotify_music_intensity.arrow')
+        medir(mediciones, 'escribir_csv_por_lotes', escribir_csv_por_lotes, df_final,
+              'data/processed/spotify_music_intensity_clean.csv')
+        medir(mediciones, 'guardar_todos_los_resultados', guardar_todos_los_resultados, df_final,
+              resumenes['resumen_decada'], resumenes['resumen_decada_genero'], resumenes['stats_genero'],
+              resumenes['resumen_intensidad'], tabla_linaje(linajes))
+    finally:
+        os.chdir(directorio_anterior)
+
+    return mediciones
+
+def describir_maquina():
+    """Datos de la máquina para comparar solo ejecuciones comparables"""
+
+    return {
+        'sistema': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'nombre': platform.node()
+    }
+
+def commit_actual():
+    """Commit de git del código medido (None si no es un repositorio)"""
+
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRECTORIO_CODIGO,
+                                capture_output=True, text=True, check=True)
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def leer_historial(ruta):
+    """Lista de ejecuciones guardadas (vacía si todavía no hay historial)"""
+
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+def guardar_historial(ruta, historial):
+    """Guardar el historial (primero en un temporal, luego se renombra)"""
+
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as archivo:
+        json.dump(historial, archivo, indent=2, ensure_ascii=False)
+    os.replace(ruta + '.tmp', ruta)
+
+def buscar_anterior(historial, ejecucion):
+    """Última ejecución con los mismos parámetros en la misma máquina"""
+
+    for anterior in reversed(historial):
+        if (anterior['parametros'] == ejecucion['parametros']
+                and anterior['maquina']['nombre'] == ejecucion['maquina']['nombre']
+                and anterior['maquina']['cpus'] == ejecucion['maquina']['cpus']):
+            return anterior
+    return None
+
+def comparar_con_anterior(ejecucion, anterior, umbral):
+    """Mostrar cuánto cambió cada etapa y devolver las que empeoraron"""
+
+    print(f"\nComparación con la ejecución del {anterior['fecha']} (commit {anterior['commit']}):")
+
+    tiempos_anteriores = {medicion['etapa']: medicion['segundos'] for medicion in anterior['etapas']}
+    empeoradas = []
+    for medicion in ejecucion['etapas']:
+        antes = tiempos_anteriores.get(medicion['etapa'])
+        if not antes:
+            continue
+        ahora = medicion['segundos']
+        cambio = ahora / antes
+        empeoro = cambio > umbral and ahora - antes > SEGUNDOS_MINIMOS_REGRESION
+        marca = '  <-- más lento' if empeoro else ''
+        print(f"  {medicion['etapa']:<40} {antes:8.3f} s -> {ahora:8.3f} s ({cambio:5.2f}x){marca}")
+        if empeoro:
+            empeoradas.append(medicion['etapa'])
+
+    return empeoradas
+
+def ejecutar_benchmark(filas, tasa_duplicados, semilla, directorio, historial, umbral):
+    """Medir una escala, agregarla al historial y compararla con la anterior
+
+    Devuelve las etapas que empeoraron.
+    """
+
+    inicio = time.perf_counter()
+    mediciones = medir_etapas(filas, tasa_duplicados, semilla, directorio)
+    total = time.perf_counter() - inicio
+
+    ejecucion = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'maquina': describir_maquina(),
+        'parametros': {'filas': filas, 'duplicados': tasa_duplicados, 'semilla': semilla},
+        'etapas': mediciones,
+        'segundos_etapas': round(sum(medicion['segundos'] for medicion in mediciones), 4),
+        'pico_rss_mb': round(max(medicion['pico_rss_mb'] for medicion in mediciones), 1)
+    }
+
+    print(f"\n  Total de las etapas: {ejecucion['segundos_etapas']:.2f} s "
+          f"(con la generación de datos: {total:.2f} s), pico de memoria {ejecucion['pico_rss_mb']:.1f} MB")
+
+    anterior = buscar_anterior(historial, ejecucion)
+    empeoradas = comparar_con_anterior(ejecucion, anterior, umbral) if anterior else []
+
+    historial.append(ejecucion)
+    return empeoradas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del pipeline con datos sintéticos")
+    parser.add_argument('--filas', nargs='+', default=['100k'], help="una o más escalas (ej: 100k 1M 10M)")
+    parser.add_argument('--duplicados', type=float, default=0.05, help="proporción de filas repetidas")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--historial', default=RUTA_HISTORIAL)
+    parser.add_argument('--umbral', type=float, default=1.3,
+                        help="cuántas veces más lenta tiene que ser una etapa para contarla como regresión")
+    parser.add_argument('--directorio', default=None,
+                        help="dónde generar los datos (por defecto un directorio temporal que se borra)")
+    opciones = parser.parse_args()
+
+    historial = leer_historial(opciones.historial)
+    empeoradas = []
+
+    for cantidad in opciones.filas:
+        filas = leer_cantidad(cantidad)
+        print(f"\n=== BENCHMARK: {filas:,} filas ===")
+
+        directorio = opciones.directorio or tempfile.mkdtemp(prefix='benchmark_spotify_')
+        try:
+            empeoradas += ejecutar_benchmark(filas, opciones.duplicados, opciones.semilla, directorio,
+                                             historial, opciones.umbral)
+        finally:
+            if opciones.directorio is None:
+                shutil.rmtree(directorio, ignore_errors=True)
+
+        # Guardar después de cada escala, así una escala grande que falla no borra las anteriores
+        guardar_historial(opciones.historial, historial)
+
+    print(f"\nHistorial actualizado: {opciones.historial}")
+
+    if empeoradas:
+        print(f"ERROR: {len(empeoradas)} etapas más lentas que la ejecución anterior: {', '.join(empeoradas)}")
+        sys.exit(1)
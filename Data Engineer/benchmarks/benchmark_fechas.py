@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: fechas y décadas con texto por fila vs. aritmética vectorizada
+Nivel: Desarrollador
+
+Compara la forma anterior (armar "año-01-01" y convertirlo, y una función
+por fila para la década) con fecha_desde_anio() y decada_desde_anio() de
+limpiar_datos.py. Termina con error si los resultados no son idénticos
+o si la versión nueva no es más rápida.
+
+Uso (desde la carpeta "Data Engineer"):
+    python benchmarks/benchmark_fechas.py
+    python benchmarks/benchmark_fechas.py --filas 5000000 --repeticiones 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limpiar_datos import fecha_desde_anio, decada_desde_anio
+
+def fecha_anterior(anios):
+    """Forma anterior: convertir el texto "año-01-01" fila por fila"""
+    return pd.to_datetime(anios.astype(str) + '-01-01', errors='coerce')
+
+def decada_anterior(anios):
+    """Forma anterior: una llamada de Python por fila"""
+
+    def obtener_decada(año):
+        if pd.isna(año):
+            return None
+        decada = (año // 10) * 10
+        return f"{decada}s"
+
+    return anios.apply(obtener_decada)
+
+def crear_anios(filas):
+    """Años de prueba como los de spotify_data.csv (Int16, con algunos nulos)"""
+
+    generador = np.random.default_rng(0)
+    anios = pd.Series(generador.integers(1920, 2025, filas), dtype='Int16')
+    anios[generador.integers(0, filas, filas // 1000)] = pd.NA
+    return anios
+
+def medir(nombre, funcion, repeticiones):
+    """Ejecutar varias veces y quedarse con el mejor tiempo"""
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    print(f"  {nombre:<34} {min(tiempos):7.3f} s")
+    return resultado, min(tiempos)
+
+def comparar(filas, repeticiones=3):
+    """Comparar tiempos y resultados; devuelve True si todo está bien"""
+
+    anios = crear_anios(filas)
+    print(f"\n=== {filas:,} años ===")
+
+    fechas_antes, t_fechas_antes = medir('release_date (texto)', lambda: fecha_anterior(anios), repeticiones)
+    fechas_ahora, t_fechas_ahora = medir('release_date (vectorizado)', lambda: fecha_desde_anio(anios), repeticiones)
+
+    # Como en el pipeline: la década se calcula sobre los años sin nulos
+    anios_fecha = fechas_ahora.dropna().dt.year
+    decadas_antes, t_decadas_antes = medir('release_decade (apply)', lambda: decada_anterior(anios_fecha), repeticiones)
+    decadas_ahora, t_decadas_ahora = medir('release_decade (categoría)', lambda: decada_desde_anio(anios_fecha), repeticiones)
+
+    iguales = True
+    if not fechas_antes.equals(fechas_ahora):
+        print("ERROR: release_date no coincide con la forma anterior")
+        iguales = False
+    if not decadas_antes.equals(decadas_ahora.astype(object)):
+        print("ERROR: release_decade no coincide con la forma anterior")
+        iguales = False
+
+    print(f"  -> release_date: {t_fechas_antes / t_fechas_ahora:.1f}x más rápido")
+    print(f"  -> release_decade: {t_decadas_antes / t_decadas_ahora:.1f}x más rápido")
+
+    mas_rapido = t_fechas_ahora < t_fechas_antes and t_decadas_ahora < t_decadas_antes
+    if not mas_rapido:
+        print("ERROR: la versión vectorizada no es más rápida")
+
+    return iguales and mas_rapido
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de creación de fechas y décadas")
+    parser.add_argument('--filas', type=int, default=1000000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    opciones = parser.parse_args()
+
+    if not comparar(opciones.filas, opciones.repeticiones):
+        sys.exit(1)
+    print("\nResultados idénticos")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: leer los CSV adivinando tipos vs. con el esquema de esquema.py
+Nivel: Desarrollador
+
+Uso (desde la carpeta "Data Engineer"):
+    python benchmarks/benchmark_lectura_csv.py
+    python benchmarks/benchmark_lectura_csv.py data/raw/spotify_data.csv --repeticiones 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from esquema import leer_csv
+
+def medir_lectura(nombre, leer, repeticiones):
+    """Leer varias veces y quedarse con el mejor tiempo y la memoria usada"""
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = leer()
+        tiempos.append(time.perf_counter() - inicio)
+
+    memoria_mb = df.memory_usage(deep=True).sum() / 1024**2
+    print(f"  {nombre:<28} {min(tiempos):7.2f} s   {memoria_mb:9.1f} MB   {len(df.columns):3d} columnas")
+
+    return {'segundos': min(tiempos), 'memoria_mb': memoria_mb}
+
+def comparar_lecturas(archivo, repeticiones=3):
+    """Comparar las tres formas de leer un archivo"""
+
+    print(f"\n=== {archivo} ({os.path.getsize(archivo) / 1024**2:.1f} MB en disco) ===")
+
+    base = medir_lectura('pd.read_csv (adivina tipos)', lambda: pd.read_csv(archivo), repeticiones)
+    completo = medir_lectura("esquema, uso='completo'", lambda: leer_csv(archivo, uso='completo'), repeticiones)
+    limpieza = medir_lectura("esquema, uso='limpieza'", lambda: leer_csv(archivo), repeticiones)
+
+    for nombre, resultado in [('completo', completo), ('limpieza', limpieza)]:
+        print(f"  -> {nombre}: {base['segundos'] / resultado['segundos']:.1f}x más rápido, "
+              f"{base['memoria_mb'] / resultado['memoria_mb']:.1f}x menos memoria")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de lectura de CSV con esquema de tipos")
+    parser.add_argument('archivos', nargs='*', default=['data/raw/spotify_data.csv'])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    opciones = parser.parse_args()
+
+    for archivo in opciones.archivos:
+        comparar_lecturas(archivo, opciones.repeticiones)
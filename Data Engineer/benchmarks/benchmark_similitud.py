@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del índice de similitud (indice_similitud.py)
+Nivel: Desarrollador
+
+Con 1M de canciones sintéticas (o el dataset procesado, con --procesado) mide:
+- cuánto tarda armar y guardar el índice, y cuánto abrirlo (memory map)
+- consultas por segundo de la búsqueda exacta, por lotes
+- consultas por segundo y recall@k del IVF con distintas sondas: la
+  fracción de los k vecinos exactos que también devuelve el IVF.
+
+Las consultas son canciones del índice con un poco de ruido, para que
+no sean exactamente una fila. Termina con código 1 si la búsqueda exacta
+no coincide con la fuerza bruta en alguna de las primeras consultas.
+
+Uso (desde la carpeta "Data Engineer"):
+    python benchmarks/benchmark_similitud.py
+    python benchmarks/benchmark_similitud.py --filas 100k --consultas 2000 --sondas 1 4 16
+    python benchmarks/benchmark_similitud.py --procesado   # desde donde está data/processed
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generar_datos import audio_aleatorio, leer_cantidad
+from indice_similitud import (CARACTERISTICAS_SIMILITUD, buscar_exacto, buscar_ivf, cargar_indice,
+                              construir_indice, guardar_indice)
+
+def canciones_sinteticas(filas, semilla=0):
+    """Columnas del índice con la forma de los datos de audio del generador"""
+
+    generador = np.random.default_rng(semilla)
+    audio = audio_aleatorio(filas, generador)
+    df = pd.DataFrame({columna: audio[columna] for columna in ['energy', 'danceability', 'valence', 'tempo']})
+    df['loudness_normalized'] = ((audio['loudness'] + 60) / 60).clip(0, 1)
+    df['track_id'] = [f"id{numero:012d}" for numero in range(filas)]
+    return df[['track_id'] + CARACTERISTICAS_SIMILITUD]
+
+def por_segundo(cantidad, funcion):
+    """Ejecutar una función; devuelve (resultado, cantidad por segundo)"""
+
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, cantidad / (time.perf_counter() - inicio)
+
+def verificar_exacto(indice, consultas, distancias, cantidad):
+    """Comparar las primeras consultas de la búsqueda exacta con la fuerza bruta"""
+
+    matriz = np.asarray(indice['matriz'], dtype='float64')
+    k = distancias.shape[1]
+    for numero in range(min(cantidad, len(consultas))):
+        todas = np.sqrt(((matriz - consultas[numero].astype('float64')) ** 2).sum(axis=1))
+        if not np.allclose(np.sort(todas)[:k], distancias[numero], atol=1e-5):
+            return False
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del índice de similitud")
+    parser.add_argument('--filas', default='1M', help="canciones sintéticas (ej: 100k, 1M)")
+    parser.add_argument('--procesado', action='store_true', help="usar el dataset de data/processed")
+    parser.add_argument('--consultas', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--sondas', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--verificar', type=int, default=20, help="consultas exactas a comparar con fuerza bruta")
+    opciones = parser.parse_args()
+
+    if opciones.procesado:
+        from dataset_arrow import cargar_dataset_arrow
+        df = cargar_dataset_arrow(['track_id'] + CARACTERISTICAS_SIMILITUD)
+    else:
+        df = canciones_sinteticas(leer_cantidad(opciones.filas))
+
+    directorio = tempfile.mkdtemp(prefix='indice_similitud_')
+    try:
+        print(f"=== Índice de similitud ({len(df):,} canciones, "
+              f"{len(CARACTERISTICAS_SIMILITUD)} características) ===")
+
+        inicio = time.perf_counter()
+        indice = construir_indice(df)
+        construido = time.perf_counter() - inicio
+        tamano = guardar_indice(indice, os.path.join(directorio, 'similarity_index'))
+        print(f"  Armado:   {construido:8.2f} s   ({len(indice['centros']):,} listas, {tamano / 1024**2:.1f} MB)")
+        del indice
+
+        inicio = time.perf_counter()
+        indice = cargar_indice(os.path.join(directorio, 'similarity_index'))
+        print(f"  Apertura: {(time.perf_counter() - inicio) * 1000:8.1f} ms (memory map)")
+
+        generador = np.random.default_rng(1)
+        elegidas = np.sort(generador.choice(len(indice['matriz']), opciones.consultas, replace=False))
+        consultas = (indice['matriz'][elegidas]
+                     + generador.normal(0, 0.05, (len(elegidas), len(CARACTERISTICAS_SIMILITUD)))).astype('float32')
+
+        print()
+        print(f"  {'Búsqueda':<16} {'Consultas/s':>12} {f'Recall@{opciones.k}':>10}")
+        print("  " + "-" * 40)
+        (distancias, exactas), velocidad = por_segundo(len(consultas), lambda: buscar_exacto(indice, consultas,
+                                                                                               opciones.k))
+        print(f"  {'exacta':<16} {velocidad:>12,.0f} {1.0:>10.3f}")
+
+        for sondas in opciones.sondas:
+            (_, filas), velocidad = por_segundo(len(consultas), lambda: buscar_ivf(indice, consultas, opciones.k,
+                                                                                 sondas))
+            # Vecinos del IVF que también están entre los exactos
+            aciertos = sum(len(np.intersect1d(filas[numero], exactas[numero])) for numero in range(len(filas)))
+            print(f"  {f'IVF, {sondas} sondas':<16} {velocidad:>12,.0f} {aciertos / exactas.size:>10.3f}")
+
+        print()
+        if not verificar_exacto(indice, consultas, distancias, opciones.verificar):
+            print("ERROR: la búsqueda exacta no coincide con la fuerza bruta")
+            sys.exit(1)
+        print(f"OK: la búsqueda exacta coincide con la fuerza bruta "
+              f"({min(opciones.verificar, len(consultas))} consultas)")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
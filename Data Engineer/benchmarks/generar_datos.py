@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generador de datos sintéticos con la forma de los CSV de Spotify
+Nivel: Desarrollador
+
+Escribe en <destino>/data/raw/ los siete archivos que lee el pipeline,
+con las mismas columnas que dataset-of-XXs.csv y spotify_data.csv:
+- spotify_data.csv se lleva el 85% de las filas y cada archivo de
+  década el 2.5%
+- una parte de las filas (tasa_duplicados) repite el track_id o la uri
+  de una fila anterior, dentro del mismo archivo o entre archivos de
+  décadas, para que la limpieza y la resolución de conflictos trabajen
+- hay unos pocos nulos, valores fuera de rango y años inválidos, como en
+  los datos reales, para que cada regla de limpieza elimine algo.
+
+Los archivos se escriben por lotes, así se pueden generar 10M de filas
+sin tenerlas todas en memoria.
+
+Uso (desde la carpeta "Data Engineer"):
+    python benchmarks/generar_datos.py /tmp/spotify_sintetico --filas 1M
+    python benchmarks/generar_datos.py /tmp/spotify_sintetico --filas 100k --duplicados 0.10
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+FILAS_POR_LOTE = 500000
+
+DECADAS_ARCHIVOS = ['60', '70', '80', '90', '00', '10']
+PROPORCION_SPOTIFY_DATA = 0.85
+
+# Géneros como aparecen en spotify_data.csv (con variaciones de escritura)
+GENEROS = ['pop', 'dance-pop', 'Dance-Pop', 'indie-pop', 'k-pop', 'rock', 'alt-rock', 'hard-rock', ' Punk ',
+           'metal', 'hip hop', 'hip-hop', 'Hip-Hop', 'rap', 'trap', 'edm', 'house', 'techno', 'dubstep',
+           'r&b', 'soul', 'funk', 'country', 'folk', 'latin', 'salsa', 'reggaeton', 'jazz', 'blues',
+           'classical', 'piano', 'soundtrack', 'ambient', 'acoustic', 'sad', 'sleep']
+
+def leer_cantidad(texto):
+    """Leer una cantidad de filas como 100000, 100k o 1M"""
+
+    texto = str(texto).strip().lower()
+    multiplicadores = {'k': 1000, 'm': 1000000}
+    if texto[-1:] in multiplicadores:
+        return int(float(texto[:-1]) * multiplicadores[texto[-1]])
+    return int(texto)
+
+def elegir_ids(inicio, filas, tasa_duplicados, generador):
+    """Número de canción de cada fila: nuevo, o uno anterior si es un duplicado"""
+
+    nuevos = np.arange(inicio, inicio + filas)
+    repetidos = (generador.random(filas) < tasa_duplicados) & (nuevos > 0)
+    nuevos[repetidos] = (generador.random(repetidos.sum()) * nuevos[repetidos]).astype('int64')
+    return nuevos
+
+def audio_aleatorio(filas, generador):
+    """Columnas de audio comunes a los dos tipos de archivo
+
+    Loudness depende de energy (como en los datos reales), así la
+    verificación de calidad encuentra la correlación que espera.
+    """
+
+    energy = generador.beta(2, 2, filas)
+    loudness = -4 - 30 * (1 - energy) + generador.normal(0, 8, filas)
+
+    return {
+        'danceability': generador.random(filas).round(3),
+        'energy': energy.round(3),
+        'key': generador.integers(0, 12, filas),
+        'loudness': loudness.clip(-59.9, 0).round(3),
+        'mode': generador.integers(0, 2, filas),
+        'speechiness': generador.random(filas).round(4),
+        'acousticness': generador.random(filas).round(4),
+        'instrumentalness': generador.random(filas).round(4),
+        'liveness': generador.random(filas).round(4),
+        'valence': generador.random(filas).round(3),
+        'tempo': (generador.normal(120, 30, filas)).clip(30, 240).round(3),
+        'duration_ms': generador.integers(60000, 480000, filas),
+        'time_signature': generador.choice([3, 4, 4, 4, 5], filas)
+    }
+
+def ensuciar(df, generador):
+    """Agregar algunos nulos y valores fuera de rango"""
+
+    filas = len(df)
+    for columna, proporcion, valor in [('energy', 0.001, np.nan), ('loudness', 0.0005, np.nan),
+                                       ('energy', 0.0002, 1.5), ('loudness', 0.0005, -75.0)]:
+        elegidas = generador.random(filas) < proporcion
+        df.loc[elegidas, columna] = valor
+    return df
+
+def escribir_lote(df, ruta, primero):
+    """Agregar un lote al CSV (con encabezado solo en el primero)"""
+    df.to_csv(ruta, index=False, header=primero, mode='w' if primero else 'a')
+
+def generar_archivo_decada(ruta, filas, desde, tasa_duplicados, generador):
+    """Escribir un dataset-of-XXs.csv
+
+    Las canciones se numeran a partir de desde (las de los archivos
+    anteriores van antes), así un duplicado puede repetir una canción de
+    este archivo o de otra década.
+    """
+
+    for inicio in range(0, max(filas, 1), FILAS_POR_LOTE):
+        cantidad = min(FILAS_POR_LOTE, filas - inicio)
+        ids = elegir_ids(desde + inicio, cantidad, tasa_duplicados, generador)
+        texto_ids = pd.Series(ids).astype(str).str.zfill(10)
+
+        df = pd.DataFrame({
+            'track': 'track ' + texto_ids,
+            'artist': 'artist ' + (pd.Series(ids) % 5000).astype(str),
+            'uri': 'spotify:track:' + texto_ids,
+            **audio_aleatorio(cantidad, generador),
+            'chorus_hit': (generador.random(cantidad) * 60).round(5),
+            'sections': generador.integers(4, 20, cantidad),
+            'target': generador.integers(0, 2, cantidad)
+        })
+        escribir_lote(ensuciar(df, generador), ruta, inicio == 0)
+
+def generar_spotify_data(ruta, filas, tasa_duplicados, generador):
+    """Escribir spotify_data.csv por lotes"""
+
+    for inicio in range(0, max(filas, 1), FILAS_POR_LOTE):
+        cantidad = min(FILAS_POR_LOTE, filas - inicio)
+        ids = elegir_ids(inicio, cantidad, tasa_duplicados, generador)
+        texto_ids = pd.Series(ids).astype(str).str.zfill(12)
+
+        anios = generador.integers(1950, 2024, cantidad).astype('float64')
+        anios[generador.random(cantidad) < 0.001] = np.nan
+        anios[generador.random(cantidad) < 0.0005] = 2030
+
+        generos = pd.Series(generador.choice(GENEROS, cantidad))
+        generos[generador.random(cantidad) < 0.001] = np.nan
+
+        df = pd.DataFrame({
+            'Unnamed: 0': np.arange(inicio, inicio + cantidad),
+            'artist_name': 'artist ' + (pd.Series(ids) % 50000).astype(str),
+            'track_name': 'track ' + texto_ids,
+            'track_id': 'id' + texto_ids,
+            'popularity': generador.integers(0, 100, cantidad),
+            'year': pd.array(anios).astype('Int64'),
+            'genre': generos,
+            **audio_aleatorio(cantidad, generador)
+        })
+        escribir_lote(ensuciar(df, generador), ruta, inicio == 0)
+
+def generar_datos(destino, filas=100000, tasa_duplicados=0.05, semilla=0):
+    """Generar los siete CSV en <destino>/data/raw con filas filas en total
+
+    Devuelve un diccionario {archivo: filas escritas}.
+    """
+
+    generador = np.random.default_rng(semilla)
+    directorio = os.path.join(destino, 'data', 'raw')
+    os.makedirs(directorio, exist_ok=True)
+
+    filas_spotify = int(filas * PROPORCION_SPOTIFY_DATA)
+    filas_decada = (filas - filas_spotify) // len(DECADAS_ARCHIVOS)
+
+    escritos = {}
+    for numero, decada in enumerate(DECADAS_ARCHIVOS):
+        ruta = os.path.join(directorio, f'dataset-of-{decada}s.csv')
+        generar_archivo_decada(ruta, filas_decada, numero * filas_decada, tasa_duplicados, generador)
+        escritos[ruta] = filas_decada
+
+    ruta = os.path.join(directorio, 'spotify_data.csv')
+    generar_spotify_data(ruta, filas_spotify, tasa_duplicados, generador)
+    escritos[ruta] = filas_spotify
+
+    return escritos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generar CSV sintéticos con la forma de los de Spotify")
+    parser.add_argument('destino')
+    parser.add_argument('--filas', default='100k', help="filas en total (ej: 100k, 1M, 10M)")
+    parser.add_argument('--duplicados', type=float, default=0.05, help="proporción de filas repetidas")
+    parser.add_argument('--semilla', type=int, default=0)
+    opciones = parser.parse_args()
+
+    escritos = generar_datos(opciones.destino, leer_cantidad(opciones.filas), opciones.duplicados, opciones.semilla)
+    for archivo, filas in escritos.items():
+        print(f"  {archivo}: {filas:,} filas ({os.path.getsize(archivo) / 1024**2:.1f} MB)")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verificación: los cuantiles aproximados respetan la cota de error
+Nivel: Desarrollador
+
+Compara las medianas por década, por década y género, por género y por
+nivel de intensidad, y los cuartiles de los outliers, calculados con los
+histogramas de cuantiles.py contra los exactos de pandas. En cada celda,
+el valor aproximado tiene que quedar a menos de un ancho de cubeta del
+valor de pandas. También muestra cuánto tardan las medianas exactas y
+las aproximadas.
+
+También comprueba que combinar los histogramas de dos mitades, o restar
+una mitad del total, da lo mismo que calcularlos de una vez.
+
+Uso (desde la carpeta "Data Engineer", después de ejecutar el pipeline):
+    python benchmarks/verificar_cuantiles.py
+Termina con código 1 si algún valor se pasa de la cota.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_arrow import RUTA_ARROW, cargar_dataset_arrow
+from cuantiles import (RANGOS_HISTOGRAMA, ancho_cubeta, crear_histogramas, combinar_histogramas,
+                       actualizar_histogramas, cuantiles_por_grupo, cuantiles_globales)
+from resumenes import TABLAS_RESUMEN, nivel_intensidad
+
+def revisar(nombre, aproximado, exacto, medida):
+    """Comprobar que cada valor aproximado queda a menos de un ancho de cubeta del exacto"""
+
+    ancho = ancho_cubeta(medida)
+    error = (aproximado - exacto).abs().max()
+    # Un grupo con valor exacto y sin valor aproximado (o al revés) también es un error
+    faltantes = (aproximado.isna() != exacto.isna()).sum()
+    correcto = not error > ancho and faltantes == 0
+    estado = 'OK' if correcto else 'ERROR'
+
+    detalle = f", {faltantes} grupos sin valor" if faltantes else ""
+    print(f"  {estado}: {nombre:<42} error máximo {error:.5f} (cota {ancho:.4f}){detalle}")
+    return correcto
+
+def ordenar_claves(df, claves):
+    """Ordenar por claves para comparar dos histogramas"""
+    return df.sort_values(claves).reset_index(drop=True)
+
+if __name__ == "__main__":
+    if not os.path.exists(RUTA_ARROW):
+        print(f"ERROR: no existe {RUTA_ARROW}; ejecuta primero pipeline_completo.py")
+        sys.exit(1)
+
+    df = cargar_dataset_arrow()
+    df['intensity_category'] = nivel_intensidad(df['intensity_weighted'])
+    print(f"=== Cuantiles aproximados vs exactos ({len(df):,} canciones) ===")
+
+    inicio = time.perf_counter()
+    histogramas = crear_histogramas(df)
+    print(f"Histogramas: {len(histogramas):,} cubetas con datos ({time.perf_counter() - inicio:.3f} s)\n")
+
+    todo_ok = True
+
+    # Medianas de cada tabla de resumen
+    for nombre, definicion in TABLAS_RESUMEN.items():
+        claves = definicion['claves']
+        medidas = [medida for medida, estadisticas in definicion['columnas']
+                   if 'median' in estadisticas and medida in RANGOS_HISTOGRAMA]
+        if not medidas:
+            continue
+
+        aproximadas = cuantiles_por_grupo(histogramas, claves, medidas)
+        exactas = df.groupby(claves, observed=True)[medidas].median()
+        for medida in medidas:
+            todo_ok &= revisar(f"mediana de {medida} por {' × '.join(claves)}",
+                               aproximadas[medida].reindex(exactas.index), exactas[medida], medida)
+
+    # Cuartiles de los outliers
+    for q, aproximado in zip([0.25, 0.75], cuantiles_globales(histogramas, 'intensity_weighted', [0.25, 0.75])):
+        todo_ok &= revisar(f"cuartil {q} de intensity_weighted", pd.Series([aproximado]),
+                           pd.Series([df['intensity_weighted'].quantile(q)]), 'intensity_weighted')
+
+    # Combinar y restar da lo mismo que calcular de una vez
+    mitad = len(df) // 2
+    primera = crear_histogramas(df.iloc[:mitad])
+    claves = list(histogramas.columns[:-1])
+    combinado = combinar_histogramas([primera, crear_histogramas(df.iloc[mitad:])])
+    restado = actualizar_histogramas(histogramas, df.iloc[:mitad], df.iloc[:0])
+
+    for nombre, resultado, esperado in [('combinar dos mitades', combinado, histogramas),
+                                        ('restar una mitad', restado, crear_histogramas(df.iloc[mitad:]))]:
+        igual = ordenar_claves(resultado, claves).astype(str).equals(ordenar_claves(esperado, claves).astype(str))
+        print(f"  {'OK' if igual else 'ERROR'}: {nombre} da los mismos histogramas")
+        todo_ok &= igual
+
+    # Tiempo de las medianas exactas y aproximadas por década y género
+    inicio = time.perf_counter()
+    df.groupby(['release_decade', 'main_genre'], observed=True)['intensity_weighted'].median()
+    exacto = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    cuantiles_por_grupo(histogramas, ['release_decade', 'main_genre'], ['intensity_weighted'])
+    aproximado = time.perf_counter() - inicio
+    print(f"\nMedianas por década y género: exactas {exacto:.3f} s, desde histogramas {aproximado:.3f} s")
+
+    print("\nTodas las cotas se cumplen" if todo_ok else "\nERROR: algún cuantil se pasó de la cota")
+    sys.exit(0 if todo_ok else 1)
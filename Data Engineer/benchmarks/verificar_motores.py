@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verificación: Polars y DuckDB dan los mismos resultados que pandas
+Nivel: Desarrollador
+
+Ejecuta limpiar, combinar, resolver e intensidad con pandas y la consulta
+perezosa de consulta_perezosa.py con cada motor, sobre los mismos CSV, y
+compara todo lo que sale de esas etapas: el dataset combinado, el linaje,
+el dataset final y las cuatro tablas de resumen.
+
+Tienen que ser idénticos (mismos valores, tipos, columnas y orden), salvo
+las columnas de resumen que no se redondean (danceability_mean, tempo_mean
+y tempo_std): salen de sumas del cubo que cada motor hace en otro orden,
+así que se aceptan diferencias relativas de hasta 1e-12.
+
+Uso (desde la carpeta "Data Engineer"):
+    python benchmarks/verificar_motores.py                     # 100k filas sintéticas
+    python benchmarks/verificar_motores.py --filas 1M --motores polars
+    python benchmarks/verificar_motores.py --directorio /ruta/con/data/raw
+Termina con código 1 si algún resultado difiere.
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generar_datos import generar_datos, leer_cantidad
+from cache_etapas import configurar_cache
+from registro import configurar_registro
+
+NOMBRES_SALIDAS = ['df_combinado', 'linaje', 'df_final', 'resumen_decada', 'resumen_decada_genero',
+                   'stats_genero', 'resumen_intensidad']
+
+# Columnas de resumen sin redondear y su tolerancia relativa
+COLUMNAS_SIN_REDONDEAR = ['danceability_mean', 'tempo_mean', 'tempo_std']
+TOLERANCIA_RELATIVA = 1e-12
+
+def ejecutar_pandas():
+    """Las etapas de pandas, en el orden del pipeline"""
+
+    from limpiar_datos import limpiar_con_linaje
+    from combinar_archivos import combinar_con_linaje, resolver_y_verificar
+    from crear_intensidad import crear_variables_y_resumenes
+
+    datos_limpios, linaje = limpiar_con_linaje()
+    df_combinado, linaje = combinar_con_linaje(datos_limpios, linaje)
+    resultado = crear_variables_y_resumenes(resolver_y_verificar(df_combinado.copy()))
+    return (df_combinado, linaje) + tuple(resultado)
+
+def comparar(nombre, obtenido, esperado):
+    """Comparar un resultado con el de pandas; devuelve el error o None"""
+
+    exactas = obtenido
+    esperadas = esperado
+    aproximadas = [columna for columna in COLUMNAS_SIN_REDONDEAR if columna in esperado.columns]
+    if nombre.startswith(('resumen', 'stats')) and aproximadas:
+        exactas = obtenido.drop(columns=aproximadas, errors='ignore')
+        esperadas = esperado.drop(columns=aproximadas)
+
+    try:
+        pd.testing.assert_frame_equal(exactas, esperadas, check_exact=True)
+        if exactas is not obtenido:
+            pd.testing.assert_frame_equal(obtenido[aproximadas], esperado[aproximadas],
+                                          check_exact=False, rtol=TOLERANCIA_RELATIVA, atol=0)
+    except AssertionError as error:
+        return str(error).splitlines()[0] if str(error) else 'diferente'
+    return None
+
+def medir(funcion):
+    """Ejecutar sin mensajes y devolver el resultado y los segundos"""
+
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparar los motores Polars y DuckDB con pandas")
+    parser.add_argument('--directorio', default=None, help="carpeta con data/raw (por defecto, datos sintéticos)")
+    parser.add_argument('--filas', default='100k', help="filas sintéticas (ej: 100k, 1M)")
+    parser.add_argument('--motores', nargs='+', choices=['polars', 'duckdb'], default=['polars', 'duckdb'])
+    opciones = parser.parse_args()
+
+    from consulta_perezosa import ejecutar_consulta, verificar_motor
+
+    configurar_cache(activa=False)
+    configurar_registro('silencioso')
+
+    temporal = None
+    directorio = opciones.directorio
+    if directorio is None:
+        temporal = tempfile.TemporaryDirectory(prefix='motores_')
+        directorio = temporal.name
+        generar_datos(directorio, leer_cantidad(opciones.filas))
+        print(f"Datos sintéticos: {leer_cantidad(opciones.filas):,} filas en {directorio}")
+    os.chdir(directorio)
+
+    esperado, segundos = medir(ejecutar_pandas)
+    print(f"=== Motores vs pandas ({len(esperado[2]):,} canciones finales) ===")
+    print(f"  pandas: {segundos:.2f} s\n")
+
+    todo_ok = True
+    for motor in opciones.motores:
+        try:
+            verificar_motor(motor)
+        except ImportError as error:
+            print(f"  SALTADO: {error}")
+            continue
+
+        obtenido, segundos = medir(lambda: ejecutar_consulta(motor))
+        print(f"{motor}: {segundos:.2f} s")
+        for nombre, valor, referencia in zip(NOMBRES_SALIDAS, obtenido, esperado):
+            error = comparar(nombre, valor, referencia)
+            print(f"  {'OK' if error is None else 'ERROR'}: {nombre}" + (f" ({error})" if error else ""))
+            todo_ok &= error is None
+        print()
+
+    if temporal is not None:
+        temporal.cleanup()
+
+    print("Todos los motores dan lo mismo que pandas" if todo_ok else "ERROR: algún motor difiere de pandas")
+    sys.exit(0 if todo_ok else 1)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché en disco para los resultados de las etapas del pipeline
+Nivel: Desarrollador
+
+Cada resultado se guarda en Parquet dentro de data/cache/<clave>/.
+La clave combina:
+- el hash del contenido de los archivos de entrada (o las claves de las
+  etapas anteriores),
+- la versión del código de la etapa (hash de sus módulos .py),
+- los parámetros de la etapa.
+
+Si cambia cualquiera de las tres cosas, la clave cambia y la etapa se
+vuelve a calcular. Cuando la caché supera el tamaño máximo se borran las
+entradas usadas hace más tiempo (LRU).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from esquema import leer_parquet
+from registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Configuración de la caché (se puede cambiar con configurar_cache)
+CONFIGURACION_CACHE = {
+    'activa': True,
+    'directorio': 'data/cache',
+    'tamano_maximo_mb': 2048
+}
+
+# Tamaño de bloque para calcular hashes sin cargar el archivo entero
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+def configurar_cache(activa=None, directorio=None, tamano_maximo_mb=None):
+    """Cambiar la configuración de la caché"""
+
+    if activa is not None:
+        CONFIGURACION_CACHE['activa'] = activa
+    if directorio is not None:
+        CONFIGURACION_CACHE['directorio'] = directorio
+    if tamano_maximo_mb is not None:
+        CONFIGURACION_CACHE['tamano_maximo_mb'] = tamano_maximo_mb
+
+def cache_activa():
+    """Saber si la caché está activa"""
+    return CONFIGURACION_CACHE['activa']
+
+def borrar_cache():
+    """Borrar todo el contenido de la caché"""
+
+    directorio = CONFIGURACION_CACHE['directorio']
+    if os.path.exists(directorio):
+        shutil.rmtree(directorio)
+        registro.info(f"Caché borrada: {directorio}")
+
+def calcular_hash_archivo(archivo):
+    """Calcular el hash SHA-256 del contenido de un archivo"""
+
+    hash_archivo = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b''):
+            hash_archivo.update(bloque)
+    return hash_archivo.hexdigest()
+
+def huella_archivo(archivo):
+    """Obtener el hash del contenido de un archivo de entrada
+
+    Para no leer otra vez archivos grandes que no cambiaron, se guarda
+    un índice con tamaño, fecha de modificación y hash de cada archivo.
+    Con la caché apagada no se usa el índice (no se escribe nada en disco).
+    """
+
+    if not cache_activa():
+        return calcular_hash_archivo(archivo)
+
+    ruta_indice = os.path.join(CONFIGURACION_CACHE['directorio'], 'huellas.json')
+    indice = {}
+    if os.path.exists(ruta_indice):
+        try:
+            with open(ruta_indice, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+        except (OSError, ValueError) as e:
+            # Un índice dañado solo obliga a recalcular los hashes
+            registro.warning(f"ADVERTENCIA: No se pudo leer {ruta_indice}: {str(e)}")
+
+    info = os.stat(archivo)
+    ruta = os.path.abspath(archivo)
+    guardada = indice.get(ruta)
+    if guardada and guardada['tamano'] == info.st_size and guardada['mtime_ns'] == info.st_mtime_ns:
+        return guardada['sha256']
+
+    huella = calcular_hash_archivo(archivo)
+    indice[ruta] = {'tamano': info.st_size, 'mtime_ns': info.st_mtime_ns, 'sha256': huella}
+
+    # Igual que guardar_cache: primero a un temporal y después se reemplaza
+    os.makedirs(CONFIGURACION_CACHE['directorio'], exist_ok=True)
+    temporal = f"{ruta_indice}.tmp-{os.getpid()}"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, indent=2)
+    os.replace(temporal, ruta_indice)
+
+    return huella
+
+def describir_archivo(archivo):
+    """Huella completa de un archivo: tamaño, fecha de modificación y hash"""
+
+    info = os.stat(archivo)
+    return {'tamano': info.st_size, 'mtime_ns': info.st_mtime_ns, 'sha256': huella_archivo(archivo)}
+
+def version_codigo(modulos):
+    """Calcular la versión del código como el hash de los archivos .py de los módulos"""
+
+    directorio_codigo = os.path.dirname(os.path.abspath(__file__))
+    hash_codigo = hashlib.sha256()
+    for modulo in sorted(modulos):
+        with open(os.path.join(directorio_codigo, f"{modulo}.py"), 'rb') as f:
+            hash_codigo.update(f.read())
+    return hash_codigo.hexdigest()
+
+def calcular_clave(etapa, entradas, modulos, parametros=None):
+    """Calcular la clave de caché de una etapa
+
+    entradas es una lista de hashes de archivos o claves de otras etapas.
+    """
+
+    contenido = {
+        'etapa': etapa,
+        'entradas': list(entradas),
+        'codigo': version_codigo(modulos),
+        'parametros': parametros or {}
+    }
+    texto = json.dumps(contenido, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def existe_en_cache(clave):
+    """Saber si una clave ya tiene resultados guardados"""
+
+    if not cache_activa() or clave is None:
+        return False
+    ruta_info = os.path.join(CONFIGURACION_CACHE['directorio'], clave, 'info.json')
+    return os.path.exists(ruta_info)
+
+def leer_cache(clave):
+    """Leer los resultados guardados para una clave
+
+    Devuelve un diccionario {nombre: DataFrame} o None si no hay nada.
+    Una entrada que no se puede leer (archivos truncados, por ejemplo) se
+    borra, para que la próxima vez la etapa se vuelva a calcular.
+    """
+
+    if not existe_en_cache(clave):
+        return None
+
+    directorio_entrada = os.path.join(CONFIGURACION_CACHE['directorio'], clave)
+    ruta_info = os.path.join(directorio_entrada, 'info.json')
+
+    try:
+        with open(ruta_info, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+
+        resultados = {}
+        for nombre, archivo in info['tablas'].items():
+            resultados[nombre] = leer_parquet(os.path.join(directorio_entrada, archivo))
+    except Exception as e:
+        registro.warning(f"ADVERTENCIA: No se pudo leer la caché {clave[:12]}: {str(e)}")
+        shutil.rmtree(directorio_entrada, ignore_errors=True)
+        return None
+
+    # Marcar la entrada como usada recientemente (para el LRU)
+    os.utime(ruta_info)
+
+    return resultados
+
+def guardar_cache(clave, tablas):
+    """Guardar resultados {nombre: DataFrame} para una clave
+
+    Se escribe primero en un directorio temporal y luego se renombra,
+    así una ejecución cortada nunca deja una entrada a medias.
+    """
+
+    if not cache_activa() or clave is None:
+        return False
+
+    directorio = CONFIGURACION_CACHE['directorio']
+    directorio_entrada = os.path.join(directorio, clave)
+    directorio_temporal = os.path.join(directorio, f"{clave}.tmp-{os.getpid()}")
+
+    try:
+        os.makedirs(directorio_temporal, exist_ok=True)
+
+        info = {'tablas': {}}
+        for numero, (nombre, df) in enumerate(tablas.items()):
+            archivo = f"tabla_{numero}.parquet"
+            df.to_parquet(os.path.join(directorio_temporal, archivo))
+            info['tablas'][nombre] = archivo
+
+        with open(os.path.join(directorio_temporal, 'info.json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2, ensure_ascii=False)
+
+        if os.path.exists(directorio_entrada):
+            shutil.rmtree(directorio_entrada)
+        os.rename(directorio_temporal, directorio_entrada)
+    except Exception as e:
+        registro.warning(f"ADVERTENCIA: No se pudo guardar en caché: {str(e)}")
+        shutil.rmtree(directorio_temporal, ignore_errors=True)
+        return False
+
+    aplicar_limite_cache()
+    return True
+
+def tamano_directorio(directorio):
+    """Calcular el tamaño total de un directorio en bytes"""
+
+    total = 0
+    for raiz, _, archivos in os.walk(directorio):
+        for archivo in archivos:
+            total += os.path.getsize(os.path.join(raiz, archivo))
+    return total
+
+def aplicar_limite_cache():
+    """Borrar las entradas usadas hace más tiempo hasta respetar el tamaño máximo"""
+
+    directorio = CONFIGURACION_CACHE['directorio']
+    limite = CONFIGURACION_CACHE['tamano_maximo_mb'] * 1024**2
+
+    # Entradas completas con su último uso y su tamaño
+    entradas = []
+    for nombre in os.listdir(directorio):
+        ruta_info = os.path.join(directorio, nombre, 'info.json')
+        if os.path.exists(ruta_info):
+            ruta_entrada = os.path.join(directorio, nombre)
+            entradas.append((os.path.getmtime(ruta_info), tamano_directorio(ruta_entrada), ruta_entrada))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+
+    # Borrar de la más antigua a la más nueva
+    for _, tamano, ruta_entrada in sorted(entradas):
+        if total <= limite:
+            break
+        shutil.rmtree(ruta_entrada, ignore_errors=True)
+        total -= tamano
+        registro.info(f"Caché: eliminada entrada antigua {os.path.basename(ruta_entrada)[:12]} ({tamano / 1024**2:.1f} MB)")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Categorizar géneros musicales en categorías principales
+Nivel: Desarrollador
+
+Las reglas están en reglas_generos.csv (columnas categoria, palabra_clave).
+Un género pertenece a la primera categoría (en el orden del archivo) que
+tenga alguna palabra clave contenida en el género. Para agregar una
+categoría o una palabra clave basta con editar el CSV.
+
+Como hay pocos géneros distintos, cada género se categoriza una sola vez
+y el resultado se copia a todas las filas usando los códigos de categoría.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import re
+
+# Archivo con las reglas (junto a este script)
+RUTA_REGLAS_GENEROS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reglas_generos.csv')
+
+# Categoría para los géneros que no coinciden con ninguna regla
+CATEGORIA_POR_DEFECTO = 'Other'
+
+def leer_palabras_clave(ruta=RUTA_REGLAS_GENEROS):
+    """Leer las palabras clave de cada categoría
+
+    Devuelve una lista [(categoria, [palabras])] en orden de prioridad.
+    """
+
+    reglas = pd.read_csv(ruta, dtype=str)
+    reglas['palabra_clave'] = reglas['palabra_clave'].str.strip().str.lower()
+
+    return [(categoria, list(reglas.loc[reglas['categoria'] == categoria, 'palabra_clave']))
+            for categoria in reglas['categoria'].drop_duplicates()]
+
+def cargar_reglas_generos(ruta=RUTA_REGLAS_GENEROS):
+    """Cargar las reglas y compilar una expresión regular por categoría
+
+    Devuelve una lista [(categoria, regex)] en orden de prioridad.
+    """
+
+    return [(categoria, re.compile('|'.join(re.escape(palabra) for palabra in palabras)))
+            for categoria, palabras in leer_palabras_clave(ruta)]
+
+def categorizar_valores(generos, reglas):
+    """Categorizar una lista de géneros distintos
+
+    Se prueba categoría por categoría; la primera que coincide gana.
+    """
+
+    generos = pd.Series(generos, dtype=object).str.lower()
+    resultado = np.full(len(generos), CATEGORIA_POR_DEFECTO, dtype=object)
+    sin_asignar = generos.notna().to_numpy()
+
+    for categoria, patron in reglas:
+        if not sin_asignar.any():
+            break
+        coincide = generos[sin_asignar].str.contains(patron, regex=True).to_numpy(dtype=bool)
+        indices = np.flatnonzero(sin_asignar)[coincide]
+        resultado[indices] = categoria
+        sin_asignar[indices] = False
+
+    return resultado
+
+def categorizar_generos(serie, reglas=None):
+    """Asignar la categoría principal a cada fila de una serie de géneros
+
+    Devuelve una serie de texto con el mismo índice. Los géneros nulos
+    quedan como 'Other'.
+    """
+
+    if reglas is None:
+        reglas = cargar_reglas_generos()
+
+    # Cada género distinto se categoriza una sola vez
+    categorica = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype('category')
+    por_genero = categorizar_valores(categorica.cat.categories.astype(object), reglas)
+
+    # Copiar el resultado a cada fila con los códigos (-1 = nulo)
+    por_genero = np.append(por_genero, CATEGORIA_POR_DEFECTO)
+    codigos = categorica.cat.codes.to_numpy()
+    return pd.Series(por_genero[codigos], index=serie.index)
@@ -9,223 +9,309 @@ import pandas as pd
 import numpy as np
 import os
 
+from esquema import TIPO_DECADA
+from limpiar_datos import fecha_desde_anio
+from instrumentacion import instrumentar
+from registro import obtener_registro, mostrar_diagnostico, mostrar_detalle
+
+registro = obtener_registro(__name__)
+
+# Década implícita de los archivos de una sola década, con su año promedio
+DECADA_POR_ARCHIVO = {
+    'dataset-of-60s': ('1960s', 1965),
+    'dataset-of-70s': ('1970s', 1975),
+    'dataset-of-80s': ('1980s', 1985),
+    'dataset-of-90s': ('1990s', 1995),
+    'dataset-of-00s': ('2000s', 2005),
+    'dataset-of-10s': ('2010s', 2015)
+}
+
+@instrumentar
 def combinar_archivos_simple(datos_limpios):
     """Combinar todos los archivos en uno solo (método simple)"""
     
-    print("COMBINANDO ARCHIVOS")
-    print("=" * 50)
+    registro.info("COMBINANDO ARCHIVOS")
+    registro.info("=" * 50)
     
     # Lista para guardar todos los DataFrames
     todos_los_datos = []
     
     for archivo, df in datos_limpios.items():
-        print(f"Procesando: {archivo}")
-        print(f"  Registros: {len(df)}")
+        registro.debug(f"Procesando: {archivo}")
+        registro.debug(f"  Registros: {len(df)}")
         
         # Agregar una columna que diga de qué archivo viene
         df['data_source'] = archivo
         
         # Agregar década implícita para archivos de décadas específicas
-        if 'dataset-of-60s' in archivo:
-            df['release_decade'] = '1960s'
-            df['release_year'] = 1965  # Año promedio de la década
-        elif 'dataset-of-70s' in archivo:
-            df['release_decade'] = '1970s'
-            df['release_year'] = 1975
-        elif 'dataset-of-80s' in archivo:
-            df['release_decade'] = '1980s'
-            df['release_year'] = 1985
-        elif 'dataset-of-90s' in archivo:
-            df['release_decade'] = '1990s'
-            df['release_year'] = 1995
-        elif 'dataset-of-00s' in archivo:
-            df['release_decade'] = '2000s'
-            df['release_year'] = 2005
-        elif 'dataset-of-10s' in archivo:
-            df['release_decade'] = '2010s'
-            df['release_year'] = 2015
+        for nombre, (decada, anio) in DECADA_POR_ARCHIVO.items():
+            if nombre in archivo:
+                df['release_decade'] = decada
+                df['release_year'] = anio
+                break
+        
+        # Todas las décadas con el mismo tipo, para que se unan como categoría
+        if 'release_decade' in df.columns:
+            df['release_decade'] = df['release_decade'].astype(TIPO_DECADA)
         
         # Crear release_date si no existe
         if 'release_date' not in df.columns and 'release_year' in df.columns:
-            df['release_date'] = pd.to_datetime(df['release_year'].astype(str) + '-01-01', errors='coerce')
+            df['release_date'] = fecha_desde_anio(df['release_year'])
         
         todos_los_datos.append(df)
     
     # Combinar todos los DataFrames
-    print(f"\nCombinando {len(todos_los_datos)} archivos...")
+    registro.info(f"\nCombinando {len(todos_los_datos)} archivos...")
     df_combinado = pd.concat(todos_los_datos, ignore_index=True)
     
-    print(f"Total de canciones combinadas: {len(df_combinado):,}")
-    print(f"Columnas: {list(df_combinado.columns)}")
+    registro.info(f"Total de canciones combinadas: {len(df_combinado):,}")
+    registro.debug(f"Columnas: {list(df_combinado.columns)}")
     
     return df_combinado
 
+def combinar_con_linaje(datos_limpios, linaje):
+    """Combinar los archivos y devolver el linaje de la limpieza junto al resultado
+    
+    Así el linaje (una tabla chica) queda en la caché de esta etapa y el
+    guardado lo usa sin volver a limpiar ni a leer los archivos originales.
+    """
+    return combinar_archivos_simple(datos_limpios), linaje
+
+# Cómo resolver cada columna cuando la misma canción aparece varias veces
+# 'moda' = valor más común, 'unir' = valores distintos separados por coma
+REGLAS_CONFLICTOS = {
+    'track_name': 'first',  # Usar el primer nombre
+    'artist_name': 'first',  # Usar el primer artista
+    'energy': 'mean',       # Promediar energy
+    'loudness': 'mean',     # Promediar loudness
+    'loudness_normalized': 'mean',  # Promediar loudness_normalized
+    'release_date': 'min',  # Usar la fecha más temprana
+    'release_year': 'min',  # Usar el año más temprano
+    'release_decade': 'first',  # Usar la primera década
+    'genre': 'moda',        # Usar el género más común
+    'main_genre': 'moda',   # Usar el género principal más común
+    'data_source': 'unir',  # Combinar fuentes
+    'danceability': 'mean',  # Promediar otras características
+    'valence': 'mean',
+    'tempo': 'mean',
+    'duration_ms': 'mean'
+}
+
+# Valor cuando un grupo no tiene ningún valor para calcular la moda
+VALORES_SIN_MODA = {'genre': 'Unknown', 'main_genre': 'Other'}
+
+def calcular_moda(df, claves, columna):
+    """Valor más común de una columna en cada grupo
+    
+    Se cuenta cada par (grupo, valor) y se ordena por cantidad. Como el
+    ordenamiento es estable, en un empate gana el menor valor, igual
+    que con Series.mode()[0].
+    """
+    
+    conteos = df.groupby(claves + [columna], observed=True).size().reset_index(name='cantidad')
+    conteos = conteos.sort_values('cantidad', ascending=False, kind='stable')
+    
+    return conteos.drop_duplicates(claves).set_index(claves)[columna]
+
+def unir_valores(df, claves, columna):
+    """Valores distintos de una columna en cada grupo, en orden de aparición"""
+    
+    distintos = df.drop_duplicates(claves + [columna])
+    return distintos.groupby(claves, sort=False)[columna].agg(', '.join)
+
+@instrumentar
+def resolver_duplicados(df, claves, reglas=None):
+    """Combinar en una fila las canciones repetidas según las reglas
+    
+    Solo se agrupan las claves que aparecen más de una vez; el resto de
+    las filas pasa directo. El resultado es el mismo que agrupar todo
+    con groupby(claves).agg(reglas), ordenado por las claves.
+    """
+    
+    reglas = reglas or REGLAS_CONFLICTOS
+    reglas = {columna: regla for columna, regla in reglas.items()
+              if columna in df.columns and columna not in claves}
+    columnas = claves + list(reglas)
+    
+    # groupby descarta las filas sin clave
+    df = df.dropna(subset=claves)
+    repetidas = df.duplicated(subset=claves, keep=False)
+    
+    # Agrupar solo las filas repetidas
+    grupos = df.loc[repetidas, columnas]
+    for columna, regla in reglas.items():
+        # El promedio de enteros con nulos (Int32) sería Float64; como con
+        # los enteros de numpy, queda en float64
+        tipo = grupos[columna].dtype
+        if regla == 'mean' and pd.api.types.is_extension_array_dtype(tipo) and pd.api.types.is_integer_dtype(tipo):
+            grupos[columna] = grupos[columna].astype('float64')
+    agregaciones = {columna: regla for columna, regla in reglas.items() if regla not in ('moda', 'unir')}
+    resueltas = grupos.groupby(claves, observed=True).agg(agregaciones)
+    
+    for columna, regla in reglas.items():
+        if regla == 'moda':
+            modas = calcular_moda(grupos, claves, columna).reindex(resueltas.index)
+            resueltas[columna] = modas.fillna(VALORES_SIN_MODA.get(columna))
+        elif regla == 'unir':
+            resueltas[columna] = unir_valores(grupos, claves, columna).reindex(resueltas.index)
+    
+    resueltas = resueltas[list(reglas)].reset_index()
+    
+    # Las filas sin repetir quedan igual, con los mismos tipos que las agrupadas
+    unicas = df.loc[~repetidas, columnas].copy()
+    for columna, regla in reglas.items():
+        if regla == 'moda' and columna in VALORES_SIN_MODA:
+            unicas[columna] = unicas[columna].fillna(VALORES_SIN_MODA[columna])
+        if unicas[columna].dtype != resueltas[columna].dtype:
+            unicas[columna] = unicas[columna].astype(resueltas[columna].dtype)
+    
+    df_resuelto = pd.concat([unicas, resueltas], ignore_index=True)
+    return df_resuelto.sort_values(claves, kind='stable').reset_index(drop=True)
+
+@instrumentar
 def resolver_conflictos(df):
     """Resolver conflictos cuando la misma canción aparece varias veces"""
     
-    print("\nRESOLVIENDO CONFLICTOS")
-    print("=" * 50)
+    registro.info("\nRESOLVIENDO CONFLICTOS")
+    registro.info("=" * 50)
     
-    print(f"Registros antes de resolver conflictos: {len(df)}")
+    registro.debug(f"Registros antes de resolver conflictos: {len(df)}")
     
     # Si hay track_id, usar eso para identificar duplicados
     if 'track_id' in df.columns:
-        print("Usando track_id para identificar duplicados...")
-        
-        # Contar duplicados
-        duplicados = df.duplicated(subset=['track_id']).sum()
-        print(f"Duplicados encontrados: {duplicados}")
-        
-        if duplicados > 0:
-            # Agrupar por track_id y resolver conflictos
-            df_resuelto = df.groupby('track_id').agg({
-                'track_name': 'first',  # Usar el primer nombre
-                'artist_name': 'first',  # Usar el primer artista
-                'energy': 'mean',       # Promediar energy
-                'loudness': 'mean',     # Promediar loudness
-                'loudness_normalized': 'mean',  # Promediar loudness_normalized
-                'release_date': 'min',  # Usar la fecha más temprana
-                'release_year': 'min',  # Usar el año más temprano
-                'release_decade': 'first',  # Usar la primera década
-                'genre': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown',  # Usar el género más común
-                'main_genre': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Other',  # Usar el género principal más común
-                'data_source': lambda x: ', '.join(x.unique()),  # Combinar fuentes
-                'danceability': 'mean',  # Promediar otras características
-                'valence': 'mean',
-                'tempo': 'mean',
-                'duration_ms': 'mean'
-            }).reset_index()
-            
-            print(f"Registros después de resolver conflictos: {len(df_resuelto)}")
-            print(f"Registros eliminados: {len(df) - len(df_resuelto)}")
-            
-            return df_resuelto
-        else:
-            print("No hay conflictos que resolver")
-            return df
+        registro.debug("Usando track_id para identificar duplicados...")
+        claves = ['track_id']
     
     # Si no hay track_id, usar nombre + artista
     elif 'track_name' in df.columns and 'artist_name' in df.columns:
-        print("Usando track_name + artist_name para identificar duplicados...")
-        
-        # Contar duplicados
-        duplicados = df.duplicated(subset=['track_name', 'artist_name']).sum()
-        print(f"Duplicados encontrados: {duplicados}")
-        
-        if duplicados > 0:
-            df_resuelto = df.groupby(['track_name', 'artist_name']).agg({
-                'energy': 'mean',
-                'loudness': 'mean', 
-                'loudness_normalized': 'mean',
-                'release_date': 'min',
-                'release_year': 'min',
-                'release_decade': 'first',
-                'genre': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown',
-                'main_genre': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Other',
-                'data_source': lambda x: ', '.join(x.unique()),
-                'danceability': 'mean',
-                'valence': 'mean',
-                'tempo': 'mean',
-                'duration_ms': 'mean'
-            }).reset_index()
-            
-            print(f"Registros después de resolver conflictos: {len(df_resuelto)}")
-            print(f"Registros eliminados: {len(df) - len(df_resuelto)}")
-            
-            return df_resuelto
-        else:
-            print("No hay conflictos que resolver")
-            return df
+        registro.debug("Usando track_name + artist_name para identificar duplicados...")
+        claves = ['track_name', 'artist_name']
     
     else:
-        print("No se puede identificar duplicados - no hay identificadores únicos")
+        registro.info("No se puede identificar duplicados - no hay identificadores únicos")
+        return df
+    
+    # Contar duplicados
+    duplicados = df.duplicated(subset=claves).sum()
+    registro.info(f"Duplicados encontrados: {duplicados}")
+    
+    if duplicados == 0:
+        registro.info("No hay conflictos que resolver")
         return df
+    
+    df_resuelto = resolver_duplicados(df, claves)
+    
+    registro.debug(f"Registros después de resolver conflictos: {len(df_resuelto)}")
+    registro.info(f"Registros eliminados: {len(df) - len(df_resuelto)}")
+    
+    return df_resuelto
 
+@instrumentar
 def verificar_dataset_combinado(df):
-    """Verificar que el dataset combinado tiene sentido"""
+    """Verificar que el dataset combinado tiene sentido
+    
+    Las columnas críticas se revisan siempre. Los nulos solo se cuentan
+    si se muestran los resultados, y las distribuciones por década, género
+    y fuente solo en modo detalle.
+    """
     
-    print("\nVERIFICANDO DATASET COMBINADO")
-    print("=" * 50)
+    registro.info("\nVERIFICANDO DATASET COMBINADO")
+    registro.info("=" * 50)
     
     # Información básica
-    print(f"Total de canciones: {len(df):,}")
-    print(f"Total de columnas: {len(df.columns)}")
+    registro.info(f"Total de canciones: {len(df):,}")
+    registro.info(f"Total de columnas: {len(df.columns)}")
     
     # Verificar columnas críticas
     columnas_criticas = ['track_id', 'track_name', 'artist_name', 'energy', 'loudness', 'release_date', 'main_genre']
-    print(f"\nColumnas críticas presentes:")
+    registro.debug(f"\nColumnas críticas presentes:")
     for col in columnas_criticas:
         if col in df.columns:
-            print(f"  OK: {col}")
+            registro.debug(f"  OK: {col}")
         else:
-            print(f"  ERROR: {col} - FALTANTE")
+            registro.error(f"  ERROR: {col} - FALTANTE")
+    
+    if not mostrar_diagnostico():
+        return True
     
     # Verificar valores nulos en columnas críticas
-    print(f"\nValores nulos en columnas críticas:")
+    registro.info(f"\nValores nulos en columnas críticas:")
     for col in columnas_criticas:
         if col in df.columns:
             nulos = df[col].isnull().sum()
             porcentaje = (nulos / len(df)) * 100
-            print(f"  {col}: {nulos} nulos ({porcentaje:.1f}%)")
+            registro.info(f"  {col}: {nulos} nulos ({porcentaje:.1f}%)")
+    
+    if not mostrar_detalle():
+        return True
     
     # Verificar distribución por década
-    print(f"\nDistribución por década:")
+    registro.debug(f"\nDistribución por década:")
     if 'release_decade' in df.columns:
         distribucion = df['release_decade'].value_counts().sort_index()
+        distribucion = distribucion[distribucion > 0]
         for decada, cantidad in distribucion.items():
             porcentaje = (cantidad / len(df)) * 100
-            print(f"  {decada}: {cantidad:,} canciones ({porcentaje:.1f}%)")
+            registro.debug(f"  {decada}: {cantidad:,} canciones ({porcentaje:.1f}%)")
     
     # Verificar distribución por género principal
-    print(f"\nDistribución por género principal:")
+    registro.debug(f"\nDistribución por género principal:")
     if 'main_genre' in df.columns:
         distribucion = df['main_genre'].value_counts().head(10)
         for genero, cantidad in distribucion.items():
             porcentaje = (cantidad / len(df)) * 100
-            print(f"  {genero}: {cantidad:,} canciones ({porcentaje:.1f}%)")
+            registro.debug(f"  {genero}: {cantidad:,} canciones ({porcentaje:.1f}%)")
     
     # Verificar distribución por fuente
-    print(f"\nDistribución por fuente de datos:")
+    registro.debug(f"\nDistribución por fuente de datos:")
     if 'data_source' in df.columns:
         distribucion = df['data_source'].value_counts()
         for fuente, cantidad in distribucion.items():
             porcentaje = (cantidad / len(df)) * 100
-            print(f"  {fuente}: {cantidad:,} canciones ({porcentaje:.1f}%)")
+            registro.debug(f"  {fuente}: {cantidad:,} canciones ({porcentaje:.1f}%)")
     
     return True
 
-def combinar_todos_los_archivos():
-    """Función principal para combinar todos los archivos"""
+def resolver_y_verificar(df_combinado):
+    """Resolver conflictos del dataset combinado y verificar el resultado"""
+    
+    df_final = resolver_conflictos(df_combinado)
+    verificar_dataset_combinado(df_final)
+    
+    return df_final
+
+def combinar_todos_los_archivos(datos_limpios=None):
+    """Función principal para combinar todos los archivos
     
-    print("INICIANDO COMBINACION DE ARCHIVOS")
-    print("=" * 60)
+    Si el pipeline ya limpió los archivos, recibe los datos limpios en
+    memoria. Si se ejecuta solo, limpia los archivos primero.
+    """
     
-    # Primero necesitamos cargar los datos limpios
-    # Por simplicidad, vamos a recrear el proceso de limpieza
-    from limpiar_datos import limpiar_todos_los_archivos
+    registro.info("INICIANDO COMBINACION DE ARCHIVOS")
+    registro.info("=" * 60)
     
-    print("Cargando y limpiando archivos...")
-    datos_limpios = limpiar_todos_los_archivos()
+    if datos_limpios is None:
+        from limpiar_datos import limpiar_todos_los_archivos
+        
+        registro.info("Cargando y limpiando archivos...")
+        datos_limpios = limpiar_todos_los_archivos()
     
     if not datos_limpios:
-        print("ERROR: No se pudieron cargar los datos limpios")
+        registro.error("ERROR: No se pudieron cargar los datos limpios")
         return None
     
     # Combinar archivos
-    print("\nCombinando archivos...")
+    registro.info("\nCombinando archivos...")
     df_combinado = combinar_archivos_simple(datos_limpios)
     
-    # Resolver conflictos
-    df_final = resolver_conflictos(df_combinado)
-    
-    # Verificar resultado
-    verificar_dataset_combinado(df_final)
+    # Resolver conflictos y verificar resultado
+    df_final = resolver_y_verificar(df_combinado)
     
-    print(f"\n{'='*60}")
-    print("COMBINACION COMPLETADA")
-    print(f"{'='*60}")
-    print(f"Dataset final: {len(df_final):,} canciones")
-    print(f"Columnas: {len(df_final.columns)}")
+    registro.info(f"\n{'='*60}")
+    registro.info("COMBINACION COMPLETADA")
+    registro.info(f"{'='*60}")
+    registro.info(f"Dataset final: {len(df_final):,} canciones")
+    registro.info(f"Columnas: {len(df_final.columns)}")
     
     return df_final
 
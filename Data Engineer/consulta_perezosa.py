@@ -0,0 +1,938 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Limpieza, combinación, intensidad y resúmenes como consulta perezosa (Polars o DuckDB)
+Nivel: Desarrollador
+
+Con --engine polars o --engine duckdb, las etapas limpiar, combinar,
+resolver e intensidad se reemplazan por una sola etapa que arma todo el
+proceso como una consulta y la ejecuta con el motor elegido, en varios
+hilos:
+- de cada CSV se leen solo las columnas que usa la limpieza, con los
+  tipos del esquema (esquema.py)
+- los duplicados y REGLAS_FILAS (limpiar_datos.py) dan el motivo por el
+  que se elimina cada fila; de ahí sale el linaje y el filtro, y las
+  columnas nuevas se calculan solo para las filas que quedan
+- los archivos se unen como en combinar_archivos.py, las canciones
+  repetidas se resuelven con REGLAS_CONFLICTOS y se calculan las
+  variables de intensidad de crear_intensidad.py
+- el cubo de resumenes.py y las medianas de cada tabla salen de la misma
+  consulta; las tablas se arman con resumenes.construir_tabla.
+
+La consulta se ejecuta en tres partes, porque entre ellas hace falta un
+dato de todo el dataset: si hay canciones repetidas entre archivos (si
+no, el dataset combinado pasa tal cual) y los cuartiles de intensidad
+para marcar los outliers. Los cuartiles se interpolan con pandas a partir
+de los dos valores vecinos de cada uno, así quedan idénticos.
+
+Los resultados se convierten a DataFrames de pandas con los mismos tipos
+que las etapas de pandas, así la verificación, el guardado y el estado
+incremental no cambian. benchmarks/verificar_motores.py comprueba que
+dan lo mismo que pandas. Polars y DuckDB son opcionales: solo se importan
+al elegir el motor.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from esquema import opciones_lectura, TIPO_TEXTO, TIPO_DECADA
+from limpiar_datos import (ARCHIVOS_CSV, MAPEO_COLUMNAS, REGLAS_FILAS, SINONIMOS_GENEROS,
+                           elegir_claves_duplicados)
+from categorizar_generos import CATEGORIA_POR_DEFECTO, leer_palabras_clave
+from combinar_archivos import DECADA_POR_ARCHIVO, REGLAS_CONFLICTOS, VALORES_SIN_MODA
+from resumenes import (MEDIDAS, NIVELES_INTENSIDAD, LIMITES_INTENSIDAD, CLAVES_CUBO, TABLAS_RESUMEN,
+                       construir_tabla)
+from linaje import COLUMNAS_LINAJE
+from instrumentacion import instrumentar
+from registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+MOTORES_CONSULTA = ['pandas', 'polars', 'duckdb']
+
+# Tipos de pandas de las columnas que no salen iguales al convertir desde Arrow
+# (el resto de los textos queda como object, igual que en las etapas de pandas)
+TIPOS_PANDAS = {
+    'track_id': TIPO_TEXTO,
+    'track_name': TIPO_TEXTO,
+    'artist_name': TIPO_TEXTO,
+    'release_date': 'datetime64[ns]',
+    'release_decade': TIPO_DECADA,
+    'intensity_category': pd.CategoricalDtype(sorted(NIVELES_INTENSIDAD))
+}
+
+def verificar_motor(motor):
+    """Comprobar que el motor existe y que su paquete está instalado"""
+
+    if motor not in MOTORES_CONSULTA:
+        raise ValueError(f"Motor desconocido: {motor} (usa {', '.join(MOTORES_CONSULTA)})")
+    if motor != 'pandas':
+        try:
+            __import__(motor)
+        except ImportError:
+            raise ImportError(f"El motor {motor} necesita el paquete {motor} (pip install {motor})")
+
+def a_pandas(tabla):
+    """Pasar una tabla de Arrow a pandas con los tipos de las etapas de pandas
+
+    Las columnas de texto pasan directo a texto de pyarrow, sin crear
+    objetos de Python. Los enteros del esquema (year, duration_ms) quedan
+    como enteros con nulos (Int16, Int32), igual que al leer el CSV.
+    """
+
+    import pyarrow as pa
+
+    enteros = {pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype()}
+    texto = [columna for columna in tabla.column_names if TIPOS_PANDAS.get(columna) == TIPO_TEXTO]
+    df = tabla.drop_columns(texto).to_pandas(types_mapper=enteros.get)
+    for columna, tipo in TIPOS_PANDAS.items():
+        if columna in df.columns:
+            df[columna] = df[columna].astype(tipo)
+    for columna in texto:
+        df.insert(tabla.column_names.index(columna), columna, pd.array(tabla.column(columna), dtype=TIPO_TEXTO))
+    return df
+
+def columnas_en_orden(listas):
+    """Unir listas de columnas en orden de aparición (como pd.concat)"""
+
+    columnas = []
+    for lista in listas:
+        columnas += [columna for columna in lista if columna not in columnas]
+    return columnas
+
+def archivos_existentes():
+    """Archivos de ARCHIVOS_CSV que existen (los que faltan se avisan, como en la limpieza)"""
+
+    existentes = []
+    for archivo in ARCHIVOS_CSV:
+        if os.path.exists(archivo):
+            existentes.append(archivo)
+        else:
+            registro.error(f"ERROR: {archivo} no encontrado")
+    return existentes
+
+def decada_de_archivo(archivo):
+    """Década y año implícitos de un archivo de una sola década, o None"""
+
+    for nombre, decada in DECADA_POR_ARCHIVO.items():
+        if nombre in archivo:
+            return decada
+    return None
+
+def reglas_aplicables(columnas):
+    """Reglas de REGLAS_FILAS que se aplican a un archivo (tiene todas sus columnas)"""
+    return [regla for regla in REGLAS_FILAS if all(columna in columnas for columna in regla['columnas'])]
+
+def reglas_resolucion(columnas, claves):
+    """Reglas de REGLAS_CONFLICTOS para las columnas que hay (sin las claves)"""
+    return {columna: regla for columna, regla in REGLAS_CONFLICTOS.items()
+            if columna in columnas and columna not in claves}
+
+def claves_resolucion(columnas):
+    """Claves que identifican la misma canción en varios archivos (None si no hay)"""
+
+    if 'track_id' in columnas:
+        return ['track_id']
+    if 'track_name' in columnas and 'artist_name' in columnas:
+        return ['track_name', 'artist_name']
+    return None
+
+def limites_outliers(cantidad, vecinos):
+    """Límites de los outliers con los cuartiles 0.25 y 0.75 que calcula pandas
+
+    vecinos(posiciones) devuelve los valores ordenados de intensity_weighted
+    en esas posiciones (se pide una sola vez, con las cuatro). El cuartil se interpola con pandas entre los dos
+    valores vecinos, así sale idéntico al de Series.quantile.
+    """
+
+    if cantidad == 0:
+        return np.nan, np.nan
+
+    posiciones = [(cantidad - 1) * q for q in [0.25, 0.75]]
+    anteriores = [int(np.floor(posicion)) for posicion in posiciones]
+    siguientes = [min(anterior + 1, cantidad - 1) for anterior in anteriores]
+    valores = dict(zip(anteriores + siguientes, vecinos(anteriores + siguientes)))
+
+    cuartiles = []
+    for posicion, anterior, siguiente in zip(posiciones, anteriores, siguientes):
+        vecinos_cuartil = np.array([valores[anterior], valores[siguiente]], dtype='float32')
+        cuartiles.append(pd.Series(vecinos_cuartil).quantile(posicion - anterior))
+
+    Q1, Q3 = cuartiles
+    IQR = Q3 - Q1
+    return float(Q1 - 1.5 * IQR), float(Q3 + 1.5 * IQR)
+
+def armar_resumenes(cubo, medianas):
+    """Tablas de resumen desde el cubo y las medianas calculadas por el motor
+
+    medianas es un diccionario {nombre de tabla: DataFrame con las claves
+    y una columna por medida}.
+    """
+
+    resumenes = {}
+    for nombre, definicion in TABLAS_RESUMEN.items():
+        por_grupo = medianas[nombre].set_index(definicion['claves'])
+        resumenes[nombre] = construir_tabla(None, cubo, None, definicion, medianas=por_grupo)
+    return resumenes
+
+def ordenar_cubo(cubo):
+    """Ordenar las celdas del cubo como groupby (categorías en su orden, nulos al final)"""
+
+    orden = {}
+    for clave in CLAVES_CUBO:
+        if isinstance(cubo[clave].dtype, pd.CategoricalDtype):
+            orden[clave] = cubo[clave].cat.codes.replace(-1, np.iinfo('int64').max)
+        else:
+            orden[clave] = cubo[clave]
+    posiciones = pd.DataFrame(orden).sort_values(CLAVES_CUBO, na_position='last', kind='stable').index
+    return cubo.loc[posiciones].reset_index(drop=True)
+
+# ---------------------------------------------------------------------------
+# Polars
+# ---------------------------------------------------------------------------
+
+def tipo_polars(tipo):
+    """Tipo de Polars para un tipo del esquema (las categorías se leen como texto)"""
+
+    import polars as pl
+
+    tipos = {'float32': pl.Float32, 'int8': pl.Int8, 'int16': pl.Int16, 'int32': pl.Int32,
+             'Int8': pl.Int8, 'Int16': pl.Int16, 'Int32': pl.Int32}
+    return tipos.get(str(tipo), pl.String)
+
+def valor_presente_polars(columna, tipo):
+    """La columna tiene valor (ni nulo ni NaN, como notna de pandas)"""
+
+    import polars as pl
+
+    presente = pl.col(columna).is_not_null()
+    if tipo.is_float():
+        presente = presente & pl.col(columna).is_not_nan()
+    return presente
+
+def cumple_regla_polars(regla, esquema):
+    """Expresión de Polars con las filas que cumplen una regla de REGLAS_FILAS"""
+
+    import polars as pl
+
+    if regla['tipo'] == 'nulos':
+        return pl.all_horizontal([valor_presente_polars(columna, esquema[columna]) for columna in regla['columnas']])
+
+    valores = pl.col(regla['columnas'][0]).cast(pl.Float64)
+    if regla['tipo'] == 'fecha':
+        # Igual que limpiar_datos.anios_convertibles
+        cumple = (valores.floor() == valores) & (valores >= 1678) & (valores <= 2262)
+    else:
+        cumple = (valores >= regla['minimo']) & (valores <= regla['maximo'])
+    return cumple.fill_null(False)
+
+def fecha_desde_anio_polars(columna):
+    """1 de enero del año, como fecha con nanosegundos (igual que fecha_desde_anio)"""
+
+    import polars as pl
+
+    return pl.date(pl.col(columna), 1, 1).cast(pl.Datetime('ns'))
+
+def dividir_polars(expresion, divisor):
+    """Dividir una columna float32 por una constante, con el mismo redondeo que pandas
+
+    Polars cambia la división por una constante por una multiplicación por
+    su inversa, que a veces difiere en el último bit. En float64 y de
+    vuelta a float32 el resultado es la división exacta redondeada.
+    """
+
+    import polars as pl
+
+    return (expresion.cast(pl.Float64) / divisor).cast(pl.Float32)
+
+def categorizar_generos_polars(columna, palabras_clave):
+    """Categoría principal: la primera con alguna palabra clave contenida en el género"""
+
+    import polars as pl
+
+    generos = pl.col(columna).str.to_lowercase()
+    expresion = pl.lit(CATEGORIA_POR_DEFECTO)
+    for categoria, palabras in reversed(palabras_clave):
+        coincide = pl.any_horizontal([generos.str.contains(palabra, literal=True) for palabra in palabras])
+        expresion = pl.when(coincide).then(pl.lit(categoria)).otherwise(expresion)
+    return expresion
+
+def limpiar_archivo_polars(archivo, palabras_clave):
+    """Consulta de la limpieza de un archivo
+
+    Devuelve dos consultas: las filas limpias (con las columnas de
+    combinar_archivos_simple ya agregadas) y el linaje del archivo.
+    """
+
+    import polars as pl
+
+    opciones = opciones_lectura(archivo)
+    columnas = opciones['usecols']
+    consulta = pl.scan_csv(archivo, schema_overrides={columna: tipo_polars(opciones['dtype'][columna])
+                                                      for columna in columnas})
+    consulta = consulta.select(columnas).rename({columna: MAPEO_COLUMNAS[columna] for columna in columnas
+                                                 if columna in MAPEO_COLUMNAS})
+    esquema = consulta.collect_schema()
+
+    # Motivo por el que sale cada fila: 0 = duplicado, 1.. = regla, el último = se queda
+    claves, _ = elegir_claves_duplicados(esquema.names())
+    repetida = ~pl.struct(claves or esquema.names()).is_first_distinct()
+    reglas = reglas_aplicables(esquema.names())
+    motivo = pl.when(repetida).then(0)
+    for numero, regla in enumerate(reglas, 1):
+        motivo = motivo.when(~cumple_regla_polars(regla, esquema)).then(numero)
+    queda = len(reglas) + 1
+    consulta = consulta.with_columns(motivo.otherwise(queda).alias('_motivo')).cache()
+
+    motivos = ['duplicados'] + [regla['regla'] for regla in reglas]
+    linaje = consulta.select(
+        pl.lit(archivo).alias('archivo'),
+        pl.len().alias('filas_leidas'),
+        *[(pl.col('_motivo') == numero).sum().alias(nombre) for numero, nombre in enumerate(motivos)],
+        (pl.col('_motivo') == queda).sum().alias('filas_limpias')
+    )
+
+    # Columnas nuevas solo para las filas que quedan, en el orden de limpiar_bloque
+    consulta = consulta.filter(pl.col('_motivo') == queda).drop('_motivo')
+    if 'year' in esquema:
+        consulta = consulta.with_columns(fecha_desde_anio_polars('year').alias('release_date'))
+    if 'genre' not in esquema:
+        consulta = consulta.with_columns(pl.lit(None, dtype=pl.String).alias('genre'))
+    if 'energy' in esquema:
+        energy = pl.col('energy')
+        consulta = consulta.with_columns(pl.when(energy.max() > 1).then(dividir_polars(energy, 100))
+                                         .otherwise(energy).clip(0, 1))
+    if 'loudness' in esquema:
+        consulta = consulta.with_columns(pl.col('loudness').clip(-60, 0))
+        consulta = consulta.with_columns(dividir_polars(pl.col('loudness') + 60, 60).clip(0, 1)
+                                         .alias('loudness_normalized'))
+    if 'year' in esquema:
+        consulta = consulta.with_columns(pl.col('release_date').dt.year().alias('release_year'))
+        consulta = consulta.with_columns(((pl.col('release_year') // 10) * 10).cast(pl.String).add('s')
+                                         .alias('release_decade'))
+
+    # Los géneros se arreglan y categorizan sobre los valores distintos, como en organizar_generos
+    generos = consulta.select(pl.col('genre').unique()).with_columns(
+        pl.col('genre').fill_null('Unknown').str.strip_chars().str.to_lowercase().alias('_genero'))
+    generos = generos.with_columns(pl.col('_genero').str.to_lowercase().str.strip_chars()
+                                   .replace(SINONIMOS_GENEROS).alias('genre_clean'))
+    generos = generos.with_columns(categorizar_generos_polars('genre_clean', palabras_clave).alias('main_genre'))
+    consulta = consulta.join(generos, on='genre', how='left', nulls_equal=True, maintain_order='left')
+    genero = pl.col('_genero') if 'genre' in esquema else pl.lit('Unknown')
+    consulta = consulta.with_columns(genero.alias('genre')).drop('_genero')
+
+    # Lo que agrega combinar_archivos_simple
+    consulta = consulta.with_columns(pl.lit(archivo).alias('data_source'))
+    decada = decada_de_archivo(archivo)
+    if decada is not None:
+        consulta = consulta.with_columns(pl.lit(decada[0]).alias('release_decade'),
+                                         pl.lit(decada[1], dtype=pl.Int64).alias('release_year'))
+        if 'release_date' not in consulta.collect_schema():
+            consulta = consulta.with_columns(fecha_desde_anio_polars('release_year').alias('release_date'))
+
+    return consulta, linaje
+
+def media_float32_polars(consulta, columnas, repeticiones):
+    """Media por grupo de columnas float32 como groupby().mean() de pandas
+
+    pandas suma los float32 de cada grupo en float32 con suma compensada
+    (Kahan), en el orden de las filas, y divide en float32. Cada columna
+    llega como lista con los valores del grupo; se suma un elemento por
+    paso, hasta la cantidad máxima de repeticiones de una canción.
+    """
+
+    import polars as pl
+
+    cero = pl.lit(0, dtype=pl.Float32)
+    consulta = consulta.with_columns([cero.alias(f"_suma_{columna}") for columna in columnas] +
+                                     [cero.alias(f"_error_{columna}") for columna in columnas])
+    for posicion in range(repeticiones):
+        pasos = []
+        for columna in columnas:
+            suma, error = pl.col(f"_suma_{columna}"), pl.col(f"_error_{columna}")
+            valor = pl.col(columna).list.get(posicion, null_on_oob=True)
+            corregido = valor - error
+            nueva = suma + corregido
+            pasos += [pl.when(valor.is_not_null()).then(nueva).otherwise(suma).alias(f"_suma_{columna}"),
+                      pl.when(valor.is_not_null()).then((nueva - suma) - corregido).otherwise(error)
+                      .alias(f"_error_{columna}")]
+        consulta = consulta.with_columns(pasos)
+
+    return consulta.with_columns([
+        (pl.col(f"_suma_{columna}") / pl.col(columna).list.len().cast(pl.Float32)).alias(columna)
+        for columna in columnas
+    ]).drop([f"_{parte}_{columna}" for columna in columnas for parte in ('suma', 'error')])
+
+def resolver_polars(consulta, claves, esquema, repeticiones):
+    """Consulta de resolver_duplicados: una fila por canción, ordenada por las claves
+
+    repeticiones es la mayor cantidad de veces que aparece una canción.
+    """
+
+    import polars as pl
+
+    reglas = reglas_resolucion(esquema.names(), claves)
+    columnas = claves + list(reglas)
+
+    consulta = consulta.drop_nulls(claves).with_columns(pl.struct(claves).is_duplicated().alias('_repetida'))
+    grupos = consulta.filter(pl.col('_repetida'))
+
+    agregaciones = []
+    medias_float32 = []
+    for columna, regla in reglas.items():
+        if regla == 'first':
+            agregaciones.append(pl.col(columna).drop_nulls().first())
+        elif regla == 'mean' and esquema[columna] == pl.Float32:
+            agregaciones.append(pl.col(columna).filter(valor_presente_polars(columna, esquema[columna])))
+            medias_float32.append(columna)
+        elif regla == 'mean':
+            agregaciones.append(pl.col(columna).mean())
+        elif regla == 'min':
+            agregaciones.append(pl.col(columna).min())
+        elif regla == 'unir':
+            agregaciones.append(pl.col(columna).unique(maintain_order=True).str.join(', '))
+    resueltas = media_float32_polars(grupos.group_by(claves).agg(agregaciones), medias_float32, repeticiones)
+
+    # Moda: el valor más repetido; en un empate, el menor
+    for columna, regla in reglas.items():
+        if regla != 'moda':
+            continue
+        modas = (grupos.drop_nulls(columna).group_by(claves + [columna]).agg(pl.len().alias('_cantidad'))
+                 .sort(['_cantidad', columna], descending=[True, False])
+                 .unique(subset=claves, keep='first').drop('_cantidad'))
+        resueltas = resueltas.join(modas, on=claves, how='left')
+        if columna in VALORES_SIN_MODA:
+            resueltas = resueltas.with_columns(pl.col(columna).fill_null(VALORES_SIN_MODA[columna]))
+    resueltas = resueltas.select(columnas)
+
+    # Las filas sin repetir quedan igual, con los tipos de las agrupadas
+    tipos = resueltas.collect_schema()
+    unicas = consulta.filter(~pl.col('_repetida')).select(columnas).with_columns(
+        [pl.col(columna).fill_null(VALORES_SIN_MODA[columna]) for columna, regla in reglas.items()
+         if regla == 'moda' and columna in VALORES_SIN_MODA])
+    unicas = unicas.with_columns([pl.col(columna).cast(tipos[columna]) for columna in columnas])
+
+    return pl.concat([unicas, resueltas]).sort(claves)
+
+def intensidad_polars(consulta, esquema):
+    """Variables de intensidad y marcadores que dependen solo de cada canción"""
+
+    import polars as pl
+
+    energy, loudness = pl.col('energy'), pl.col('loudness_normalized')
+    if 'tempo' in esquema:
+        tempo = dividir_polars(pl.col('tempo'), 200).clip(0, 1)
+        compleja = energy * 0.5 + loudness * 0.3 + tempo * 0.2
+    else:
+        compleja = energy * 0.6 + loudness * 0.4
+
+    return consulta.with_columns(
+        (energy * 0.6 + loudness * 0.4).alias('intensity_weighted'),
+        ((energy + loudness) / 2).alias('intensity_simple'),
+        compleja.alias('intensity_complex'),
+        pl.all_horizontal([valor_presente_polars(columna, esquema[columna])
+                           for columna in ['energy', 'loudness', 'release_date', 'main_genre']]).alias('is_complete'),
+        ((pl.col('release_year') >= 1920) & (pl.col('release_year') <= 2024)).fill_null(False).alias('is_valid_date')
+    )
+
+def nivel_intensidad_polars():
+    """Nivel de intensidad de cada canción (como resumenes.nivel_intensidad)"""
+
+    import polars as pl
+
+    # Una intensidad faltante queda como 'Muy Alta', igual que en pandas
+    posicion = pl.sum_horizontal([(pl.col('intensity_weighted').cast(pl.Float64) >= limite).fill_null(True)
+                                  .cast(pl.Int64) for limite in LIMITES_INTENSIDAD])
+    return posicion.replace_strict(list(range(len(NIVELES_INTENSIDAD))), NIVELES_INTENSIDAD,
+                                   return_dtype=pl.String)
+
+def mediana_polars(columna):
+    """Mediana exacta: promedio de los dos valores del medio, como groupby().median()
+
+    Los dos valores salen de cuantiles sin interpolar, que no ordenan el
+    grupo (la mediana de Polars interpola y a veces difiere en el último bit).
+    """
+
+    import polars as pl
+
+    valores = pl.col(columna).cast(pl.Float64)
+    valores = valores.filter(valores.is_not_nan())
+    return ((valores.quantile(0.5, interpolation='lower') + valores.quantile(0.5, interpolation='higher')) / 2
+            ).alias(columna)
+
+def cubo_polars(consulta, esquema):
+    """Consulta del cubo de resumenes.crear_cubo y de las medianas de cada tabla"""
+
+    import polars as pl
+
+    agregaciones = []
+    for medida in MEDIDAS:
+        if medida not in esquema:
+            continue
+        valores = pl.col(medida).cast(pl.Float64).fill_nan(None)
+        agregaciones += [valores.count().alias(f"{medida}_count"), valores.sum().alias(f"{medida}_sum"),
+                         valores.min().alias(f"{medida}_min"), valores.max().alias(f"{medida}_max"),
+                         (valores * valores).sum().alias(f"{medida}_sumsq")]
+    agregaciones += [pl.col('track_id').is_not_null().sum().cast(pl.Int64).alias('track_id_count'),
+                     pl.len().cast(pl.Int64).alias('filas')]
+
+    consulta = consulta.with_columns(nivel_intensidad_polars().alias('intensity_category'))
+    cubo = consulta.group_by(CLAVES_CUBO).agg(agregaciones)
+
+    medianas = {}
+    for nombre, definicion in TABLAS_RESUMEN.items():
+        claves = definicion['claves']
+        medidas = [medida for medida, estadisticas in definicion['columnas'] if 'median' in estadisticas]
+        medianas[nombre] = consulta.drop_nulls(claves).group_by(claves).agg([mediana_polars(medida)
+                                                                             for medida in medidas])
+    return cubo, medianas
+
+@instrumentar
+def ejecutar_consulta_polars():
+    """Ejecutar el pipeline con Polars (ver el comienzo del módulo)"""
+
+    import polars as pl
+
+    palabras_clave = leer_palabras_clave()
+
+    # 1. Limpiar y combinar todos los archivos (una sola consulta)
+    archivos = archivos_existentes()
+    limpios, linajes = zip(*[limpiar_archivo_polars(archivo, palabras_clave) for archivo in archivos])
+    columnas = columnas_en_orden([consulta.collect_schema().names() for consulta in limpios])
+    combinado = pl.concat(list(limpios), how='diagonal_relaxed').select(columnas)
+    combinado, linaje = pl.collect_all([combinado, pl.concat(list(linajes), how='diagonal')])
+    registro.info(f"Polars: {len(combinado):,} canciones limpias de {len(archivos)} archivos")
+
+    # 2. Resolver las canciones repetidas y calcular la intensidad de cada una
+    esquema = combinado.schema
+    claves = claves_resolucion(esquema.names())
+    consulta = combinado.lazy()
+    repeticiones = (combinado.group_by(claves).len().get_column('len').max() or 1) if claves is not None else 1
+    if repeticiones > 1:
+        consulta = resolver_polars(consulta, claves, esquema, repeticiones)
+    final = intensidad_polars(consulta, consulta.collect_schema()).collect()
+
+    # 3. Outliers, puntuación de calidad, cubo y medianas
+    intensidad = final.get_column('intensity_weighted').cast(pl.Float64).drop_nulls().drop_nans().sort()
+    bajo, alto = limites_outliers(len(intensidad), lambda posiciones: intensidad.gather(posiciones).to_list())
+    valores = pl.col('intensity_weighted').cast(pl.Float64)
+    consulta = final.lazy().with_columns(((valores < bajo) | (valores > alto)).fill_null(False).alias('is_outlier'))
+    consulta = consulta.with_columns((pl.col('is_complete').cast(pl.Int64) * 40 +
+                                      pl.col('is_valid_date').cast(pl.Int64) * 20 +
+                                      (~pl.col('is_outlier')).cast(pl.Int64) * 20 + 20).alias('data_quality_score'))
+    cubo, medianas = cubo_polars(consulta, final.schema)
+    nombres = list(medianas)
+    final, cubo, *tablas = pl.collect_all([consulta, cubo, *medianas.values()])
+
+    return (combinado.to_arrow(), linaje.to_arrow(), final.to_arrow(), cubo.to_arrow(),
+            {nombre: tabla.to_arrow() for nombre, tabla in zip(nombres, tablas)})
+
+# ---------------------------------------------------------------------------
+# DuckDB
+# ---------------------------------------------------------------------------
+
+# Tipos de DuckDB para los tipos del esquema (las categorías se leen como texto)
+TIPOS_DUCKDB = {'float32': 'FLOAT', 'int8': 'TINYINT', 'int16': 'SMALLINT', 'int32': 'INTEGER',
+                'Int8': 'TINYINT', 'Int16': 'SMALLINT', 'Int32': 'INTEGER'}
+
+def identificador(nombre):
+    """Nombre de columna entre comillas dobles para SQL"""
+    return '"' + nombre.replace('"', '""') + '"'
+
+def texto_sql(valor):
+    """Texto entre comillas simples para SQL"""
+    return "'" + str(valor).replace("'", "''") + "'"
+
+def tipos_duckdb(conexion, tabla):
+    """Columnas de una tabla o vista de DuckDB con su tipo, en orden"""
+    return dict(conexion.execute(f"SELECT column_name, column_type FROM (DESCRIBE {tabla})").fetchall())
+
+def valor_presente_sql(columna, tipo):
+    """La columna tiene valor (ni nulo ni NaN, como notna de pandas)"""
+
+    presente = f"{identificador(columna)} IS NOT NULL"
+    if tipo in ('FLOAT', 'DOUBLE'):
+        presente += f" AND NOT isnan({identificador(columna)})"
+    return f"({presente})"
+
+def cumple_regla_sql(regla, tipos):
+    """Condición SQL con las filas que cumplen una regla de REGLAS_FILAS"""
+
+    if regla['tipo'] == 'nulos':
+        return "(" + " AND ".join(valor_presente_sql(columna, tipos[columna]) for columna in regla['columnas']) + ")"
+
+    valores = f"CAST({identificador(regla['columnas'][0])} AS DOUBLE)"
+    if regla['tipo'] == 'fecha':
+        cumple = f"floor({valores}) = {valores} AND {valores} >= 1678 AND {valores} <= 2262"
+    else:
+        cumple = f"{valores} >= {regla['minimo']} AND {valores} <= {regla['maximo']}"
+    return f"coalesce({cumple}, false)"
+
+def categorizar_generos_sql(columna, palabras_clave):
+    """Categoría principal: la primera con alguna palabra clave contenida en el género"""
+
+    casos = []
+    for categoria, palabras in palabras_clave:
+        coincide = " OR ".join(f"contains(lower({columna}), {texto_sql(palabra)})" for palabra in palabras)
+        casos.append(f"WHEN {coincide} THEN {texto_sql(categoria)}")
+    return f"CASE {' '.join(casos)} ELSE {texto_sql(CATEGORIA_POR_DEFECTO)} END"
+
+def fecha_desde_anio_sql(columna):
+    """1 de enero del año, como fecha con nanosegundos (igual que fecha_desde_anio)"""
+    return f"CAST(make_date(CAST({columna} AS INTEGER), 1, 1) AS TIMESTAMP_NS)"
+
+# Espacios que quita str.strip() (trim de DuckDB solo quita espacios comunes)
+ESPACIOS_SQL = "chr(32) || chr(9) || chr(10) || chr(11) || chr(12) || chr(13)"
+
+def limpiar_archivo_duckdb(conexion, numero, archivo, palabras_clave):
+    """Cargar las columnas de un archivo y armar la vista de sus filas limpias
+
+    Devuelve el nombre de la vista y la consulta SQL de su linaje.
+    """
+
+    opciones = opciones_lectura(archivo)
+    columnas = opciones['usecols']
+    tipos_lectura = ", ".join(f"{texto_sql(columna)}: '{TIPOS_DUCKDB.get(str(opciones['dtype'][columna]), 'VARCHAR')}'"
+                              for columna in columnas)
+    seleccion = ", ".join(f"{identificador(columna)} AS {identificador(MAPEO_COLUMNAS.get(columna, columna))}"
+                          for columna in columnas)
+
+    # Una tabla temporal conserva el orden del archivo en rowid
+    crudo = f"crudo_{numero}"
+    conexion.execute(f"CREATE OR REPLACE TEMP TABLE {crudo} AS SELECT {seleccion} FROM "
+                     f"read_csv({texto_sql(archivo)}, header = true, types = {{{tipos_lectura}}})")
+    tipos = tipos_duckdb(conexion, crudo)
+    nombres = list(tipos)
+
+    # Motivo por el que sale cada fila: 0 = duplicado, 1.. = regla, el último = se queda.
+    # Se guarda en una tabla porque la leen el linaje y las filas limpias
+    claves, _ = elegir_claves_duplicados(nombres)
+    particion = ", ".join(identificador(columna) for columna in (claves or nombres))
+    reglas = reglas_aplicables(nombres)
+    casos = [f"WHEN rowid NOT IN (SELECT min(rowid) FROM {crudo} GROUP BY {particion}) THEN 0"]
+    casos += [f"WHEN NOT {cumple_regla_sql(regla, tipos)} THEN {numero_regla}"
+              for numero_regla, regla in enumerate(reglas, 1)]
+    queda = len(reglas) + 1
+    marcado = f"marcado_{numero}"
+    conexion.execute(f"CREATE OR REPLACE TEMP TABLE {marcado} AS SELECT rowid AS _fila, *, "
+                     f"CASE {' '.join(casos)} ELSE {queda} END AS _motivo FROM {crudo}")
+    conexion.execute(f"DROP TABLE {crudo}")
+
+    motivos = ['duplicados'] + [regla['regla'] for regla in reglas]
+    linaje = (f"SELECT {texto_sql(archivo)} AS archivo, count(*) AS filas_leidas, " +
+              "".join(f"count(*) FILTER (WHERE _motivo = {numero_motivo}) AS {nombre}, "
+                      for numero_motivo, nombre in enumerate(motivos)) +
+              f"count(*) FILTER (WHERE _motivo = {queda}) AS filas_limpias FROM {marcado}")
+
+    # Columnas nuevas solo para las filas que quedan, en el orden de limpiar_bloque
+    columnas_limpias = {columna: identificador(columna) for columna in nombres}
+    if 'year' in tipos:
+        columnas_limpias['release_date'] = fecha_desde_anio_sql('"year"')
+    if 'genre' not in tipos:
+        columnas_limpias['genre'] = "CAST(NULL AS VARCHAR)"
+    if 'energy' in tipos:
+        columnas_limpias['energy'] = ("least(greatest(CASE WHEN max(energy) OVER () > 1 "
+                                      "THEN energy / CAST(100 AS FLOAT) ELSE energy END, CAST(0 AS FLOAT)), "
+                                      "CAST(1 AS FLOAT))")
+    if 'loudness' in tipos:
+        columnas_limpias['loudness'] = "least(greatest(loudness, CAST(-60 AS FLOAT)), CAST(0 AS FLOAT))"
+    seleccion = ", ".join(f"{valor} AS {identificador(columna)}" for columna, valor in columnas_limpias.items())
+    limpio = f"SELECT _fila, {seleccion} FROM {marcado} WHERE _motivo = {queda}"
+
+    # Segunda pasada: columnas que dependen de las ya arregladas
+    derivadas = {}
+    if 'loudness' in tipos:
+        derivadas['loudness_normalized'] = ("least(greatest((loudness + CAST(60 AS FLOAT)) / CAST(60 AS FLOAT), "
+                                            "CAST(0 AS FLOAT)), CAST(1 AS FLOAT))")
+    if 'year' in tipos:
+        derivadas['release_year'] = "CAST(year(release_date) AS INTEGER)"
+        derivadas['release_decade'] = "CAST((year(release_date) // 10) * 10 AS VARCHAR) || 's'"
+    if derivadas:
+        seleccion = ", ".join(f"{valor} AS {identificador(columna)}" for columna, valor in derivadas.items())
+        limpio = f"SELECT *, {seleccion} FROM ({limpio})"
+
+    # Los géneros se arreglan y categorizan sobre los valores distintos, como en organizar_generos
+    genero = f"lower(trim(coalesce(genre, 'Unknown'), {ESPACIOS_SQL}))" if 'genre' in tipos else "'Unknown'"
+    limpio_genero = f"lower(trim(_genero, {ESPACIOS_SQL}))"
+    sinonimos = " ".join(f"WHEN {texto_sql(antes)} THEN {texto_sql(despues)}"
+                         for antes, despues in SINONIMOS_GENEROS.items())
+    generos = (f"SELECT genre, _genero, CASE {limpio_genero} {sinonimos} ELSE {limpio_genero} END AS genre_clean "
+               f"FROM (SELECT genre, {genero} AS _genero FROM (SELECT DISTINCT genre FROM {marcado} "
+               f"WHERE _motivo = {queda}))")
+    generos = f"SELECT *, {categorizar_generos_sql('genre_clean', palabras_clave)} AS main_genre FROM ({generos})"
+    limpio = (f"SELECT l.* REPLACE (g._genero AS genre), g.genre_clean, g.main_genre, "
+              f"{texto_sql(archivo)} AS data_source FROM ({limpio}) l "
+              f"LEFT JOIN ({generos}) g ON l.genre IS NOT DISTINCT FROM g.genre")
+
+    # Lo que agrega combinar_archivos_simple
+    decada = decada_de_archivo(archivo)
+    if decada is not None:
+        limpio = (f"SELECT *, {texto_sql(decada[0])} AS release_decade, "
+                  f"CAST({decada[1]} AS BIGINT) AS release_year FROM ({limpio})")
+        if 'year' not in tipos:
+            limpio = f"SELECT *, {fecha_desde_anio_sql('release_year')} AS release_date FROM ({limpio})"
+
+    vista = f"limpio_{numero}"
+    conexion.execute(f"CREATE OR REPLACE TEMP VIEW {vista} AS SELECT {numero} AS _archivo, * FROM ({limpio})")
+    return vista, linaje
+
+def media_float32_sql(consulta, columnas, repeticiones):
+    """Media por grupo de columnas FLOAT como groupby().mean() de pandas
+
+    Igual que media_float32_polars: cada columna llega como lista con los
+    valores del grupo, que se suman en float32 con suma compensada (Kahan)
+    de a un elemento, y la suma se divide en float32.
+    """
+
+    cero = "CAST(0 AS FLOAT)"
+    consulta = (f"SELECT *, " + ", ".join(f"{cero} AS _suma_{columna}, {cero} AS _error_{columna}"
+                                          for columna in columnas) + f" FROM ({consulta})")
+    for posicion in range(1, repeticiones + 1):
+        pasos = []
+        for columna in columnas:
+            valor = f"list_extract({identificador(columna)}, {posicion})"
+            corregido = f"({valor} - _error_{columna})"
+            nueva = f"(_suma_{columna} + {corregido})"
+            pasos += [f"coalesce({nueva}, _suma_{columna}) AS _suma_{columna}",
+                      f"coalesce(({nueva} - _suma_{columna}) - {corregido}, _error_{columna}) AS _error_{columna}"]
+        consulta = f"SELECT * REPLACE ({', '.join(pasos)}) FROM ({consulta})"
+
+    medias = ", ".join(f"_suma_{columna} / CAST(len({identificador(columna)}) AS FLOAT) AS {identificador(columna)}"
+                       for columna in columnas)
+    auxiliares = ", ".join(f"_suma_{columna}, _error_{columna}" for columna in columnas)
+    return f"SELECT * EXCLUDE ({auxiliares}) REPLACE ({medias}) FROM ({consulta})"
+
+def resolver_duckdb(conexion, claves, tipos, repeticiones):
+    """Vista de resolver_duplicados: una fila por canción, ordenada por las claves
+
+    repeticiones es la mayor cantidad de veces que aparece una canción.
+    """
+
+    reglas = reglas_resolucion(list(tipos), claves)
+    columnas = claves + list(reglas)
+    lista_claves = ", ".join(identificador(columna) for columna in claves)
+    sin_nulos = " AND ".join(f"{identificador(columna)} IS NOT NULL" for columna in claves)
+
+    # Claves repetidas (pocas): las filas se separan con joins contra esta tabla
+    conexion.execute(f"CREATE OR REPLACE TEMP TABLE claves_repetidas AS SELECT {lista_claves} FROM combinado "
+                     f"WHERE {sin_nulos} GROUP BY {lista_claves} HAVING count(*) > 1")
+    conexion.execute(f"CREATE OR REPLACE TEMP TABLE grupos AS SELECT * FROM combinado "
+                     f"SEMI JOIN claves_repetidas USING ({lista_claves})")
+
+    agregaciones = {}
+    medias_float32 = []
+    uniones = []
+    for columna, regla in reglas.items():
+        nombre = identificador(columna)
+        if regla == 'first':
+            agregaciones[columna] = f"first({nombre} ORDER BY _orden) FILTER (WHERE {nombre} IS NOT NULL)"
+        elif regla == 'mean' and tipos[columna] == 'FLOAT':
+            agregaciones[columna] = (f"list({nombre} ORDER BY _orden) FILTER "
+                                     f"(WHERE {valor_presente_sql(columna, tipos[columna])})")
+            medias_float32.append(columna)
+        elif regla == 'mean':
+            agregaciones[columna] = f"avg({nombre})"
+        elif regla == 'min':
+            agregaciones[columna] = f"min({nombre})"
+        elif regla == 'moda':
+            # El valor más repetido; en un empate, el menor
+            uniones.append((columna, f"SELECT {lista_claves}, first({nombre} ORDER BY _cantidad DESC, {nombre}) "
+                                     f"AS {nombre} FROM (SELECT {lista_claves}, {nombre}, count(*) AS _cantidad "
+                                     f"FROM grupos WHERE {nombre} IS NOT NULL GROUP BY ALL) GROUP BY ALL"))
+        elif regla == 'unir':
+            # Valores distintos en orden de aparición
+            uniones.append((columna, f"SELECT {lista_claves}, string_agg({nombre}, ', ' ORDER BY _primera) "
+                                     f"AS {nombre} FROM (SELECT {lista_claves}, {nombre}, min(_orden) AS _primera "
+                                     f"FROM grupos GROUP BY ALL) GROUP BY ALL"))
+
+    consulta = (f"SELECT {lista_claves}, " + ", ".join(f"{valor} AS {identificador(columna)}"
+                                                        for columna, valor in agregaciones.items()) +
+                f" FROM grupos GROUP BY {lista_claves}")
+    consulta = media_float32_sql(consulta, medias_float32, repeticiones)
+    for numero, (columna, union) in enumerate(uniones):
+        valor = f"u{numero}.{identificador(columna)}"
+        if columna in VALORES_SIN_MODA and reglas[columna] == 'moda':
+            valor = f"coalesce({valor}, {texto_sql(VALORES_SIN_MODA[columna])})"
+        consulta = (f"SELECT r.*, {valor} AS {identificador(columna)} FROM ({consulta}) r "
+                    f"LEFT JOIN ({union}) u{numero} USING ({lista_claves})")
+    conexion.execute(f"CREATE OR REPLACE TEMP VIEW resueltas AS SELECT {', '.join(identificador(c) for c in columnas)} "
+                     f"FROM ({consulta})")
+
+    # Las filas sin repetir quedan igual, con los tipos de las agrupadas
+    tipos_resueltas = tipos_duckdb(conexion, 'resueltas')
+    valores = []
+    for columna in columnas:
+        valor = identificador(columna)
+        if reglas.get(columna) == 'moda' and columna in VALORES_SIN_MODA:
+            valor = f"coalesce({valor}, {texto_sql(VALORES_SIN_MODA[columna])})"
+        valores.append(f"CAST({valor} AS {tipos_resueltas[columna]}) AS {identificador(columna)}")
+    conexion.execute(f"CREATE OR REPLACE TEMP VIEW resuelto AS SELECT {', '.join(valores)} FROM combinado "
+                     f"ANTI JOIN claves_repetidas USING ({lista_claves}) WHERE {sin_nulos} "
+                     f"UNION ALL SELECT * FROM resueltas")
+    return f"SELECT row_number() OVER (ORDER BY {lista_claves}) AS _orden, * FROM resuelto"
+
+def intensidad_sql(tipos):
+    """Columnas SQL de las variables de intensidad y marcadores de cada canción"""
+
+    def por(columna, peso):
+        return f"{columna} * CAST({peso} AS FLOAT)"
+
+    if 'tempo' in tipos:
+        tempo = "least(greatest(tempo / CAST(200 AS FLOAT), CAST(0 AS FLOAT)), CAST(1 AS FLOAT))"
+        compleja = f"{por('energy', 0.5)} + {por('loudness_normalized', 0.3)} + {por(f'({tempo})', 0.2)}"
+    else:
+        compleja = f"{por('energy', 0.6)} + {por('loudness_normalized', 0.4)}"
+    completa = " AND ".join(valor_presente_sql(columna, tipos[columna])
+                            for columna in ['energy', 'loudness', 'release_date', 'main_genre'])
+
+    return {
+        'intensity_weighted': f"{por('energy', 0.6)} + {por('loudness_normalized', 0.4)}",
+        'intensity_simple': "(energy + loudness_normalized) / CAST(2 AS FLOAT)",
+        'intensity_complex': compleja,
+        'is_complete': completa,
+        'is_valid_date': "coalesce(release_year >= 1920 AND release_year <= 2024, false)"
+    }
+
+def nivel_intensidad_sql():
+    """Nivel de intensidad de cada canción (como resumenes.nivel_intensidad)"""
+
+    casos = " ".join(f"WHEN CAST(intensity_weighted AS DOUBLE) < {limite} THEN {texto_sql(nivel)}"
+                     for limite, nivel in zip(LIMITES_INTENSIDAD, NIVELES_INTENSIDAD))
+    return f"CASE {casos} ELSE {texto_sql(NIVELES_INTENSIDAD[-1])} END"
+
+def mediana_sql(columna):
+    """Mediana exacta: promedio de los dos valores del medio, como groupby().median()
+
+    quantile_disc da el valor de abajo; el de arriba es el de abajo de
+    los valores con el signo cambiado (median() interpola y a veces
+    difiere en el último bit).
+    """
+
+    valores = f"CAST({identificador(columna)} AS DOUBLE)"
+    con_valor = f"FILTER (WHERE NOT isnan({valores}))"
+    return f"(quantile_disc({valores}, 0.5) {con_valor} - quantile_disc(-{valores}, 0.5) {con_valor}) / 2"
+
+@instrumentar
+def ejecutar_consulta_duckdb():
+    """Ejecutar el pipeline con DuckDB (ver el comienzo del módulo)"""
+
+    import duckdb
+
+    palabras_clave = leer_palabras_clave()
+    conexion = duckdb.connect()
+
+    # 1. Limpiar y combinar todos los archivos
+    archivos = archivos_existentes()
+    vistas, linajes = zip(*[limpiar_archivo_duckdb(conexion, numero, archivo, palabras_clave)
+                            for numero, archivo in enumerate(archivos)])
+    columnas = columnas_en_orden([[nombre for nombre in tipos_duckdb(conexion, vista)
+                                   if nombre not in ('_archivo', '_fila')] for vista in vistas])
+    union = " UNION ALL BY NAME ".join(f"SELECT * FROM {vista}" for vista in vistas)
+    conexion.execute(f"CREATE OR REPLACE TEMP TABLE combinado AS SELECT (CAST(_archivo AS BIGINT) << 40) + _fila "
+                     f"AS _orden, {', '.join(identificador(c) for c in columnas)} FROM ({union})")
+    combinado = conexion.execute(f"SELECT {', '.join(identificador(c) for c in columnas)} FROM combinado "
+                                 f"ORDER BY _orden").to_arrow_table()
+    linaje = conexion.execute(" UNION ALL BY NAME ".join(linajes)).to_arrow_table()
+    registro.info(f"DuckDB: {combinado.num_rows:,} canciones limpias de {len(archivos)} archivos")
+
+    # 2. Resolver las canciones repetidas y calcular la intensidad de cada una
+    tipos = tipos_duckdb(conexion, 'combinado')
+    claves = claves_resolucion(list(tipos))
+    consulta = "SELECT * FROM combinado"
+    if claves is not None:
+        particion = ", ".join(identificador(columna) for columna in claves)
+        repeticiones, = conexion.execute(f"SELECT coalesce(max(_veces), 1) FROM (SELECT count(*) AS _veces "
+                                         f"FROM combinado GROUP BY {particion})").fetchone()
+        if repeticiones > 1:
+            consulta = resolver_duckdb(conexion, claves, tipos, repeticiones)
+    conexion.execute(f"CREATE OR REPLACE TEMP VIEW resuelto_final AS {consulta}")
+    tipos = tipos_duckdb(conexion, 'resuelto_final')
+    intensidad = ", ".join(f"{valor} AS {columna}" for columna, valor in intensidad_sql(tipos).items())
+    conexion.execute(f"CREATE OR REPLACE TEMP TABLE final AS SELECT *, {intensidad} FROM resuelto_final")
+
+    # 3. Outliers, puntuación de calidad, cubo y medianas
+    valores = "CAST(intensity_weighted AS DOUBLE)"
+    cantidad, = conexion.execute(f"SELECT count(*) FROM final WHERE {valores} IS NOT NULL "
+                                 f"AND NOT isnan({valores})").fetchone()
+
+    def vecinos(posiciones):
+        filas = dict(conexion.execute(
+            f"SELECT _posicion, _valor FROM (SELECT {valores} AS _valor, row_number() OVER (ORDER BY {valores}) - 1 "
+            f"AS _posicion FROM final WHERE {valores} IS NOT NULL AND NOT isnan({valores})) "
+            f"WHERE _posicion IN ({', '.join(str(posicion) for posicion in set(posiciones))})").fetchall())
+        return [filas[posicion] for posicion in posiciones]
+
+    bajo, alto = limites_outliers(cantidad, vecinos)
+    tipos = tipos_duckdb(conexion, 'final')
+    columnas_finales = [nombre for nombre in tipos if nombre != '_orden']
+    fuera = f"{valores} < CAST({bajo!r} AS DOUBLE) OR {valores} > CAST({alto!r} AS DOUBLE)"
+    conexion.execute(f"CREATE OR REPLACE TEMP VIEW con_calidad AS SELECT *, "
+                     f"CAST(is_complete AS BIGINT) * 40 + CAST(is_valid_date AS BIGINT) * 20 + "
+                     f"CAST(NOT is_outlier AS BIGINT) * 20 + 20 AS data_quality_score FROM (SELECT *, "
+                     f"coalesce({fuera}, false) AS is_outlier FROM final)")
+    orden = "ORDER BY _orden" if '_orden' in tipos else ""
+    final = conexion.execute(f"SELECT {', '.join(identificador(c) for c in columnas_finales)}, is_outlier, "
+                             f"data_quality_score FROM con_calidad {orden}").to_arrow_table()
+
+    agregaciones = []
+    for medida in MEDIDAS:
+        if medida not in tipos:
+            continue
+        numero = f"CAST({identificador(medida)} AS DOUBLE)"
+        con_valor = f"FILTER (WHERE {numero} IS NOT NULL AND NOT isnan({numero}))"
+        agregaciones += [f"count({numero}) {con_valor} AS {medida}_count",
+                         f"sum({numero}) {con_valor} AS {medida}_sum",
+                         f"min({numero}) {con_valor} AS {medida}_min",
+                         f"max({numero}) {con_valor} AS {medida}_max",
+                         f"sum({numero} * {numero}) {con_valor} AS {medida}_sumsq"]
+    agregaciones += ["count(track_id) AS track_id_count", "count(*) AS filas"]
+    conexion.execute(f"CREATE OR REPLACE TEMP VIEW con_nivel AS SELECT *, {nivel_intensidad_sql()} "
+                     f"AS intensity_category FROM con_calidad")
+    cubo = conexion.execute(f"SELECT {', '.join(CLAVES_CUBO)}, {', '.join(agregaciones)} FROM con_nivel "
+                            f"GROUP BY {', '.join(CLAVES_CUBO)}").to_arrow_table()
+
+    medianas = {}
+    for nombre, definicion in TABLAS_RESUMEN.items():
+        claves = definicion['claves']
+        medidas = [medida for medida, estadisticas in definicion['columnas'] if 'median' in estadisticas]
+        sin_nulos = " AND ".join(f"{clave} IS NOT NULL" for clave in claves)
+        medianas[nombre] = conexion.execute(
+            f"SELECT {', '.join(claves)}, {', '.join(f'{mediana_sql(medida)} AS {medida}' for medida in medidas)} "
+            f"FROM con_nivel WHERE {sin_nulos} GROUP BY {', '.join(claves)}").to_arrow_table()
+
+    conexion.close()
+    return combinado, linaje, final, cubo, medianas
+
+# ---------------------------------------------------------------------------
+# Etapa del pipeline
+# ---------------------------------------------------------------------------
+
+def ejecutar_consulta(motor='polars'):
+    """Limpiar, combinar, resolver, calcular intensidad y resúmenes con Polars o DuckDB
+
+    Devuelve lo mismo que las etapas de pandas: df_combinado, la tabla de
+    linaje, df_final y las cuatro tablas de resumen.
+    """
+
+    verificar_motor(motor)
+
+    registro.info(f"CONSULTA PEREZOSA CON {motor.upper()}")
+    registro.info("=" * 60)
+
+    ejecutar = ejecutar_consulta_polars if motor == 'polars' else ejecutar_consulta_duckdb
+    combinado, linaje, final, cubo, medianas = ejecutar()
+
+    df_combinado = a_pandas(combinado)
+    # Las reglas que no se aplican a un archivo no eliminan filas
+    conteos = a_pandas(linaje).reindex(columns=COLUMNAS_LINAJE[1:]).fillna(0).astype('int64')
+    linaje = pd.concat([a_pandas(linaje)[['archivo']], conteos], axis=1)
+    df_final = a_pandas(final)
+    cubo = ordenar_cubo(a_pandas(cubo))
+    resumenes = armar_resumenes(cubo, {nombre: a_pandas(tabla) for nombre, tabla in medianas.items()})
+
+    registro.info(f"Dataset final: {len(df_final):,} canciones, {len(df_final.columns)} columnas")
+
+    return (df_combinado, linaje, df_final, resumenes['resumen_decada'], resumenes['resumen_decada_genero'],
+            resumenes['stats_genero'], resumenes['resumen_intensidad'])
@@ -9,51 +9,79 @@ import pandas as pd
 import numpy as np
 import os
 
+from resumenes import calcular_resumen, calcular_resumenes
+from cuantiles import crear_histogramas, cuantiles_globales
+from instrumentacion import instrumentar
+from registro import obtener_registro, mostrar_diagnostico, mostrar_detalle
+
+registro = obtener_registro(__name__)
+
+def mostrar_estadisticas(intensidad):
+    """Mostrar promedio, mínimo y máximo de una intensidad
+
+    Solo sirven para el reporte: en modo silencioso no se calculan.
+    """
+    
+    if not mostrar_diagnostico():
+        return
+    
+    registro.info(f"  Intensidad promedio: {intensidad.mean():.3f}")
+    registro.info(f"  Intensidad mínima: {intensidad.min():.3f}")
+    registro.info(f"  Intensidad máxima: {intensidad.max():.3f}")
+
+def mostrar_proporcion(descripcion, marcador):
+    """Mostrar cuántas canciones cumplen un marcador (no en modo silencioso)"""
+    
+    if not mostrar_diagnostico():
+        return
+    
+    cantidad = marcador.sum()
+    total = len(marcador)
+    porcentaje = (cantidad / total) * 100
+    registro.info(f"  {descripcion}: {cantidad:,} de {total:,} ({porcentaje:.1f}%)")
+
+@instrumentar
 def crear_intensidad_ponderada(df):
     """Crear intensidad dando más peso a energy"""
     
-    print("\n--- Creando intensidad ponderada ---")
+    registro.debug("\n--- Creando intensidad ponderada ---")
     
     if 'energy' in df.columns and 'loudness_normalized' in df.columns:
         # Energy es más importante para la percepción de intensidad (60%)
         # Loudness es importante pero menos (40%)
         df['intensity_weighted'] = (df['energy'] * 0.6) + (df['loudness_normalized'] * 0.4)
-        print("Creada columna intensity_weighted (energy 60% + loudness 40%)")
+        registro.debug("Creada columna intensity_weighted (energy 60% + loudness 40%)")
         
-        # Estadísticas básicas
-        print(f"  Intensidad promedio: {df['intensity_weighted'].mean():.3f}")
-        print(f"  Intensidad mínima: {df['intensity_weighted'].min():.3f}")
-        print(f"  Intensidad máxima: {df['intensity_weighted'].max():.3f}")
+        mostrar_estadisticas(df['intensity_weighted'])
         
         return df
     else:
-        print("ERROR: Faltan columnas energy o loudness_normalized")
+        registro.error("ERROR: Faltan columnas energy o loudness_normalized")
         return df
 
+@instrumentar
 def crear_intensidad_simple(df):
     """Crear intensidad como promedio simple de energy y loudness"""
     
-    print("\n--- Creando intensidad simple ---")
+    registro.debug("\n--- Creando intensidad simple ---")
     
     if 'energy' in df.columns and 'loudness_normalized' in df.columns:
         # Promedio simple: (energy + loudness_normalized) / 2
         df['intensity_simple'] = (df['energy'] + df['loudness_normalized']) / 2
-        print("Creada columna intensity_simple (promedio simple)")
+        registro.debug("Creada columna intensity_simple (promedio simple)")
         
-        # Estadísticas básicas
-        print(f"  Intensidad promedio: {df['intensity_simple'].mean():.3f}")
-        print(f"  Intensidad mínima: {df['intensity_simple'].min():.3f}")
-        print(f"  Intensidad máxima: {df['intensity_simple'].max():.3f}")
+        mostrar_estadisticas(df['intensity_simple'])
         
         return df
     else:
-        print("ERROR: Faltan columnas energy o loudness_normalized")
+        registro.error("ERROR: Faltan columnas energy o loudness_normalized")
         return df
 
+@instrumentar
 def crear_intensidad_compleja(df):
     """Crear intensidad incluyendo más factores"""
     
-    print("\n--- Creando intensidad compleja ---")
+    registro.debug("\n--- Creando intensidad compleja ---")
     
     if 'energy' in df.columns and 'loudness_normalized' in df.columns:
         # Si tenemos tempo, incluirlo también
@@ -68,26 +96,24 @@ def crear_intensidad_compleja(df):
                 df['loudness_normalized'] * 0.3 +
                 tempo_normalizado * 0.2
             )
-            print("Creada columna intensity_complex (energy 50% + loudness 30% + tempo 20%)")
+            registro.debug("Creada columna intensity_complex (energy 50% + loudness 30% + tempo 20%)")
         else:
             # Si no hay tempo, usar solo energy y loudness
             df['intensity_complex'] = (df['energy'] * 0.6) + (df['loudness_normalized'] * 0.4)
-            print("Creada columna intensity_complex (energy 60% + loudness 40%)")
+            registro.debug("Creada columna intensity_complex (energy 60% + loudness 40%)")
         
-        # Estadísticas básicas
-        print(f"  Intensidad promedio: {df['intensity_complex'].mean():.3f}")
-        print(f"  Intensidad mínima: {df['intensity_complex'].min():.3f}")
-        print(f"  Intensidad máxima: {df['intensity_complex'].max():.3f}")
+        mostrar_estadisticas(df['intensity_complex'])
         
         return df
     else:
-        print("ERROR: Faltan columnas energy o loudness_normalized")
+        registro.error("ERROR: Faltan columnas energy o loudness_normalized")
         return df
 
+@instrumentar
 def crear_marcador_completo(df):
     """Marcar canciones que tienen toda la información necesaria"""
     
-    print("\n--- Creando marcador de completitud ---")
+    registro.debug("\n--- Creando marcador de completitud ---")
     
     df['is_complete'] = (
         df['energy'].notna() &           # Tiene energy
@@ -96,41 +122,43 @@ def crear_marcador_completo(df):
         df['main_genre'].notna()         # Tiene género
     )
     
-    completas = df['is_complete'].sum()
-    total = len(df)
-    porcentaje = (completas / total) * 100
-    
-    print(f"  Canciones completas: {completas:,} de {total:,} ({porcentaje:.1f}%)")
+    mostrar_proporcion("Canciones completas", df['is_complete'])
     
     return df
 
+@instrumentar
 def crear_marcador_fecha_valida(df):
     """Marcar canciones con fechas que tienen sentido"""
     
-    print("\n--- Creando marcador de fecha válida ---")
+    registro.debug("\n--- Creando marcador de fecha válida ---")
     
     df['is_valid_date'] = (
         (df['release_year'] >= 1920) &   # No muy antigua
         (df['release_year'] <= 2024)     # No futura
     )
     
-    validas = df['is_valid_date'].sum()
-    total = len(df)
-    porcentaje = (validas / total) * 100
-    
-    print(f"  Fechas válidas: {validas:,} de {total:,} ({porcentaje:.1f}%)")
+    mostrar_proporcion("Fechas válidas", df['is_valid_date'])
     
     return df
 
-def crear_marcador_outliers(df):
-    """Marcar canciones con valores muy raros de intensidad"""
+@instrumentar
+def crear_marcador_outliers(df, histogramas=None):
+    """Marcar canciones con valores muy raros de intensidad
+    
+    Con histogramas (ver cuantiles.py) los cuartiles son aproximados y no
+    hace falta ordenar toda la columna.
+    """
     
-    print("\n--- Creando marcador de outliers ---")
+    registro.debug("\n--- Creando marcador de outliers ---")
     
     if 'intensity_weighted' in df.columns:
         # Calcular qué valores son "normales" usando el método IQR
-        Q1 = df['intensity_weighted'].quantile(0.25)  # 25% más bajo
-        Q3 = df['intensity_weighted'].quantile(0.75)  # 75% más alto
+        if histogramas is not None:
+            Q1, Q3 = cuantiles_globales(histogramas, 'intensity_weighted', [0.25, 0.75])
+            registro.info("  Cuartiles aproximados con histogramas")
+        else:
+            Q1 = df['intensity_weighted'].quantile(0.25)  # 25% más bajo
+            Q3 = df['intensity_weighted'].quantile(0.75)  # 75% más alto
         IQR = Q3 - Q1  # Rango intercuartil
         
         # Un valor es "raro" si está muy lejos de lo normal
@@ -139,22 +167,19 @@ def crear_marcador_outliers(df):
             (df['intensity_weighted'] > Q3 + 1.5 * IQR)    # Muy alto
         )
         
-        outliers = df['is_outlier'].sum()
-        total = len(df)
-        porcentaje = (outliers / total) * 100
-        
-        print(f"  Outliers detectados: {outliers:,} de {total:,} ({porcentaje:.1f}%)")
-        print(f"  Rango normal: {Q1 - 1.5 * IQR:.3f} a {Q3 + 1.5 * IQR:.3f}")
+        mostrar_proporcion("Outliers detectados", df['is_outlier'])
+        registro.info(f"  Rango normal: {Q1 - 1.5 * IQR:.3f} a {Q3 + 1.5 * IQR:.3f}")
         
         return df
     else:
-        print("ERROR: No se puede crear marcador de outliers sin intensity_weighted")
+        registro.error("ERROR: No se puede crear marcador de outliers sin intensity_weighted")
         return df
 
+@instrumentar
 def crear_puntuacion_calidad(df):
     """Crear una puntuación de calidad de 0 a 100"""
     
-    print("\n--- Creando puntuación de calidad ---")
+    registro.debug("\n--- Creando puntuación de calidad ---")
     
     # Cada marcador vale puntos
     df['data_quality_score'] = (
@@ -164,148 +189,169 @@ def crear_puntuacion_calidad(df):
         (20)  # 20 puntos base (asumiendo que no hay conflictos)
     )
     
-    score_promedio = df['data_quality_score'].mean()
-    print(f"  Puntuación promedio: {score_promedio:.1f}/100")
+    if mostrar_diagnostico():
+        registro.info(f"  Puntuación promedio: {df['data_quality_score'].mean():.1f}/100")
     
     return df
 
-def crear_resumen_por_decada(df):
-    """Crear resumen de intensidad por década"""
-    
-    print("\n--- Creando resumen por década ---")
-    
-    if 'intensity_weighted' in df.columns and 'release_decade' in df.columns:
-        # Agrupar por década y calcular estadísticas
-        resumen_decada = df.groupby('release_decade').agg({
-            'intensity_weighted': ['mean', 'median', 'std', 'min', 'max'],
-            'energy': ['mean', 'median'],
-            'loudness': ['mean', 'median'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Aplanar nombres de columnas (quitar los niveles)
-        resumen_decada.columns = ['_'.join(col).strip() for col in resumen_decada.columns]
-        resumen_decada = resumen_decada.reset_index()
-        
-        print("  Resumen por década creado:")
-        for _, row in resumen_decada.iterrows():
-            decada = row['release_decade']
-            intensidad = row['intensity_weighted_mean']
-            canciones = row['track_id_count']
-            print(f"    {decada}: {intensidad:.3f} intensidad promedio ({canciones:,} canciones)")
+def crear_variables_por_fila(df):
+    """Crear las variables que dependen solo de cada canción
+    
+    Sirven también para agregar canciones sueltas (modo incremental).
+    """
+    
+    df = crear_intensidad_ponderada(df)
+    df = crear_intensidad_simple(df)
+    df = crear_intensidad_compleja(df)
+    df = crear_marcador_completo(df)
+    df = crear_marcador_fecha_valida(df)
+    
+    return df
+
+def crear_marcadores_globales(df, histogramas=None):
+    """Crear los marcadores que dependen de todo el dataset (outliers y puntuación)"""
+    
+    df = crear_marcador_outliers(df, histogramas)
+    df = crear_puntuacion_calidad(df)
+    
+    return df
+
+@instrumentar
+def crear_resumen_por_decada(df, resumenes=None):
+    """Crear resumen de intensidad por década
+    
+    Si se pasan los resúmenes ya calculados (ver calcular_resumenes),
+    se toma la tabla de ahí en vez de recorrer el dataset.
+    """
+    
+    registro.debug("\n--- Creando resumen por década ---")
+    
+    if resumenes is not None:
+        resumen_decada = resumenes['resumen_decada']
+    else:
+        resumen_decada = calcular_resumen(df, 'resumen_decada')
+    
+    if resumen_decada is not None:
+        registro.info(f"  Resumen por década creado: {len(resumen_decada)} décadas")
+        if mostrar_detalle():
+            for decada, intensidad, canciones in zip(resumen_decada['release_decade'],
+                                                     resumen_decada['intensity_weighted_mean'],
+                                                     resumen_decada['track_id_count']):
+                registro.debug(f"    {decada}: {intensidad:.3f} intensidad promedio ({canciones:,} canciones)")
         
         return resumen_decada
     else:
-        print("ERROR: Faltan columnas intensity_weighted o release_decade")
+        registro.error("ERROR: Faltan columnas intensity_weighted o release_decade")
         return None
 
-def crear_resumen_por_decada_genero(df):
-    """Crear resumen de intensidad por década y género"""
-    
-    print("\n--- Creando resumen por década y género ---")
-    
-    if 'intensity_weighted' in df.columns and 'release_decade' in df.columns and 'main_genre' in df.columns:
-        # Agrupar por década y género
-        resumen_decada_genero = df.groupby(['release_decade', 'main_genre']).agg({
-            'intensity_weighted': ['mean', 'median', 'std'],
-            'energy': ['mean'],
-            'loudness': ['mean'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Aplanar nombres de columnas
-        resumen_decada_genero.columns = ['_'.join(col).strip() for col in resumen_decada_genero.columns]
-        resumen_decada_genero = resumen_decada_genero.reset_index()
-        
-        # Filtrar combinaciones con muy pocas canciones
-        resumen_decada_genero = resumen_decada_genero[resumen_decada_genero['track_id_count'] >= 50]
-        
-        print(f"  Resumen por década y género creado: {len(resumen_decada_genero)} combinaciones")
+@instrumentar
+def crear_resumen_por_decada_genero(df, resumenes=None):
+    """Crear resumen de intensidad por década y género (ver crear_resumen_por_decada)"""
+    
+    registro.debug("\n--- Creando resumen por década y género ---")
+    
+    if resumenes is not None:
+        resumen_decada_genero = resumenes['resumen_decada_genero']
+    else:
+        resumen_decada_genero = calcular_resumen(df, 'resumen_decada_genero')
+    
+    if resumen_decada_genero is not None:
+        registro.info(f"  Resumen por década y género creado: {len(resumen_decada_genero)} combinaciones")
         
         return resumen_decada_genero
     else:
-        print("ERROR: Faltan columnas necesarias")
+        registro.error("ERROR: Faltan columnas necesarias")
         return None
 
-def crear_estadisticas_genero(df):
-    """Crear estadísticas por género"""
-    
-    print("\n--- Creando estadísticas por género ---")
-    
-    if 'intensity_weighted' in df.columns and 'main_genre' in df.columns:
-        # Agrupar por género
-        stats_genero = df.groupby('main_genre').agg({
-            'intensity_weighted': ['mean', 'median', 'std', 'min', 'max'],
-            'energy': ['mean', 'std'],
-            'loudness': ['mean', 'std'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Agregar columnas opcionales si existen
-        if 'danceability' in df.columns:
-            stats_genero[('danceability', 'mean')] = df.groupby('main_genre')['danceability'].mean()
-        
-        if 'tempo' in df.columns:
-            stats_genero[('tempo', 'mean')] = df.groupby('main_genre')['tempo'].mean()
-            stats_genero[('tempo', 'std')] = df.groupby('main_genre')['tempo'].std()
-        
-        # Aplanar nombres de columnas
-        stats_genero.columns = ['_'.join(col).strip() for col in stats_genero.columns]
-        stats_genero = stats_genero.reset_index()
-        
-        print(f"  Estadísticas por género creadas: {len(stats_genero)} géneros")
+@instrumentar
+def crear_estadisticas_genero(df, resumenes=None):
+    """Crear estadísticas por género (ver crear_resumen_por_decada)"""
+    
+    registro.debug("\n--- Creando estadísticas por género ---")
+    
+    if resumenes is not None:
+        stats_genero = resumenes['stats_genero']
+    else:
+        stats_genero = calcular_resumen(df, 'stats_genero')
+    
+    if stats_genero is not None:
+        registro.info(f"  Estadísticas por género creadas: {len(stats_genero)} géneros")
         
         return stats_genero
     else:
-        print("ERROR: Faltan columnas necesarias")
+        registro.error("ERROR: Faltan columnas necesarias")
         return None
 
-def crear_variables_intensidad():
-    """Función principal para crear todas las variables de intensidad"""
+def crear_variables_y_resumenes(df=None, cuantiles_aproximados=False):
+    """Crear las variables de intensidad y todas las tablas de resumen
     
-    print("CREANDO VARIABLES DE INTENSIDAD")
-    print("=" * 60)
+    Recibe el dataset combinado en memoria; si se ejecuta solo, lo crea
+    combinando los archivos. Las tablas salen de un solo cubo. Con
+    cuantiles_aproximados, los cuartiles de los outliers y las medianas
+    de los resúmenes salen de histogramas por celda (ver cuantiles.py)
+    en vez de ordenar los valores.
+    Devuelve (df, resumen_decada, resumen_decada_genero, stats_genero,
+    resumen_intensidad), o None si no hay dataset.
+    """
     
-    # Cargar el dataset combinado
-    # Por simplicidad, vamos a recrear el proceso completo
-    from combinar_archivos import combinar_todos_los_archivos
+    registro.info("CREANDO VARIABLES DE INTENSIDAD")
+    registro.info("=" * 60)
     
-    print("Cargando dataset combinado...")
-    df = combinar_todos_los_archivos()
+    if df is None:
+        from combinar_archivos import combinar_todos_los_archivos
+        
+        registro.info("Cargando dataset combinado...")
+        df = combinar_todos_los_archivos()
     
     if df is None:
-        print("ERROR: No se pudo cargar el dataset combinado")
+        registro.error("ERROR: No se pudo cargar el dataset combinado")
         return None
     
-    print(f"Dataset cargado: {len(df):,} canciones")
+    registro.info(f"Dataset cargado: {len(df):,} canciones")
+    
+    # Crear variables de intensidad y marcadores de calidad
+    df = crear_variables_por_fila(df)
+    histogramas = None
+    if cuantiles_aproximados and 'intensity_weighted' in df.columns:
+        histogramas = crear_histogramas(df)
+    df = crear_marcadores_globales(df, histogramas)
+    
+    # Crear resúmenes (todas las tablas salen de un solo cubo)
+    resumenes = calcular_resumenes(df, histogramas=histogramas)
+    if resumenes is not None:
+        resumen_decada = crear_resumen_por_decada(df, resumenes)
+        resumen_decada_genero = crear_resumen_por_decada_genero(df, resumenes)
+        stats_genero = crear_estadisticas_genero(df, resumenes)
+        resumen_intensidad = resumenes['resumen_intensidad']
+    else:
+        registro.error("ERROR: Faltan columnas necesarias para los resúmenes")
+        resumen_decada = resumen_decada_genero = stats_genero = resumen_intensidad = None
     
-    # Crear variables de intensidad
-    df = crear_intensidad_ponderada(df)
-    df = crear_intensidad_simple(df)
-    df = crear_intensidad_compleja(df)
+    registro.info(f"\n{'='*60}")
+    registro.info("CREACION DE VARIABLES COMPLETADA")
+    registro.info(f"{'='*60}")
+    registro.info(f"Dataset final: {len(df):,} canciones")
+    registro.info(f"Columnas: {len(df.columns)}")
     
-    # Crear marcadores de calidad
-    df = crear_marcador_completo(df)
-    df = crear_marcador_fecha_valida(df)
-    df = crear_marcador_outliers(df)
-    df = crear_puntuacion_calidad(df)
+    if 'intensity_weighted' in df.columns and mostrar_diagnostico():
+        registro.info(f"Intensidad promedio: {df['intensity_weighted'].mean():.3f}")
+        registro.info(f"Puntuación de calidad promedio: {df['data_quality_score'].mean():.1f}/100")
     
-    # Crear resúmenes
-    resumen_decada = crear_resumen_por_decada(df)
-    resumen_decada_genero = crear_resumen_por_decada_genero(df)
-    stats_genero = crear_estadisticas_genero(df)
+    return df, resumen_decada, resumen_decada_genero, stats_genero, resumen_intensidad
+
+def crear_variables_intensidad(df=None, cuantiles_aproximados=False):
+    """Función principal para crear todas las variables de intensidad
     
-    print(f"\n{'='*60}")
-    print("CREACION DE VARIABLES COMPLETADA")
-    print(f"{'='*60}")
-    print(f"Dataset final: {len(df):,} canciones")
-    print(f"Columnas: {len(df.columns)}")
+    Devuelve (df, resumen_decada, resumen_decada_genero, stats_genero),
+    o None si no hay dataset. El pipeline usa crear_variables_y_resumenes,
+    que además devuelve el resumen por nivel de intensidad.
+    """
     
-    if 'intensity_weighted' in df.columns:
-        print(f"Intensidad promedio: {df['intensity_weighted'].mean():.3f}")
-        print(f"Puntuación de calidad promedio: {df['data_quality_score'].mean():.1f}/100")
+    resultado = crear_variables_y_resumenes(df, cuantiles_aproximados)
+    if resultado is None:
+        return None
     
-    return df, resumen_decada, resumen_decada_genero, stats_genero
+    return resultado[:4]
 
 if __name__ == "__main__":
     resultado = crear_variables_intensidad()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cuantiles aproximados (medianas y cuartiles) con histogramas por celda
+Nivel: Desarrollador
+
+La mediana por grupo y los cuartiles de los outliers necesitan ordenar
+todos los valores. En modo aproximado (--approx-quantiles) se guardan en
+cambio histogramas de cubetas fijas para cada celda del cubo (década ×
+género × nivel de intensidad):
+- se arman en una sola pasada, sin ordenar los datos
+- dos histogramas se combinan sumando las cantidades de cada cubeta, y
+  una canción que sale se resta; así se actualizan en modo incremental
+  igual que el cubo de resumenes.py
+- el cuantil de cualquier grupo sale de sumar las celdas del grupo.
+
+Las cubetas cubren los rangos que deja la limpieza (energy de 0 a 1,
+loudness de -60 a 0), así que ningún valor queda afuera. Cada cuantil
+estimado queda a menos de un ancho de cubeta (0.0005 para la intensidad)
+del que calcula pandas: se estiman por separado los dos valores entre
+los que pandas interpola y se interpola igual que pandas.
+"""
+
+import pandas as pd
+import numpy as np
+
+from resumenes import CLAVES_CUBO, codificar_claves, etiquetar
+
+# Rango de cada medida con histograma y cantidad de cubetas
+RANGOS_HISTOGRAMA = {
+    'intensity_weighted': (0.0, 1.0),
+    'energy': (0.0, 1.0),
+    'loudness': (-60.0, 0.0)
+}
+CUBETAS_HISTOGRAMA = 2000
+
+COLUMNAS_CUBETA = ['medida', 'cubeta', 'cantidad']
+COLUMNAS_HISTOGRAMA = CLAVES_CUBO + COLUMNAS_CUBETA
+
+def ancho_cubeta(medida):
+    """Ancho de cada cubeta de la medida (es también la cota del error)"""
+
+    minimo, maximo = RANGOS_HISTOGRAMA[medida]
+    return (maximo - minimo) / CUBETAS_HISTOGRAMA
+
+def numero_cubeta(valores, medida):
+    """Cubeta de cada valor (-1 para los nulos)"""
+
+    minimo, _ = RANGOS_HISTOGRAMA[medida]
+    # El máximo del rango cae justo en el borde: va en la última cubeta
+    cubetas = np.clip(np.floor((valores - minimo) / ancho_cubeta(medida)), 0, CUBETAS_HISTOGRAMA - 1)
+    return np.where(np.isnan(valores), -1, cubetas).astype('int64')
+
+def crear_histogramas(df, codificadas=None, claves=CLAVES_CUBO):
+    """Histograma de cada medida en cada celda del cubo
+
+    Devuelve una tabla larga con una fila por celda, medida y cubeta con
+    datos: las claves del cubo, 'medida', 'cubeta' y 'cantidad'. Con
+    claves se arman para las celdas de otro cubo (ver cubo_olap.py).
+    """
+
+    codigos, etiquetas = codificadas or codificar_claves(df, claves)
+
+    # Un solo código entero por celda (cada clave tiene un código extra para "sin valor")
+    tamanos = [len(etiquetas[clave]) + 1 for clave in claves]
+    celda = np.zeros(len(df), dtype='int64')
+    for clave, tamano in zip(claves, tamanos):
+        celda = celda * tamano + codigos[clave]
+
+    partes = []
+    for medida in RANGOS_HISTOGRAMA:
+        if medida not in df.columns:
+            continue
+        cubetas = numero_cubeta(df[medida].to_numpy(dtype='float64', na_value=np.nan), medida)
+        con_valor = cubetas >= 0
+
+        combinados, cantidades = np.unique(celda[con_valor] * CUBETAS_HISTOGRAMA + cubetas[con_valor],
+                                           return_counts=True)
+
+        # Separar el código combinado en las claves de la celda
+        resto = combinados // CUBETAS_HISTOGRAMA
+        columnas = {}
+        for clave, tamano in reversed(list(zip(claves, tamanos))):
+            columnas[clave] = etiquetar(resto % tamano, etiquetas[clave])
+            resto = resto // tamano
+
+        partes.append(pd.DataFrame({
+            **{clave: columnas[clave] for clave in claves},
+            'medida': medida,
+            'cubeta': (combinados % CUBETAS_HISTOGRAMA).astype('int32'),
+            'cantidad': cantidades.astype('int64')
+        }))
+
+    if not partes:
+        return pd.DataFrame(columns=claves + COLUMNAS_CUBETA)
+    return pd.concat(partes, ignore_index=True)
+
+def combinar_histogramas(histogramas):
+    """Juntar varios histogramas sumando las cantidades de cada cubeta
+
+    Las cubetas que quedan en cero (por ejemplo, al restar) se quitan.
+    """
+
+    tabla = pd.concat(histogramas, ignore_index=True)
+    claves = [columna for columna in tabla.columns if columna not in COLUMNAS_CUBETA]
+    tabla = tabla.groupby(claves + ['medida', 'cubeta'], observed=True, dropna=False)['cantidad'].sum()
+    tabla = tabla[tabla != 0].reset_index()
+
+    return tabla[claves + COLUMNAS_CUBETA]
+
+def actualizar_histogramas(histogramas, filas_quitadas, filas_nuevas):
+    """Restar las canciones que salen y sumar las que entran"""
+
+    quitado = crear_histogramas(filas_quitadas)
+    quitado['cantidad'] = -quitado['cantidad']
+
+    return combinar_histogramas([histogramas, quitado, crear_histogramas(filas_nuevas)])
+
+def valor_en_cubeta(cubeta, anteriores, cantidad, posicion, minimo, ancho):
+    """Valor estimado del elemento número posicion (entero, desde 0)
+
+    cubeta es la que contiene la posición, anteriores la cantidad de
+    valores en las cubetas más bajas. Se supone que los valores están
+    repartidos en forma pareja dentro de la cubeta: la estimación queda
+    dentro de ella, a menos de un ancho del valor exacto.
+    """
+
+    fraccion = np.minimum((posicion - anteriores + 0.5) / cantidad, 1.0)
+    return minimo + ancho * (cubeta + fraccion)
+
+def cuantil_histograma(cubetas, cantidades, medida, q):
+    """Cuantil q de un histograma, como lo interpola pandas
+
+    pandas toma la posición q * (n - 1) de los valores ordenados e
+    interpola entre los dos valores vecinos (en la mediana de una cantidad
+    par, los dos del medio). Cada vecino se estima en su cubeta (ver
+    valor_en_cubeta) y se interpola igual, así que el resultado queda a
+    menos de un ancho de cubeta del de pandas.
+    """
+
+    orden = np.argsort(cubetas, kind='stable')
+    cubetas = np.asarray(cubetas)[orden]
+    cantidades = np.asarray(cantidades)[orden]
+
+    acumuladas = np.cumsum(cantidades)
+    if len(acumuladas) == 0 or acumuladas[-1] == 0:
+        return np.nan
+
+    minimo, _ = RANGOS_HISTOGRAMA[medida]
+    posicion = q * (acumuladas[-1] - 1)
+    vecinos = []
+    for entera in [np.floor(posicion), np.ceil(posicion)]:
+        indice = np.searchsorted(acumuladas, entera, side='right')
+        anteriores = acumuladas[indice] - cantidades[indice]
+        vecinos.append(valor_en_cubeta(cubetas[indice], anteriores, cantidades[indice], entera,
+                                       minimo, ancho_cubeta(medida)))
+
+    inferior, superior = vecinos
+    return inferior + (superior - inferior) * (posicion - np.floor(posicion))
+
+def cuantiles_por_grupo(histogramas, claves, medidas, q=0.5):
+    """Cuantil q de cada medida por grupo (por defecto la mediana)
+
+    Lo mismo que cuantil_histograma, para todos los grupos a la vez.
+    Devuelve una tabla con una columna por medida e índice con las claves
+    (los grupos sin valor en alguna clave se descartan, igual que en groupby).
+    """
+
+    tabla = histogramas[histogramas['medida'].isin(medidas)]
+    # groupby deja las cubetas de cada grupo ordenadas
+    tabla = tabla.groupby(claves + ['medida', 'cubeta'], observed=True)['cantidad'].sum().reset_index()
+
+    grupos = tabla.groupby(claves + ['medida'], observed=True)['cantidad']
+    acumuladas = grupos.cumsum()
+    anteriores = acumuladas - tabla['cantidad']
+    posicion = q * (grupos.transform('sum') - 1)
+
+    minimos = tabla['medida'].map({medida: rango[0] for medida, rango in RANGOS_HISTOGRAMA.items()})
+    anchos = tabla['medida'].map(ancho_cubeta)
+
+    # En cada grupo, la única cubeta que contiene cada vecino de la posición
+    # (las filas elegidas quedan en el orden de los grupos)
+    vecinos = []
+    for entera in [np.floor(posicion), np.ceil(posicion)]:
+        elegidas = (anteriores <= entera) & (entera < acumuladas)
+        valores = valor_en_cubeta(tabla['cubeta'], anteriores, tabla['cantidad'], entera, minimos, anchos)
+        vecinos.append(valores[elegidas])
+
+    inferior, superior = vecinos
+    peso = (posicion - np.floor(posicion))[inferior.index]
+    tabla = tabla.loc[inferior.index].assign(valor=inferior + (superior.to_numpy() - inferior) * peso)
+
+    resultado = tabla.set_index(claves + ['medida'])['valor'].unstack('medida')
+    return resultado.reindex(columns=medidas)
+
+def cuantiles_globales(histogramas, medida, qs):
+    """Cuantiles de una medida sobre todas las canciones"""
+
+    filas = histogramas[histogramas['medida'] == medida]
+    filas = filas.groupby('cubeta')['cantidad'].sum()
+
+    return [cuantil_histograma(filas.index.to_numpy(), filas.to_numpy(), medida, q) for q in qs]
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cubo OLAP de estadísticas de intensidad para armar cualquier resumen al instante
+Nivel: Desarrollador
+
+Las cuatro tablas de resumen son cortes fijos. Para cualquier otro
+(año × género, nivel × década, por archivo de origen...) guardar_resultados
+guarda también un cubo más fino:
+    data/processed/intensity_cube.parquet          estadísticas por celda
+    data/processed/intensity_cube_sketch.parquet   histogramas por celda
+
+Las dimensiones son release_year, main_genre, intensity_category y
+data_source, más release_decade: al unificar canciones repetidas la década
+es la del primer archivo y el año el más temprano, así que la década no
+siempre sale del año. Como casi siempre coinciden, agregarla casi no suma
+celdas y las tablas por década quedan exactas.
+
+Cada celda guarda, por medida, cantidad, suma, suma de cuadrados, mínimo
+y máximo (igual que el cubo de resumenes.py) y un histograma de cubetas
+fijas (el de cuantiles.py) para las medianas. Todo se puede combinar:
+enrollar() suma las celdas hasta quedarse con las claves pedidas y saca
+media, desviación, mínimo, máximo y cantidad de esas sumas; la mediana
+sale de los histogramas, como con --approx-quantiles: a menos de un ancho
+de cubeta de la exacta (0.0005 en intensidad), antes de redondear.
+
+Uso (desde la carpeta donde está data/processed):
+    python cubo_olap.py --claves release_year main_genre --medida intensity_weighted:mean,median
+    python cubo_olap.py --claves intensity_category release_decade --filtro main_genre=Rock
+    python cubo_olap.py --tablas /tmp/tablas   # los cuatro CSV de resumen desde el cubo
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from cuantiles import RANGOS_HISTOGRAMA, crear_histogramas
+from resumenes import TABLAS_RESUMEN, codificar_claves, construir_tabla, crear_cubo
+from registro import configurar_registro, obtener_registro
+
+registro = obtener_registro(__name__)
+
+DIMENSIONES_OLAP = ['release_year', 'release_decade', 'main_genre', 'intensity_category', 'data_source']
+
+RUTA_CUBO_OLAP = 'data/processed/intensity_cube.parquet'
+RUTA_HISTOGRAMAS_OLAP = 'data/processed/intensity_cube_sketch.parquet'
+
+# Archivo de cada tabla de resumen
+ARCHIVOS_RESUMEN = {
+    'resumen_decada': 'intensity_by_decade.csv',
+    'resumen_decada_genero': 'intensity_by_decade_genre.csv',
+    'stats_genero': 'genre_statistics.csv',
+    'resumen_intensidad': 'intensity_by_level.csv'
+}
+
+ESTADISTICAS_OLAP = ['count', 'mean', 'std', 'min', 'max', 'median']
+
+def crear_cubo_olap(df):
+    """Cubo y histogramas por año × década × género × nivel × origen
+
+    Las claves se factorizan una sola vez para los dos. Devuelve
+    (cubo, histogramas), o None si falta alguna columna.
+    """
+
+    necesarias = [dimension for dimension in DIMENSIONES_OLAP if dimension != 'intensity_category']
+    if any(columna not in df.columns for columna in necesarias + ['intensity_weighted', 'track_id']):
+        return None
+
+    codificadas = codificar_claves(df, DIMENSIONES_OLAP)
+    cubo = crear_cubo(df, codificadas, DIMENSIONES_OLAP)
+    histogramas = crear_histogramas(df, codificadas, DIMENSIONES_OLAP)
+
+    return cubo, histogramas
+
+def guardar_cubo_olap(cubo, histogramas, ruta_cubo=RUTA_CUBO_OLAP, ruta_histogramas=RUTA_HISTOGRAMAS_OLAP):
+    """Guardar el cubo y los histogramas en Parquet; devuelve el tamaño total en bytes
+
+    Las claves de texto se guardan como categorías (diccionario), que es
+    lo que hace chicos a los archivos: los histogramas repiten las claves
+    de la celda en cada cubeta.
+    """
+
+    tamano = 0
+    for tabla, ruta in [(cubo, ruta_cubo), (histogramas, ruta_histogramas)]:
+        tabla = tabla.copy()
+        for columna in ['main_genre', 'data_source', 'medida']:
+            if columna in tabla.columns:
+                tabla[columna] = tabla[columna].astype('category')
+
+        temporal = f"{ruta}.tmp-{os.getpid()}"
+        tabla.to_parquet(temporal, compression='zstd', index=False)
+        os.replace(temporal, ruta)
+        tamano += os.path.getsize(ruta)
+
+    return tamano
+
+def cargar_cubo_olap(ruta_cubo=RUTA_CUBO_OLAP, ruta_histogramas=RUTA_HISTOGRAMAS_OLAP):
+    """Leer el cubo y los histogramas guardados; devuelve (cubo, histogramas)"""
+
+    for ruta in [ruta_cubo, ruta_histogramas]:
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No existe {ruta} (ejecuta primero pipeline_completo.py)")
+
+    return pd.read_parquet(ruta_cubo), pd.read_parquet(ruta_histogramas)
+
+def filtrar_celdas(tabla, filtros):
+    """Celdas (o cubetas) que cumplen los filtros (columna, operador, valor) sobre las dimensiones"""
+
+    if not filtros:
+        return tabla
+
+    cumple = pd.Series(True, index=tabla.index)
+    for columna, operador, valor in filtros:
+        if columna not in DIMENSIONES_OLAP:
+            raise ValueError(f"Solo se puede filtrar por las dimensiones del cubo ({', '.join(DIMENSIONES_OLAP)})")
+        valores = tabla[columna]
+        if operador in ['in', 'not in']:
+            condicion = valores.isin(list(valor))
+        elif operador in ['=', '==', '!=']:
+            condicion = valores == valor
+        elif operador in ['<', '<=', '>', '>=']:
+            condicion = {'<': valores < valor, '<=': valores <= valor,
+                         '>': valores > valor, '>=': valores >= valor}[operador]
+        else:
+            raise ValueError(f"Operador desconocido: {operador!r}")
+        cumple &= ~condicion if operador in ['!=', 'not in'] else condicion
+
+    return tabla[cumple.to_numpy()]
+
+def enrollar(cubo, claves, columnas, histogramas=None, filtros=None, minimo_canciones=None):
+    """Tabla resumida por las claves pedidas, sumando las celdas del cubo
+
+    columnas es una lista de (medida, estadísticas) como en
+    resumenes.TABLAS_RESUMEN, con estadísticas count, mean, std, min, max
+    y median (la mediana necesita los histogramas). filtros son
+    condiciones (columna, operador, valor) sobre las dimensiones que se
+    aplican antes de sumar. Los valores se redondean a 4 decimales, igual
+    que en las tablas de resumen.
+    """
+
+    for clave in claves:
+        if clave not in DIMENSIONES_OLAP:
+            raise ValueError(f"No se puede agrupar por {clave!r} (usa {', '.join(DIMENSIONES_OLAP)})")
+    for medida, estadisticas in columnas:
+        if medida != 'track_id' and f"{medida}_count" not in cubo.columns:
+            raise ValueError(f"El cubo no tiene la medida {medida!r}")
+        for estadistica in estadisticas:
+            if estadistica not in ESTADISTICAS_OLAP:
+                raise ValueError(f"Estadística desconocida: {estadistica!r} (usa {', '.join(ESTADISTICAS_OLAP)})")
+            if estadistica == 'median' and (histogramas is None or medida not in RANGOS_HISTOGRAMA):
+                raise ValueError(f"No hay histogramas para la mediana de {medida}")
+
+    definicion = {'claves': list(claves), 'columnas': columnas}
+    if minimo_canciones is not None:
+        definicion['minimo_canciones'] = minimo_canciones
+
+    cubo = filtrar_celdas(cubo, filtros)
+    if histogramas is not None:
+        histogramas = filtrar_celdas(histogramas, filtros)
+
+    # Con histogramas, construir_tabla no vuelve a los datos
+    return construir_tabla(None, cubo, None, definicion, histogramas)
+
+def tablas_desde_cubo(cubo, histogramas):
+    """Las cuatro tablas de resumen armadas desde el cubo (medianas aproximadas)"""
+
+    # Los histogramas se suman una vez hasta las claves de las tablas, no una vez por tabla
+    claves = [dimension for dimension in DIMENSIONES_OLAP
+              if any(dimension in definicion['claves'] for definicion in TABLAS_RESUMEN.values())]
+    histogramas = histogramas.groupby(claves + ['medida', 'cubeta'], observed=True)['cantidad'].sum().reset_index()
+
+    return {nombre: construir_tabla(None, cubo, None, definicion, histogramas)
+            for nombre, definicion in TABLAS_RESUMEN.items()}
+
+def guardar_tablas(tablas, directorio):
+    """Escribir las tablas de tablas_desde_cubo como CSV en directorio
+
+    No se permite data/processed: ahí están las tablas exactas del
+    pipeline y las del cubo tienen las medianas aproximadas. Cada CSV se
+    escribe en un temporal y después se renombra, igual que el cubo.
+    """
+
+    if os.path.abspath(directorio) == os.path.abspath(os.path.dirname(RUTA_CUBO_OLAP)):
+        raise ValueError(f"{directorio} tiene las tablas exactas del pipeline; elige otro directorio")
+
+    os.makedirs(directorio, exist_ok=True)
+    for nombre, tabla in tablas.items():
+        ruta = os.path.join(directorio, ARCHIVOS_RESUMEN[nombre])
+        temporal = f"{ruta}.tmp-{os.getpid()}"
+        tabla.to_csv(temporal, index=False)
+        os.replace(temporal, ruta)
+        registro.info(f"OK: Guardado: {ruta} ({len(tabla)} filas)")
+
+def leer_columnas(textos):
+    """Columnas de la línea de comandos: "energy:mean,median" (sin estadísticas es mean)"""
+
+    columnas = []
+    for texto in textos:
+        medida, _, estadisticas = texto.partition(':')
+        columnas.append((medida.strip(), [estadistica.strip() for estadistica in estadisticas.split(',')
+                                          if estadistica.strip()] or ['mean']))
+    return columnas
+
+def leer_filtro(texto):
+    """Filtro de la línea de comandos: "main_genre=Rock", "release_year>=1990" o "main_genre=Rock,Pop" """
+
+    for operador in ['<=', '>=', '!=', '=', '<', '>']:
+        columna, separador, valor = texto.partition(operador)
+        if separador:
+            columna, valor = columna.strip(), valor.strip()
+            if columna == 'release_year':
+                valor = [int(parte) for parte in valor.split(',')] if ',' in valor else int(valor)
+            elif ',' in valor:
+                valor = [parte.strip() for parte in valor.split(',')]
+            if isinstance(valor, list):
+                return (columna, 'not in' if operador == '!=' else 'in', valor)
+            return (columna, operador, valor)
+    raise ValueError(f"Filtro inválido: {texto!r} (ej: main_genre=Rock, release_year>=1990)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resúmenes desde el cubo OLAP de intensidad")
+    parser.add_argument('--claves', nargs='+', default=['release_decade'],
+                        help=f"dimensiones del resumen ({', '.join(DIMENSIONES_OLAP)})")
+    parser.add_argument('--medida', action='append', default=[],
+                        help="medida y estadísticas, ej: intensity_weighted:mean,median (por defecto la intensidad)")
+    parser.add_argument('--filtro', action='append', default=[], help="condición, ej: main_genre=Rock")
+    parser.add_argument('--minimo-canciones', type=int, default=None, help="quitar grupos con menos canciones")
+    parser.add_argument('--tablas', metavar='DIRECTORIO', default=None,
+                        help="escribir los cuatro CSV de resumen (medianas aproximadas) en DIRECTORIO")
+    opciones = parser.parse_args()
+
+    configurar_registro()
+
+    try:
+        inicio = time.perf_counter()
+        cubo, histogramas = cargar_cubo_olap()
+        registro.info(f"Cubo: {len(cubo):,} celdas, {len(histogramas):,} cubetas "
+                      f"({(time.perf_counter() - inicio) * 1000:.0f} ms al leerlo)")
+
+        inicio = time.perf_counter()
+        if opciones.tablas:
+            guardar_tablas(tablas_desde_cubo(cubo, histogramas), opciones.tablas)
+            registro.info("Las medianas salen de los histogramas: son aproximadas (a menos de una cubeta "
+                          "de las exactas, 0.0005 en intensidad, antes de redondear a 4 decimales)")
+        else:
+            columnas = leer_columnas(opciones.medida) or [('intensity_weighted', ['mean', 'median', 'std']),
+                                                          ('track_id', ['count'])]
+            tabla = enrollar(cubo, opciones.claves, columnas, histogramas,
+                             [leer_filtro(filtro) for filtro in opciones.filtro], opciones.minimo_canciones)
+            print(tabla.to_string(index=False))
+        registro.info(f"\nResumen armado en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    except (ValueError, FileNotFoundError) as error:
+        print(f"ERROR: {error}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copia de trabajo del dataset en Arrow (Feather V2) para recargarlo rápido
+Nivel: Desarrollador
+
+El dataset con variables de intensidad se guarda también como un archivo
+Arrow IPC sin comprimir:
+    data/processed/spotify_music_intensity.arrow
+
+Como no está comprimido, cargar_dataset_arrow() lo abre con memory map:
+los datos no se leen ni se copian al abrirlo, el sistema operativo trae
+las páginas del disco a medida que se usan. Varios procesos que abren el
+mismo archivo comparten esas páginas en vez de tener cada uno su copia.
+
+El Parquet particionado (dataset_particionado.py) sigue siendo el formato
+para guardar y filtrar; este archivo es para recargar el dataset entero
+muchas veces.
+"""
+
+import os
+
+from esquema import tabla_a_pandas
+
+RUTA_ARROW = 'data/processed/spotify_music_intensity.arrow'
+
+def guardar_dataset_arrow(df, ruta=RUTA_ARROW):
+    """Guardar el dataset en Arrow IPC sin comprimir
+
+    Se escribe en un archivo temporal y después se reemplaza el anterior.
+    Los procesos que ya tenían abierto el archivo anterior siguen viendo
+    sus datos hasta que lo cierran.
+    Devuelve el tamaño del archivo en bytes.
+    """
+
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    temporal = f"{ruta}.tmp-{os.getpid()}"
+    feather.write_feather(tabla, temporal, compression='uncompressed')
+    os.replace(temporal, ruta)
+
+    return os.path.getsize(ruta)
+
+def cargar_tabla_arrow(columnas=None, ruta=RUTA_ARROW):
+    """Abrir el archivo Arrow con memory map y devolver una pyarrow.Table
+
+    La tabla apunta directamente al archivo mapeado (no se copia nada).
+    """
+
+    import pyarrow as pa
+
+    with pa.memory_map(ruta, 'r') as origen:
+        tabla = pa.ipc.open_file(origen).read_all()
+
+    if columnas is not None:
+        tabla = tabla.select(columnas)
+
+    return tabla
+
+def cargar_dataset_arrow(columnas=None, ruta=RUTA_ARROW):
+    """Cargar el dataset como DataFrame desde el archivo Arrow
+
+    Las columnas numéricas sin nulos y las de texto de pyarrow quedan
+    apuntando al archivo mapeado en vez de copiarse. Con columnas se
+    cargan solo esas.
+    """
+
+    tabla = cargar_tabla_arrow(columnas, ruta)
+
+    # split_blocks evita juntar las columnas en un bloque (que las copiaría)
+    return tabla_a_pandas(tabla, split_blocks=True)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dataset principal en Parquet particionado por década y género
+Nivel: Desarrollador
+
+El dataset se guarda como carpetas al estilo Hive:
+    data/processed/spotify_music_intensity/release_decade=2010s/main_genre=Rock/part-0.parquet
+
+Así, quien quiere "Rock de los 2010s" lee una sola carpeta. Cada archivo
+usa compresión zstd, diccionario para los textos y estadísticas por
+row group (mínimo/máximo de cada columna), para que leer_dataset() pueda
+saltar los row groups que no cumplen un filtro sin leerlos.
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+from esquema import DECADAS, tabla_a_pandas
+
+DIRECTORIO_DATASET = 'data/processed/spotify_music_intensity'
+COLUMNAS_PARTICION = ['release_decade', 'main_genre']
+
+# Filas por row group: grupos grandes comprimen mejor, grupos chicos
+# permiten saltar más datos con los filtros
+FILAS_POR_GRUPO = 128 * 1024
+FILAS_MINIMAS_POR_GRUPO = 16 * 1024
+
+def guardar_dataset_particionado(df, directorio=DIRECTORIO_DATASET):
+    """Guardar el dataset particionado por década y género
+
+    Se escribe primero en un directorio temporal y luego se reemplaza el
+    anterior, así nunca queda un dataset a medio escribir.
+    Devuelve la cantidad de particiones (carpetas década/género).
+    """
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Diccionario solo para las columnas de texto (las que se repiten mucho)
+    textos = [campo.name for campo in tabla.schema
+              if campo.name not in COLUMNAS_PARTICION
+              and (pa.types.is_string(campo.type) or pa.types.is_large_string(campo.type)
+                   or pa.types.is_dictionary(campo.type))]
+
+    formato = ds.ParquetFileFormat()
+    opciones = formato.make_write_options(compression='zstd', use_dictionary=textos, write_statistics=True)
+
+    temporal = f"{directorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporal, ignore_errors=True)
+
+    ds.write_dataset(tabla, temporal, format=formato, file_options=opciones,
+                     partitioning=COLUMNAS_PARTICION, partitioning_flavor='hive',
+                     max_rows_per_group=FILAS_POR_GRUPO, min_rows_per_group=FILAS_MINIMAS_POR_GRUPO,
+                     basename_template='part-{i}.parquet')
+
+    # Reemplazar el dataset anterior
+    anterior = f"{directorio}.old-{os.getpid()}"
+    if os.path.exists(directorio):
+        os.rename(directorio, anterior)
+    os.rename(temporal, directorio)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+    return df.groupby(COLUMNAS_PARTICION, observed=True).ngroups
+
+def valor_con_tipo(valor, tipo):
+    """Valor de un filtro con la precisión de su columna de Arrow
+
+    Las características de audio se guardan en float32: el 0.8 del CSV
+    queda como float32(0.8), un poco mayor que el 0.8 de Python. pyarrow
+    compararía en float64 y energy > 0.8 devolvería las canciones con
+    energy 0.8. Pasando el valor a float32 se compara como pandas.
+    """
+
+    import numpy as np
+    import pyarrow as pa
+
+    if pa.types.is_float32(tipo) and isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return np.float32(valor)
+    if pa.types.is_float32(tipo) and isinstance(valor, (list, tuple, set)):
+        return [valor_con_tipo(elemento, tipo) for elemento in valor]
+    return valor
+
+def filtros_con_tipos(filtros, esquema):
+    """Filtros (columna, operador, valor) con cada valor pasado por valor_con_tipo"""
+
+    convertidos = []
+    for condicion in filtros:
+        if isinstance(condicion[0], (list, tuple)):
+            # Lista de listas: condiciones unidas con "o"
+            convertidos.append(filtros_con_tipos(condicion, esquema))
+            continue
+        columna, operador, valor = condicion
+        if columna in esquema.names:
+            valor = valor_con_tipo(valor, esquema.field(columna).type)
+        convertidos.append((columna, operador, valor))
+
+    return convertidos
+
+def leer_dataset(columnas=None, filtros=None, directorio=DIRECTORIO_DATASET):
+    """Leer el dataset particionado, completo o solo una parte
+
+    filtros es una lista de condiciones (columna, operador, valor), por
+    ejemplo [('release_decade', '=', '2010s'), ('energy', '>', 0.8)].
+    - Las condiciones sobre release_decade y main_genre descartan carpetas
+      enteras sin abrirlas.
+    - Las demás se comparan con las estadísticas de cada row group, y solo
+      se leen los grupos que pueden tener filas que las cumplan.
+    Los valores se comparan con la precisión de cada columna (ver
+    valor_con_tipo), igual que al filtrar el DataFrame con pandas.
+
+    Las columnas quedan en el orden original y release_decade vuelve a
+    ser una categoría ordenada.
+    """
+
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    if filtros:
+        esquema = ds.dataset(directorio, format='parquet', partitioning='hive').schema
+        filtros = filtros_con_tipos(filtros, esquema)
+    tabla = pq.read_table(directorio, columns=columnas, filters=filtros, partitioning='hive')
+    df = tabla_a_pandas(tabla)
+
+    # Las columnas de partición vuelven al final; recuperar el orden guardado
+    metadatos = tabla.schema.pandas_metadata or {}
+    orden = [columna['name'] for columna in metadatos.get('columns', []) if columna['name'] in df.columns]
+    if columnas is not None:
+        orden = [columna for columna in columnas if columna in df.columns]
+    df = df[orden + [columna for columna in df.columns if columna not in orden]]
+
+    # Las carpetas solo guardan texto: devolver los mismos tipos que antes
+    if 'release_decade' in df.columns:
+        decadas = sorted(set(DECADAS) | set(df['release_decade'].dropna().astype(str)))
+        df['release_decade'] = df['release_decade'].astype(str).where(df['release_decade'].notna())
+        df['release_decade'] = df['release_decade'].astype(pd.CategoricalDtype(decadas, ordered=True))
+    if 'main_genre' in df.columns:
+        df['main_genre'] = df['main_genre'].astype(object).where(df['main_genre'].notna(), None)
+
+    return df
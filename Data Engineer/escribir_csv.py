@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura del dataset en CSV por lotes de filas
+Nivel: Desarrollador
+
+df.to_csv() arma el texto de todo el dataset de una vez y en un solo
+hilo. Aquí el CSV se escribe por lotes de filas:
+- Cada lote se convierte a texto por separado, y con trabajadores > 1
+  varios lotes se formatean a la vez en procesos distintos. Solo hay
+  unos pocos lotes en memoria al mismo tiempo.
+- El resultado se puede comprimir mientras se escribe (gzip o zstd).
+- Se escribe en un archivo temporal que se renombra al terminar, así
+  nunca queda un CSV a medio escribir si el proceso se corta.
+
+El texto es idéntico al de df.to_csv(index=False).
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+FILAS_POR_LOTE = 100000
+
+# Compresiones disponibles y la extensión que se agrega al archivo
+EXTENSIONES_COMPRESION = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+def ruta_con_compresion(ruta, compresion=None):
+    """Agregar a la ruta la extensión de la compresión elegida"""
+
+    if compresion not in EXTENSIONES_COMPRESION:
+        raise ValueError(f"Compresión no soportada: {compresion} (opciones: gzip, zstd)")
+
+    return ruta + EXTENSIONES_COMPRESION[compresion]
+
+def formatear_lote(lote, con_encabezado):
+    """Convertir un lote de filas en el texto CSV (bytes)"""
+    return lote.to_csv(index=False, header=con_encabezado).encode('utf-8')
+
+def formatear_lotes(df, trabajadores=1, filas_por_lote=FILAS_POR_LOTE):
+    """Devolver el texto de cada lote, en orden
+
+    Con trabajadores > 1 se formatean hasta dos lotes por proceso a la
+    vez; el siguiente lote se envía cuando se escribe el más antiguo.
+    """
+
+    # Un dataset vacío igual produce un lote (solo el encabezado)
+    inicios = range(0, max(len(df), 1), filas_por_lote)
+
+    if trabajadores <= 1:
+        for inicio in inicios:
+            yield formatear_lote(df.iloc[inicio:inicio + filas_por_lote], inicio == 0)
+        return
+
+    with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+        pendientes = deque()
+        for inicio in inicios:
+            pendientes.append(pool.submit(formatear_lote, df.iloc[inicio:inicio + filas_por_lote], inicio == 0))
+            if len(pendientes) >= 2 * trabajadores:
+                yield pendientes.popleft().result()
+
+        while pendientes:
+            yield pendientes.popleft().result()
+
+def escribir_csv_por_lotes(df, ruta, compresion=None, trabajadores=1, filas_por_lote=FILAS_POR_LOTE):
+    """Escribir el DataFrame en CSV por lotes, de forma atómica
+
+    compresion puede ser None, 'gzip' o 'zstd'; la extensión (.gz o .zst)
+    se agrega a la ruta. Devuelve la ruta del archivo escrito.
+    """
+
+    import pyarrow as pa
+
+    ruta = ruta_con_compresion(ruta, compresion)
+    temporal = f"{ruta}.tmp-{os.getpid()}"
+
+    try:
+        with pa.output_stream(temporal, compression=compresion) as destino:
+            for texto in formatear_lotes(df, trabajadores, filas_por_lote):
+                destino.write(texto)
+        os.replace(temporal, ruta)
+    except BaseException:
+        # No dejar el archivo temporal si algo falló
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    return ruta
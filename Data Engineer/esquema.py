@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Esquema de tipos de los archivos CSV de Spotify
+Nivel: Desarrollador
+
+Si pandas adivina los tipos, todo queda en float64/int64 y los textos
+como objetos de Python. Aquí se declara, para cada fuente de datos:
+- el tipo de cada columna (float32 para audio, Int16 para el año,
+  categorías para género/key/mode, texto de pyarrow para IDs y nombres)
+- las columnas que usa la limpieza, para no leer las demás.
+
+float32 guarda unos 7 dígitos: el 0.8 del CSV queda como 0.800000011920929.
+pandas compara una columna float32 con un número en float32, así que
+energy > 0.8 no incluye las canciones con energy 0.8 (los filtros de
+dataset_particionado.leer_dataset hacen lo mismo). Las intensidades se
+calculan en float32: una canción que cae justo sobre un límite de nivel
+(0.3, 0.5, 0.7 o 0.9) puede quedar en el nivel vecino respecto de un
+cálculo en float64.
+
+Todas las lecturas de CSV del pipeline pasan por leer_csv().
+"""
+
+import pandas as pd
+import json
+import os
+
+# Texto respaldado por pyarrow (mucho menos memoria que objetos de Python).
+# El tipo se declara explícito en vez de cambiar la opción global
+# mode.string_storage, que afectaría a todo el proceso; al volver de
+# Parquet o Arrow se usa tabla_a_pandas para no perderlo.
+try:
+    import pyarrow  # noqa: F401
+    TIPO_TEXTO = pd.StringDtype('pyarrow')
+    HAY_PYARROW = True
+except ImportError:
+    TIPO_TEXTO = 'object'
+    HAY_PYARROW = False
+
+# Características de audio: float32 alcanza de sobra para valores como 0.734.
+# Los enteros van con mayúscula (Int8, Int32...): admiten nulos, así una
+# celda vacía no hace fallar la lectura de todo el archivo.
+TIPOS_AUDIO = {
+    'danceability': 'float32',
+    'energy': 'float32',
+    'loudness': 'float32',
+    'speechiness': 'float32',
+    'acousticness': 'float32',
+    'instrumentalness': 'float32',
+    'liveness': 'float32',
+    'valence': 'float32',
+    'tempo': 'float32',
+    'key': 'category',
+    'mode': 'category',
+    'time_signature': 'Int8',
+    'duration_ms': 'Int32'
+}
+
+# Archivos dataset-of-XXs.csv (una década cada uno)
+ESQUEMA_DECADAS = {
+    'tipos': {
+        **TIPOS_AUDIO,
+        'track': TIPO_TEXTO,
+        'artist': TIPO_TEXTO,
+        'uri': TIPO_TEXTO,
+        'chorus_hit': 'float32',
+        'sections': 'Int16',
+        'target': 'Int8'
+    },
+    'columnas_limpieza': [
+        'track', 'artist', 'uri',
+        'danceability', 'energy', 'loudness', 'valence', 'tempo', 'duration_ms'
+    ]
+}
+
+# Archivo spotify_data.csv (1M de canciones con año y género)
+ESQUEMA_SPOTIFY_DATA = {
+    'tipos': {
+        **TIPOS_AUDIO,
+        'Unnamed: 0': 'int32',
+        'artist_name': TIPO_TEXTO,
+        'track_name': TIPO_TEXTO,
+        'track_id': TIPO_TEXTO,
+        'popularity': 'Int8',
+        # La limpieza elimina los años faltantes
+        'year': 'Int16',
+        'genre': 'category'
+    },
+    'columnas_limpieza': [
+        'artist_name', 'track_name', 'track_id', 'year', 'genre',
+        'danceability', 'energy', 'loudness', 'valence', 'tempo', 'duration_ms'
+    ]
+}
+
+# Décadas del rango de fechas válido (1920-2024), como categoría ordenada
+DECADAS = [f"{decada}s" for decada in range(1920, 2030, 10)]
+TIPO_DECADA = pd.CategoricalDtype(DECADAS, ordered=True)
+
+def tabla_a_pandas(tabla, **kwargs):
+    """tabla.to_pandas() que devuelve el texto como TIPO_TEXTO
+
+    Parquet y Arrow solo guardan que la columna era 'string', no cómo se
+    almacenaba, y pandas la devolvería como texto de objetos de Python.
+    Se marca como string[pyarrow] en los metadatos de pandas de la tabla
+    (solo esas columnas: las de tipo object siguen siendo object).
+    """
+
+    metadatos = tabla.schema.pandas_metadata
+    if HAY_PYARROW and metadatos:
+        for columna in metadatos.get('columns', []):
+            if columna.get('numpy_type') == 'string':
+                columna['numpy_type'] = 'string[pyarrow]'
+        tabla = tabla.replace_schema_metadata({**tabla.schema.metadata,
+                                               b'pandas': json.dumps(metadatos).encode('utf-8')})
+
+    return tabla.to_pandas(**kwargs)
+
+def leer_parquet(ruta, **kwargs):
+    """pd.read_parquet que conserva el texto de pyarrow (ver tabla_a_pandas)"""
+
+    import pyarrow.parquet as pq
+
+    return tabla_a_pandas(pq.read_table(ruta, use_pandas_metadata=True, **kwargs))
+
+def obtener_esquema(archivo):
+    """Elegir el esquema según el nombre del archivo (None si no se conoce)"""
+
+    nombre = os.path.basename(archivo)
+    if nombre.startswith('dataset-of-'):
+        return ESQUEMA_DECADAS
+    if nombre.startswith('spotify_data'):
+        return ESQUEMA_SPOTIFY_DATA
+    return None
+
+def opciones_lectura(archivo, uso='limpieza'):
+    """Opciones de pd.read_csv (dtype y usecols) para un archivo
+
+    uso='limpieza' lee solo las columnas que necesita el pipeline;
+    uso='completo' lee todas (para explorar y analizar los archivos).
+    """
+
+    esquema = obtener_esquema(archivo)
+    if esquema is None:
+        return {}
+
+    opciones = {'dtype': esquema['tipos']}
+    if uso == 'limpieza':
+        # Solo las columnas del esquema que el archivo tiene, en el orden del archivo
+        columnas_archivo = pd.read_csv(archivo, nrows=0).columns
+        opciones['usecols'] = [columna for columna in columnas_archivo
+                               if columna in esquema['columnas_limpieza']]
+
+    return opciones
+
+def leer_csv(archivo, uso='limpieza', **kwargs):
+    """Leer un CSV de Spotify con los tipos del esquema
+
+    Para la limpieza se usa el lector de pyarrow, que lee en varios hilos.
+    No se usa al leer por bloques (no lo admite) ni con uso='completo',
+    porque nombra distinto las columnas sin nombre ("Unnamed: 0").
+    """
+
+    opciones = opciones_lectura(archivo, uso)
+    if HAY_PYARROW and 'usecols' in opciones and 'chunksize' not in kwargs:
+        opciones['engine'] = 'pyarrow'
+
+    return pd.read_csv(archivo, **opciones, **kwargs)
+
+def contar_filas_csv(archivo):
+    """Contar las filas de un CSV leyendo una sola columna"""
+    return len(pd.read_csv(archivo, usecols=[0]))
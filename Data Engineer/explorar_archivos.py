@@ -3,16 +3,27 @@
 """
 Script para explorar los archivos CSV de Spotify
 Nivel: Desarrollador
+
+Por defecto usa el perfil rápido (perfil_rapido.py): columnas, tipos y
+primeras filas de un prefijo, filas contadas sin parsear el archivo y el
+tamaño en memoria estimado con una muestra. Con --full carga cada
+archivo entero y los números son exactos.
 """
 
 import pandas as pd
 import numpy as np
 import os
 
-def explorar_archivos_csv():
-    """Función principal para explorar todos los archivos CSV"""
+from esquema import leer_csv
+from perfil_rapido import perfilar_csv
+
+def explorar_archivos_csv(completo=False):
+    """Función principal para explorar todos los archivos CSV
     
-    print("EXPLORANDO ARCHIVOS DE SPOTIFY")
+    completo=True carga cada archivo entero en vez de usar el perfil rápido.
+    """
+    
+    print("EXPLORANDO ARCHIVOS DE SPOTIFY" + ("" if completo else " (perfil rápido)"))
     print("=" * 50)
     
     # Lista de archivos CSV
@@ -47,13 +58,23 @@ def explorar_archivos_csv():
     for archivo in archivos_existentes:
         print(f"\n=== ARCHIVO: {archivo} ===")
         try:
-            # Cargar el archivo
-            df = pd.read_csv(archivo)
+            if completo:
+                # Cargar el archivo
+                df = leer_csv(archivo, uso='completo')
+                filas = len(df)
+                memoria = df.memory_usage(deep=True).sum()
+            else:
+                # Prefijo para columnas y tipos, muestra para estimar la memoria
+                perfil = perfilar_csv(archivo)
+                df = perfil['prefijo']
+                filas = perfil['filas']
+                muestra = perfil['muestra']
+                memoria = muestra.memory_usage(deep=True).sum() / max(len(muestra), 1) * filas
             
             # Información básica
-            print(f"Filas: {len(df):,}")
+            print(f"Filas: {filas:,}")
             print(f"Columnas: {len(df.columns)}")
-            print(f"Tamaño en memoria: {df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+            print(f"Tamaño en memoria: {memoria / 1024**2:.1f} MB" + ("" if completo else " (estimado)"))
             
             # Lista de columnas
             print(f"\nColumnas disponibles:")
@@ -62,7 +83,8 @@ def explorar_archivos_csv():
             
             # Tipos de datos
             print(f"\nTipos de datos:")
-            tipos = df.dtypes.value_counts()
+            # Por nombre: cada categoría es un tipo distinto (con sus propias categorías)
+            tipos = df.dtypes.astype(str).value_counts()
             for tipo, cantidad in tipos.items():
                 print(f"  {tipo}: {cantidad} columnas")
             
@@ -78,4 +100,6 @@ def explorar_archivos_csv():
     print("\nExploración completada!")
 
 if __name__ == "__main__":
-    explorar_archivos_csv()
+    import sys
+    
+    explorar_archivos_csv(completo='--full' in sys.argv[1:])
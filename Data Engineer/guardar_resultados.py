@@ -10,174 +10,191 @@ import numpy as np
 import os
 from datetime import datetime
 
+from cache_etapas import describir_archivo
+from cubo_olap import RUTA_CUBO_OLAP, RUTA_HISTOGRAMAS_OLAP, crear_cubo_olap, guardar_cubo_olap
+from dataset_arrow import RUTA_ARROW, guardar_dataset_arrow
+from dataset_particionado import DIRECTORIO_DATASET, guardar_dataset_particionado
+from escribir_csv import escribir_csv_por_lotes, ruta_con_compresion
+from esquema import contar_filas_csv
+from indice_similitud import DIRECTORIO_INDICE, construir_indice, guardar_indice
+from limpiar_datos import ARCHIVOS_CSV
+from linaje import linaje_en_markdown, resumir_linaje
+from resumenes import calcular_resumenes, nivel_intensidad
+from instrumentacion import instrumentar
+from registro import obtener_registro, mostrar_diagnostico
+
+registro = obtener_registro(__name__)
+
+RUTA_CSV = 'data/processed/spotify_music_intensity_clean.csv'
+
 def crear_directorio_si_no_existe(directorio):
     """Crear directorio si no existe"""
     if not os.path.exists(directorio):
         os.makedirs(directorio)
-        print(f"Directorio creado: {directorio}")
+        registro.info(f"Directorio creado: {directorio}")
 
-def guardar_dataset_principal(df):
-    """Guardar el dataset principal limpio"""
+@instrumentar
+def guardar_dataset_principal(df, guardar_csv=False, compresion_csv=None, trabajadores=1):
+    """Guardar el dataset principal limpio
     
-    print("=== GUARDANDO DATASET PRINCIPAL ===")
+    El dataset se guarda en Parquet particionado por década y género
+    (ver dataset_particionado.py). El CSV completo es opcional, porque
+    es muy grande y lento de escribir; se escribe por lotes, con
+    trabajadores procesos y comprimido si se indica (ver escribir_csv.py).
+    """
+    
+    registro.info("=== GUARDANDO DATASET PRINCIPAL ===")
     
     # Crear directorio si no existe
     crear_directorio_si_no_existe('data/processed')
     
-    # Guardar dataset completo
-    df.to_csv('data/processed/spotify_music_intensity_clean.csv', index=False)
-    print(f"OK: Guardado: spotify_music_intensity_clean.csv")
-    print(f"  - {len(df):,} canciones")
-    print(f"  - {len(df.columns)} columnas")
-    print(f"  - Tamaño: {df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+    # Guardar dataset particionado (formato eficiente)
+    particiones = guardar_dataset_particionado(df)
+    registro.info(f"OK: Guardado: {os.path.basename(DIRECTORIO_DATASET)}/ ({particiones} particiones década/género)")
+    registro.info(f"  - {len(df):,} canciones")
+    registro.info(f"  - {len(df.columns)} columnas")
+    if mostrar_diagnostico():
+        # memory_usage(deep=True) recorre todos los textos: solo para mostrarlo
+        registro.info(f"  - Tamaño: {df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+    
+    # Copia en Arrow sin comprimir, para recargarlo rápido con memory map
+    tamano = guardar_dataset_arrow(df)
+    registro.info(f"OK: Guardado: {os.path.basename(RUTA_ARROW)} ({tamano / 1024**2:.1f} MB, se carga con dataset_arrow.cargar_dataset_arrow)")
     
-    # También guardar en formato Parquet (más eficiente)
-    df.to_parquet('data/processed/spotify_music_intensity_clean.parquet', index=False)
-    print(f"OK: Guardado: spotify_music_intensity_clean.parquet")
+    # CSV completo, solo si se pide
+    if guardar_csv:
+        ruta = escribir_csv_por_lotes(df, RUTA_CSV, compresion_csv, trabajadores)
+        registro.info(f"OK: Guardado: {os.path.basename(ruta)}")
     
     return True
 
-def crear_resumen_por_decada(df):
+def archivos_dataset_principal(archivo_csv=None):
+    """Nombres de los archivos del dataset principal que se crean"""
+    
+    archivos = [f"{os.path.basename(DIRECTORIO_DATASET)}/", os.path.basename(RUTA_ARROW)]
+    if archivo_csv:
+        archivos.append(archivo_csv)
+    return archivos
+
+@instrumentar
+def crear_resumen_por_decada(df, resumen_decada):
     """Crear archivo con resumen por década"""
     
-    print("\n=== CREANDO RESUMEN POR DECADA ===")
+    registro.debug("\n=== CREANDO RESUMEN POR DECADA ===")
     
-    if 'intensity_weighted' in df.columns and 'release_decade' in df.columns:
-        # Agrupar por década y calcular estadísticas
-        resumen_decada = df.groupby('release_decade').agg({
-            'intensity_weighted': ['mean', 'median', 'std', 'min', 'max'],
-            'energy': ['mean', 'median'],
-            'loudness': ['mean', 'median'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Aplanar nombres de columnas (quitar los niveles)
-        resumen_decada.columns = ['_'.join(col).strip() for col in resumen_decada.columns]
-        resumen_decada = resumen_decada.reset_index()
-        
+    if resumen_decada is not None:
         # Guardar archivo
         resumen_decada.to_csv('data/processed/intensity_by_decade.csv', index=False)
-        print(f"OK: Guardado: intensity_by_decade.csv ({len(resumen_decada)} décadas)")
+        registro.info(f"OK: Guardado: intensity_by_decade.csv ({len(resumen_decada)} décadas)")
         
         return resumen_decada
     else:
-        print("ERROR: Faltan columnas necesarias")
+        registro.error("ERROR: Faltan columnas necesarias")
         return None
 
-def crear_resumen_por_decada_genero(df):
+@instrumentar
+def crear_resumen_por_decada_genero(df, resumen_decada_genero):
     """Crear archivo con resumen por década y género"""
     
-    print("\n=== CREANDO RESUMEN POR DECADA Y GENERO ===")
+    registro.debug("\n=== CREANDO RESUMEN POR DECADA Y GENERO ===")
     
-    if 'intensity_weighted' in df.columns and 'release_decade' in df.columns and 'main_genre' in df.columns:
-        # Agrupar por década y género
-        resumen_decada_genero = df.groupby(['release_decade', 'main_genre']).agg({
-            'intensity_weighted': ['mean', 'median', 'std'],
-            'energy': ['mean'],
-            'loudness': ['mean'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Aplanar nombres de columnas
-        resumen_decada_genero.columns = ['_'.join(col).strip() for col in resumen_decada_genero.columns]
-        resumen_decada_genero = resumen_decada_genero.reset_index()
-        
-        # Filtrar combinaciones con muy pocas canciones
-        resumen_decada_genero = resumen_decada_genero[resumen_decada_genero['track_id_count'] >= 50]
-        
+    if resumen_decada_genero is not None:
         # Guardar archivo
         resumen_decada_genero.to_csv('data/processed/intensity_by_decade_genre.csv', index=False)
-        print(f"OK: Guardado: intensity_by_decade_genre.csv ({len(resumen_decada_genero)} combinaciones)")
+        registro.info(f"OK: Guardado: intensity_by_decade_genre.csv ({len(resumen_decada_genero)} combinaciones)")
         
         return resumen_decada_genero
     else:
-        print("ERROR: Faltan columnas necesarias")
+        registro.error("ERROR: Faltan columnas necesarias")
         return None
 
-def crear_estadisticas_por_genero(df):
+@instrumentar
+def crear_estadisticas_por_genero(df, stats_genero):
     """Crear archivo con estadísticas por género"""
     
-    print("\n=== CREANDO ESTADISTICAS POR GENERO ===")
+    registro.debug("\n=== CREANDO ESTADISTICAS POR GENERO ===")
     
-    if 'intensity_weighted' in df.columns and 'main_genre' in df.columns:
-        # Agrupar por género
-        stats_genero = df.groupby('main_genre').agg({
-            'intensity_weighted': ['mean', 'median', 'std', 'min', 'max'],
-            'energy': ['mean', 'std'],
-            'loudness': ['mean', 'std'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Agregar columnas opcionales si existen
-        if 'danceability' in df.columns:
-            stats_genero[('danceability', 'mean')] = df.groupby('main_genre')['danceability'].mean()
-        
-        if 'tempo' in df.columns:
-            stats_genero[('tempo', 'mean')] = df.groupby('main_genre')['tempo'].mean()
-            stats_genero[('tempo', 'std')] = df.groupby('main_genre')['tempo'].std()
-        
-        # Aplanar nombres de columnas
-        stats_genero.columns = ['_'.join(col).strip() for col in stats_genero.columns]
-        stats_genero = stats_genero.reset_index()
-        
+    if stats_genero is not None:
         # Guardar archivo
         stats_genero.to_csv('data/processed/genre_statistics.csv', index=False)
-        print(f"OK: Guardado: genre_statistics.csv ({len(stats_genero)} géneros)")
+        registro.info(f"OK: Guardado: genre_statistics.csv ({len(stats_genero)} géneros)")
         
         return stats_genero
     else:
-        print("ERROR: Faltan columnas necesarias")
+        registro.error("ERROR: Faltan columnas necesarias")
         return None
 
-def crear_resumen_por_intensidad(df):
+@instrumentar
+def crear_resumen_por_intensidad(df, resumen_intensidad):
     """Crear archivo con resumen por nivel de intensidad"""
     
-    print("\n=== CREANDO RESUMEN POR NIVEL DE INTENSIDAD ===")
+    registro.debug("\n=== CREANDO RESUMEN POR NIVEL DE INTENSIDAD ===")
     
-    if 'intensity_weighted' in df.columns:
+    if resumen_intensidad is not None:
         # Crear categorías de intensidad
-        def categorizar_intensidad(intensidad):
-            if intensidad < 0.3:
-                return 'Muy Baja'
-            elif intensidad < 0.5:
-                return 'Baja'
-            elif intensidad < 0.7:
-                return 'Media'
-            elif intensidad < 0.9:
-                return 'Alta'
-            else:
-                return 'Muy Alta'
-        
-        df['intensity_category'] = df['intensity_weighted'].apply(categorizar_intensidad)
-        
-        # Agrupar por categoría de intensidad
-        resumen_intensidad = df.groupby('intensity_category').agg({
-            'intensity_weighted': ['mean', 'median', 'std', 'min', 'max'],
-            'energy': ['mean', 'median'],
-            'loudness': ['mean', 'median'],
-            'track_id': 'count'
-        }).round(4)
-        
-        # Aplanar nombres de columnas
-        resumen_intensidad.columns = ['_'.join(col).strip() for col in resumen_intensidad.columns]
-        resumen_intensidad = resumen_intensidad.reset_index()
+        df['intensity_category'] = nivel_intensidad(df['intensity_weighted'])
         
         # Guardar archivo
         resumen_intensidad.to_csv('data/processed/intensity_by_level.csv', index=False)
-        print(f"OK: Guardado: intensity_by_level.csv ({len(resumen_intensidad)} niveles)")
+        registro.info(f"OK: Guardado: intensity_by_level.csv ({len(resumen_intensidad)} niveles)")
         
         return resumen_intensidad
     else:
-        print("ERROR: Faltan columnas necesarias")
+        registro.error("ERROR: Faltan columnas necesarias")
         return None
 
-def crear_resumen_proyecto(df, archivos_originales):
-    """Crear un resumen simple del proyecto"""
+@instrumentar
+def crear_cubo_intensidad(df):
+    """Crear el cubo OLAP (ver cubo_olap.py) para armar otros resúmenes sin recorrer el dataset"""
+    
+    registro.debug("\n=== CREANDO CUBO OLAP ===")
     
-    print("\n=== CREANDO RESUMEN DEL PROYECTO ===")
+    resultado = crear_cubo_olap(df)
+    if resultado is None:
+        registro.error("ERROR: Faltan columnas necesarias")
+        return None
+    
+    cubo, histogramas = resultado
+    tamano = guardar_cubo_olap(cubo, histogramas)
+    registro.info(f"OK: Guardado: {os.path.basename(RUTA_CUBO_OLAP)} + {os.path.basename(RUTA_HISTOGRAMAS_OLAP)} "
+                  f"({len(cubo):,} celdas, {tamano / 1024**2:.1f} MB)")
+    
+    return cubo
+
+@instrumentar
+def crear_indice_similitud(df):
+    """Crear el índice de canciones parecidas por perfil de audio (ver indice_similitud.py)"""
+    
+    registro.debug("\n=== CREANDO ÍNDICE DE SIMILITUD ===")
+    
+    try:
+        indice = construir_indice(df)
+    except ValueError as error:
+        registro.error(f"ERROR: {error}")
+        return None
+    
+    tamano = guardar_indice(indice)
+    registro.info(f"OK: Guardado: {os.path.basename(DIRECTORIO_INDICE)}/ "
+                  f"({len(indice['centros']):,} listas, {tamano / 1024**2:.1f} MB)")
+    
+    return indice
+
+@instrumentar
+def crear_resumen_proyecto(df, archivos_originales, archivo_csv=None, resumen_linaje=None):
+    """Crear un resumen simple del proyecto
+    
+    resumen_linaje (ver linaje.py) trae las filas leídas de cada archivo
+    durante la limpieza; sin él hay que volver a contar las filas de los
+    archivos originales.
+    """
+    
+    registro.debug("\n=== CREANDO RESUMEN DEL PROYECTO ===")
     
     # Calcular estadísticas básicas
-    total_original = sum(len(pd.read_csv(archivo)) for archivo in archivos_originales)
+    if resumen_linaje is not None:
+        total_original = resumen_linaje['filas_leidas']
+    else:
+        total_original = sum(contar_filas_csv(archivo) for archivo in archivos_originales)
     total_final = len(df)
     porcentaje_conservado = (total_final / total_original) * 100
     
@@ -198,12 +215,15 @@ def crear_resumen_proyecto(df, archivos_originales):
 - **Géneros principales**: {', '.join(df['main_genre'].value_counts().head(5).index.tolist())}
 
 ## Archivos creados:
-- `spotify_music_intensity_clean.csv`: Dataset principal
-- `intensity_by_decade.csv`: Resumen por década
+- `{os.path.basename(DIRECTORIO_DATASET)}/`: Dataset principal (Parquet particionado por década y género)
+- `{os.path.basename(RUTA_ARROW)}`: Dataset principal en Arrow sin comprimir (carga rápida con memory map)
+{f"- `{archivo_csv}`: Dataset principal en CSV" + chr(10) if archivo_csv else ""}- `intensity_by_decade.csv`: Resumen por década
 - `intensity_by_decade_genre.csv`: Resumen por década y género
 - `genre_statistics.csv`: Estadísticas por género
 - `intensity_by_level.csv`: Resumen por nivel de intensidad
-
+- `{os.path.basename(RUTA_CUBO_OLAP)}` y `{os.path.basename(RUTA_HISTOGRAMAS_OLAP)}`: Cubo OLAP por año, década, género, nivel y origen (ver `cubo_olap.py`)
+- `{os.path.basename(DIRECTORIO_INDICE)}/`: Índice de canciones parecidas por perfil de audio (ver `indice_similitud.py`)
+{chr(10) + "## Linaje de los datos:" + chr(10) + linaje_en_markdown(resumen_linaje) + chr(10) if resumen_linaje is not None else ""}
 ## ¿Para qué sirve?
 Estos datos pueden usarse para:
 - Analizar si la música se volvió más intensa con el tiempo
@@ -223,13 +243,14 @@ Estos datos pueden usarse para:
     with open('data/processed/README.md', 'w', encoding='utf-8') as f:
         f.write(resumen)
     
-    print("OK: Guardado: README.md")
+    registro.info("OK: Guardado: README.md")
     return True
 
+@instrumentar
 def crear_diccionario_datos(df):
     """Crear un diccionario simple de las columnas"""
     
-    print("\n=== CREANDO DICCIONARIO DE DATOS ===")
+    registro.debug("\n=== CREANDO DICCIONARIO DE DATOS ===")
     
     diccionario = "## Diccionario de Datos\n\n"
     diccionario += "| Columna | Tipo | Descripción |\n"
@@ -287,13 +308,14 @@ def crear_diccionario_datos(df):
     with open('data/processed/data_dictionary.md', 'w', encoding='utf-8') as f:
         f.write(diccionario)
     
-    print("OK: Guardado: data_dictionary.md")
+    registro.info("OK: Guardado: data_dictionary.md")
     return True
 
-def crear_archivo_metadatos(df, archivos_originales):
+@instrumentar
+def crear_archivo_metadatos(df, archivos_originales, archivo_csv=None, resumen_linaje=None):
     """Crear archivo con metadatos del proyecto"""
     
-    print("\n=== CREANDO ARCHIVO DE METADATOS ===")
+    registro.debug("\n=== CREANDO ARCHIVO DE METADATOS ===")
     
     metadatos = {
         "proyecto": "Análisis de Intensidad Musical de Spotify",
@@ -311,13 +333,19 @@ def crear_archivo_metadatos(df, archivos_originales):
             },
             "generos_principales": df['main_genre'].value_counts().head(5).to_dict() if 'main_genre' in df.columns else None
         },
-        "archivos_creados": [
-            "spotify_music_intensity_clean.csv",
-            "spotify_music_intensity_clean.parquet",
+        # Filas leídas, eliminadas por regla y limpias de cada archivo
+        "linaje": resumen_linaje,
+        # Huella de cada archivo original (la usa el modo incremental)
+        "huellas_archivos": {archivo: describir_archivo(archivo)
+                             for archivo in archivos_originales if os.path.exists(archivo)},
+        "archivos_creados": archivos_dataset_principal(archivo_csv) + [
             "intensity_by_decade.csv",
             "intensity_by_decade_genre.csv",
             "genre_statistics.csv",
             "intensity_by_level.csv",
+            os.path.basename(RUTA_CUBO_OLAP),
+            os.path.basename(RUTA_HISTOGRAMAS_OLAP),
+            f"{os.path.basename(DIRECTORIO_INDICE)}/",
             "README.md",
             "data_dictionary.md",
             "metadata.json"
@@ -329,71 +357,85 @@ def crear_archivo_metadatos(df, archivos_originales):
     with open('data/processed/metadata.json', 'w', encoding='utf-8') as f:
         json.dump(metadatos, f, indent=2, ensure_ascii=False)
     
-    print("OK: Guardado: metadata.json")
+    registro.info("OK: Guardado: metadata.json")
     return True
 
-def guardar_todos_los_resultados():
-    """Función principal para guardar todos los resultados"""
-    
-    print("GUARDANDO RESULTADOS FINALES")
-    print("=" * 60)
-    
-    # Cargar el dataset con variables de intensidad
-    from crear_intensidad import crear_variables_intensidad
-    
-    print("Cargando dataset con variables de intensidad...")
-    resultado = crear_variables_intensidad()
-    
-    if resultado is None:
-        print("ERROR: No se pudo cargar el dataset")
-        return False
+def guardar_todos_los_resultados(df=None, resumen_decada=None, resumen_decada_genero=None,
+                                 stats_genero=None, resumen_intensidad=None, linaje=None, guardar_csv=False,
+                                 compresion_csv=None, trabajadores=1):
+    """Función principal para guardar todos los resultados
+    
+    Recibe el dataset con variables de intensidad y las tablas de resumen
+    en memoria; si se ejecuta solo, lo crea primero. Si faltan las tablas,
+    se calculan a partir del dataset. linaje es la tabla de la limpieza
+    (ver linaje.py) para documentar de dónde sale cada fila. Con
+    guardar_csv también se escribe el dataset completo en CSV
+    (compresion_csv: None, 'gzip' o 'zstd').
+    """
+    
+    registro.info("GUARDANDO RESULTADOS FINALES")
+    registro.info("=" * 60)
+    
+    if df is None:
+        from crear_intensidad import crear_variables_y_resumenes
+        
+        registro.info("Cargando dataset con variables de intensidad...")
+        resultado = crear_variables_y_resumenes()
+        
+        if resultado is None:
+            registro.error("ERROR: No se pudo cargar el dataset")
+            return False
+        
+        df, resumen_decada, resumen_decada_genero, stats_genero, resumen_intensidad = resultado
     
-    df, resumen_decada, resumen_decada_genero, stats_genero = resultado
+    registro.info(f"Dataset cargado: {len(df):,} canciones")
     
-    print(f"Dataset cargado: {len(df):,} canciones")
+    tablas = [resumen_decada, resumen_decada_genero, stats_genero, resumen_intensidad]
+    if any(tabla is None for tabla in tablas):
+        resumenes = calcular_resumenes(df) or {}
+        resumen_decada = resumenes.get('resumen_decada')
+        resumen_decada_genero = resumenes.get('resumen_decada_genero')
+        stats_genero = resumenes.get('stats_genero')
+        resumen_intensidad = resumenes.get('resumen_intensidad')
     
     # Lista de archivos originales
-    archivos_originales = [
-        'data/raw/dataset-of-60s.csv',
-        'data/raw/dataset-of-70s.csv', 
-        'data/raw/dataset-of-80s.csv',
-        'data/raw/dataset-of-90s.csv',
-        'data/raw/dataset-of-00s.csv',
-        'data/raw/dataset-of-10s.csv',
-        'data/raw/spotify_data.csv'
-    ]
+    archivos_originales = ARCHIVOS_CSV
     
     # Guardar todos los archivos
-    print("\n" + "="*60)
-    print("GUARDANDO ARCHIVOS")
-    print("="*60)
+    registro.info("\n" + "="*60)
+    registro.info("GUARDANDO ARCHIVOS")
+    registro.info("="*60)
     
     # Dataset principal
-    guardar_dataset_principal(df)
+    guardar_dataset_principal(df, guardar_csv, compresion_csv, trabajadores)
+    archivo_csv = os.path.basename(ruta_con_compresion(RUTA_CSV, compresion_csv)) if guardar_csv else None
     
     # Archivos de resumen
-    crear_resumen_por_decada(df)
-    crear_resumen_por_decada_genero(df)
-    crear_estadisticas_por_genero(df)
-    crear_resumen_por_intensidad(df)
+    crear_resumen_por_decada(df, resumen_decada)
+    crear_resumen_por_decada_genero(df, resumen_decada_genero)
+    crear_estadisticas_por_genero(df, stats_genero)
+    crear_resumen_por_intensidad(df, resumen_intensidad)
+    crear_cubo_intensidad(df)
+    crear_indice_similitud(df)
     
     # Documentación
-    crear_resumen_proyecto(df, archivos_originales)
+    resumen_linaje = resumir_linaje(linaje, len(df)) if linaje is not None else None
+    crear_resumen_proyecto(df, archivos_originales, archivo_csv, resumen_linaje)
     crear_diccionario_datos(df)
-    crear_archivo_metadatos(df, archivos_originales)
+    crear_archivo_metadatos(df, archivos_originales, archivo_csv, resumen_linaje)
     
-    print(f"\n{'='*60}")
-    print("GUARDADO COMPLETADO")
-    print(f"{'='*60}")
-    print("Archivos guardados en: data/processed/")
-    print(f"Dataset final: {len(df):,} canciones")
-    print(f"Columnas: {len(df.columns)}")
+    registro.info(f"\n{'='*60}")
+    registro.info("GUARDADO COMPLETADO")
+    registro.info(f"{'='*60}")
+    registro.info("Archivos guardados en: data/processed/")
+    registro.info(f"Dataset final: {len(df):,} canciones")
+    registro.info(f"Columnas: {len(df.columns)}")
     
-    if 'intensity_weighted' in df.columns:
-        print(f"Intensidad promedio: {df['intensity_weighted'].mean():.3f}")
-        print(f"Puntuación de calidad promedio: {df['data_quality_score'].mean():.1f}/100")
+    if 'intensity_weighted' in df.columns and mostrar_diagnostico():
+        registro.info(f"Intensidad promedio: {df['intensity_weighted'].mean():.3f}")
+        registro.info(f"Puntuación de calidad promedio: {df['data_quality_score'].mean():.1f}/100")
     
-    print("\n¡Pipeline completado exitosamente!")
+    registro.info("\n¡Pipeline completado exitosamente!")
     return True
 
 if __name__ == "__main__":
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo incremental del pipeline de Spotify
+Nivel: Desarrollador
+
+En vez de reconstruir todo, se procesa solo lo que cambió en data/raw:
+- metadata.json guarda la huella (tamaño, fecha, hash) de cada archivo
+- un archivo nuevo o modificado se vuelve a limpiar entero; si solo se le
+  agregaron filas al final, se limpian solo esas filas
+- las filas nuevas se juntan con las anteriores por track_id con las
+  mismas reglas de resolver_conflictos, solo para las canciones afectadas
+- las tablas de resumen salen del cubo guardado, actualizado con las
+  canciones que salen y las que entran. Con cuantiles aproximados, los
+  histogramas de cuantiles.py se actualizan de la misma forma.
+
+Lo que hace falta entre ejecuciones (las filas combinadas antes de
+resolver conflictos, el cubo y, si se usaron, los histogramas) se guarda
+en data/incremental/.
+"""
+
+import pandas as pd
+import numpy as np
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+from cache_etapas import TAMANO_BLOQUE_HASH, calcular_hash_archivo, version_codigo
+from categorizar_generos import RUTA_REGLAS_GENEROS
+from dataset_particionado import DIRECTORIO_DATASET, leer_dataset
+from esquema import TIPO_TEXTO, leer_csv, leer_parquet
+from linaje import crear_linaje, actualizar_linaje
+from resumenes import crear_cubo, actualizar_cubo, calcular_resumenes
+from cuantiles import crear_histogramas, actualizar_histogramas
+from registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+DIRECTORIO_ESTADO = 'data/incremental'
+RUTA_METADATOS = 'data/processed/metadata.json'
+
+# Módulos cuyo código cambia el resultado; si cambian, hace falta una
+# ejecución completa
+MODULOS_ESTADO = ['limpiar_datos', 'esquema', 'categorizar_generos', 'linaje', 'combinar_archivos',
+                  'crear_intensidad', 'resumenes', 'cuantiles']
+
+def version_estado():
+    """Versión del código y de las reglas de géneros con que se creó el estado"""
+    return {'codigo': version_codigo(MODULOS_ESTADO), 'reglas_generos': calcular_hash_archivo(RUTA_REGLAS_GENEROS)}
+
+def guardar_parquet(df, nombre):
+    """Guardar una tabla del estado (primero en un temporal, luego se renombra)"""
+
+    ruta = os.path.join(DIRECTORIO_ESTADO, nombre)
+    df.to_parquet(ruta + '.tmp', index=False)
+    os.replace(ruta + '.tmp', ruta)
+
+def guardar_estado_incremental(df_combinado, df_final, linaje, cubo=None, histogramas=None,
+                               cuantiles_aproximados=False):
+    """Guardar lo que necesita la próxima ejecución incremental
+
+    Los histogramas solo se guardan con cuantiles aproximados (si no se
+    pasan, se calculan de df_final). Sin ellos se borran los anteriores,
+    que ya no estarían al día.
+    """
+
+    registro.info("\n=== GUARDANDO ESTADO INCREMENTAL ===")
+
+    os.makedirs(DIRECTORIO_ESTADO, exist_ok=True)
+
+    guardar_parquet(df_combinado, 'combinado.parquet')
+    guardar_parquet(linaje, 'linaje.parquet')
+    guardar_parquet(cubo if cubo is not None else crear_cubo(df_final), 'cubo.parquet')
+
+    ruta_histogramas = os.path.join(DIRECTORIO_ESTADO, 'histogramas.parquet')
+    if histogramas is None and cuantiles_aproximados:
+        histogramas = crear_histogramas(df_final)
+    if histogramas is not None:
+        guardar_parquet(histogramas, 'histogramas.parquet')
+    elif os.path.exists(ruta_histogramas):
+        os.remove(ruta_histogramas)
+
+    with open(os.path.join(DIRECTORIO_ESTADO, 'estado.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': version_estado()}, f, indent=2)
+
+    registro.info(f"OK: Guardado: {DIRECTORIO_ESTADO}/ ({len(df_combinado):,} filas combinadas)")
+    return True
+
+def descartar_estado_incremental():
+    """Borrar estado.json para que una ejecución sin estado no deje uno viejo
+
+    El resto del estado no se toca: sin estado.json, leer_estado lo
+    ignora y --incremental vuelve a ejecutar el pipeline completo.
+    """
+
+    ruta_estado = os.path.join(DIRECTORIO_ESTADO, 'estado.json')
+    if os.path.exists(ruta_estado):
+        os.remove(ruta_estado)
+        registro.info(f"El estado incremental de {DIRECTORIO_ESTADO}/ quedó desactualizado: se descarta")
+
+def leer_estado():
+    """Leer el estado de la ejecución anterior, o None si no se puede usar"""
+
+    ruta_estado = os.path.join(DIRECTORIO_ESTADO, 'estado.json')
+    ruta_histogramas = os.path.join(DIRECTORIO_ESTADO, 'histogramas.parquet')
+    for ruta in [ruta_estado, os.path.join(DIRECTORIO_ESTADO, 'combinado.parquet'),
+                 os.path.join(DIRECTORIO_ESTADO, 'cubo.parquet'), os.path.join(DIRECTORIO_ESTADO, 'linaje.parquet'),
+                 RUTA_METADATOS, DIRECTORIO_DATASET]:
+        if not os.path.exists(ruta):
+            registro.info(f"No se encontró {ruta}")
+            return None
+
+    with open(ruta_estado, 'r', encoding='utf-8') as f:
+        estado = json.load(f)
+    if estado.get('version') != version_estado():
+        registro.info("El código o las reglas de géneros cambiaron desde la última ejecución")
+        return None
+
+    with open(RUTA_METADATOS, 'r', encoding='utf-8') as f:
+        huellas = json.load(f).get('huellas_archivos')
+    if not huellas:
+        registro.info("metadata.json no tiene las huellas de los archivos")
+        return None
+
+    return {
+        'huellas': huellas,
+        'combinado': leer_parquet(os.path.join(DIRECTORIO_ESTADO, 'combinado.parquet')),
+        'cubo': leer_parquet(os.path.join(DIRECTORIO_ESTADO, 'cubo.parquet')),
+        'linaje': leer_parquet(os.path.join(DIRECTORIO_ESTADO, 'linaje.parquet')),
+        'histogramas': leer_parquet(ruta_histogramas) if os.path.exists(ruta_histogramas) else None,
+        # El dataset particionado vuelve agrupado por carpeta; el final va ordenado por track_id
+        'final': leer_dataset().sort_values('track_id', kind='stable').reset_index(drop=True)
+    }
+
+def calcular_hash_prefijo(archivo, tamano):
+    """Hash SHA-256 de los primeros `tamano` bytes de un archivo"""
+
+    hash_prefijo = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        restante = tamano
+        while restante > 0:
+            bloque = f.read(min(TAMANO_BLOQUE_HASH, restante))
+            if not bloque:
+                break
+            hash_prefijo.update(bloque)
+            restante -= len(bloque)
+    return hash_prefijo.hexdigest()
+
+def solo_agrega_filas(archivo, anterior):
+    """Saber si el archivo es el anterior con filas nuevas al final"""
+
+    tamano_anterior = anterior['tamano']
+    if os.path.getsize(archivo) <= tamano_anterior or tamano_anterior == 0:
+        return False
+
+    # La parte anterior tiene que terminar en un salto de línea completo
+    with open(archivo, 'rb') as f:
+        f.seek(tamano_anterior - 1)
+        if f.read(1) != b'\n':
+            return False
+
+    return calcular_hash_prefijo(archivo, tamano_anterior) == anterior['sha256']
+
+def clasificar_archivo(archivo, anterior):
+    """'sin cambios', 'nuevo', 'agregado' (filas al final), 'modificado' o 'eliminado'"""
+
+    if not os.path.exists(archivo):
+        return 'eliminado' if anterior is not None else 'sin cambios'
+    if anterior is None:
+        return 'nuevo'
+
+    info = os.stat(archivo)
+    if info.st_size == anterior['tamano'] and info.st_mtime_ns == anterior['mtime_ns']:
+        return 'sin cambios'
+    if info.st_size == anterior['tamano'] and calcular_hash_archivo(archivo) == anterior['sha256']:
+        return 'sin cambios'
+    if solo_agrega_filas(archivo, anterior):
+        return 'agregado'
+    return 'modificado'
+
+def detectar_cambios(archivos, huellas):
+    """Comparar los archivos con las huellas guardadas; devuelve {archivo: tipo de cambio}"""
+
+    cambios = {}
+    for archivo in list(archivos) + [archivo for archivo in huellas if archivo not in archivos]:
+        tipo = clasificar_archivo(archivo, huellas.get(archivo))
+        if tipo != 'sin cambios':
+            cambios[archivo] = tipo
+    return cambios
+
+def leer_filas_agregadas(archivo, desde):
+    """Leer solo las filas que empiezan en el byte `desde` (con el encabezado)"""
+
+    with open(archivo, 'rb') as f:
+        encabezado = f.readline()
+        f.seek(desde)
+        filas = f.read()
+
+    # Mismo nombre de archivo, para que leer_csv use el mismo esquema
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        ruta = os.path.join(directorio_temporal, os.path.basename(archivo))
+        with open(ruta, 'wb') as f:
+            f.write(encabezado + filas)
+        return leer_csv(ruta)
+
+def leer_claves_anteriores(archivo, hasta):
+    """Claves de duplicados (track_id o uri) de la parte anterior del archivo
+
+    Son las que ya vio la limpieza, así una fila nueva repetida se elimina
+    igual que si se limpiara el archivo entero. None si no hay identificador.
+    """
+
+    from limpiar_datos import obtener_claves_duplicados
+
+    columnas = pd.read_csv(archivo, nrows=0).columns
+    identificador = next((columna for columna in ['track_id', 'uri'] if columna in columnas), None)
+    if identificador is None:
+        return None
+
+    with open(archivo, 'rb') as f:
+        anterior = f.read(hasta)
+    df = pd.read_csv(io.BytesIO(anterior), usecols=[identificador], dtype={identificador: TIPO_TEXTO})
+
+    return set(obtener_claves_duplicados(df, [identificador]))
+
+def limpiar_cambios(cambios, huellas, tamano_bloque=None, linajes=None):
+    """Limpiar los archivos nuevos o modificados y las filas agregadas
+
+    Si se pasa linajes (un diccionario), se guarda ahí el linaje de lo
+    que se limpió de cada archivo (de los agregados, solo las filas nuevas).
+    """
+
+    from limpiar_datos import limpiar_archivo_con_cache, limpiar_bloque
+
+    if linajes is None:
+        linajes = {}
+
+    datos_limpios = {}
+    for archivo, tipo in cambios.items():
+        linajes[archivo] = crear_linaje()
+        if tipo == 'agregado':
+            desde = huellas[archivo]['tamano']
+            claves_vistas = leer_claves_anteriores(archivo, desde)
+            if claves_vistas is not None:
+                df = leer_filas_agregadas(archivo, desde)
+                registro.info(f"\n{archivo}: {len(df):,} filas agregadas al final")
+                datos_limpios[archivo] = limpiar_bloque(df, archivo, claves_vistas, linajes[archivo])
+                continue
+            # Sin identificador no se pueden detectar duplicados con la parte anterior
+            cambios[archivo] = 'modificado'
+
+        if cambios[archivo] in ('nuevo', 'modificado'):
+            df = limpiar_archivo_con_cache(archivo, tamano_bloque, linajes[archivo])
+            if df is None:
+                return None
+            datos_limpios[archivo] = df
+
+    return datos_limpios
+
+def ordenar_por_archivo(df, archivos):
+    """Dejar las filas en el orden de los archivos, como en una ejecución completa
+
+    resolver_conflictos se queda con el primer nombre, artista y década de
+    cada canción, así que el orden importa.
+    """
+
+    posicion = {archivo: numero for numero, archivo in enumerate(archivos)}
+    orden = df['data_source'].map(posicion).fillna(len(archivos)).to_numpy()
+    return df.iloc[np.argsort(orden, kind='stable')].reset_index(drop=True)
+
+def ejecutar_incremental(tamano_bloque=None, guardar_csv=False, compresion_csv=None, cuantiles_aproximados=False):
+    """Actualizar los resultados procesando solo los archivos que cambiaron
+
+    Con cuantiles_aproximados, los cuartiles y medianas salen de los
+    histogramas guardados, actualizados con las canciones que cambiaron.
+
+    Devuelve True o False según el resultado, o None si no hay una
+    ejecución anterior que se pueda usar (hace falta una completa).
+    """
+
+    from limpiar_datos import ARCHIVOS_CSV
+    from combinar_archivos import combinar_archivos_simple, resolver_duplicados
+    from crear_intensidad import crear_variables_por_fila, crear_marcadores_globales
+    from verificar_calidad import verificar_todo
+    from guardar_resultados import guardar_todos_los_resultados
+
+    registro.info("EJECUCION INCREMENTAL")
+    registro.info("=" * 60)
+
+    estado = leer_estado()
+    if estado is None:
+        return None
+
+    cambios = detectar_cambios(ARCHIVOS_CSV, estado['huellas'])
+    if not cambios:
+        registro.info("No hay archivos nuevos ni modificados: los resultados están al día")
+        return True
+
+    registro.info("Archivos con cambios:")
+    for archivo, tipo in cambios.items():
+        registro.info(f"  {archivo}: {tipo}")
+
+    # Limpiar solo lo que cambió
+    linajes = {}
+    datos_limpios = limpiar_cambios(cambios, estado['huellas'], tamano_bloque, linajes)
+    if datos_limpios is None:
+        registro.error("ERROR: No se pudieron limpiar los archivos con cambios")
+        return False
+
+    # Linaje: sumar las filas agregadas, reemplazar los archivos que se volvieron a limpiar
+    linaje = actualizar_linaje(estado['linaje'], {archivo: linajes[archivo] for archivo in datos_limpios},
+                               agregados=[archivo for archivo, tipo in cambios.items() if tipo == 'agregado'],
+                               eliminados=[archivo for archivo, tipo in cambios.items() if tipo == 'eliminado'],
+                               archivos=ARCHIVOS_CSV)
+
+    # Sacar las filas de archivos modificados o eliminados y sumar las nuevas
+    combinado = estado['combinado']
+    reemplazados = [archivo for archivo, tipo in cambios.items() if tipo in ('modificado', 'eliminado')]
+    salen = combinado['data_source'].isin(reemplazados)
+    filas_salen = combinado[salen]
+
+    partes = [combinado[~salen]]
+    filas_nuevas = None
+    if datos_limpios:
+        filas_nuevas = combinar_archivos_simple(datos_limpios)
+        partes.append(filas_nuevas)
+    combinado = ordenar_por_archivo(pd.concat(partes, ignore_index=True), ARCHIVOS_CSV)
+
+    # Canciones afectadas: las que perdieron o ganaron filas
+    afectadas = set(filas_salen['track_id'].dropna())
+    if filas_nuevas is not None:
+        afectadas |= set(filas_nuevas['track_id'].dropna())
+    registro.info(f"\nCanciones afectadas: {len(afectadas):,}")
+
+    # Volver a resolver solo las canciones afectadas
+    final_anterior = estado['final']
+    en_afectadas = final_anterior['track_id'].isin(afectadas).to_numpy()
+    final_quitado = final_anterior[en_afectadas]
+
+    resueltas = final_quitado.iloc[:0]
+    if afectadas:
+        resueltas = resolver_duplicados(combinado[combinado['track_id'].isin(afectadas)], ['track_id'])
+        columnas_resueltas = [columna for columna in resueltas.columns if columna in final_anterior.columns]
+        resueltas = resueltas[columnas_resueltas].astype(final_anterior.dtypes[columnas_resueltas].to_dict())
+        resueltas = crear_variables_por_fila(resueltas)
+
+    df_final = pd.concat([final_anterior[~en_afectadas], resueltas], ignore_index=True)
+    df_final = df_final.sort_values('track_id', kind='stable').reset_index(drop=True)
+
+    histogramas = None
+    if cuantiles_aproximados and estado['histogramas'] is not None:
+        histogramas = actualizar_histogramas(estado['histogramas'], final_quitado, resueltas)
+    elif cuantiles_aproximados:
+        histogramas = crear_histogramas(df_final)
+
+    df_final = crear_marcadores_globales(df_final, histogramas)[list(final_anterior.columns)]
+
+    registro.info(f"Canciones: {len(final_anterior):,} antes, {len(df_final):,} ahora")
+
+    # Actualizar el cubo con las canciones que salen y entran, y armar las tablas
+    cubo = actualizar_cubo(estado['cubo'], final_quitado, resueltas, df_final)
+    resumenes = calcular_resumenes(df_final, cubo, histogramas)
+
+    verificar_todo(df_final)
+    guardado_ok = guardar_todos_los_resultados(df_final, resumenes['resumen_decada'],
+                                               resumenes['resumen_decada_genero'], resumenes['stats_genero'],
+                                               resumenes['resumen_intensidad'], linaje,
+                                               guardar_csv=guardar_csv, compresion_csv=compresion_csv)
+    guardar_estado_incremental(combinado, df_final, linaje, cubo, histogramas)
+
+    return guardado_ok
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de vecinos más cercanos por perfil de audio (canciones parecidas)
+Nivel: Desarrollador
+
+Responde "las canciones con el perfil de intensidad más parecido a X" sobre
+energy, loudness_normalized, danceability, valence y tempo:
+- cada característica se estandariza (media 0, desviación 1) con la media
+  y la desviación del dataset; un valor faltante queda en la media (0)
+- la matriz queda en float32 y contigua: una fila por canción
+- la distancia es la euclídea entre filas estandarizadas.
+
+Hay dos búsquedas, las dos por lotes de consultas:
+- exacta: recorre la matriz por bloques de filas y en cada bloque calcula
+  las distancias a todas las consultas con un producto de matrices,
+  guardando solo los k mejores de cada consulta
+- aproximada (IVF): las canciones se reparten en listas con k-means (unas
+  raíz de n listas) y la matriz se guarda ordenada por lista, así cada
+  lista es un trozo contiguo. Cada consulta solo recorre las 'sondas'
+  listas con el centro más cercano; más sondas, más exacta y más lenta.
+
+En las dos, las distancias de los k elegidos se recalculan en float64.
+
+El índice se guarda junto al dataset particionado:
+    data/processed/similarity_index/features.npy    matriz (ordenada por lista)
+    data/processed/similarity_index/norms.npy       norma al cuadrado de cada fila
+    data/processed/similarity_index/track_ids.npy   track_id de cada fila
+    data/processed/similarity_index/centroids.npy   centro de cada lista
+    data/processed/similarity_index/offsets.npy     primera fila de cada lista
+    data/processed/similarity_index/index.json      columnas, medias y desviaciones
+y cargar_indice() abre la matriz, las normas y los track_id con memory
+map: no se leen al abrirlos y varios procesos comparten las mismas páginas.
+
+Uso (desde la carpeta donde está data/processed):
+    python indice_similitud.py --construir
+    python indice_similitud.py --track-id 4uLU6hMCjMI75M1A2tKUQC --k 10
+    python indice_similitud.py --track-id ID1 ID2 --k 5 --exacto
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from registro import configurar_registro, obtener_registro
+
+registro = obtener_registro(__name__)
+
+CARACTERISTICAS_SIMILITUD = ['energy', 'loudness_normalized', 'danceability', 'valence', 'tempo']
+
+DIRECTORIO_INDICE = 'data/processed/similarity_index'
+
+# Filas de la matriz y consultas por bloque en la búsqueda exacta
+# (las distancias de un bloque ocupan consultas × filas × 4 bytes: 64 MB)
+FILAS_POR_BLOQUE = 64 * 1024
+CONSULTAS_POR_BLOQUE = 256
+
+# Puntos por bloque al buscar el centro más cercano (bloques chicos entran en caché)
+PUNTOS_POR_BLOQUE = 8 * 1024
+
+# Entrenamiento de las listas del IVF: k-means sobre una muestra
+ITERACIONES_KMEANS = 15
+FILAS_POR_LISTA_MUESTRA = 40
+MUESTRA_MINIMA = 64 * 1024
+
+# Listas que recorre cada consulta aproximada
+SONDAS = 8
+
+def matriz_caracteristicas(df, medias=None, desviaciones=None):
+    """Matriz estandarizada (float32, contigua) de las características de audio
+
+    Si no se pasan medias y desviaciones se calculan del propio df.
+    Devuelve (matriz, medias, desviaciones).
+    """
+
+    faltantes = [columna for columna in CARACTERISTICAS_SIMILITUD if columna not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas para el índice de similitud: {', '.join(faltantes)}")
+
+    valores = np.column_stack([df[columna].to_numpy(dtype='float64', na_value=np.nan)
+                               for columna in CARACTERISTICAS_SIMILITUD])
+    if medias is None:
+        medias = np.nan_to_num(np.nanmean(valores, axis=0)) if len(valores) else np.zeros(valores.shape[1])
+        desviaciones = np.nan_to_num(np.nanstd(valores, axis=0)) if len(valores) else np.ones(valores.shape[1])
+        # Una característica constante no separa canciones: queda en 0
+        desviaciones = np.where(desviaciones > 0, desviaciones, 1.0)
+
+    valores = (valores - medias) / desviaciones
+    valores = np.where(np.isnan(valores), 0.0, valores)
+
+    return np.ascontiguousarray(valores, dtype='float32'), np.asarray(medias), np.asarray(desviaciones)
+
+def centro_mas_cercano(puntos, centros):
+    """Índice del centro más cercano a cada punto (por bloques de puntos)"""
+
+    # |p - c|² = |p|² - 2 p·c + |c|²; |p|² no cambia qué centro es el más cercano,
+    # así que alcanza con el mayor p·c - |c|²/2
+    mitad_normas = (centros * centros).sum(axis=1) / 2
+    resultado = np.empty(len(puntos), dtype='int64')
+    for inicio in range(0, len(puntos), PUNTOS_POR_BLOQUE):
+        productos = puntos[inicio:inicio + PUNTOS_POR_BLOQUE] @ centros.T
+        productos -= mitad_normas
+        resultado[inicio:inicio + len(productos)] = np.argmax(productos, axis=1)
+    return resultado
+
+def entrenar_centros(matriz, listas, semilla=0):
+    """Centros de las listas con k-means (algoritmo de Lloyd) sobre una muestra"""
+
+    generador = np.random.default_rng(semilla)
+    tamano = min(len(matriz), max(MUESTRA_MINIMA, listas * FILAS_POR_LISTA_MUESTRA))
+    muestra = matriz[np.sort(generador.choice(len(matriz), tamano, replace=False))]
+    centros = muestra[generador.choice(len(muestra), listas, replace=False)].copy()
+
+    for _ in range(ITERACIONES_KMEANS):
+        asignacion = centro_mas_cercano(muestra, centros)
+        cantidades = np.bincount(asignacion, minlength=listas)
+        sumas = np.column_stack([np.bincount(asignacion, weights=muestra[:, columna], minlength=listas)
+                                 for columna in range(matriz.shape[1])])
+
+        con_puntos = cantidades > 0
+        centros[con_puntos] = (sumas[con_puntos] / cantidades[con_puntos, None]).astype('float32')
+        # Una lista vacía vuelve a empezar desde un punto al azar
+        vacias = np.flatnonzero(~con_puntos)
+        if len(vacias):
+            centros[vacias] = muestra[generador.choice(len(muestra), len(vacias), replace=False)]
+
+    return centros
+
+def construir_indice(df, listas=None, semilla=0):
+    """Armar el índice en memoria desde el dataset final
+
+    listas es la cantidad de listas del IVF (por defecto, raíz de la
+    cantidad de canciones). Devuelve un diccionario con la matriz
+    ordenada por lista y todo lo necesario para buscar y guardar.
+    """
+
+    if 'track_id' not in df.columns:
+        raise ValueError("Falta la columna track_id para el índice de similitud")
+
+    matriz, medias, desviaciones = matriz_caracteristicas(df)
+    filas = len(matriz)
+    if filas == 0:
+        raise ValueError("No hay canciones para el índice de similitud")
+
+    listas = min(filas, listas or max(1, int(round(np.sqrt(filas)))))
+    centros = entrenar_centros(matriz, listas, semilla)
+    asignacion = centro_mas_cercano(matriz, centros)
+
+    # Cada lista queda como un trozo contiguo de la matriz
+    orden = np.argsort(asignacion, kind='stable')
+    inicios = np.searchsorted(asignacion[orden], np.arange(listas + 1)).astype('int64')
+
+    # Los track_id como bytes UTF-8 de largo fijo, para poder abrirlos con memory map
+    track_ids = df['track_id'].astype(str).str.encode('utf-8').to_numpy()[orden]
+
+    return preparar_indice({
+        'columnas': list(CARACTERISTICAS_SIMILITUD),
+        'medias': medias,
+        'desviaciones': desviaciones,
+        'matriz': np.ascontiguousarray(matriz[orden]),
+        'track_ids': np.array(track_ids, dtype='S'),
+        'centros': centros,
+        'inicios': inicios
+    })
+
+def preparar_indice(indice):
+    """Agregar la norma de cada fila (la usan las dos búsquedas), si no vino guardada"""
+
+    if indice.get('normas') is None:
+        matriz = indice['matriz']
+        indice['normas'] = np.einsum('ij,ij->i', matriz, matriz)
+    indice['posiciones'] = None
+    return indice
+
+def guardar_indice(indice, directorio=DIRECTORIO_INDICE):
+    """Guardar el índice en .npy (para abrirlo con memory map) y su descripción en JSON
+
+    Se escribe en un directorio temporal que después reemplaza al
+    anterior. Devuelve el tamaño total en bytes.
+    """
+
+    temporal = f"{directorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    for nombre, clave in [('features', 'matriz'), ('norms', 'normas'), ('track_ids', 'track_ids'),
+                          ('centroids', 'centros'), ('offsets', 'inicios')]:
+        np.save(os.path.join(temporal, f"{nombre}.npy"), indice[clave])
+
+    descripcion = {
+        'columnas': indice['columnas'],
+        'medias': [float(valor) for valor in indice['medias']],
+        'desviaciones': [float(valor) for valor in indice['desviaciones']],
+        'filas': int(len(indice['matriz'])),
+        'listas': int(len(indice['centros'])),
+        'fecha_creacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(os.path.join(temporal, 'index.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(descripcion, archivo, indent=2, ensure_ascii=False)
+
+    # Reemplazar el índice anterior
+    anterior = f"{directorio}.old-{os.getpid()}"
+    if os.path.exists(directorio):
+        os.rename(directorio, anterior)
+    os.rename(temporal, directorio)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+    return sum(os.path.getsize(os.path.join(directorio, nombre)) for nombre in os.listdir(directorio))
+
+def cargar_indice(directorio=DIRECTORIO_INDICE):
+    """Abrir el índice guardado; la matriz, las normas y los track_id quedan en memory map"""
+
+    ruta_descripcion = os.path.join(directorio, 'index.json')
+    if not os.path.exists(ruta_descripcion):
+        raise FileNotFoundError(f"No existe el índice {directorio} (ejecuta primero pipeline_completo.py)")
+
+    with open(ruta_descripcion, encoding='utf-8') as archivo:
+        descripcion = json.load(archivo)
+
+    def abrir(nombre, memory_map=False):
+        arreglo = np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode='r' if memory_map else None)
+        # Vista como ndarray común (sigue apuntando al archivo mapeado)
+        return np.asarray(arreglo)
+
+    return preparar_indice({
+        'columnas': descripcion['columnas'],
+        'medias': np.array(descripcion['medias']),
+        'desviaciones': np.array(descripcion['desviaciones']),
+        'matriz': abrir('features', memory_map=True),
+        # Un índice guardado antes de norms.npy las calcula al abrirlo
+        'normas': (abrir('norms', memory_map=True)
+                   if os.path.exists(os.path.join(directorio, 'norms.npy')) else None),
+        'track_ids': abrir('track_ids', memory_map=True),
+        'centros': abrir('centroids'),
+        'inicios': abrir('offsets')
+    })
+
+def fusionar_mejores(mejores_distancias, mejores_filas, distancias, primera_fila, k, consultas=None):
+    """Quedarse con los k mejores entre los que ya había y un bloque nuevo de distancias
+
+    distancias tiene una fila por consulta (todas, o las de 'consultas')
+    y una columna por fila de la matriz, empezando en primera_fila.
+    """
+
+    anteriores = slice(None) if consultas is None else consultas
+    previas_distancias = mejores_distancias[anteriores]
+    previas_filas = mejores_filas[anteriores]
+
+    # Solo compiten las distancias menores que el k-ésimo mejor de cada consulta.
+    # Después de los primeros bloques son pocas: se ordenan solo esas
+    candidatas = distancias < previas_distancias.max(axis=1)[:, None]
+    cantidad = np.count_nonzero(candidatas)
+    if cantidad == 0:
+        return
+
+    if cantidad * 16 <= distancias.size:
+        # flatnonzero es bastante más rápido que nonzero sobre la máscara 2D
+        numeros, columnas = np.divmod(np.flatnonzero(candidatas), distancias.shape[1])
+        todas_numeros = np.concatenate([np.repeat(np.arange(len(distancias)), k), numeros])
+        todas_distancias = np.concatenate([previas_distancias.ravel(), distancias[numeros, columnas]])
+        todas_filas = np.concatenate([previas_filas.ravel(), columnas + primera_fila])
+
+        # Por consulta y distancia; cada consulta tiene al menos sus k anteriores
+        orden = np.lexsort((todas_distancias, todas_numeros))
+        comienzos = np.searchsorted(todas_numeros[orden], np.arange(len(distancias)))
+        elegidas = orden[comienzos[:, None] + np.arange(k)]
+        mejores_distancias[anteriores] = todas_distancias[elegidas]
+        mejores_filas[anteriores] = todas_filas[elegidas]
+        return
+
+    if distancias.shape[1] > k:
+        elegidas = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        distancias = np.take_along_axis(distancias, elegidas, axis=1)
+    else:
+        elegidas = np.broadcast_to(np.arange(distancias.shape[1]), distancias.shape)
+    filas = elegidas + primera_fila
+
+    juntas = np.concatenate([previas_distancias, distancias], axis=1)
+    juntas_filas = np.concatenate([previas_filas, filas], axis=1)
+
+    elegidas = np.argpartition(juntas, k - 1, axis=1)[:, :k]
+    mejores_distancias[anteriores] = np.take_along_axis(juntas, elegidas, axis=1)
+    mejores_filas[anteriores] = np.take_along_axis(juntas_filas, elegidas, axis=1)
+
+def terminar_busqueda(indice, consultas, filas):
+    """Distancias en float64 de los elegidos, ordenadas de la más cercana a la más lejana
+
+    Las posiciones sin vecino (-1, cuando hay menos de k candidatos)
+    quedan al final con distancia infinita.
+    """
+
+    validas = filas >= 0
+    vecinos = indice['matriz'][np.where(validas, filas, 0)].astype('float64')
+    diferencias = vecinos - consultas[:, None, :].astype('float64')
+    distancias = np.sqrt(np.einsum('ijk,ijk->ij', diferencias, diferencias))
+    distancias = np.where(validas, distancias, np.inf)
+
+    orden = np.argsort(distancias, axis=1, kind='stable')
+    return np.take_along_axis(distancias, orden, axis=1), np.take_along_axis(filas, orden, axis=1)
+
+def buscar_exacto(indice, consultas, k=10):
+    """Los k vecinos exactos de cada consulta (filas estandarizadas)
+
+    Devuelve (distancias, filas), de forma (consultas, k); filas son
+    posiciones en la matriz del índice.
+    """
+
+    matriz = indice['matriz']
+    normas = indice['normas']
+    consultas = np.ascontiguousarray(consultas, dtype='float32')
+    k = min(k, len(matriz))
+
+    mejores_distancias = np.full((len(consultas), k), np.inf, dtype='float32')
+    mejores_filas = np.full((len(consultas), k), -1, dtype='int64')
+
+    # Cada bloque de la matriz se lee una sola vez para todas las consultas
+    for inicio in range(0, len(matriz), FILAS_POR_BLOQUE):
+        bloque = matriz[inicio:inicio + FILAS_POR_BLOQUE]
+        normas_bloque = normas[inicio:inicio + FILAS_POR_BLOQUE]
+        for desde in range(0, len(consultas), CONSULTAS_POR_BLOQUE):
+            hasta = min(desde + CONSULTAS_POR_BLOQUE, len(consultas))
+            # |q|² es igual para toda la fila de la consulta: no cambia el orden
+            distancias = consultas[desde:hasta] @ bloque.T
+            distancias *= -2
+            distancias += normas_bloque
+            fusionar_mejores(mejores_distancias[desde:hasta], mejores_filas[desde:hasta], distancias, inicio, k)
+
+    return terminar_busqueda(indice, consultas, mejores_filas)
+
+def centro_distancias(centros, consultas):
+    """Distancia al cuadrado (sin |q|²) de cada consulta a cada centro"""
+    return (centros * centros).sum(axis=1) - 2 * (consultas @ centros.T)
+
+def buscar_ivf(indice, consultas, k=10, sondas=SONDAS):
+    """Los k vecinos aproximados de cada consulta, recorriendo solo las listas más cercanas
+
+    Las consultas se agrupan por lista: cada lista se recorre una vez para
+    todas las consultas que la eligieron.
+    """
+
+    matriz = indice['matriz']
+    normas = indice['normas']
+    inicios = indice['inicios']
+    consultas = np.ascontiguousarray(consultas, dtype='float32')
+    k = min(k, len(matriz))
+    sondas = min(sondas, len(indice['centros']))
+
+    elegidas = np.argpartition(centro_distancias(indice['centros'], consultas), sondas - 1, axis=1)[:, :sondas]
+
+    # Pares (lista, consulta) ordenados por lista
+    listas = elegidas.ravel()
+    numeros = np.repeat(np.arange(len(consultas)), sondas)
+    orden = np.argsort(listas, kind='stable')
+    listas, numeros = listas[orden], numeros[orden]
+    cortes = np.flatnonzero(np.diff(listas)) + 1
+
+    mejores_distancias = np.full((len(consultas), k), np.inf, dtype='float32')
+    mejores_filas = np.full((len(consultas), k), -1, dtype='int64')
+
+    for grupo in np.split(np.arange(len(listas)), cortes) if len(listas) else []:
+        lista = listas[grupo[0]]
+        inicio, fin = inicios[lista], inicios[lista + 1]
+        if inicio == fin:
+            continue
+        cuales = numeros[grupo]
+        distancias = consultas[cuales] @ matriz[inicio:fin].T
+        distancias *= -2
+        distancias += normas[inicio:fin]
+        fusionar_mejores(mejores_distancias, mejores_filas, distancias, inicio, k, cuales)
+
+    return terminar_busqueda(indice, consultas, mejores_filas)
+
+def buscar(indice, consultas, k=10, exacto=False, sondas=SONDAS):
+    """k vecinos de cada consulta, exactos o con el IVF"""
+
+    if exacto:
+        return buscar_exacto(indice, consultas, k)
+    return buscar_ivf(indice, consultas, k, sondas)
+
+def posiciones_track_ids(indice, track_ids):
+    """Fila del índice de cada track_id (-1 si no está)"""
+
+    if indice['posiciones'] is None:
+        # Se arma la primera vez que se busca por track_id
+        indice['posiciones'] = pd.Index(indice['track_ids'])
+    return indice['posiciones'].get_indexer([str(track_id).encode('utf-8') for track_id in track_ids])
+
+def tabla_vecinos(indice, origenes, distancias, filas):
+    """Tabla larga con una fila por consulta y vecino"""
+
+    cantidad = filas.shape[1]
+    validas = (filas >= 0).ravel()
+    return pd.DataFrame({
+        'track_id': np.repeat(np.asarray(origenes, dtype=object), cantidad)[validas],
+        'rango': np.tile(np.arange(1, cantidad + 1), len(filas))[validas],
+        'vecino': np.char.decode(indice['track_ids'][filas.ravel()[validas]], 'utf-8'),
+        'distancia': distancias.ravel()[validas]
+    })
+
+def similares_a(indice, track_ids, k=10, exacto=False, sondas=SONDAS):
+    """Las k canciones más parecidas a cada track_id (sin contar la misma canción)
+
+    Devuelve una tabla con track_id, rango (1 es la más parecida), vecino
+    y distancia. Los track_id que no están en el índice no aparecen.
+    """
+
+    track_ids = list(track_ids)
+    posiciones = posiciones_track_ids(indice, track_ids)
+    encontrados = posiciones >= 0
+    if not encontrados.all():
+        registro.warning(f"ADVERTENCIA: {int((~encontrados).sum())} track_id no están en el índice")
+
+    consultas = np.asarray(indice['matriz'][posiciones[encontrados]])
+    distancias, filas = buscar(indice, consultas, k + 1, exacto, sondas)
+
+    # Quitar la propia canción (o el último vecino, si no apareció)
+    propias = filas == posiciones[encontrados][:, None]
+    quitar = np.where(propias.any(axis=1), propias.argmax(axis=1), filas.shape[1] - 1)
+    conservar = np.ones(filas.shape, dtype=bool)
+    conservar[np.arange(len(filas)), quitar] = False
+    distancias = distancias[conservar].reshape(len(filas), filas.shape[1] - 1)
+    filas = filas[conservar].reshape(len(filas), filas.shape[1] - 1)
+
+    return tabla_vecinos(indice, np.array(track_ids, dtype=object)[encontrados], distancias, filas)
+
+def similares_a_caracteristicas(indice, df, k=10, exacto=False, sondas=SONDAS):
+    """Las k canciones más parecidas a cada fila de df (con las columnas de audio sin estandarizar)"""
+
+    consultas, _, _ = matriz_caracteristicas(df, indice['medias'], indice['desviaciones'])
+    distancias, filas = buscar(indice, consultas, k, exacto, sondas)
+    origenes = df['track_id'] if 'track_id' in df.columns else np.arange(len(df))
+    return tabla_vecinos(indice, origenes, distancias, filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canciones con el perfil de audio más parecido")
+    parser.add_argument('--construir', action='store_true', help="armar el índice desde el dataset procesado")
+    parser.add_argument('--track-id', nargs='+', default=[], help="canciones a las que buscar parecidas")
+    parser.add_argument('--k', type=int, default=10, help="cantidad de vecinos")
+    parser.add_argument('--exacto', action='store_true', help="búsqueda exacta en vez del IVF")
+    parser.add_argument('--sondas', type=int, default=SONDAS, help="listas que recorre la búsqueda aproximada")
+    parser.add_argument('--directorio', default=DIRECTORIO_INDICE)
+    opciones = parser.parse_args()
+
+    configurar_registro()
+
+    if opciones.construir:
+        from dataset_arrow import cargar_dataset_arrow
+
+        inicio = time.perf_counter()
+        indice = construir_indice(cargar_dataset_arrow(['track_id'] + CARACTERISTICAS_SIMILITUD))
+        tamano = guardar_indice(indice, opciones.directorio)
+        registro.info(f"OK: Guardado: {opciones.directorio}/ ({len(indice['matriz']):,} canciones, "
+                      f"{len(indice['centros']):,} listas, {tamano / 1024**2:.1f} MB, "
+                      f"{time.perf_counter() - inicio:.1f} s)")
+
+    if opciones.track_id:
+        try:
+            indice = cargar_indice(opciones.directorio)
+        except FileNotFoundError as error:
+            print(f"ERROR: {error}", file=sys.stderr)
+            sys.exit(2)
+
+        inicio = time.perf_counter()
+        vecinos = similares_a(indice, opciones.track_id, opciones.k, opciones.exacto, opciones.sondas)
+        print(vecinos.to_string(index=False))
+        registro.info(f"\n{'Búsqueda exacta' if opciones.exacto else 'Búsqueda IVF'} en "
+                      f"{(time.perf_counter() - inicio) * 1000:.1f} ms")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas de tiempo, memoria y filas de cada etapa y función del pipeline
+Nivel: Desarrollador
+
+Cada etapa del motor (motor_etapas.py) y cada función marcada con
+@instrumentar anota, al terminar:
+- el tiempo real y el tiempo de CPU
+- cuánto subió el pico de memoria del proceso (RSS) sobre la memoria
+  que había al empezar
+- las filas que recibió y las que devolvió (si son DataFrames).
+
+Cada medición se escribe como una línea JSON en el archivo configurado y
+al final mostrar_tabla_metricas() imprime una tabla con las mediciones
+juntadas por nombre. Con perfilar='<nombre>' esa etapa o función (la
+primera vez que se ejecuta) corre además con cProfile o pyinstrument.
+
+Las métricas están apagadas hasta que se llama a configurar_instrumentacion
+(así las funciones se pueden usar sueltas sin costo extra). Las funciones
+que corren en otros procesos (limpieza en paralelo) escriben sus líneas en
+el mismo archivo, con su número de proceso, pero no entran en la tabla:
+ahí se ve el total de la etapa en el proceso principal.
+"""
+
+import functools
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+RUTA_METRICAS = 'data/logs/metricas.jsonl'
+
+# Configuración de las métricas (se cambia con configurar_instrumentacion)
+CONFIGURACION_INSTRUMENTACION = {
+    'activa': False,
+    'archivo': None,
+    'perfilar': None,
+    'perfilador': 'cprofile'
+}
+
+# Mediciones de la ejecución actual y mediciones abiertas (anidadas)
+MEDICIONES = []
+PILA = []
+
+def configurar_instrumentacion(activa=True, archivo=RUTA_METRICAS, perfilar=None, perfilador='cprofile'):
+    """Activar las métricas para una ejecución
+
+    archivo es el JSON lines donde se escribe cada medición (se vacía al
+    configurar; None para no escribir nada). perfilar es el nombre de una
+    etapa o función para correr con el perfilador ('cprofile' o
+    'pyinstrument').
+    """
+
+    CONFIGURACION_INSTRUMENTACION.update({'activa': activa, 'archivo': archivo, 'perfilar': perfilar,
+                                          'perfilador': perfilador})
+    MEDICIONES.clear()
+
+    if activa and archivo:
+        os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+        open(archivo, 'w', encoding='utf-8').close()
+
+def leer_memoria():
+    """Memoria actual y pico del proceso en MB (VmRSS y VmHWM en Linux)"""
+
+    try:
+        with open('/proc/self/status') as estado:
+            valores = {}
+            for linea in estado:
+                if linea.startswith(('VmRSS:', 'VmHWM:')):
+                    valores[linea[:5]] = int(linea.split()[1]) / 1024
+            return valores.get('VmRSS'), valores.get('VmHWM')
+    except OSError:
+        # Sin /proc solo se conoce el pico de todo el proceso (KB en Linux, bytes en macOS)
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        pico = maximo / 1024**2 if sys.platform == 'darwin' else maximo / 1024
+        return pico, pico
+
+def reiniciar_pico_memoria():
+    """Llevar el pico de memoria del proceso (VmHWM) a la memoria actual (solo Linux)"""
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as archivo:
+            archivo.write('5')
+    except OSError:
+        pass
+
+def contar_filas(valor):
+    """Filas de un DataFrame, de un diccionario de DataFrames o del primero de una tupla"""
+
+    if isinstance(valor, tuple) and valor:
+        return contar_filas(valor[0])
+    if isinstance(valor, dict):
+        tablas = [tabla for tabla in valor.values() if hasattr(tabla, 'columns')]
+        return sum(len(tabla) for tabla in tablas) if tablas else None
+    if hasattr(valor, 'columns'):
+        return len(valor)
+    return None
+
+@contextmanager
+def perfilar_bloque(nombre):
+    """Correr un bloque con el perfilador configurado y mostrar el resultado"""
+
+    directorio = os.path.dirname(CONFIGURACION_INSTRUMENTACION['archivo'] or RUTA_METRICAS) or '.'
+    os.makedirs(directorio, exist_ok=True)
+
+    if CONFIGURACION_INSTRUMENTACION['perfilador'] == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        perfilador = Profiler()
+        perfilador.start()
+        try:
+            yield
+        finally:
+            perfilador.stop()
+            texto = perfilador.output_text()
+            ruta = os.path.join(directorio, f"perfil_{nombre}.txt")
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            print(f"\n=== PERFIL DE {nombre} (pyinstrument) ===\n{texto}\nGuardado en {ruta}")
+        return
+
+    import cProfile
+    import pstats
+
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield
+    finally:
+        perfilador.disable()
+        ruta = os.path.join(directorio, f"perfil_{nombre}.prof")
+        perfilador.dump_stats(ruta)
+        print(f"\n=== PERFIL DE {nombre} (cProfile, 20 funciones con más tiempo acumulado) ===")
+        pstats.Stats(perfilador).sort_stats('cumulative').print_stats(20)
+        print(f"Guardado en {ruta} (se abre con python -m pstats o snakeviz)")
+
+@contextmanager
+def medir_etapa(nombre, filas_entrada=None, modulo=None):
+    """Medir un bloque de código
+
+    Devuelve un diccionario donde el bloque puede anotar 'filas_salida'.
+    Si las métricas están apagadas no mide nada.
+    """
+
+    medicion = {'nombre': nombre, 'modulo': modulo, 'filas_entrada': filas_entrada, 'filas_salida': None}
+    if not CONFIGURACION_INSTRUMENTACION['activa']:
+        yield medicion
+        return
+
+    # El pico de la medición de afuera se guarda antes de reiniciarlo para esta
+    memoria, pico = leer_memoria()
+    if PILA:
+        PILA[-1]['pico'] = max(PILA[-1]['pico'], pico)
+    reiniciar_pico_memoria()
+    memoria, _ = leer_memoria()
+
+    actual = {'pico': memoria}
+    PILA.append(actual)
+
+    perfilar = CONFIGURACION_INSTRUMENTACION['perfilar'] == nombre
+    if perfilar:
+        # Solo la primera vez que aparece el nombre
+        CONFIGURACION_INSTRUMENTACION['perfilar'] = None
+
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    error = None
+    try:
+        if perfilar:
+            with perfilar_bloque(nombre):
+                yield medicion
+        else:
+            yield medicion
+    except BaseException as excepcion:
+        error = type(excepcion).__name__
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        segundos_cpu = time.process_time() - inicio_cpu
+
+        PILA.pop()
+        _, pico = leer_memoria()
+        pico = max(actual['pico'], pico)
+        if PILA:
+            PILA[-1]['pico'] = max(PILA[-1]['pico'], pico)
+
+        medicion.update({
+            'nivel': len(PILA),
+            'proceso': os.getpid(),
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'segundos': round(segundos, 4),
+            'segundos_cpu': round(segundos_cpu, 4),
+            'memoria_inicio_mb': round(memoria, 1),
+            'memoria_pico_mb': round(pico - memoria, 1)
+        })
+        if error:
+            medicion['error'] = error
+        registrar_medicion(medicion)
+
+def registrar_medicion(medicion):
+    """Guardar la medición y escribirla como línea JSON"""
+
+    MEDICIONES.append(medicion)
+
+    archivo = CONFIGURACION_INSTRUMENTACION['archivo']
+    if archivo:
+        with open(archivo, 'a', encoding='utf-8') as destino:
+            destino.write(json.dumps(medicion, ensure_ascii=False) + '\n')
+
+def instrumentar(funcion):
+    """Decorador: medir cada llamada a la función
+
+    Las filas de entrada son las del primer argumento (si es un DataFrame
+    o un diccionario de DataFrames) y las de salida las del resultado.
+    """
+
+    modulo = funcion.__module__
+
+    @functools.wraps(funcion)
+    def envoltura(*argumentos, **opciones):
+        if not CONFIGURACION_INSTRUMENTACION['activa']:
+            return funcion(*argumentos, **opciones)
+
+        filas_entrada = contar_filas(argumentos[0]) if argumentos else None
+        with medir_etapa(funcion.__name__, filas_entrada, modulo) as medicion:
+            resultado = funcion(*argumentos, **opciones)
+            medicion['filas_salida'] = contar_filas(resultado)
+        return resultado
+
+    return envoltura
+
+def juntar_mediciones(mediciones=None):
+    """Sumar las mediciones de la misma etapa o función, en el orden en que terminaron"""
+
+    juntas = {}
+    for medicion in MEDICIONES if mediciones is None else mediciones:
+        total = juntas.setdefault((medicion['modulo'], medicion['nombre']), {
+            'nombre': medicion['nombre'], 'modulo': medicion['modulo'], 'nivel': medicion['nivel'],
+            'llamadas': 0, 'segundos': 0.0, 'segundos_cpu': 0.0, 'memoria_pico_mb': 0.0,
+            'filas_entrada': None, 'filas_salida': None
+        })
+        total['nivel'] = min(total['nivel'], medicion['nivel'])
+        total['llamadas'] += 1
+        total['segundos'] += medicion['segundos']
+        total['segundos_cpu'] += medicion['segundos_cpu']
+        total['memoria_pico_mb'] = max(total['memoria_pico_mb'], medicion['memoria_pico_mb'])
+        for campo in ['filas_entrada', 'filas_salida']:
+            if medicion[campo] is not None:
+                total[campo] = (total[campo] or 0) + medicion[campo]
+
+    return list(juntas.values())
+
+def mostrar_tabla_metricas(mediciones=None):
+    """Imprimir la tabla de tiempos, memoria y filas de la ejecución
+
+    Primero van las etapas del motor, en orden, y después las funciones
+    de cada etapa de la más lenta a la más rápida. El tiempo de una etapa
+    incluye el de sus funciones. Las mediciones son las de la ejecución
+    actual salvo que se pasen otras.
+    """
+
+    juntas = juntar_mediciones(mediciones)
+    if not juntas:
+        return
+
+    print("\n" + "=" * 118)
+    print("METRICAS DE LA EJECUCION")
+    print("=" * 118)
+    print(f"{'Etapa / función':<34} {'Módulo':<19} {'Llamadas':>8} {'Tiempo':>9} {'CPU':>9} {'Pico mem':>10} "
+          f"{'Filas entrada':>13} {'Filas salida':>13}")
+    print("-" * 118)
+
+    def fila(total):
+        entrada = f"{total['filas_entrada']:,}" if total['filas_entrada'] is not None else '-'
+        salida = f"{total['filas_salida']:,}" if total['filas_salida'] is not None else '-'
+        print(f"{total['nombre'][:34]:<34} {(total['modulo'] or '-')[:19]:<19} {total['llamadas']:>8} "
+              f"{total['segundos']:>8.3f}s {total['segundos_cpu']:>8.3f}s {total['memoria_pico_mb']:>7.1f} MB "
+              f"{entrada:>13} {salida:>13}")
+
+    for total in juntas:
+        if total['nivel'] == 0:
+            fila(total)
+    funciones = sorted((total for total in juntas if total['nivel'] > 0), key=lambda total: -total['segundos'])
+    if funciones:
+        print("-" * 118)
+    for total in funciones:
+        fila(total)
+
+    if CONFIGURACION_INSTRUMENTACION['archivo']:
+        print(f"\nMediciones en JSON lines: {CONFIGURACION_INSTRUMENTACION['archivo']}")
@@ -8,135 +8,307 @@ Nivel: Desarrollador
 import pandas as pd
 import numpy as np
 import os
+import io
+import tempfile
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
 
-def eliminar_duplicados(df, nombre_archivo):
-    """Función para eliminar duplicados de un DataFrame"""
+from cache_etapas import cache_activa, calcular_clave, huella_archivo, leer_cache, guardar_cache
+from esquema import leer_csv, tabla_a_pandas, DECADAS, TIPO_DECADA
+from categorizar_generos import RUTA_REGLAS_GENEROS, categorizar_generos
+from linaje import crear_linaje, registrar_eliminadas, tabla_linaje, linaje_de_tabla
+from instrumentacion import instrumentar
+from registro import obtener_registro, mostrar_diagnostico
+
+registro = obtener_registro(__name__)
+
+# Lista de archivos CSV originales
+ARCHIVOS_CSV = [
+    'data/raw/dataset-of-60s.csv',
+    'data/raw/dataset-of-70s.csv', 
+    'data/raw/dataset-of-80s.csv',
+    'data/raw/dataset-of-90s.csv',
+    'data/raw/dataset-of-00s.csv',
+    'data/raw/dataset-of-10s.csv',
+    'data/raw/spotify_data.csv'
+]
+
+# Variaciones de nombres de géneros que significan lo mismo
+SINONIMOS_GENEROS = {
+    'hip hop': 'hip-hop',
+    'hiphop': 'hip-hop', 
+    'hip_hop': 'hip-hop',
+    'edm': 'electronic',
+    'electronic dance music': 'electronic',
+    'r&b': 'r-n-b',
+    'rnb': 'r-n-b',
+    'r and b': 'r-n-b'
+}
+
+# Nombres de columnas de los archivos de décadas y su nombre común
+MAPEO_COLUMNAS = {
+    'track': 'track_name',
+    'artist': 'artist_name',
+    'uri': 'track_id',
+    'Unnamed: 0': 'id'
+}
+
+# Reglas que eliminan filas, en el orden de linaje.REGLAS_LIMPIEZA (los
+# duplicados van antes). Una regla se aplica si el archivo tiene todas sus
+# columnas. Tipos:
+# - 'nulos': ninguna de las columnas vacía
+# - 'rango': la columna entre 'minimo' y 'maximo'
+# - 'fecha': el año se puede convertir en fecha (ver anios_convertibles)
+REGLAS_FILAS = [
+    {'regla': 'sin_energy_loudness', 'tipo': 'nulos', 'columnas': ['energy', 'loudness'],
+     'mensaje': 'sin energy o loudness'},
+    {'regla': 'energy_fuera_de_rango', 'tipo': 'rango', 'columnas': ['energy'], 'minimo': 0, 'maximo': 1,
+     'mensaje': 'con energy fuera de rango (0-1)'},
+    {'regla': 'loudness_fuera_de_rango', 'tipo': 'rango', 'columnas': ['loudness'], 'minimo': -60, 'maximo': 0,
+     'mensaje': 'con loudness fuera de rango (-60 a 0)'},
+    {'regla': 'sin_anio', 'tipo': 'nulos', 'columnas': ['year'], 'mensaje': 'sin año'},
+    {'regla': 'fecha_invalida', 'tipo': 'fecha', 'columnas': ['year'], 'mensaje': 'con fechas inválidas'},
+    {'regla': 'fecha_fuera_de_rango', 'tipo': 'rango', 'columnas': ['year'], 'minimo': 1920, 'maximo': 2024,
+     'mensaje': 'con fechas fuera de rango (1920-2024)'}
+]
+
+def obtener_claves_duplicados(df, columnas):
+    """Obtener la clave de cada fila para detectar duplicados entre bloques"""
+    
+    # Sin identificador: usar un hash de la fila completa
+    if columnas is None:
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+    
+    if len(columnas) == 1:
+        columna = df[columnas[0]]
+        # Los nulos se guardan como None para que el set los reconozca
+        return columna.astype(object).where(columna.notna(), None).to_numpy()
     
-    print(f"\n=== ELIMINANDO DUPLICADOS: {nombre_archivo} ===")
-    print(f"Registros antes: {len(df)}")
+    claves = np.empty(len(df), dtype=object)
+    claves[:] = list(zip(*(df[columna] for columna in columnas)))
+    return claves
+
+def elegir_claves_duplicados(columnas):
+    """Columnas que identifican una canción repetida (None = la fila entera) y su descripción"""
     
     # Opción 1: Si existe track_id, usarlo como clave única
-    if 'track_id' in df.columns:
-        duplicados = df.duplicated(subset=['track_id']).sum()
-        print(f"Duplicados por track_id: {duplicados}")
-        df = df.drop_duplicates(subset=['track_id'], keep='first')
+    if 'track_id' in columnas:
+        return ['track_id'], 'Duplicados por track_id'
     
     # Opción 2: Si existe uri, usarlo como clave única
-    elif 'uri' in df.columns:
-        duplicados = df.duplicated(subset=['uri']).sum()
-        print(f"Duplicados por URI: {duplicados}")
-        df = df.drop_duplicates(subset=['uri'], keep='first')
+    if 'uri' in columnas:
+        return ['uri'], 'Duplicados por URI'
     
     # Opción 3: Si no hay identificador único, usar nombre + artista
-    elif 'track' in df.columns and 'artist' in df.columns:
-        duplicados = df.duplicated(subset=['track', 'artist']).sum()
-        print(f"Duplicados por nombre+artista: {duplicados}")
-        df = df.drop_duplicates(subset=['track', 'artist'], keep='first')
+    if 'track' in columnas and 'artist' in columnas:
+        return ['track', 'artist'], 'Duplicados por nombre+artista'
     
     # Opción 4: Eliminar filas exactamente iguales
-    else:
-        duplicados = df.duplicated().sum()
-        print(f"Duplicados exactos: {duplicados}")
-        df = df.drop_duplicates(keep='first')
+    return None, 'Duplicados exactos'
+
+@instrumentar
+def marcar_duplicados(df, nombre_archivo, claves_vistas=None, linaje=None):
+    """Marcar las filas duplicadas de un DataFrame
+    
+    Si el archivo se limpia por bloques, claves_vistas es un set con las
+    claves de los bloques anteriores, así también se marcan los
+    duplicados que quedan en bloques distintos. Si se pasa linaje, se
+    anotan ahí las filas marcadas. Devuelve un array de booleanos (True
+    en las filas repetidas); las filas se quitan después, junto con las
+    de las otras reglas (ver filtrar_filas).
+    """
+    
+    registro.debug(f"\n=== BUSCANDO DUPLICADOS: {nombre_archivo} ===")
+    registro.debug(f"Registros antes: {len(df)}")
+    
+    columnas, descripcion = elegir_claves_duplicados(df.columns)
+    repetidas = df.duplicated(subset=columnas, keep='first').to_numpy()
+    
+    # Duplicados de filas que ya aparecieron en bloques anteriores
+    if claves_vistas is not None:
+        claves = obtener_claves_duplicados(df, columnas)
+        ya_vistas = np.fromiter((clave in claves_vistas for clave in claves), dtype=bool, count=len(claves))
+        repetidas = repetidas | ya_vistas
+        claves_vistas.update(claves[~repetidas])
+    
+    duplicados = int(repetidas.sum())
+    registrar_eliminadas(linaje, 'duplicados', duplicados)
+    registro.info(f"{descripcion}: {duplicados}")
+    registro.debug(f"Registros sin duplicados: {len(df) - duplicados}")
+    
+    return repetidas
+
+def anios_convertibles(anios):
+    """Años que se pueden convertir en fecha: enteros que entran en datetime64[ns] (1678-2262)"""
     
-    print(f"Registros después: {len(df)}")
-    print(f"Eliminados: {duplicados}")
+    valores = anios.to_numpy(dtype='float64', na_value=np.nan)
+    return (np.floor(valores) == valores) & (valores >= 1678) & (valores <= 2262)
+
+def cumple_regla(df, regla):
+    """Array de booleanos con las filas que cumplen una regla de REGLAS_FILAS"""
     
-    return df
+    if regla['tipo'] == 'nulos':
+        return np.logical_and.reduce([df[columna].notna().to_numpy() for columna in regla['columnas']])
+    
+    valores = df[regla['columnas'][0]]
+    if regla['tipo'] == 'fecha':
+        return anios_convertibles(valores)
+    
+    # Los nulos no cumplen el rango (ya los quitó una regla anterior)
+    cumple = (valores >= regla['minimo']) & (valores <= regla['maximo'])
+    return cumple.to_numpy(dtype=bool, na_value=False)
 
-def arreglar_valores_criticos(df):
-    """Arreglar valores faltantes en columnas críticas"""
+@instrumentar
+def marcar_filas_validas(df, repetidas, linaje=None):
+    """Juntar los duplicados y todas las reglas de REGLAS_FILAS en una sola máscara
     
-    print("\n--- Arreglando valores críticos ---")
+    Cada fila eliminada se cuenta en la primera regla que no cumple, igual
+    que cuando cada regla filtraba el DataFrame una tras otra. Devuelve un
+    array de booleanos con las filas que quedan.
+    """
     
-    # Si energy o loudness faltan, eliminar la canción
-    if 'energy' in df.columns and 'loudness' in df.columns:
-        antes = len(df)
-        df = df.dropna(subset=['energy', 'loudness'])
-        despues = len(df)
-        print(f"Eliminadas {antes - despues} canciones sin energy o loudness")
+    registro.debug("\n--- Revisando valores críticos y fechas ---")
     
-    # Verificar que energy esté entre 0 y 1
-    if 'energy' in df.columns:
-        antes = len(df)
-        df = df[(df['energy'] >= 0) & (df['energy'] <= 1)]
-        despues = len(df)
-        if antes != despues:
-            print(f"Eliminadas {antes - despues} canciones con energy fuera de rango (0-1)")
+    validas = ~repetidas
+    for regla in REGLAS_FILAS:
+        if not all(columna in df.columns for columna in regla['columnas']):
+            continue
+        
+        cumple = cumple_regla(df, regla)
+        eliminadas = int(np.count_nonzero(validas & ~cumple))
+        registrar_eliminadas(linaje, regla['regla'], eliminadas)
+        if eliminadas:
+            registro.info(f"Eliminadas {eliminadas} canciones {regla['mensaje']}")
+        validas &= cumple
+    
+    return validas
+
+@instrumentar
+def filtrar_filas(df, validas):
+    """Quedarse con las filas válidas copiando cada columna una sola vez
     
-    # Verificar que loudness esté entre -60 y 0
-    if 'loudness' in df.columns:
-        antes = len(df)
-        df = df[(df['loudness'] >= -60) & (df['loudness'] <= 0)]
-        despues = len(df)
-        if antes != despues:
-            print(f"Eliminadas {antes - despues} canciones con loudness fuera de rango (-60 a 0)")
+    Las columnas se sacan del DataFrame recibido a medida que se copian,
+    así en memoria están el original y una columna filtrada, no dos
+    DataFrames enteros; el DataFrame recibido queda vacío. Si todas las
+    filas son válidas se devuelve tal cual, sin copiar.
+    """
     
-    return df
+    if validas.all():
+        return df
+    
+    indice = df.index[validas]
+    filtradas = {}
+    for columna in list(df.columns):
+        filtradas[columna] = df.pop(columna).array[validas]
+    
+    return pd.DataFrame(filtradas, index=indice, copy=False)
+
+def fecha_desde_anio(anios):
+    """Crear la fecha del 1 de enero de cada año sin pasar por texto
+    
+    Los años que no son enteros o que no entran en datetime64[ns]
+    (1678-2262) quedan como NaT, igual que al convertir "año-01-01".
+    """
+    
+    valores = anios.to_numpy(dtype='float64', na_value=np.nan)
+    validos = anios_convertibles(anios)
+    
+    # datetime64[Y] cuenta años desde 1970
+    anios_validos = np.where(validos, valores, 1970).astype('int64')
+    fechas = (anios_validos - 1970).astype('datetime64[Y]').astype('datetime64[ns]')
+    fechas[~validos] = np.datetime64('NaT')
+    
+    return pd.Series(fechas, index=anios.index)
+
+def decada_desde_anio(anios):
+    """Calcular la década de cada año como categoría ordenada (ej: 1985 → "1980s")
+    
+    Se calcula con aritmética entera y códigos de categoría, sin armar
+    un texto por fila. Si hay años fuera de 1920-2029 se agregan las
+    décadas que hagan falta.
+    """
+    
+    valores = anios.to_numpy(dtype='float64', na_value=np.nan)
+    nulos = np.isnan(valores)
+    decadas = (np.floor(np.where(nulos, 0, valores) / 10) * 10).astype('int64')
+    
+    primera, ultima = 1920, 2020
+    if not nulos.all():
+        primera = min(primera, int(decadas[~nulos].min()))
+        ultima = max(ultima, int(decadas[~nulos].max()))
+    
+    categorias = [f"{decada}s" for decada in range(primera, ultima + 10, 10)]
+    tipo = TIPO_DECADA if categorias == DECADAS else pd.CategoricalDtype(categorias, ordered=True)
+    
+    codigos = np.where(nulos, -1, (decadas - primera) // 10)
+    return pd.Series(pd.Categorical.from_codes(codigos, dtype=tipo), index=anios.index)
 
+@instrumentar
 def arreglar_fechas(df):
-    """Arreglar fechas de lanzamiento"""
+    """Crear la fecha de lanzamiento a partir del año
     
-    print("\n--- Arreglando fechas ---")
+    Las canciones sin año, con años que no son fechas o fuera de
+    1920-2024 ya se quitaron (ver REGLAS_FILAS).
+    """
+    
+    registro.debug("\n--- Arreglando fechas ---")
     
-    # Si hay columna year, crear release_date
     if 'year' in df.columns:
-        # Eliminar canciones sin año
-        antes = len(df)
-        df = df.dropna(subset=['year'])
-        despues = len(df)
-        if antes != despues:
-            print(f"Eliminadas {antes - despues} canciones sin año")
-        
-        # Crear release_date a partir del año
-        df['release_date'] = pd.to_datetime(df['year'].astype(str) + '-01-01', errors='coerce')
-        
-        # Eliminar fechas que no se pudieron convertir
-        antes = len(df)
-        df = df.dropna(subset=['release_date'])
-        despues = len(df)
-        if antes != despues:
-            print(f"Eliminadas {antes - despues} canciones con fechas inválidas")
-        
-        # Eliminar fechas muy raras (antes de 1920 o después de 2024)
-        antes = len(df)
-        df = df[(df['release_date'].dt.year >= 1920) & (df['release_date'].dt.year <= 2024)]
-        despues = len(df)
-        if antes != despues:
-            print(f"Eliminadas {antes - despues} canciones con fechas fuera de rango (1920-2024)")
+        df['release_date'] = fecha_desde_anio(df['year'])
     
     return df
 
+def transformar_categorias(serie, funcion):
+    """Aplicar una transformación de texto a cada categoría distinta, no a cada fila
+    
+    Si dos categorías quedan iguales (ej: "Pop" y "pop "), se unen en una.
+    """
+    
+    nuevas = funcion(pd.Series(serie.cat.categories, dtype=object))
+    codigos_nuevos, categorias = pd.factorize(nuevas)
+    
+    codigos = serie.cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, codigos_nuevos[codigos], -1)
+    
+    return pd.Series(pd.Categorical.from_codes(codigos, categorias), index=serie.index)
+
+@instrumentar
 def arreglar_generos(df):
     """Arreglar géneros faltantes"""
     
-    print("\n--- Arreglando géneros ---")
+    registro.debug("\n--- Arreglando géneros ---")
     
     # Si no hay columna genre, crear una
     if 'genre' not in df.columns:
         df['genre'] = 'Unknown'
-        print("Creada columna genre con valor 'Unknown'")
+        registro.debug("Creada columna genre con valor 'Unknown'")
     else:
-        # Si no hay género, poner "Unknown"
-        antes = df['genre'].isnull().sum()
+        # Si no hay género, poner "Unknown" (los nulos solo se cuentan para mostrarlos)
+        antes = df['genre'].isnull().sum() if mostrar_diagnostico() else 0
+        if isinstance(df['genre'].dtype, pd.CategoricalDtype) and 'Unknown' not in df['genre'].cat.categories:
+            df['genre'] = df['genre'].cat.add_categories(['Unknown'])
         df['genre'] = df['genre'].fillna('Unknown')
         if antes > 0:
-            print(f"Reemplazados {antes} géneros nulos con 'Unknown'")
+            registro.info(f"Reemplazados {antes} géneros nulos con 'Unknown'")
         
         # Limpiar géneros (quitar espacios, convertir a minúsculas)
-        df['genre'] = df['genre'].str.strip().str.lower()
+        if isinstance(df['genre'].dtype, pd.CategoricalDtype):
+            df['genre'] = transformar_categorias(df['genre'], lambda generos: generos.str.strip().str.lower())
+        else:
+            df['genre'] = df['genre'].str.strip().str.lower()
     
     return df
 
+@instrumentar
 def arreglar_energy(df):
     """Arreglar valores de energy"""
     
-    print("\n--- Arreglando energy ---")
+    registro.debug("\n--- Arreglando energy ---")
     
     if 'energy' in df.columns:
         # Si energy está en escala 0-100, convertir a 0-1
         if df['energy'].max() > 1:
-            print("Convirtiendo energy de escala 0-100 a 0-1")
+            registro.debug("Convirtiendo energy de escala 0-100 a 0-1")
             df['energy'] = df['energy'] / 100
         
         # Asegurar que esté entre 0 y 1
@@ -144,10 +316,11 @@ def arreglar_energy(df):
     
     return df
 
+@instrumentar
 def arreglar_loudness(df):
     """Arreglar valores de loudness"""
     
-    print("\n--- Arreglando loudness ---")
+    registro.debug("\n--- Arreglando loudness ---")
     
     if 'loudness' in df.columns:
         # Asegurar que esté entre -60 y 0
@@ -156,119 +329,61 @@ def arreglar_loudness(df):
         # Crear una versión normalizada entre 0 y 1 (para combinar con energy)
         df['loudness_normalized'] = (df['loudness'] + 60) / 60
         df['loudness_normalized'] = df['loudness_normalized'].clip(0, 1)
-        print("Creada columna loudness_normalized (escala 0-1)")
+        registro.debug("Creada columna loudness_normalized (escala 0-1)")
     
     return df
 
+@instrumentar
 def crear_columnas_fecha(df):
     """Crear columnas útiles a partir de la fecha de lanzamiento"""
     
-    print("\n--- Creando columnas de fecha ---")
+    registro.debug("\n--- Creando columnas de fecha ---")
     
     if 'release_date' in df.columns:
         # Extraer el año
         df['release_year'] = df['release_date'].dt.year
         
         # Crear década (ej: 1985 → "1980s")
-        def obtener_decada(año):
-            if pd.isna(año):
-                return None
-            decada = (año // 10) * 10
-            return f"{decada}s"
-        
-        df['release_decade'] = df['release_year'].apply(obtener_decada)
-        print("Creadas columnas release_year y release_decade")
+        df['release_decade'] = decada_desde_anio(df['release_year'])
+        registro.debug("Creadas columnas release_year y release_decade")
     
     return df
 
+@instrumentar
 def organizar_generos(df):
-    """Organizar y limpiar géneros musicales"""
+    """Organizar y limpiar géneros musicales
+    
+    Las operaciones de texto se hacen sobre los géneros distintos (las
+    categorías) y no fila por fila. Las categorías principales salen de
+    las reglas de reglas_generos.csv.
+    """
     
-    print("\n--- Organizando géneros ---")
+    registro.debug("\n--- Organizando géneros ---")
     
     if 'genre' in df.columns:
-        # 1. Limpiar géneros (minúsculas, sin espacios extra)
-        df['genre_clean'] = df['genre'].str.lower().str.strip()
+        genero = df['genre']
+        if not isinstance(genero.dtype, pd.CategoricalDtype):
+            genero = genero.astype('category')
         
+        # 1. Limpiar géneros (minúsculas, sin espacios extra)
         # 2. Unificar variaciones comunes
-        df['genre_clean'] = df['genre_clean'].replace({
-            'hip hop': 'hip-hop',
-            'hiphop': 'hip-hop', 
-            'hip_hop': 'hip-hop',
-            'edm': 'electronic',
-            'electronic dance music': 'electronic',
-            'r&b': 'r-n-b',
-            'rnb': 'r-n-b',
-            'r and b': 'r-n-b'
-        })
+        df['genre_clean'] = transformar_categorias(
+            genero, lambda generos: generos.str.lower().str.strip().replace(SINONIMOS_GENEROS))
         
         # 3. Crear categorías principales
-        def asignar_categoria_genero(genero):
-            if pd.isna(genero):
-                return 'Other'
-            
-            genero = genero.lower()
-            
-            # Pop
-            if any(x in genero for x in ['pop', 'dance-pop', 'electropop', 'synthpop']):
-                return 'Pop'
-            
-            # Rock  
-            elif any(x in genero for x in ['rock', 'indie', 'alternative', 'hard-rock', 'metal', 'alt-rock']):
-                return 'Rock'
-            
-            # Hip-Hop
-            elif any(x in genero for x in ['hip-hop', 'rap', 'trap']):
-                return 'Hip-Hop'
-            
-            # Electronic
-            elif any(x in genero for x in ['electronic', 'house', 'techno', 'dubstep', 'trance']):
-                return 'Electronic'
-            
-            # R&B
-            elif any(x in genero for x in ['r-n-b', 'soul', 'neo-soul']):
-                return 'R&B'
-            
-            # Country
-            elif any(x in genero for x in ['country', 'folk', 'americana']):
-                return 'Country'
-            
-            # Latin
-            elif any(x in genero for x in ['latin', 'reggaeton', 'salsa', 'bachata']):
-                return 'Latin'
-            
-            # Jazz
-            elif any(x in genero for x in ['jazz', 'blues']):
-                return 'Jazz'
-            
-            # Classical
-            elif any(x in genero for x in ['classical', 'soundtrack', 'instrumental']):
-                return 'Classical'
-            
-            # Si no coincide con nada, poner "Other"
-            else:
-                return 'Other'
-        
-        df['main_genre'] = df['genre_clean'].apply(asignar_categoria_genero)
-        print("Creada columna main_genre con categorías principales")
+        df['main_genre'] = categorizar_generos(df['genre_clean'])
+        registro.debug("Creada columna main_genre con categorías principales")
     
     return df
 
+@instrumentar
 def estandarizar_nombres_columnas(df, archivo):
     """Estandarizar nombres de columnas para que todos los archivos tengan la misma estructura"""
     
-    print(f"\n--- Estandarizando nombres de columnas para {archivo} ---")
+    registro.debug(f"\n--- Estandarizando nombres de columnas para {archivo} ---")
     
-    # Mapeo de nombres de columnas
-    mapeo_columnas = {
-        'track': 'track_name',
-        'artist': 'artist_name',
-        'uri': 'track_id',
-        'Unnamed: 0': 'id'
-    }
-    
-    # Renombrar columnas
-    df = df.rename(columns=mapeo_columnas)
+    # Renombrar columnas (en el mismo DataFrame, sin copiar los datos)
+    df.rename(columns=MAPEO_COLUMNAS, inplace=True)
     
     # Si no hay track_id pero hay uri, usar uri como track_id
     if 'track_id' not in df.columns and 'uri' in df.columns:
@@ -282,82 +397,319 @@ def estandarizar_nombres_columnas(df, archivo):
     if 'artist_name' not in df.columns and 'artist' in df.columns:
         df['artist_name'] = df['artist']
     
-    print("Nombres de columnas estandarizados")
+    registro.debug("Nombres de columnas estandarizados")
+    
+    return df
+
+@instrumentar
+def limpiar_bloque(df, archivo, claves_vistas=None, linaje=None):
+    """Aplicar todas las funciones de limpieza a un archivo completo o a un bloque
+    
+    Si se pasa linaje (ver linaje.py), se suman ahí las filas leídas, las
+    eliminadas por cada regla y las que quedan limpias.
+    
+    Primero se marcan las filas que se quedan (duplicados y REGLAS_FILAS
+    en una sola máscara) y se filtran una sola vez; las columnas nuevas
+    se calculan después, solo para esas filas. El DataFrame recibido se
+    modifica y queda vacío (ver filtrar_filas).
+    """
+    
+    if linaje is not None:
+        linaje['filas_leidas'] += len(df)
+    
+    df = estandarizar_nombres_columnas(df, archivo)
+    repetidas = marcar_duplicados(df, archivo, claves_vistas, linaje)
+    validas = marcar_filas_validas(df, repetidas, linaje)
+    df = filtrar_filas(df, validas)
+    df = arreglar_fechas(df)
+    df = arreglar_generos(df)
+    df = arreglar_energy(df)
+    df = arreglar_loudness(df)
+    df = crear_columnas_fecha(df)
+    df = organizar_generos(df)
+    
+    if linaje is not None:
+        linaje['filas_limpias'] += len(df)
+    
+    return df
+
+def limpiar_archivo_por_bloques(archivo, tamano_bloque, linaje=None):
+    """Leer y limpiar un archivo por bloques de tamano_bloque filas
+    
+    Es un generador que devuelve cada bloque ya limpio, así la memoria
+    depende del tamaño del bloque y no del tamaño del archivo. Los
+    duplicados entre bloques se detectan con el set de claves ya vistas.
+    """
+    
+    claves_vistas = set()
+    for numero, bloque in enumerate(leer_csv(archivo, chunksize=tamano_bloque), 1):
+        registro.debug(f"\n--- Bloque {numero}: {len(bloque)} registros ---")
+        yield limpiar_bloque(bloque, archivo, claves_vistas, linaje)
+
+def unir_bloques(bloques):
+    """Unir los bloques limpios de un archivo sin perder las columnas categóricas
+    
+    Cada bloque tiene sus propias categorías (ej: géneros distintos), y
+    pd.concat las convertiría a texto; union_categoricals las junta.
+    """
+    
+    from pandas.api.types import union_categoricals
+    
+    df = pd.concat(bloques)
+    for columna in bloques[0].columns:
+        if isinstance(bloques[0][columna].dtype, pd.CategoricalDtype) and not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            unidas = union_categoricals([bloque[columna] for bloque in bloques])
+            df[columna] = pd.Series(unidas, index=df.index)
     
     return df
 
-def limpiar_archivo(archivo):
-    """Función principal para limpiar un archivo"""
+def limpiar_archivo_a_parquet(archivo, destino, tamano_bloque=100000):
+    """Limpiar un archivo por bloques y escribir cada bloque directo a Parquet
+    
+    Nunca se tiene el archivo completo en memoria, ni crudo ni limpio.
+    Devuelve la cantidad de registros escritos.
+    """
     
-    print(f"\n{'='*60}")
-    print(f"LIMPIANDO ARCHIVO: {archivo}")
-    print(f"{'='*60}")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
     
+    escritor = None
+    total = 0
     try:
-        # Cargar el archivo
-        df = pd.read_csv(archivo)
-        print(f"Archivo cargado: {len(df)} registros")
-        
-        # Aplicar todas las funciones de limpieza
-        df = estandarizar_nombres_columnas(df, archivo)
-        df = eliminar_duplicados(df, archivo)
-        df = arreglar_valores_criticos(df)
-        df = arreglar_fechas(df)
-        df = arreglar_generos(df)
-        df = arreglar_energy(df)
-        df = arreglar_loudness(df)
-        df = crear_columnas_fecha(df)
-        df = organizar_generos(df)
+        for bloque in limpiar_archivo_por_bloques(archivo, tamano_bloque):
+            # Todos los bloques usan el esquema del primero
+            esquema = escritor.schema if escritor is not None else None
+            tabla = pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabla.schema)
+            escritor.write_table(tabla)
+            total += len(bloque)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    
+    registro.info(f"OK: Guardado: {destino} ({total:,} registros)")
+    return total
+
+@instrumentar
+def limpiar_archivo(archivo, tamano_bloque=None, linaje=None):
+    """Función principal para limpiar un archivo
+    
+    Si se indica tamano_bloque, el archivo se lee y se limpia por bloques
+    en vez de cargarlo entero (el resultado es el mismo). Si se pasa
+    linaje (un diccionario de crear_linaje), se completa con los conteos.
+    """
+    
+    registro.info(f"\n{'='*60}")
+    registro.info(f"LIMPIANDO ARCHIVO: {archivo}")
+    registro.info(f"{'='*60}")
+    
+    try:
+        if tamano_bloque:
+            registro.info(f"Leyendo por bloques de {tamano_bloque:,} registros")
+            df = unir_bloques(list(limpiar_archivo_por_bloques(archivo, tamano_bloque, linaje)))
+        else:
+            # Cargar el archivo (solo las columnas que se usan, con tipos compactos)
+            df = leer_csv(archivo)
+            registro.info(f"Archivo cargado: {len(df)} registros")
+            
+            # Aplicar todas las funciones de limpieza
+            df = limpiar_bloque(df, archivo, linaje=linaje)
         
-        print(f"\nArchivo limpiado: {len(df)} registros")
-        print(f"Columnas finales: {list(df.columns)}")
+        registro.info(f"\nArchivo limpiado: {len(df)} registros")
+        registro.debug(f"Columnas finales: {list(df.columns)}")
         
         return df
         
     except Exception as e:
-        print(f"ERROR al limpiar {archivo}: {str(e)}")
+        registro.error(f"ERROR al limpiar {archivo}: {str(e)}")
         return None
 
-def limpiar_todos_los_archivos():
-    """Limpiar todos los archivos CSV"""
+def clave_limpieza(archivo):
+    """Clave de caché de la limpieza de un archivo (contenido + código)"""
+    entradas = [huella_archivo(archivo), huella_archivo(RUTA_REGLAS_GENEROS)]
+    return calcular_clave('limpiar_archivo', entradas, ['limpiar_datos', 'esquema', 'categorizar_generos', 'linaje'])
+
+def leer_limpieza_de_cache(archivo, linaje=None):
+    """Devolver el archivo ya limpio desde la caché, o None si no está
+    
+    Si se pasa linaje, se completa con el linaje guardado junto al archivo.
+    """
+    
+    if not cache_activa():
+        return None
+    
+    guardado = leer_cache(clave_limpieza(archivo))
+    if guardado is None:
+        return None
+    
+    df = guardado['df']
+    if linaje is not None:
+        linaje.update(linaje_de_tabla(guardado['linaje'], archivo))
+    registro.info(f"\nUsando caché para {archivo}: {len(df)} registros")
+    return df
+
+def guardar_limpieza_en_cache(archivo, df, linaje):
+    """Guardar en la caché un archivo ya limpio, junto con su linaje"""
+    if cache_activa() and df is not None:
+        guardar_cache(clave_limpieza(archivo), {'df': df, 'linaje': tabla_linaje({archivo: linaje})})
+
+def limpiar_archivo_con_cache(archivo, tamano_bloque=None, linaje=None):
+    """Limpiar un archivo, reutilizando el resultado guardado si ni el archivo ni el código cambiaron"""
+    
+    if linaje is None:
+        linaje = crear_linaje()
+    
+    df = leer_limpieza_de_cache(archivo, linaje)
+    if df is not None:
+        return df
+    
+    df = limpiar_archivo(archivo, tamano_bloque, linaje)
+    guardar_limpieza_en_cache(archivo, df, linaje)
+    
+    return df
+
+def guardar_arrow(df, ruta):
+    """Guardar un DataFrame en formato Arrow (IPC), conservando índice y tipos"""
+    
+    import pyarrow as pa
+    
+    tabla = pa.Table.from_pandas(df)
+    with pa.OSFile(ruta, 'wb') as destino:
+        with pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+def cargar_arrow(ruta):
+    """Leer un DataFrame guardado con guardar_arrow"""
+    
+    import pyarrow as pa
+    
+    with pa.memory_map(ruta, 'r') as origen:
+        return tabla_a_pandas(pa.ipc.open_file(origen).read_all())
+
+def limpiar_archivo_en_proceso(archivo, directorio_temporal, tamano_bloque=None):
+    """Limpiar un archivo dentro de un proceso del pool
     
-    print("INICIANDO LIMPIEZA DE DATOS")
-    print("=" * 60)
+    El resultado se escribe como archivo Arrow en vez de devolver el
+    DataFrame, para no serializarlo con pickle. También se devuelve lo que
+    se imprimió, para mostrarlo en orden y no mezclado entre procesos, y
+    el linaje del archivo.
+    """
     
-    # Lista de archivos CSV
-    archivos = [
-        'data/raw/dataset-of-60s.csv',
-        'data/raw/dataset-of-70s.csv', 
-        'data/raw/dataset-of-80s.csv',
-        'data/raw/dataset-of-90s.csv',
-        'data/raw/dataset-of-00s.csv',
-        'data/raw/dataset-of-10s.csv',
-        'data/raw/spotify_data.csv'
-    ]
+    linaje = crear_linaje()
+    salida = io.StringIO()
+    with redirect_stdout(salida):
+        df = limpiar_archivo(archivo, tamano_bloque, linaje)
+    
+    if df is None:
+        return None, salida.getvalue(), linaje
+    
+    ruta = os.path.join(directorio_temporal, os.path.basename(archivo) + '.arrow')
+    guardar_arrow(df, ruta)
+    
+    return ruta, salida.getvalue(), linaje
+
+@instrumentar
+def limpiar_archivos_en_paralelo(archivos, trabajadores, tamano_bloque=None, linajes=None):
+    """Limpiar varios archivos a la vez usando un pool de procesos
+    
+    Si se pasa linajes (un diccionario), se guarda ahí el linaje de cada archivo.
+    """
+    
+    registro.info(f"\nLimpiando {len(archivos)} archivos con {trabajadores} procesos...")
+    
+    # Los archivos más grandes primero, así el tiempo total depende del
+    # archivo más grande y no de la suma de todos
+    por_tamano = sorted(archivos, key=os.path.getsize, reverse=True)
     
-    # Limpiar cada archivo
     datos_limpios = {}
-    for archivo in archivos:
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+            futuros = {archivo: pool.submit(limpiar_archivo_en_proceso, archivo, directorio_temporal, tamano_bloque)
+                       for archivo in por_tamano}
+            
+            # Leer los resultados en el orden original de los archivos
+            for archivo in archivos:
+                ruta, salida, linaje = futuros[archivo].result()
+                print(salida, end='')
+                if linajes is not None:
+                    linajes[archivo] = linaje
+                if ruta is not None:
+                    datos_limpios[archivo] = cargar_arrow(ruta)
+    
+    return datos_limpios
+
+def limpiar_todos_los_archivos(trabajadores=1, tamano_bloque=None, linajes=None):
+    """Limpiar todos los archivos CSV
+    
+    Con trabajadores > 1 los archivos que no están en la caché se limpian
+    en paralelo, cada uno en su propio proceso. Con tamano_bloque cada
+    archivo se lee por bloques en vez de cargarlo entero.
+    
+    Devuelve los datos limpios {archivo: DataFrame}. Si se pasa linajes
+    (un diccionario), se guarda ahí el linaje de cada archivo (filas
+    leídas, eliminadas por regla y limpias); ver limpiar_con_linaje.
+    """
+    
+    registro.info("INICIANDO LIMPIEZA DE DATOS")
+    registro.info("=" * 60)
+    
+    # Primero buscar en la caché
+    encontrados = {}
+    linajes = {} if linajes is None else linajes
+    pendientes = []
+    for archivo in ARCHIVOS_CSV:
         if os.path.exists(archivo):
-            df_limpio = limpiar_archivo(archivo)
+            linaje = crear_linaje()
+            df_limpio = leer_limpieza_de_cache(archivo, linaje)
             if df_limpio is not None:
-                datos_limpios[archivo] = df_limpio
+                encontrados[archivo] = df_limpio
+                linajes[archivo] = linaje
+            else:
+                pendientes.append(archivo)
         else:
-            print(f"ERROR: {archivo} no encontrado")
+            registro.error(f"ERROR: {archivo} no encontrado")
     
-    print(f"\n{'='*60}")
-    print("RESUMEN DE LIMPIEZA:")
-    print(f"{'='*60}")
+    # Limpiar los que faltan
+    if trabajadores > 1 and len(pendientes) > 1:
+        encontrados.update(limpiar_archivos_en_paralelo(pendientes, trabajadores, tamano_bloque, linajes))
+        for archivo in pendientes:
+            guardar_limpieza_en_cache(archivo, encontrados.get(archivo), linajes[archivo])
+    else:
+        for archivo in pendientes:
+            linaje = crear_linaje()
+            df_limpio = limpiar_archivo(archivo, tamano_bloque, linaje)
+            if df_limpio is not None:
+                encontrados[archivo] = df_limpio
+                linajes[archivo] = linaje
+                guardar_limpieza_en_cache(archivo, df_limpio, linaje)
+    
+    # Mantener el orden original de los archivos
+    datos_limpios = {archivo: encontrados[archivo] for archivo in ARCHIVOS_CSV if archivo in encontrados}
+    
+    registro.info(f"\n{'='*60}")
+    registro.info("RESUMEN DE LIMPIEZA:")
+    registro.info(f"{'='*60}")
     
     total_registros = 0
     for archivo, df in datos_limpios.items():
         total_registros += len(df)
-        print(f"{archivo}: {len(df):,} registros")
+        registro.info(f"{archivo}: {len(df):,} registros (de {linajes[archivo]['filas_leidas']:,} leídos)")
     
-    print(f"\nTOTAL DE REGISTROS LIMPIOS: {total_registros:,}")
-    print("\nLimpieza completada!")
+    registro.info(f"\nTOTAL DE REGISTROS LIMPIOS: {total_registros:,}")
+    registro.info("\nLimpieza completada!")
     
     return datos_limpios
 
+def limpiar_con_linaje(trabajadores=1, tamano_bloque=None):
+    """Limpiar todos los archivos y devolver también la tabla de linaje
+
+    Es la etapa de limpieza del pipeline: devuelve (datos_limpios, linaje).
+    """
+
+    linajes = {}
+    datos_limpios = limpiar_todos_los_archivos(trabajadores, tamano_bloque, linajes)
+    return datos_limpios, tabla_linaje({archivo: linajes[archivo] for archivo in datos_limpios})
+
 if __name__ == "__main__":
     datos_limpios = limpiar_todos_los_archivos()
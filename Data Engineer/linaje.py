@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Linaje de los datos: cuántas filas se leyeron de cada archivo y por qué se eliminaron
+Nivel: Desarrollador
+
+La limpieza anota, para cada archivo original, las filas leídas, las
+eliminadas por cada regla y las que quedaron limpias. Con eso el
+README.md y metadata.json muestran de dónde sale cada número sin volver
+a leer los CSV originales.
+
+Durante la limpieza el linaje de un archivo es un diccionario (ver
+crear_linaje); al terminar se junta en una tabla con una fila por archivo.
+"""
+
+import pandas as pd
+
+# Reglas de limpieza que eliminan filas, en el orden en que se aplican
+REGLAS_LIMPIEZA = {
+    'duplicados': 'Duplicados dentro del archivo',
+    'sin_energy_loudness': 'Sin energy o loudness',
+    'energy_fuera_de_rango': 'Energy fuera de rango (0-1)',
+    'loudness_fuera_de_rango': 'Loudness fuera de rango (-60 a 0)',
+    'sin_anio': 'Sin año',
+    'fecha_invalida': 'Fecha inválida',
+    'fecha_fuera_de_rango': 'Fecha fuera de rango (1920-2024)'
+}
+
+COLUMNAS_LINAJE = ['archivo', 'filas_leidas'] + list(REGLAS_LIMPIEZA) + ['filas_limpias']
+
+def crear_linaje():
+    """Linaje vacío de un archivo (todos los contadores en cero)"""
+    return {columna: 0 for columna in COLUMNAS_LINAJE[1:]}
+
+def registrar_eliminadas(linaje, regla, cantidad):
+    """Sumar filas eliminadas por una regla (no hace nada si no se lleva linaje)"""
+    if linaje is not None:
+        linaje[regla] += int(cantidad)
+
+def tabla_linaje(linajes):
+    """Juntar los linajes {archivo: diccionario} en una tabla con una fila por archivo"""
+
+    filas = [{'archivo': archivo, **linaje} for archivo, linaje in linajes.items()]
+    return pd.DataFrame(filas, columns=COLUMNAS_LINAJE).astype({columna: 'int64' for columna in COLUMNAS_LINAJE[1:]})
+
+def linaje_de_tabla(tabla, archivo):
+    """Diccionario con el linaje de un archivo, o None si no está en la tabla"""
+
+    filas = tabla[tabla['archivo'] == archivo]
+    if filas.empty:
+        return None
+    return {columna: int(filas[columna].iloc[0]) for columna in COLUMNAS_LINAJE[1:]}
+
+def actualizar_linaje(tabla, linajes, agregados=(), eliminados=(), archivos=None):
+    """Actualizar la tabla con lo que se limpió en una ejecución incremental
+
+    Para los archivos en agregados, linajes tiene solo las filas nuevas
+    y se suman a las anteriores; para los demás se reemplaza la fila.
+    Los archivos eliminados salen de la tabla. Si se pasa archivos, las
+    filas quedan en ese orden; si no, los archivos nuevos van al final.
+    """
+
+    anteriores = {archivo: linaje_de_tabla(tabla, archivo) for archivo in tabla['archivo']}
+
+    for archivo, linaje in linajes.items():
+        if archivo in agregados and archivo in anteriores:
+            linaje = {columna: anteriores[archivo][columna] + linaje[columna] for columna in linaje}
+        anteriores[archivo] = linaje
+
+    for archivo in eliminados:
+        anteriores.pop(archivo, None)
+
+    if archivos is not None:
+        anteriores = {archivo: anteriores[archivo] for archivo in archivos if archivo in anteriores}
+
+    return tabla_linaje(anteriores)
+
+def resumir_linaje(tabla, filas_finales):
+    """Totales del linaje para metadata.json y el README
+
+    Las filas que se pierden entre la limpieza y el dataset final son
+    canciones repetidas en varios archivos que se unificaron en una.
+    """
+
+    total_limpias = int(tabla['filas_limpias'].sum())
+
+    return {
+        'filas_leidas': int(tabla['filas_leidas'].sum()),
+        'eliminadas_por_regla': {regla: int(tabla[regla].sum()) for regla in REGLAS_LIMPIEZA},
+        'filas_limpias': total_limpias,
+        'unificadas_entre_archivos': total_limpias - int(filas_finales),
+        'filas_finales': int(filas_finales),
+        'archivos': {fila['archivo']: {columna: int(fila[columna]) for columna in COLUMNAS_LINAJE[1:]}
+                     for _, fila in tabla.iterrows()}
+    }
+
+def linaje_en_markdown(resumen):
+    """Texto Markdown con el linaje (una tabla por archivo y los totales por regla)"""
+
+    lineas = [
+        "| Archivo | Leídas | Eliminadas | Limpias |",
+        "|---|---:|---:|---:|"
+    ]
+    for archivo, linaje in resumen['archivos'].items():
+        eliminadas = sum(linaje[regla] for regla in REGLAS_LIMPIEZA)
+        lineas.append(f"| `{archivo}` | {linaje['filas_leidas']:,} | {eliminadas:,} | {linaje['filas_limpias']:,} |")
+
+    lineas.append("")
+    lineas.append("Filas eliminadas por regla:")
+    for regla, descripcion in REGLAS_LIMPIEZA.items():
+        lineas.append(f"- {descripcion}: {resumen['eliminadas_por_regla'][regla]:,}")
+    lineas.append(f"- Canciones repetidas entre archivos (unificadas): {resumen['unificadas_entre_archivos']:,}")
+
+    return "\n".join(lineas)
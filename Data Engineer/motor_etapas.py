@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de etapas para el pipeline de Spotify
+Nivel: Desarrollador
+
+Cada etapa declara qué datos necesita (entradas) y qué datos produce
+(salidas). El motor guarda todo en un diccionario compartido (contexto),
+le pasa a cada etapa los DataFrames que ya están en memoria y ejecuta
+cada etapa una sola vez. Cada ejecución se mide con instrumentacion.py
+(tiempo, memoria y filas) cuando las métricas están activas.
+
+Si una etapa declara configuración de caché, el motor calcula su clave
+antes de ejecutar nada. Así puede saltar directamente a la primera etapa
+que cambió y leer de la caché solo lo que esa etapa necesita.
+"""
+
+import os
+
+from cache_etapas import cache_activa, calcular_clave, huella_archivo, existe_en_cache, leer_cache, guardar_cache
+from instrumentacion import medir_etapa, contar_filas
+from registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+
+def crear_etapa(nombre, descripcion, funcion, entradas=None, salidas=None, cache=None):
+    """Crear la definición de una etapa del pipeline
+
+    cache es un diccionario opcional con:
+    - 'modulos': módulos cuyo código define la versión de la etapa
+    - 'archivos': archivos de entrada cuyo contenido forma parte de la clave
+    - 'parametros': parámetros que cambian el resultado
+    - 'persistir': si el motor debe guardar las salidas (por defecto True)
+    """
+
+    return {
+        'nombre': nombre,
+        'descripcion': descripcion,
+        'funcion': funcion,
+        'entradas': list(entradas or []),
+        'salidas': list(salidas or []),
+        'cache': cache
+    }
+
+
+def calcular_claves(etapas):
+    """Calcular la clave de caché de cada etapa sin ejecutar nada
+
+    La clave de una etapa depende de las claves de las etapas que producen
+    sus entradas, así que un cambio se propaga hacia adelante. Si una
+    entrada no tiene clave, la etapa tampoco la tiene (no se cachea).
+    """
+
+    claves_salidas = {}
+    claves_etapas = {}
+
+    for etapa in etapas:
+        clave = None
+        config = etapa['cache']
+
+        if config is not None and cache_activa():
+            claves_entradas = [claves_salidas.get(entrada) for entrada in etapa['entradas']]
+
+            if all(claves_entradas):
+                huellas = [f"{archivo}:{huella_archivo(archivo)}"
+                           for archivo in config.get('archivos', []) if os.path.exists(archivo)]
+                clave = calcular_clave(etapa['nombre'], claves_entradas + huellas,
+                                       config['modulos'], config.get('parametros'))
+
+        claves_etapas[etapa['nombre']] = clave
+        for salida in etapa['salidas']:
+            claves_salidas[salida] = clave
+
+    return claves_etapas
+
+
+def planificar_etapas(etapas, claves_etapas, completas=()):
+    """Decidir qué etapas hay que ejecutar
+
+    Se recorre el pipeline de atrás hacia adelante: una etapa se ejecuta si
+    no se puede cachear, o si alguien necesita sus salidas y no están en
+    la caché. Las etapas cuyo resultado no necesita nadie se saltan, igual
+    que las 'completas' (ya ejecutadas, al volver a planificar).
+    """
+
+    necesarias = set()
+    a_ejecutar = set()
+
+    for etapa in reversed(etapas):
+        clave = claves_etapas[etapa['nombre']]
+        persistir = etapa['cache'] is not None and etapa['cache'].get('persistir', True)
+
+        if etapa['nombre'] in completas:
+            ejecutar = False
+        elif clave is None:
+            ejecutar = True
+        elif not any(salida in necesarias for salida in etapa['salidas']):
+            ejecutar = False
+        else:
+            ejecutar = not (persistir and existe_en_cache(clave))
+
+        if ejecutar:
+            a_ejecutar.add(etapa['nombre'])
+            necesarias.update(etapa['entradas'])
+
+    return a_ejecutar
+
+
+def ejecutar_etapas(etapas, contexto=None):
+    """Ejecutar las etapas en orden, pasando los resultados en memoria
+
+    Devuelve el contexto con todas las salidas, o None si alguna etapa
+    no pudo producir sus salidas.
+    """
+
+    contexto = dict(contexto or {})
+
+    claves_etapas = calcular_claves(etapas)
+    a_ejecutar = planificar_etapas(etapas, claves_etapas)
+
+    # Qué etapa produce cada salida (para leerla de la caché si hace falta)
+    productoras = {}
+    for etapa in etapas:
+        for salida in etapa['salidas']:
+            productoras[salida] = etapa['nombre']
+
+    ejecutadas = set()
+    informadas = set()
+    posicion = 0
+    while posicion < len(etapas):
+        etapa = etapas[posicion]
+        numero = posicion + 1
+        posicion += 1
+
+        if etapa['nombre'] in ejecutadas:
+            continue
+        if etapa['nombre'] not in a_ejecutar:
+            if etapa['nombre'] not in informadas:
+                registro.info(f"\nPASO {numero}: {etapa['descripcion']}... (resultado en caché, se omite)")
+                informadas.add(etapa['nombre'])
+            continue
+
+        # Traer de la caché las entradas de etapas que no se ejecutaron
+        perdidas = []
+        for entrada in etapa['entradas']:
+            if entrada in contexto or entrada not in productoras:
+                continue
+            clave = claves_etapas[productoras[entrada]]
+            guardado = leer_cache(clave)
+            if guardado is not None:
+                registro.info(f"Usando caché de la etapa '{productoras[entrada]}' ({clave[:12]})")
+                contexto.update(guardado)
+            elif productoras[entrada] not in ejecutadas:
+                perdidas.append(productoras[entrada])
+
+        # La entrada ya no está en la caché (no se pudo leer, o el límite de
+        # tamaño la borró durante la ejecución): se vuelve a planificar y se
+        # retoma desde la primera etapa pendiente
+        if perdidas:
+            registro.warning(f"ADVERTENCIA: Falta en la caché el resultado de {sorted(set(perdidas))}; "
+                             f"se vuelve a calcular")
+            completas = ejecutadas | {pendiente['nombre'] for pendiente in etapas if pendiente['salidas']
+                                      and all(salida in contexto for salida in pendiente['salidas'])}
+            a_ejecutar |= planificar_etapas(etapas, claves_etapas, completas) | set(perdidas)
+            posicion = min(indice for indice, pendiente in enumerate(etapas)
+                           if pendiente['nombre'] in a_ejecutar and pendiente['nombre'] not in ejecutadas)
+            continue
+
+        registro.info(f"\nPASO {numero}: {etapa['descripcion']}...")
+
+        # Verificar que las entradas ya fueron producidas por etapas anteriores
+        faltantes = [entrada for entrada in etapa['entradas'] if entrada not in contexto]
+        if faltantes:
+            registro.error(f"ERROR: La etapa '{etapa['nombre']}' necesita {faltantes}, que ninguna etapa anterior produjo")
+            return None
+
+        argumentos = [contexto[entrada] for entrada in etapa['entradas']]
+        with medir_etapa(etapa['nombre'], contar_filas(argumentos[0]) if argumentos else None) as medicion:
+            resultado = etapa['funcion'](*argumentos)
+            medicion['filas_salida'] = contar_filas(resultado)
+        ejecutadas.add(etapa['nombre'])
+
+        salidas = etapa['salidas']
+        if not salidas:
+            continue
+
+        if resultado is None:
+            registro.error(f"ERROR: La etapa '{etapa['nombre']}' no produjo resultados")
+            return None
+
+        # Una salida: guardar el resultado tal cual; varias: desempaquetar
+        if len(salidas) == 1:
+            contexto[salidas[0]] = resultado
+        else:
+            for nombre, valor in zip(salidas, resultado):
+                contexto[nombre] = valor
+
+        # Guardar en caché las salidas de las etapas que lo piden
+        clave = claves_etapas[etapa['nombre']]
+        if clave is not None and etapa['cache'].get('persistir', True):
+            tablas = {salida: contexto[salida] for salida in salidas}
+            if all(hasattr(tabla, 'to_parquet') for tabla in tablas.values()):
+                guardar_cache(clave, tablas)
+
+    return contexto
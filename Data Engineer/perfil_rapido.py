@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfil rápido de un CSV sin cargarlo entero
+Nivel: Desarrollador
+
+Para explorar y analizar los archivos no hace falta leer cada fila con
+pandas. El perfil rápido:
+- lee las columnas, los tipos y las primeras filas de un prefijo corto
+- cuenta las filas buscando saltos de línea en bloques de bytes
+- en esa misma pasada toma una muestra aleatoria uniforme de filas
+  (muestreo de reservorio) y solo esa muestra se convierte a DataFrame.
+
+Los porcentajes de nulos, rangos y frecuencias que salen de la muestra
+son estimaciones. El conteo de filas es exacto mientras ningún campo
+tenga saltos de línea dentro de comillas (los CSV de Spotify no tienen).
+"""
+
+import io
+import math
+import random
+
+import pandas as pd
+
+from esquema import leer_csv, opciones_lectura
+
+FILAS_PREFIJO = 1000
+TAMANO_MUESTRA = 20000
+BYTES_POR_BLOQUE = 4 * 1024 * 1024
+
+def siguiente_salto(peso, generador):
+    """Cuántas filas avanzar hasta la próxima que entra al reservorio (algoritmo L)"""
+    return math.floor(math.log(generador.random()) / math.log(1 - peso)) + 1
+
+def contar_y_muestrear(archivo, tamano=TAMANO_MUESTRA, semilla=0):
+    """Contar las filas de datos y tomar una muestra uniforme de ellas
+
+    Recorre el archivo una vez en bloques de bytes. Las filas solo se
+    separan en los bloques que contienen alguna fila elegida; en el
+    resto basta con contar los saltos de línea.
+    Devuelve (encabezado, filas, muestra) con las líneas en bytes.
+    """
+
+    generador = random.Random(semilla)
+    reservorio = []
+    peso = math.exp(math.log(generador.random()) / tamano)
+    # Índice de la próxima fila que entra al reservorio una vez lleno
+    proxima = tamano - 1 + siguiente_salto(peso, generador)
+    filas = 0
+
+    def procesar(texto, cantidad):
+        """Tomar las filas elegidas entre las cantidad líneas de texto"""
+        nonlocal peso, proxima
+        lineas = None
+
+        # Las primeras filas llenan el reservorio
+        if filas < tamano:
+            lineas = texto.split(b'\n')
+            reservorio.extend(lineas[:tamano - filas])
+
+        # Después cada fila elegida reemplaza una al azar
+        while proxima < filas + cantidad:
+            if lineas is None:
+                lineas = texto.split(b'\n')
+            reservorio[generador.randrange(tamano)] = lineas[proxima - filas]
+            peso *= math.exp(math.log(generador.random()) / tamano)
+            proxima += siguiente_salto(peso, generador)
+
+    with open(archivo, 'rb') as origen:
+        encabezado = origen.readline().rstrip(b'\r\n')
+        resto = b''
+        while True:
+            bloque = origen.read(BYTES_POR_BLOQUE)
+            if not bloque:
+                break
+            bloque = resto + bloque
+            fin = bloque.rfind(b'\n')
+            if fin < 0:
+                resto = bloque
+                continue
+            completas, resto = bloque[:fin], bloque[fin + 1:]
+            cantidad = completas.count(b'\n') + 1
+            procesar(completas, cantidad)
+            filas += cantidad
+
+        # Última línea sin salto de línea al final
+        if resto.strip():
+            procesar(resto, 1)
+            filas += 1
+
+    return encabezado, filas, reservorio
+
+def leer_muestra(archivo, encabezado, lineas):
+    """Convertir las líneas de la muestra en DataFrame con los tipos del esquema"""
+
+    texto = b'\n'.join([encabezado] + lineas)
+    return pd.read_csv(io.BytesIO(texto), **opciones_lectura(archivo, uso='completo'))
+
+def perfilar_csv(archivo, tamano_muestra=TAMANO_MUESTRA, filas_prefijo=FILAS_PREFIJO, semilla=0):
+    """Perfil rápido de un archivo CSV
+
+    Devuelve un diccionario con:
+    - 'prefijo': las primeras filas (columnas, tipos y ejemplos)
+    - 'filas': la cantidad de filas de datos
+    - 'muestra': una muestra uniforme de hasta tamano_muestra filas
+    """
+
+    prefijo = leer_csv(archivo, uso='completo', nrows=filas_prefijo)
+    encabezado, filas, lineas = contar_y_muestrear(archivo, tamano_muestra, semilla)
+
+    return {
+        'prefijo': prefijo,
+        'filas': filas,
+        'muestra': leer_muestra(archivo, encabezado, lineas)
+    }
+
+def escalar(cantidad_muestra, perfil):
+    """Estimar cuántas filas del archivo cumplen algo a partir de la muestra"""
+
+    if len(perfil['muestra']) == 0:
+        return 0
+    return int(round(cantidad_muestra * perfil['filas'] / len(perfil['muestra'])))
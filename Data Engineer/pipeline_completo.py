@@ -8,9 +8,11 @@ Este script ejecuta todo el pipeline de principio a fin:
 2. Analizar problemas
 3. Limpiar datos
 4. Combinar archivos
-5. Crear variables de intensidad
-6. Verificar calidad
-7. Guardar resultados
+5. Resolver conflictos
+6. Crear variables de intensidad
+7. Verificar calidad
+8. Guardar resultados
+9. Guardar estado para el modo incremental (solo con --incremental)
 
 Autor: Desarrollador
 Fecha: 2024
@@ -20,93 +22,189 @@ import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
+from functools import partial
 
-def ejecutar_pipeline_completo():
-    """Ejecutar todo el pipeline de análisis de intensidad musical"""
+from escribir_csv import EXTENSIONES_COMPRESION
+from motor_etapas import crear_etapa, ejecutar_etapas
+from registro import obtener_registro, mostrar_diagnostico
+
+registro = obtener_registro(__name__)
+
+def construir_etapas(trabajadores=1, tamano_bloque=None, guardar_csv=False, compresion_csv=None, perfil='rapido',
+                     cuantiles_aproximados=False, motor='pandas', guardar_estado=False):
+    """Definir las etapas del pipeline con sus entradas y salidas
+    
+    Cada etapa recibe en memoria lo que produjo la anterior, así los
+    archivos se leen y se limpian una sola vez por ejecución. Las etapas
+    con caché guardan su resultado en data/cache/ y se saltan si ni sus
+    entradas ni su código cambiaron.
+    
+    perfil indica cómo se exploran y analizan los archivos: 'rapido'
+    (prefijo y muestra), 'completo' (cada archivo entero) o None para
+    no ejecutar esas dos etapas.
+    cuantiles_aproximados calcula medianas y cuartiles con histogramas
+    (ver cuantiles.py) en vez de ordenar los valores.
+    motor 'polars' o 'duckdb' reemplaza limpiar, combinar, resolver e
+    intensidad por una sola etapa que lo hace como consulta perezosa
+    (ver consulta_perezosa.py).
+    guardar_estado agrega la etapa que guarda lo que necesita el modo
+    incremental (una copia del dataset combinado y el cubo).
+    """
+    
+    from explorar_archivos import explorar_archivos_csv
+    from analizar_problemas import analizar_todos_los_archivos
+    from limpiar_datos import ARCHIVOS_CSV, limpiar_con_linaje
+    from categorizar_generos import RUTA_REGLAS_GENEROS
+    from combinar_archivos import combinar_con_linaje, resolver_y_verificar
+    from crear_intensidad import crear_variables_y_resumenes
+    from verificar_calidad import verificar_todo
+    from guardar_resultados import guardar_todos_los_resultados
+    from incremental import guardar_estado_incremental
+    
+    etapas_perfil = []
+    if perfil is not None:
+        completo = perfil == 'completo'
+        etapas_perfil = [
+            crear_etapa('explorar', 'Explorando archivos', partial(explorar_archivos_csv, completo=completo)),
+            crear_etapa('analizar', 'Analizando problemas en los datos',
+                        partial(analizar_todos_los_archivos, completo=completo))
+        ]
+    
+    if motor == 'pandas':
+        etapas_datos = [
+            # La limpieza guarda cada archivo por separado en la caché
+            crear_etapa('limpiar', 'Limpiando datos', partial(limpiar_con_linaje, trabajadores=trabajadores,
+                                                              tamano_bloque=tamano_bloque),
+                        salidas=['datos_limpios', 'linaje_limpieza'],
+                        cache={'modulos': ['limpiar_datos', 'esquema', 'categorizar_generos', 'linaje'],
+                               'archivos': ARCHIVOS_CSV + [RUTA_REGLAS_GENEROS],
+                               'parametros': {'archivos': ARCHIVOS_CSV}, 'persistir': False}),
+            crear_etapa('combinar', 'Combinando archivos', combinar_con_linaje,
+                        entradas=['datos_limpios', 'linaje_limpieza'], salidas=['df_combinado', 'linaje'],
+                        cache={'modulos': ['combinar_archivos']}),
+            crear_etapa('resolver', 'Resolviendo conflictos', resolver_y_verificar,
+                        entradas=['df_combinado'], salidas=['df_resuelto'],
+                        cache={'modulos': ['combinar_archivos']}),
+            crear_etapa('intensidad', 'Creando variables de intensidad',
+                        partial(crear_variables_y_resumenes, cuantiles_aproximados=cuantiles_aproximados),
+                        entradas=['df_resuelto'],
+                        salidas=['df_final', 'resumen_decada', 'resumen_decada_genero', 'stats_genero',
+                                 'resumen_intensidad'],
+                        cache={'modulos': ['crear_intensidad', 'resumenes', 'cuantiles'],
+                               'parametros': {'cuantiles_aproximados': cuantiles_aproximados}})
+        ]
+    else:
+        from consulta_perezosa import ejecutar_consulta
+        
+        etapas_datos = [
+            crear_etapa('consulta', f'Limpiando, combinando y creando intensidad con {motor}',
+                        partial(ejecutar_consulta, motor=motor),
+                        salidas=['df_combinado', 'linaje', 'df_final', 'resumen_decada', 'resumen_decada_genero',
+                                 'stats_genero', 'resumen_intensidad'],
+                        cache={'modulos': ['consulta_perezosa', 'limpiar_datos', 'esquema', 'categorizar_generos',
+                                           'linaje', 'combinar_archivos', 'crear_intensidad', 'resumenes'],
+                               'archivos': ARCHIVOS_CSV + [RUTA_REGLAS_GENEROS],
+                               'parametros': {'archivos': ARCHIVOS_CSV, 'motor': motor}})
+        ]
+    
+    etapas_estado = []
+    if guardar_estado:
+        etapas_estado = [
+            crear_etapa('estado', 'Guardando estado incremental',
+                        partial(guardar_estado_incremental, cuantiles_aproximados=cuantiles_aproximados),
+                        entradas=['df_combinado', 'df_final', 'linaje'], salidas=['estado_ok'])
+        ]
     
-    print("INICIANDO PIPELINE DE ANALISIS DE INTENSIDAD MUSICAL")
-    print("=" * 60)
-    print("Fecha:", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-    print("=" * 60)
+    return etapas_perfil + etapas_datos + [
+        crear_etapa('verificar', 'Verificando calidad', verificar_todo,
+                    entradas=['df_final'], salidas=['calidad_ok']),
+        crear_etapa('guardar', 'Guardando resultados', partial(guardar_todos_los_resultados, guardar_csv=guardar_csv,
+                                                               compresion_csv=compresion_csv,
+                                                               trabajadores=trabajadores),
+                    entradas=['df_final', 'resumen_decada', 'resumen_decada_genero', 'stats_genero',
+                              'resumen_intensidad', 'linaje'],
+                    salidas=['guardado_ok'])
+    ] + etapas_estado
+
+def ejecutar_pipeline_completo(trabajadores=1, tamano_bloque=None, guardar_csv=False, compresion_csv=None,
+                               perfil='rapido', cuantiles_aproximados=False, motor='pandas', guardar_estado=False):
+    """Ejecutar todo el pipeline de análisis de intensidad musical
+    
+    trabajadores es la cantidad de procesos para limpiar archivos (y
+    escribir el CSV) en paralelo.
+    tamano_bloque, si se indica, hace que cada archivo se lea por bloques.
+    guardar_csv también escribe el dataset completo en CSV, comprimido
+    con compresion_csv ('gzip' o 'zstd') si se indica.
+    perfil es el modo de los pasos de exploración y análisis,
+    cuantiles_aproximados el de medianas y cuartiles y motor el que limpia,
+    combina y calcula la intensidad (ver construir_etapas).
+    guardar_estado guarda el estado para la próxima ejecución con
+    --incremental; sin él se descarta el estado anterior, que ya no
+    correspondería a los datos guardados.
+    """
+    
+    registro.info("INICIANDO PIPELINE DE ANALISIS DE INTENSIDAD MUSICAL")
+    registro.info("=" * 60)
+    registro.info(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    registro.info("=" * 60)
     
     try:
-        # PASO 1: Explorar archivos
-        print("\nPASO 1: Explorando archivos...")
-        from explorar_archivos import explorar_archivos_csv
-        explorar_archivos_csv()
-        
-        # PASO 2: Analizar problemas
-        print("\nPASO 2: Analizando problemas en los datos...")
-        from analizar_problemas import analizar_todos_los_archivos
-        analizar_todos_los_archivos()
-        
-        # PASO 3: Limpiar datos
-        print("\nPASO 3: Limpiando datos...")
-        from limpiar_datos import limpiar_todos_los_archivos
-        datos_limpios = limpiar_todos_los_archivos()
-        
-        # PASO 4: Combinar archivos
-        print("\nPASO 4: Combinando archivos...")
-        from combinar_archivos import combinar_todos_los_archivos
-        df_combinado = combinar_todos_los_archivos()
-        
-        # PASO 5: Crear variables de intensidad
-        print("\nPASO 5: Creando variables de intensidad...")
-        from crear_intensidad import crear_variables_intensidad
-        resultado = crear_variables_intensidad()
+        if not guardar_estado:
+            from incremental import descartar_estado_incremental
+            descartar_estado_incremental()
         
-        if resultado is None:
-            print("ERROR: No se pudieron crear las variables de intensidad")
+        contexto = ejecutar_etapas(construir_etapas(trabajadores, tamano_bloque, guardar_csv, compresion_csv,
+                                                          perfil, cuantiles_aproximados, motor, guardar_estado))
+        
+        if contexto is None:
+            registro.error("ERROR: El pipeline se detuvo porque una etapa no produjo resultados")
             return False
         
-        df_final, resumen_decada, resumen_decada_genero, stats_genero = resultado
+        df_final = contexto['df_final']
+        calidad_ok = contexto['calidad_ok']
+        guardado_ok = contexto['guardado_ok']
         
-        # PASO 6: Verificar calidad
-        print("\nPASO 6: Verificando calidad...")
-        from verificar_calidad import verificar_todo
-        calidad_ok = verificar_todo()
+        # RESUMEN FINAL
+        registro.info("\n" + "=" * 60)
+        registro.info("PIPELINE COMPLETADO EXITOSAMENTE!")
+        registro.info("=" * 60)
         
-        # PASO 7: Guardar resultados
-        print("\nPASO 7: Guardando resultados...")
-        from guardar_resultados import guardar_todos_los_resultados
-        guardado_ok = guardar_todos_los_resultados()
+        registro.info(f"Dataset final: {len(df_final):,} canciones")
+        registro.info(f"Columnas: {len(df_final.columns)}")
+        if mostrar_diagnostico():
+            registro.info(f"Intensidad promedio: {df_final['intensity_weighted'].mean():.3f}")
+            registro.info(f"Calidad promedio: {df_final['data_quality_score'].mean():.1f}/100")
         
-        # RESUMEN FINAL
-        print("\n" + "=" * 60)
-        print("PIPELINE COMPLETADO EXITOSAMENTE!")
-        print("=" * 60)
-        
-        print(f"Dataset final: {len(df_final):,} canciones")
-        print(f"Columnas: {len(df_final.columns)}")
-        print(f"Intensidad promedio: {df_final['intensity_weighted'].mean():.3f}")
-        print(f"Calidad promedio: {df_final['data_quality_score'].mean():.1f}/100")
-        
-        print(f"\nArchivos creados en: data/processed/")
-        print("   - spotify_music_intensity_clean.csv (dataset principal)")
-        print("   - spotify_music_intensity_clean.parquet (dataset principal)")
-        print("   - intensity_by_decade.csv (resumen por década)")
-        print("   - intensity_by_decade_genre.csv (resumen por década y género)")
-        print("   - genre_statistics.csv (estadísticas por género)")
-        print("   - intensity_by_level.csv (resumen por nivel de intensidad)")
-        print("   - README.md (documentación del proyecto)")
-        print("   - data_dictionary.md (diccionario de datos)")
-        print("   - metadata.json (metadatos del proyecto)")
-        
-        print(f"\nDescubrimientos principales:")
-        print(f"   - La música se volvió más intensa con el tiempo (correlación 0.903)")
-        print(f"   - Géneros más intensos: Rock (0.830), Electronic (0.796), Latin (0.792)")
-        print(f"   - Géneros más tranquilos: Classical (0.396), Jazz (0.666), Country (0.672)")
-        print(f"   - Calidad de datos: 99.9/100 puntos promedio")
-        
-        print(f"\nEstado final:")
-        print(f"   - Calidad: {'OK' if calidad_ok else 'ADVERTENCIAS'}")
-        print(f"   - Guardado: {'OK' if guardado_ok else 'ERROR'}")
+        registro.info(f"\nArchivos creados en: data/processed/")
+        registro.info("   - spotify_music_intensity/ (dataset principal, Parquet por década y género)")
+        registro.info("   - spotify_music_intensity.arrow (dataset principal, Arrow para cargar con memory map)")
+        if guardar_csv:
+            registro.info(f"   - spotify_music_intensity_clean.csv{EXTENSIONES_COMPRESION[compresion_csv]} (dataset principal en CSV)")
+        registro.info("   - intensity_by_decade.csv (resumen por década)")
+        registro.info("   - intensity_by_decade_genre.csv (resumen por década y género)")
+        registro.info("   - genre_statistics.csv (estadísticas por género)")
+        registro.info("   - intensity_by_level.csv (resumen por nivel de intensidad)")
+        registro.info("   - intensity_cube.parquet + intensity_cube_sketch.parquet (cubo OLAP, ver cubo_olap.py)")
+        registro.info("   - similarity_index/ (canciones parecidas por perfil de audio, ver indice_similitud.py)")
+        registro.info("   - README.md (documentación del proyecto)")
+        registro.info("   - data_dictionary.md (diccionario de datos)")
+        registro.info("   - metadata.json (metadatos del proyecto)")
+        
+        registro.info(f"\nDescubrimientos principales:")
+        registro.info(f"   - La música se volvió más intensa con el tiempo (correlación 0.903)")
+        registro.info(f"   - Géneros más intensos: Rock (0.830), Electronic (0.796), Latin (0.792)")
+        registro.info(f"   - Géneros más tranquilos: Classical (0.396), Jazz (0.666), Country (0.672)")
+        registro.info(f"   - Calidad de datos: 99.9/100 puntos promedio")
+        
+        registro.info(f"\nEstado final:")
+        registro.info(f"   - Calidad: {'OK' if calidad_ok else 'ADVERTENCIAS'}")
+        registro.info(f"   - Guardado: {'OK' if guardado_ok else 'ERROR'}")
         
         return True
         
     except Exception as e:
-        print(f"\nERROR en el pipeline: {str(e)}")
-        print("Revisa los logs anteriores para más detalles")
+        registro.error(f"\nERROR en el pipeline: {str(e)}")
+        registro.error("Revisa los logs anteriores para más detalles")
         return False
 
 def mostrar_ayuda():
@@ -134,37 +232,202 @@ PASOS DEL PIPELINE:
 2. Analizar problemas - Buscar nulos, duplicados, valores raros
 3. Limpiar datos - Eliminar duplicados, arreglar nulos, estandarizar
 4. Combinar archivos - Unir todos los archivos en uno solo
-5. Crear intensidad - Crear variables de intensidad musical
-6. Verificar calidad - Validar que todo esté correcto
-7. Guardar resultados - Guardar archivos finales y documentación
+5. Resolver conflictos - Unificar canciones repetidas entre archivos
+6. Crear intensidad - Crear variables de intensidad musical
+7. Verificar calidad - Validar que todo esté correcto
+8. Guardar resultados - Guardar archivos finales y documentación
+9. Guardar estado - Guardar lo necesario para el modo incremental (solo con --incremental)
 
 USO:
-    python pipeline_completo.py          # Ejecutar todo el pipeline
-    python pipeline_completo.py --help   # Mostrar esta ayuda
+    python pipeline_completo.py                 # Ejecutar todo el pipeline
+    python pipeline_completo.py --help          # Mostrar esta ayuda
+    python pipeline_completo.py --no-cache      # No leer ni guardar la caché
+    python pipeline_completo.py --clear-cache   # Borrar la caché antes de ejecutar
+    python pipeline_completo.py --workers 4     # Limpiar los archivos con 4 procesos
+    python pipeline_completo.py --chunk-size 200000   # Leer los archivos por bloques
+    python pipeline_completo.py --incremental   # Procesar solo los archivos que cambiaron
+    python pipeline_completo.py --csv           # Guardar también el dataset completo en CSV
+    python pipeline_completo.py --csv --csv-compression zstd   # CSV comprimido (gzip o zstd)
+    python pipeline_completo.py --full          # Explorar y analizar cada archivo entero (exacto)
+    python pipeline_completo.py --no-profile    # Saltar la exploración y el análisis
+    python pipeline_completo.py --approx-quantiles   # Medianas y cuartiles aproximados (histogramas)
+    python pipeline_completo.py --engine polars   # Limpiar, combinar e intensidad con Polars (o duckdb)
+    python pipeline_completo.py --no-metrics    # No medir tiempos, memoria y filas
+    python pipeline_completo.py --profile-stage limpiar   # Perfilar una etapa o función con cProfile
+    python pipeline_completo.py --profile-stage resolver_conflictos --profiler pyinstrument
+    python pipeline_completo.py --quiet         # Solo advertencias y errores (producción)
+    python pipeline_completo.py --verbose       # Todos los detalles de cada función
+
+EXPLORACIÓN Y ANÁLISIS:
+Por defecto los pasos 1 y 2 usan un perfil rápido: columnas y tipos de las
+primeras filas, filas contadas sin parsear el archivo y nulos, rangos y
+géneros estimados con una muestra aleatoria de 20.000 filas por archivo.
+Con --full se cargan los archivos enteros, como antes.
+
+CUANTILES APROXIMADOS:
+Por defecto las medianas de los resúmenes y los cuartiles de los outliers
+son exactos. Con --approx-quantiles salen de histogramas de 2000 cubetas
+por década, género y nivel de intensidad, que se combinan y se actualizan
+en modo incremental sin volver a recorrer los datos. Cada valor queda a
+menos del ancho de una cubeta del exacto (0.0005 en intensidad y energy,
+0.03 dB en loudness), antes de redondear a 4 decimales; se comprueba con
+benchmarks/verificar_cuantiles.py. En una ejecución completa no es más
+rápido: armar los histogramas cuesta más que ordenar cada grupo.
+
+MOTOR:
+Por defecto los pasos 3 a 6 usan pandas. Con --engine polars o --engine
+duckdb se arman como una sola consulta perezosa que lee solo las columnas
+necesarias, filtra las filas antes de calcular columnas nuevas y usa todos
+los núcleos (ver consulta_perezosa.py). Los resultados son los mismos que
+con pandas (se comprueba con benchmarks/verificar_motores.py). --workers y
+--chunk-size solo se usan con pandas, --approx-quantiles solo funciona con
+pandas y --incremental actualiza siempre con pandas (el motor se usa si
+hace falta ejecutar el pipeline completo).
+
+MENSAJES:
+Por defecto cada paso muestra lo que hace y sus resultados. Con --verbose
+se ven además los encabezados de cada función, los bloques leídos y las
+tablas por década y género. Con --quiet solo salen advertencias y errores,
+no se calculan las estadísticas que solo sirven para mostrarlas (promedios,
+mínimos, máximos, nulos, distribuciones) y se saltan la exploración y el
+análisis (salvo con --full). Las métricas se siguen guardando en
+data/logs/metricas.jsonl, pero no se muestra la tabla.
+
+MÉTRICAS:
+Cada etapa y cada función de limpieza, combinación, intensidad, calidad y
+guardado anota su tiempo real y de CPU, cuánto subió el pico de memoria y
+las filas que recibió y devolvió. Cada medición se escribe como una línea
+JSON en data/logs/metricas.jsonl y al final se muestra una tabla. Con
+--profile-stage NOMBRE esa etapa o función corre además con cProfile (o
+pyinstrument, si está instalado) y el perfil se guarda en data/logs/.
+Con --workers > 1 la limpieza de cada archivo ocurre en otro proceso: sus
+mediciones quedan en el archivo pero la tabla muestra solo el total.
+
+CACHÉ:
+Los resultados de limpiar, combinar, resolver conflictos y crear intensidad
+se guardan en data/cache/. Si los archivos de entrada y el código de una
+etapa no cambiaron, la etapa se salta y se usa el resultado guardado.
+
+MODO INCREMENTAL:
+metadata.json guarda la huella (tamaño, fecha y hash) de cada archivo.
+Con --incremental solo se limpian los archivos nuevos o modificados (o solo
+las filas agregadas al final), se vuelven a resolver las canciones
+afectadas y las tablas de resumen se actualizan desde el cubo guardado en
+data/incremental/. Si no hay una ejecución anterior, o el código cambió,
+se ejecuta el pipeline completo y se guarda ese estado. Las ejecuciones
+sin --incremental no lo guardan (es una copia más del dataset combinado)
+y descartan el anterior, que ya no correspondería a los datos.
 
 ARCHIVOS DE SALIDA:
-- data/processed/spotify_music_intensity_clean.csv (dataset principal)
+- data/processed/spotify_music_intensity/ (dataset principal, Parquet
+  particionado por década y género; se lee con dataset_particionado.leer_dataset)
+- data/processed/spotify_music_intensity.arrow (el mismo dataset en Arrow sin
+  comprimir; se carga con dataset_arrow.cargar_dataset_arrow)
+- data/processed/spotify_music_intensity_clean.csv (solo con --csv; se escribe
+  por lotes, con --workers procesos, y termina en .gz o .zst si se comprime)
 - data/processed/intensity_by_decade.csv (resumen por década)
 - data/processed/genre_statistics.csv (estadísticas por género)
+- data/processed/intensity_cube.parquet e intensity_cube_sketch.parquet (cubo
+  por año, década, género, nivel de intensidad y origen; cualquier otro
+  resumen sale de ahí con cubo_olap.py, sin recorrer el dataset)
+- data/processed/similarity_index/ (índice de vecinos más cercanos por perfil
+  de audio; las canciones parecidas salen con indice_similitud.py)
 - data/processed/README.md (documentación)
 - Y más...
 
-TIEMPO ESTIMADO: 5-10 minutos (dependiendo del hardware)
+TIEMPO ESTIMADO: depende del hardware y del tamaño de los datos. Para medirlo
+en tu máquina, etapa por etapa y con datos sintéticos de 100k, 1M o 10M filas:
+    python benchmarks/benchmark_etapas.py --filas 100k 1M
 """
     
     print(ayuda)
 
+def leer_argumentos(argumentos):
+    """Leer las opciones de la línea de comandos"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--clear-cache', action='store_true')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--csv', action='store_true')
+    parser.add_argument('--csv-compression', choices=['gzip', 'zstd'], default=None)
+    parser.add_argument('--full', action='store_true')
+    parser.add_argument('--no-profile', action='store_true')
+    parser.add_argument('--approx-quantiles', action='store_true')
+    parser.add_argument('--engine', choices=['pandas', 'polars', 'duckdb'], default='pandas')
+    parser.add_argument('--no-metrics', action='store_true')
+    parser.add_argument('--profile-stage', default=None)
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+    parser.add_argument('--quiet', action='store_true')
+    parser.add_argument('--verbose', action='store_true')
+    
+    opciones = parser.parse_args(argumentos)
+    if opciones.approx_quantiles and opciones.engine != 'pandas':
+        parser.error("--approx-quantiles solo funciona con --engine pandas")
+    
+    return opciones
+
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] in ['--help', '-h', 'help']:
         mostrar_ayuda()
     else:
-        resultado = ejecutar_pipeline_completo()
+        from cache_etapas import configurar_cache, borrar_cache
+        from instrumentacion import RUTA_METRICAS, configurar_instrumentacion, mostrar_tabla_metricas
+        from registro import configurar_registro
+        
+        opciones = leer_argumentos(sys.argv[1:])
+        
+        if opciones.quiet:
+            configurar_registro('silencioso')
+        elif opciones.verbose:
+            configurar_registro('detalle')
+        
+        if opciones.clear_cache:
+            borrar_cache()
+        if opciones.no_cache:
+            configurar_cache(activa=False)
+        configurar_instrumentacion(activa=not opciones.no_metrics or opciones.profile_stage is not None,
+                                   archivo=None if opciones.no_metrics else RUTA_METRICAS,
+                                   perfilar=opciones.profile_stage, perfilador=opciones.profiler)
+        
+        # La exploración y el análisis solo muestran diagnósticos: en modo
+        # silencioso se saltan salvo que se pidan con --full
+        perfil = 'completo' if opciones.full else 'rapido'
+        if opciones.no_profile or (opciones.quiet and not opciones.full):
+            perfil = None
+        
+        resultado = None
+        if opciones.incremental:
+            from incremental import ejecutar_incremental
+            
+            resultado = ejecutar_incremental(tamano_bloque=opciones.chunk_size, guardar_csv=opciones.csv,
+                                             compresion_csv=opciones.csv_compression,
+                                             cuantiles_aproximados=opciones.approx_quantiles)
+            if resultado is None:
+                registro.info("No se puede actualizar de forma incremental: se ejecuta el pipeline completo\n")
+        
+        if resultado is None:
+            resultado = ejecutar_pipeline_completo(trabajadores=opciones.workers,
+                                                   tamano_bloque=opciones.chunk_size,
+                                                   guardar_csv=opciones.csv,
+                                                   compresion_csv=opciones.csv_compression,
+                                                   perfil=perfil,
+                                                   cuantiles_aproximados=opciones.approx_quantiles,
+                                                   motor=opciones.engine,
+                                                   guardar_estado=opciones.incremental)
+        
+        if not opciones.no_metrics and mostrar_diagnostico():
+            mostrar_tabla_metricas()
         
         if resultado:
-            print(f"\n¡Mision cumplida! El pipeline se ejecuto exitosamente.")
-            print(f"Revisa la documentacion en data/processed/README.md")
+            registro.info(f"\n¡Mision cumplida! El pipeline se ejecuto exitosamente.")
+            registro.info(f"Revisa la documentacion en data/processed/README.md")
         else:
-            print(f"\nEl pipeline fallo. Revisa los errores anteriores.")
+            registro.error(f"\nEl pipeline fallo. Revisa los errores anteriores.")
             sys.exit(1)
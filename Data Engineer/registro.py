@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mensajes del pipeline con niveles (detalle, normal, silencioso)
+Nivel: Desarrollador
+
+Cada módulo pide su registro con obtener_registro(__name__) y escribe con
+registro.debug / info / warning / error en vez de print. Los niveles son:
+- 'detalle': todo, incluidos los encabezados de cada función, los bloques
+  leídos y las tablas por década o género
+- 'normal' (por defecto): lo que hace cada paso y sus resultados
+- 'silencioso': solo advertencias y errores.
+
+Los mensajes salen por sys.stdout tal cual (sin fecha ni nivel), así se
+ven igual que antes y se pueden capturar con redirect_stdout, como hace la
+limpieza en paralelo.
+
+Las estadísticas que solo sirven para mostrarlas (promedios, mínimos,
+máximos) se calculan dentro de un "if mostrar_diagnostico():", así en modo
+silencioso no se calculan.
+"""
+
+import logging
+
+NIVELES_REGISTRO = {
+    'detalle': logging.DEBUG,
+    'normal': logging.INFO,
+    'silencioso': logging.WARNING
+}
+
+# Nivel de los mensajes (se cambia con configurar_registro)
+CONFIGURACION_REGISTRO = {
+    'nivel': 'normal'
+}
+
+class SalidaEstandar(logging.Handler):
+    """Escribir cada mensaje en el sys.stdout del momento (no en el de cuando se creó)"""
+
+    def emit(self, mensaje):
+        try:
+            print(self.format(mensaje))
+        except Exception:
+            self.handleError(mensaje)
+
+RAIZ = logging.getLogger('pipeline')
+RAIZ.addHandler(SalidaEstandar())
+RAIZ.setLevel(NIVELES_REGISTRO[CONFIGURACION_REGISTRO['nivel']])
+RAIZ.propagate = False
+
+def obtener_registro(modulo):
+    """Registro de un módulo (hijo de 'pipeline', comparte su nivel)"""
+    return logging.getLogger(f"pipeline.{modulo}")
+
+def configurar_registro(nivel=None):
+    """Cambiar el nivel de los mensajes: 'detalle', 'normal' o 'silencioso'"""
+
+    if nivel is not None:
+        if nivel not in NIVELES_REGISTRO:
+            raise ValueError(f"Nivel de registro desconocido: {nivel} (usa {', '.join(NIVELES_REGISTRO)})")
+        CONFIGURACION_REGISTRO['nivel'] = nivel
+        RAIZ.setLevel(NIVELES_REGISTRO[nivel])
+
+def mostrar_diagnostico():
+    """¿Se muestran los resultados de cada paso? (no en modo silencioso)"""
+    return RAIZ.isEnabledFor(logging.INFO)
+
+def mostrar_detalle():
+    """¿Se muestran los mensajes de detalle? (solo en modo detalle)"""
+    return RAIZ.isEnabledFor(logging.DEBUG)
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de resúmenes de intensidad
+Nivel: Desarrollador
+
+Las cuatro tablas de resumen (por década, por década y género, por género
+y por nivel de intensidad) salen de un solo cubo:
+- se factorizan década, género y nivel de intensidad una sola vez
+- se agrupa una vez por década × género × nivel, guardando por celda
+  cantidad, suma, suma de cuadrados, mínimo y máximo de cada medida
+- cada tabla suma las celdas del cubo que le corresponden; la media y la
+  desviación estándar salen de esas sumas
+- la mediana no se puede armar desde el cubo, así que es la única que
+  vuelve a recorrer los datos (una pasada por tabla). En modo aproximado
+  sale de los histogramas por celda de cuantiles.py, sin recorrer los datos.
+"""
+
+import pandas as pd
+import numpy as np
+
+from registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Medidas que se guardan en el cubo
+MEDIDAS = ['intensity_weighted', 'energy', 'loudness', 'danceability', 'tempo']
+
+# Niveles de intensidad y sus límites (intensidad < 0.3 es 'Muy Baja', etc.)
+NIVELES_INTENSIDAD = ['Muy Baja', 'Baja', 'Media', 'Alta', 'Muy Alta']
+LIMITES_INTENSIDAD = [0.3, 0.5, 0.7, 0.9]
+
+# Claves del cubo
+CLAVES_CUBO = ['release_decade', 'main_genre', 'intensity_category']
+
+# Sufijos de las columnas de estadísticas del cubo (las demás columnas son claves)
+SUFIJOS_ESTADISTICAS = ('_count', '_sum', '_sumsq', '_min', '_max')
+
+# Columnas de cada tabla: (medida, estadísticas). 'extra' son columnas que
+# se agregan sin redondear, solo si la medida existe en el dataset.
+TABLAS_RESUMEN = {
+    'resumen_decada': {
+        'claves': ['release_decade'],
+        'columnas': [
+            ('intensity_weighted', ['mean', 'median', 'std', 'min', 'max']),
+            ('energy', ['mean', 'median']),
+            ('loudness', ['mean', 'median']),
+            ('track_id', ['count'])
+        ]
+    },
+    'resumen_decada_genero': {
+        'claves': ['release_decade', 'main_genre'],
+        'columnas': [
+            ('intensity_weighted', ['mean', 'median', 'std']),
+            ('energy', ['mean']),
+            ('loudness', ['mean']),
+            ('track_id', ['count'])
+        ],
+        # Combinaciones con muy pocas canciones no se incluyen
+        'minimo_canciones': 50
+    },
+    'stats_genero': {
+        'claves': ['main_genre'],
+        'columnas': [
+            ('intensity_weighted', ['mean', 'median', 'std', 'min', 'max']),
+            ('energy', ['mean', 'std']),
+            ('loudness', ['mean', 'std']),
+            ('track_id', ['count'])
+        ],
+        'extra': [
+            ('danceability', ['mean']),
+            ('tempo', ['mean', 'std'])
+        ]
+    },
+    'resumen_intensidad': {
+        'claves': ['intensity_category'],
+        'columnas': [
+            ('intensity_weighted', ['mean', 'median', 'std', 'min', 'max']),
+            ('energy', ['mean', 'median']),
+            ('loudness', ['mean', 'median']),
+            ('track_id', ['count'])
+        ]
+    }
+}
+
+def nivel_intensidad(intensidad):
+    """Nivel de intensidad de cada canción ('Muy Baja' ... 'Muy Alta')
+
+    Las categorías quedan en orden alfabético, que es como se ordenaba
+    la tabla por nivel. Una intensidad faltante queda como 'Muy Alta',
+    igual que al comparar con los límites fila por fila.
+    """
+
+    valores = intensidad.to_numpy(dtype='float64', na_value=np.nan)
+    posiciones = np.searchsorted(LIMITES_INTENSIDAD, valores, side='right')
+
+    categorias = sorted(NIVELES_INTENSIDAD)
+    codigos = np.array([categorias.index(nivel) for nivel in NIVELES_INTENSIDAD])[posiciones]
+
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=intensidad.index)
+
+def factorizar(serie):
+    """Códigos enteros y etiquetas de una clave, en el orden de groupby
+
+    Las filas sin valor reciben el código len(etiquetas), así siguen
+    contando en los totales que no usan esta clave.
+    """
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy().astype('int64')
+        etiquetas = pd.Categorical.from_codes(range(len(serie.cat.categories)), dtype=serie.dtype)
+    else:
+        codigos, etiquetas = pd.factorize(serie, sort=True)
+
+    codigos = np.where(codigos < 0, len(etiquetas), codigos)
+    return codigos, etiquetas
+
+def etiquetar(codigos, etiquetas):
+    """Pasar códigos a etiquetas (el código 'sin valor' queda como nulo)"""
+
+    codigos = np.where(codigos == len(etiquetas), -1, codigos)
+    if isinstance(etiquetas, pd.Categorical):
+        return pd.Categorical.from_codes(codigos, dtype=etiquetas.dtype)
+    if pd.api.types.is_integer_dtype(etiquetas.dtype):
+        # Claves enteras (como el año): sin valores faltantes siguen siendo int64
+        if (codigos < 0).any():
+            etiquetas = etiquetas.astype('Int64')
+        else:
+            return etiquetas.take(codigos)
+    return etiquetas.take(codigos, allow_fill=True, fill_value=np.nan)
+
+def codificar_claves(df, claves=CLAVES_CUBO):
+    """Factorizar las claves del cubo una sola vez
+
+    intensity_category se calcula desde intensity_weighted; las demás
+    claves son columnas del dataset. Devuelve dos diccionarios por clave:
+    códigos de cada fila y etiquetas.
+    """
+
+    codigos = {}
+    etiquetas = {}
+    for nombre in claves:
+        serie = nivel_intensidad(df['intensity_weighted']) if nombre == 'intensity_category' else df[nombre]
+        codigos[nombre], etiquetas[nombre] = factorizar(serie)
+
+    return codigos, etiquetas
+
+def es_estadistica(columna):
+    """¿La columna del cubo es una estadística (y no una clave)?"""
+    return columna == 'filas' or columna.endswith(SUFIJOS_ESTADISTICAS)
+
+def funcion_columna(columna):
+    """Cómo se combinan dos celdas del cubo en una columna dada"""
+
+    if columna.endswith('_min'):
+        return 'min'
+    if columna.endswith('_max'):
+        return 'max'
+    return 'sum'
+
+def crear_cubo(df, codificadas=None, claves=CLAVES_CUBO):
+    """Agrupar una sola vez por década × género × nivel de intensidad
+
+    Devuelve una fila por celda con datos: las claves y, por cada medida,
+    cantidad, suma, suma de cuadrados, mínimo y máximo. Todas estas
+    columnas se pueden combinar entre cubos (ver combinar_cubos). Con
+    claves se arma el cubo con otras dimensiones (ver cubo_olap.py).
+    """
+
+    codigos, etiquetas = codificadas or codificar_claves(df, claves)
+    tabla = {clave: codigos[clave] for clave in claves}
+
+    # Cada medida aporta cantidad, suma, mínimo, máximo y suma de cuadrados
+    agregaciones = {}
+    for medida in MEDIDAS:
+        if medida not in df.columns:
+            continue
+        valores = df[medida].to_numpy(dtype='float64', na_value=np.nan)
+        tabla[medida] = valores
+        tabla[f"{medida}_cuadrado"] = valores * valores
+        agregaciones[medida] = ['count', 'sum', 'min', 'max']
+        agregaciones[f"{medida}_cuadrado"] = ['sum']
+
+    tabla['track_id'] = df['track_id'].notna().to_numpy().astype('int64')
+    tabla['filas'] = np.ones(len(df), dtype='int64')
+    agregaciones['track_id'] = ['sum']
+    agregaciones['filas'] = ['sum']
+
+    cubo = pd.DataFrame(tabla).groupby(claves).agg(agregaciones)
+    cubo.columns = ['_'.join(columna) for columna in cubo.columns]
+    cubo = cubo.rename(columns=lambda columna: columna.replace('_cuadrado_sum', '_sumsq'))
+    cubo = cubo.rename(columns={'track_id_sum': 'track_id_count', 'filas_sum': 'filas'})
+
+    # Pasar los códigos de cada celda a sus etiquetas
+    celdas = pd.DataFrame({clave: etiquetar(cubo.index.get_level_values(clave).to_numpy(), etiquetas[clave])
+                           for clave in claves})
+
+    return pd.concat([celdas, cubo.reset_index(drop=True)], axis=1)
+
+def combinar_cubos(cubos):
+    """Juntar varios cubos en uno, combinando las celdas con las mismas claves"""
+
+    cubo = pd.concat(cubos, ignore_index=True)
+    claves = [columna for columna in cubo.columns if not es_estadistica(columna)]
+    funciones = {columna: funcion_columna(columna) for columna in cubo.columns if es_estadistica(columna)}
+
+    return cubo.groupby(claves, observed=True, dropna=False).agg(funciones).reset_index()
+
+def claves_de_filas(df):
+    """Celda del cubo de cada fila, como MultiIndex de etiquetas"""
+    return pd.MultiIndex.from_arrays([df['release_decade'], df['main_genre'],
+                                      nivel_intensidad(df['intensity_weighted'])], names=CLAVES_CUBO)
+
+def actualizar_cubo(cubo, filas_quitadas, filas_nuevas, df):
+    """Actualizar el cubo con las filas que salen y las que entran
+
+    Cantidades, sumas y sumas de cuadrados se restan y se suman. El mínimo
+    y el máximo no se pueden restar: las celdas donde una fila que sale
+    tenía el mínimo o el máximo se recalculan solo con sus filas actuales
+    (df es el dataset ya actualizado).
+    """
+
+    quitado = crear_cubo(filas_quitadas)
+
+    negativo = quitado.copy()
+    for columna in negativo.columns:
+        if columna in CLAVES_CUBO:
+            continue
+        if funcion_columna(columna) == 'sum':
+            negativo[columna] = -negativo[columna]
+        else:
+            negativo[columna] = np.nan
+
+    actualizado = combinar_cubos([cubo, negativo, crear_cubo(filas_nuevas)])
+    actualizado = actualizado[actualizado['filas'] > 0].reset_index(drop=True)
+
+    # Celdas donde una fila que sale tocaba el mínimo o el máximo
+    comparacion = quitado.merge(cubo, on=CLAVES_CUBO, suffixes=('_quitado', ''))
+    columnas_extremos = [columna for columna in cubo.columns
+                         if columna not in CLAVES_CUBO and funcion_columna(columna) != 'sum']
+    tocadas = np.zeros(len(comparacion), dtype=bool)
+    for columna in columnas_extremos:
+        if funcion_columna(columna) == 'min':
+            tocadas |= (comparacion[f"{columna}_quitado"] <= comparacion[columna]).to_numpy()
+        else:
+            tocadas |= (comparacion[f"{columna}_quitado"] >= comparacion[columna]).to_numpy()
+
+    if tocadas.any():
+        celdas = pd.MultiIndex.from_frame(comparacion.loc[tocadas, CLAVES_CUBO])
+        recalculado = crear_cubo(df[claves_de_filas(df).isin(celdas)]).set_index(CLAVES_CUBO)
+
+        actualizado = actualizado.set_index(CLAVES_CUBO)
+        actualizado.update(recalculado[columnas_extremos])
+        actualizado = actualizado.reset_index()
+
+        registro.info(f"  Cubo: {tocadas.sum()} celdas con mínimo o máximo recalculado")
+
+    return actualizado
+
+def agregar_cubo(cubo, claves):
+    """Sumar las celdas del cubo hasta quedar solo con las claves indicadas
+
+    Las celdas sin valor en alguna de las claves se descartan, igual que
+    en groupby.
+    """
+
+    funciones = {columna: funcion_columna(columna) for columna in cubo.columns if es_estadistica(columna)}
+    return cubo.groupby(claves, observed=True).agg(funciones)
+
+def calcular_estadistica(agregado, medida, estadistica):
+    """Media, desviación, mínimo, máximo o cantidad desde las sumas del cubo"""
+
+    if medida == 'track_id':
+        return agregado['track_id_count']
+
+    cantidad = agregado[f"{medida}_count"]
+    suma = agregado[f"{medida}_sum"]
+
+    if estadistica == 'mean':
+        return suma / cantidad.where(cantidad > 0)
+    if estadistica == 'std':
+        varianza = (agregado[f"{medida}_sumsq"] - suma * suma / cantidad.where(cantidad > 0)) / (cantidad - 1).where(cantidad > 1)
+        return np.sqrt(varianza.clip(lower=0))
+    if estadistica == 'count':
+        return cantidad
+    return agregado[f"{medida}_{estadistica}"]
+
+def calcular_medianas(df, codificadas, claves, medidas):
+    """Mediana por grupo: la única estadística que recorre los datos de nuevo"""
+
+    codigos, etiquetas = codificadas
+    valores = pd.DataFrame({medida: df[medida].to_numpy(dtype='float64', na_value=np.nan) for medida in medidas})
+    medianas = valores.groupby([codigos[clave] for clave in claves]).median()
+
+    # Quitar los grupos sin valor y pasar los códigos a etiquetas
+    niveles = []
+    con_valor = np.ones(len(medianas), dtype=bool)
+    for numero, clave in enumerate(claves):
+        codigos_grupo = medianas.index.get_level_values(numero).to_numpy()
+        con_valor &= codigos_grupo < len(etiquetas[clave])
+        niveles.append(codigos_grupo)
+
+    medianas = medianas[con_valor]
+    niveles = [etiquetar(nivel[con_valor], etiquetas[clave]) for nivel, clave in zip(niveles, claves)]
+    if len(claves) == 1:
+        medianas.index = pd.Index(niveles[0], name=claves[0])
+    else:
+        medianas.index = pd.MultiIndex.from_arrays(niveles, names=claves)
+
+    return medianas
+
+def construir_tabla(df, cubo, codificadas, definicion, histogramas=None, medianas=None):
+    """Armar una tabla de resumen a partir del cubo
+
+    Con histogramas (ver cuantiles.py) las medianas son aproximadas. Si
+    se pasan medianas ya calculadas (una fila por grupo, con las claves
+    como índice), no se recorren los datos.
+    """
+
+    claves = definicion['claves']
+    agregado = agregar_cubo(cubo, claves)
+
+    con_mediana = [medida for medida, estadisticas in definicion['columnas'] if 'median' in estadisticas]
+    if con_mediana and medianas is not None:
+        medianas = medianas.reindex(agregado.index)
+    elif con_mediana and histogramas is not None:
+        from cuantiles import cuantiles_por_grupo
+
+        medianas = cuantiles_por_grupo(histogramas, claves, con_mediana).reindex(agregado.index)
+    elif con_mediana:
+        medianas = calcular_medianas(df, codificadas, claves, con_mediana).reindex(agregado.index)
+
+    columnas = {}
+    for medida, estadisticas in definicion['columnas']:
+        for estadistica in estadisticas:
+            if estadistica == 'median':
+                columnas[f"{medida}_median"] = medianas[medida]
+            else:
+                columnas[f"{medida}_{estadistica}"] = calcular_estadistica(agregado, medida, estadistica)
+
+    tabla = pd.DataFrame(columnas).round(4)
+
+    for medida, estadisticas in definicion.get('extra', []):
+        if f"{medida}_count" in cubo.columns:
+            for estadistica in estadisticas:
+                tabla[f"{medida}_{estadistica}"] = calcular_estadistica(agregado, medida, estadistica)
+
+    tabla = tabla.reset_index()
+
+    if 'minimo_canciones' in definicion:
+        tabla = tabla[tabla['track_id_count'] >= definicion['minimo_canciones']]
+
+    return tabla
+
+def calcular_resumen(df, nombre, histogramas=None):
+    """Calcular una sola tabla de TABLAS_RESUMEN (None si faltan columnas)
+
+    El cubo se arma solo con las claves de esa tabla. Para varias tablas
+    conviene calcular_resumenes, que recorre los datos una sola vez.
+    """
+
+    definicion = TABLAS_RESUMEN[nombre]
+    necesarias = ([medida for medida, _ in definicion['columnas']]
+                  + [clave for clave in definicion['claves'] if clave != 'intensity_category'])
+    if any(columna not in df.columns for columna in necesarias):
+        return None
+
+    codificadas = codificar_claves(df, definicion['claves'])
+    cubo = crear_cubo(df, codificadas, definicion['claves'])
+
+    return construir_tabla(df, cubo, codificadas, definicion, histogramas)
+
+def calcular_resumenes(df, cubo=None, histogramas=None):
+    """Calcular todas las tablas de resumen con un solo cubo
+
+    Si se pasa un cubo ya calculado (por ejemplo, actualizado en modo
+    incremental), solo se recorren los datos para las medianas. Si
+    además se pasan histogramas, las medianas salen de ellos.
+    Devuelve un diccionario {nombre: DataFrame} con las claves de
+    TABLAS_RESUMEN, o None si faltan columnas.
+    """
+
+    necesarias = ['intensity_weighted', 'energy', 'loudness', 'track_id', 'release_decade', 'main_genre']
+    if any(columna not in df.columns for columna in necesarias):
+        return None
+
+    codificadas = codificar_claves(df)
+    if cubo is None:
+        cubo = crear_cubo(df, codificadas)
+
+    return {nombre: construir_tabla(df, cubo, codificadas, definicion, histogramas)
+            for nombre, definicion in TABLAS_RESUMEN.items()}
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servicio de consultas sobre el dataset procesado (librería, CLI y HTTP local)
+Nivel: Desarrollador
+
+Responde preguntas como "intensidad media del Latin de los 90 con tempo
+mayor a 140" sin cargar el dataset en pandas. Una consulta es un
+diccionario (o un JSON) con:
+- filtros: lista de condiciones (columna, operador, valor), como en
+  dataset_particionado.leer_dataset. Operadores: =, ==, !=, <, <=, >, >=,
+  in y not in.
+- agrupar: columnas de grupo (release_decade, main_genre, intensity_category)
+- medidas: {medida: [funciones]}, con funciones count, sum, mean, min,
+  max y std (desviación estándar muestral, como pandas).
+
+Por ejemplo:
+    {"filtros": [["main_genre", "=", "Latin"], ["release_decade", "=", "1990s"],
+                 ["tempo", ">", 140]],
+     "medidas": {"intensity_weighted": ["mean"]}}
+
+El resultado tiene las columnas de grupo, 'canciones' (filas de cada
+grupo) y una columna <medida>_<función> por cada medida pedida. Los grupos
+sin valor en una columna de grupo no se incluyen, igual que en las tablas
+de resumen.
+
+El Parquet particionado se abre una sola vez (pyarrow.dataset) y cada
+consulta lee solo las columnas que usa: los filtros de década y género
+descartan carpetas enteras y los de las medidas se comparan con las
+estadísticas de cada row group. intensity_category no se guarda en el
+dataset: los filtros sobre ella se traducen a rangos de intensity_weighted
+y para agrupar se calcula con los mismos límites que resumenes.py.
+
+Los resultados se guardan en una caché en memoria (LRU) con la consulta
+normalizada como clave. Si el pipeline reemplaza el dataset, el servicio
+lo nota en la siguiente consulta, lo vuelve a abrir y vacía la caché.
+
+Uso (desde la carpeta donde está data/processed):
+    python servicio_consultas.py --filtro main_genre=Latin --filtro release_decade=1990s \\
+        --filtro "tempo>140" --medida intensity_weighted:mean
+    python servicio_consultas.py --agrupar release_decade --medida energy:mean,std --json
+    python servicio_consultas.py --consulta '{"agrupar": ["intensity_category"]}'
+    python servicio_consultas.py --servir --puerto 8765
+
+Con --servir atiende en http://127.0.0.1:8765:
+    GET  /columnas             columnas, funciones y valores de década y género
+    GET  /consulta?q=<json>    una consulta (también ?filtro=...&agrupar=...&medida=...)
+    POST /consulta             una consulta en el cuerpo, en JSON
+Así los tableros comparten un solo proceso con el dataset abierto y la
+caché, en vez de cargar cada uno el dataset entero.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlparse
+
+from dataset_particionado import COLUMNAS_PARTICION, DIRECTORIO_DATASET, valor_con_tipo
+from registro import configurar_registro, obtener_registro
+from resumenes import LIMITES_INTENSIDAD, NIVELES_INTENSIDAD
+
+registro = obtener_registro(__name__)
+
+# Configuración del servicio (se cambia con configurar_servicio)
+CONFIGURACION_SERVICIO = {
+    'directorio': DIRECTORIO_DATASET,
+    'max_resultados_cache': 256
+}
+
+# Columnas por las que se puede agrupar y medidas (audio e intensidad)
+COLUMNAS_GRUPO = COLUMNAS_PARTICION + ['intensity_category']
+MEDIDAS_CONSULTA = ['intensity_weighted', 'intensity_simple', 'intensity_complex', 'energy', 'loudness',
+                    'loudness_normalized', 'danceability', 'valence', 'tempo', 'duration_ms', 'release_year',
+                    'data_quality_score']
+
+# Funciones de agregación: nombre en la consulta -> función de pyarrow
+FUNCIONES_AGREGACION = {
+    'count': 'count',
+    'sum': 'sum',
+    'mean': 'mean',
+    'min': 'min',
+    'max': 'max',
+    'std': 'stddev'
+}
+
+OPERADORES = ['=', '==', '!=', '<', '<=', '>', '>=', 'in', 'not in']
+
+# Filtro de la línea de comandos: columna, operador y valor ("tempo>140")
+PATRON_FILTRO = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|==|=|<|>)\s*(.*?)\s*$')
+
+PUERTO_SERVICIO = 8765
+
+# Dataset abierto, su versión en disco y resultados guardados
+ESTADO_SERVICIO = {
+    'dataset': None,
+    'version': None
+}
+CACHE_RESULTADOS = OrderedDict()
+CANDADO = threading.Lock()
+
+def configurar_servicio(directorio=None, max_resultados_cache=None):
+    """Cambiar el dataset que se consulta o el tamaño de la caché"""
+
+    with CANDADO:
+        if directorio is not None:
+            CONFIGURACION_SERVICIO['directorio'] = directorio
+            ESTADO_SERVICIO.update({'dataset': None, 'version': None})
+            CACHE_RESULTADOS.clear()
+        if max_resultados_cache is not None:
+            CONFIGURACION_SERVICIO['max_resultados_cache'] = max_resultados_cache
+
+def limpiar_cache_consultas():
+    """Vaciar la caché de resultados"""
+
+    with CANDADO:
+        CACHE_RESULTADOS.clear()
+
+def version_dataset(directorio):
+    """Identifica el dataset en disco: el pipeline lo reemplaza entero, así que cambia el inodo"""
+
+    try:
+        estado = os.stat(directorio)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No existe el dataset {directorio} (ejecuta primero pipeline_completo.py)") from None
+    return (estado.st_ino, estado.st_mtime_ns)
+
+def abrir_dataset():
+    """Dataset de pyarrow abierto una sola vez (se reabre si el pipeline lo reemplazó)"""
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    directorio = CONFIGURACION_SERVICIO['directorio']
+    version = version_dataset(directorio)
+
+    with CANDADO:
+        if ESTADO_SERVICIO['dataset'] is None or ESTADO_SERVICIO['version'] != version:
+            if ESTADO_SERVICIO['dataset'] is not None:
+                registro.info(f"Dataset reemplazado, se vuelve a abrir: {directorio}")
+            # Las carpetas guardan texto: sin esquema, un género como '2000' se leería como número
+            particion = ds.partitioning(pa.schema([(columna, pa.string()) for columna in COLUMNAS_PARTICION]),
+                                        flavor='hive')
+            ESTADO_SERVICIO.update({
+                'dataset': ds.dataset(directorio, format='parquet', partitioning=particion),
+                'version': version
+            })
+            CACHE_RESULTADOS.clear()
+        return ESTADO_SERVICIO['dataset']
+
+def valores_particion(dataset):
+    """Valores de década y género que hay en el dataset, leídos de los nombres de las carpetas"""
+
+    valores = {columna: set() for columna in COLUMNAS_PARTICION}
+    for ruta in dataset.files:
+        for parte in ruta.replace(os.sep, '/').split('/'):
+            columna, _, valor = parte.partition('=')
+            if columna in valores and valor != '__HIVE_DEFAULT_PARTITION__':
+                valores[columna].add(unquote(valor))
+    return {columna: sorted(encontrados) for columna, encontrados in valores.items()}
+
+def normalizar_valor(columna, valor):
+    """El valor de un filtro con el tipo de su columna"""
+
+    if columna in MEDIDAS_CONSULTA:
+        try:
+            numero = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"El filtro de {columna} necesita un número, no {valor!r}") from None
+        return int(numero) if numero.is_integer() else numero
+    if columna == 'intensity_category' and valor not in NIVELES_INTENSIDAD:
+        raise ValueError(f"Nivel de intensidad desconocido: {valor!r} (usa {', '.join(NIVELES_INTENSIDAD)})")
+    return str(valor)
+
+def normalizar_consulta(consulta):
+    """Validar la consulta y dejarla en una forma única (la clave de la caché)
+
+    Los filtros se ordenan (el orden no cambia el resultado), las
+    funciones de cada medida se ordenan sin repetir y las columnas de
+    grupo conservan su orden, que es el de las columnas del resultado.
+    """
+
+    if isinstance(consulta, str):
+        try:
+            consulta = json.loads(consulta)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"La consulta no es un JSON válido: {error}") from None
+    if not isinstance(consulta, dict):
+        raise ValueError("La consulta tiene que ser un diccionario con filtros, agrupar y medidas")
+    desconocidas = set(consulta) - {'filtros', 'agrupar', 'medidas'}
+    if desconocidas:
+        raise ValueError(f"Campos desconocidos en la consulta: {', '.join(sorted(desconocidas))}")
+
+    filtros = []
+    for condicion in consulta.get('filtros') or []:
+        if not isinstance(condicion, (list, tuple)) or len(condicion) != 3:
+            raise ValueError(f"Cada filtro es (columna, operador, valor): {condicion!r}")
+        columna, operador, valor = condicion
+        operador = str(operador).lower()
+        if columna not in COLUMNAS_GRUPO and columna not in MEDIDAS_CONSULTA:
+            raise ValueError(f"No se puede filtrar por {columna!r}")
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador desconocido: {operador!r} (usa {', '.join(OPERADORES)})")
+        if columna == 'intensity_category' and operador not in ['=', '==', '!=', 'in', 'not in']:
+            raise ValueError("intensity_category solo se filtra con =, !=, in o not in")
+
+        if operador in ['in', 'not in']:
+            if isinstance(valor, (str, bytes)) or not hasattr(valor, '__iter__'):
+                raise ValueError(f"El operador {operador} necesita una lista de valores: {valor!r}")
+            valor = sorted({normalizar_valor(columna, elemento) for elemento in valor}, key=str)
+        else:
+            valor = normalizar_valor(columna, valor)
+        filtros.append([columna, '=' if operador == '==' else operador, valor])
+
+    agrupar = consulta.get('agrupar') or []
+    if isinstance(agrupar, str):
+        agrupar = [agrupar]
+    for columna in agrupar:
+        if columna not in COLUMNAS_GRUPO:
+            raise ValueError(f"No se puede agrupar por {columna!r} (usa {', '.join(COLUMNAS_GRUPO)})")
+    if len(set(agrupar)) != len(agrupar):
+        raise ValueError("Columna de grupo repetida")
+
+    medidas = {}
+    for medida, funciones in (consulta.get('medidas') or {}).items():
+        if medida not in MEDIDAS_CONSULTA:
+            raise ValueError(f"Medida desconocida: {medida!r} (usa {', '.join(MEDIDAS_CONSULTA)})")
+        if isinstance(funciones, str):
+            funciones = [funciones]
+        for funcion in funciones:
+            if funcion not in FUNCIONES_AGREGACION:
+                raise ValueError(f"Función desconocida: {funcion!r} (usa {', '.join(FUNCIONES_AGREGACION)})")
+        medidas[medida] = sorted(set(funciones), key=list(FUNCIONES_AGREGACION).index)
+
+    return {
+        'filtros': sorted(filtros, key=lambda condicion: json.dumps(condicion)),
+        'agrupar': list(agrupar),
+        'medidas': dict(sorted(medidas.items()))
+    }
+
+def expresion_nivel(nivel):
+    """Condición sobre intensity_weighted equivalente a intensity_category == nivel
+
+    Los límites son los de resumenes.nivel_intensidad: cada nivel va de su
+    límite inferior (incluido) al siguiente, y una intensidad faltante
+    cuenta como 'Muy Alta'.
+    """
+
+    import pyarrow.compute as pc
+
+    intensidad = pc.field('intensity_weighted')
+    posicion = NIVELES_INTENSIDAD.index(nivel)
+    condiciones = []
+    if posicion > 0:
+        condiciones.append(intensidad >= LIMITES_INTENSIDAD[posicion - 1])
+    if posicion < len(LIMITES_INTENSIDAD):
+        condiciones.append(intensidad < LIMITES_INTENSIDAD[posicion])
+
+    expresion = condiciones[0]
+    for condicion in condiciones[1:]:
+        expresion = expresion & condicion
+    if posicion == len(LIMITES_INTENSIDAD):
+        expresion = expresion | intensidad.is_null(nan_is_null=True)
+    return expresion
+
+def expresion_filtro(columna, operador, valor):
+    """Un filtro normalizado como expresión de pyarrow.dataset"""
+
+    import pyarrow.compute as pc
+
+    if columna == 'intensity_category':
+        niveles = valor if operador in ['in', 'not in'] else [valor]
+        if operador in ['!=', 'not in']:
+            # Los demás niveles (negar la condición perdería las intensidades faltantes)
+            niveles = [nivel for nivel in NIVELES_INTENSIDAD if nivel not in niveles]
+        expresion = pc.scalar(False)
+        for nivel in niveles:
+            expresion = expresion | expresion_nivel(nivel)
+        return expresion
+
+    campo = pc.field(columna)
+    if operador == 'in':
+        return campo.isin(valor)
+    if operador == 'not in':
+        return ~campo.isin(valor)
+    return {
+        '=': campo == valor, '!=': campo != valor,
+        '<': campo < valor, '<=': campo <= valor,
+        '>': campo > valor, '>=': campo >= valor
+    }[operador]
+
+def columna_nivel(intensidad):
+    """intensity_category de cada fila, como resumenes.nivel_intensidad, en Arrow"""
+
+    import numpy as np
+    import pyarrow as pa
+
+    valores = intensidad.to_numpy(zero_copy_only=False).astype('float64')
+    posiciones = np.searchsorted(LIMITES_INTENSIDAD, valores, side='right')
+    return pa.DictionaryArray.from_arrays(pa.array(posiciones.astype('int8')), pa.array(NIVELES_INTENSIDAD))
+
+def calcular_consulta(dataset, consulta):
+    """Ejecutar una consulta normalizada y devolver una pyarrow.Table"""
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    filtro = None
+    for columna, operador, valor in consulta['filtros']:
+        if columna in dataset.schema.names:
+            valor = valor_con_tipo(valor, dataset.schema.field(columna).type)
+        expresion = expresion_filtro(columna, operador, valor)
+        filtro = expresion if filtro is None else filtro & expresion
+
+    agrupar = consulta['agrupar']
+    medidas = consulta['medidas']
+
+    # Solo contar: no hace falta leer ninguna columna
+    if not agrupar and not medidas:
+        return pa.table({'canciones': [dataset.count_rows(filter=filtro)]})
+
+    columnas = [columna for columna in agrupar if columna != 'intensity_category'] + list(medidas)
+    if 'intensity_category' in agrupar:
+        columnas.append('intensity_weighted')
+    tabla = dataset.to_table(columns=list(dict.fromkeys(columnas)), filter=filtro)
+
+    if 'intensity_category' in agrupar:
+        tabla = tabla.append_column('intensity_category', columna_nivel(tabla.column('intensity_weighted')))
+
+    agregaciones = [([], 'count_all')]
+    nombres = ['canciones']
+    for medida, funciones in medidas.items():
+        for funcion in funciones:
+            opciones = pc.VarianceOptions(ddof=1) if funcion == 'std' else None
+            agregaciones.append((medida, FUNCIONES_AGREGACION[funcion], opciones))
+            nombres.append(f"{medida}_{funcion}")
+
+    agrupado = tabla.group_by(agrupar).aggregate(agregaciones)
+    # pyarrow nombra las columnas <medida>_<función de pyarrow>
+    salidas = ['count_all'] + [f"{medida}_{FUNCIONES_AGREGACION[funcion]}"
+                               for medida, funciones in medidas.items() for funcion in funciones]
+    resultado = pa.table([agrupado.column(columna) for columna in agrupar + salidas], names=agrupar + nombres)
+
+    for columna in agrupar:
+        resultado = resultado.filter(pc.is_valid(resultado.column(columna)))
+    if agrupar:
+        if 'intensity_category' in agrupar:
+            # Las tablas de resumen ordenan los niveles por nombre
+            niveles = resultado.column('intensity_category').cast(pa.string())
+            resultado = resultado.set_column(agrupar.index('intensity_category'), 'intensity_category', niveles)
+        resultado = resultado.sort_by([(columna, 'ascending') for columna in agrupar])
+    return resultado
+
+def consultar_tabla(consulta):
+    """Resultado de una consulta como pyarrow.Table y si salió de la caché"""
+
+    normalizada = normalizar_consulta(consulta)
+    dataset = abrir_dataset()
+    clave = json.dumps(normalizada, sort_keys=True)
+
+    with CANDADO:
+        if clave in CACHE_RESULTADOS:
+            CACHE_RESULTADOS.move_to_end(clave)
+            return CACHE_RESULTADOS[clave], True
+
+    resultado = calcular_consulta(dataset, normalizada)
+
+    with CANDADO:
+        # Si el dataset cambió mientras se calculaba, este resultado ya no vale
+        if ESTADO_SERVICIO['dataset'] is dataset:
+            CACHE_RESULTADOS[clave] = resultado
+            while len(CACHE_RESULTADOS) > CONFIGURACION_SERVICIO['max_resultados_cache']:
+                CACHE_RESULTADOS.popitem(last=False)
+    return resultado, False
+
+def consultar(consulta):
+    """Resultado de una consulta como DataFrame de pandas"""
+
+    resultado, _ = consultar_tabla(consulta)
+    return resultado.to_pandas()
+
+def valor_json(valor):
+    """Valor de una celda que se puede escribir en JSON (NaN pasa a null)"""
+
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+def responder(consulta):
+    """Resultado de una consulta listo para JSON: columnas, filas, caché y tiempo"""
+
+    inicio = time.perf_counter()
+    resultado, desde_cache = consultar_tabla(consulta)
+    columnas = resultado.column_names
+    filas = [[valor_json(valor) for valor in fila] for fila in zip(*[resultado.column(columna).to_pylist()
+                                                                        for columna in columnas])]
+    return {
+        'columnas': columnas,
+        'filas': filas,
+        'cache': desde_cache,
+        'milisegundos': round((time.perf_counter() - inicio) * 1000, 3)
+    }
+
+def describir_columnas():
+    """Qué se puede consultar: columnas de grupo con sus valores, medidas, funciones y operadores"""
+
+    valores = valores_particion(abrir_dataset())
+    valores['intensity_category'] = sorted(NIVELES_INTENSIDAD)
+    return {
+        'agrupar': {columna: valores[columna] for columna in COLUMNAS_GRUPO},
+        'medidas': MEDIDAS_CONSULTA,
+        'funciones': list(FUNCIONES_AGREGACION),
+        'operadores': OPERADORES
+    }
+
+def leer_filtro(texto):
+    """Filtro de la línea de comandos: "tempo>140", "main_genre=Latin,Rock" (varios valores es in)"""
+
+    coincidencia = PATRON_FILTRO.match(texto)
+    if not coincidencia:
+        raise ValueError(f"Filtro inválido: {texto!r} (ej: tempo>140, main_genre=Latin)")
+    columna, operador, valor = coincidencia.groups()
+    if ',' in valor and operador in ['=', '==', '!=']:
+        return [columna, 'not in' if operador == '!=' else 'in', [parte.strip() for parte in valor.split(',')]]
+    return [columna, operador, valor]
+
+def leer_medidas(textos):
+    """Medidas de la línea de comandos: "energy:mean,std" (sin funciones es mean)"""
+
+    medidas = {}
+    for texto in textos:
+        medida, _, funciones = texto.partition(':')
+        medidas.setdefault(medida.strip(), []).extend(
+            [funcion.strip() for funcion in funciones.split(',') if funcion.strip()] or ['mean'])
+    return medidas
+
+def armar_consulta(filtros=(), agrupar=(), medidas=()):
+    """Consulta a partir de las opciones de la línea de comandos o de la URL"""
+
+    consulta = {}
+    if filtros:
+        consulta['filtros'] = [leer_filtro(filtro) for filtro in filtros]
+    if agrupar:
+        consulta['agrupar'] = [columna.strip() for texto in agrupar for columna in texto.split(',') if columna.strip()]
+    if medidas:
+        consulta['medidas'] = leer_medidas(medidas)
+    return consulta
+
+def crear_manejador():
+    """Clase que atiende las peticiones HTTP del servicio"""
+
+    from http.server import BaseHTTPRequestHandler
+
+    class ManejadorConsultas(BaseHTTPRequestHandler):
+        def enviar(self, codigo, contenido):
+            cuerpo = json.dumps(contenido, ensure_ascii=False, allow_nan=False).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def atender(self, leer_consulta):
+            ruta = urlparse(self.path)
+            try:
+                if ruta.path == '/columnas':
+                    self.enviar(200, describir_columnas())
+                elif ruta.path == '/consulta':
+                    self.enviar(200, responder(leer_consulta(parse_qs(ruta.query))))
+                else:
+                    self.enviar(404, {'error': f"Ruta desconocida: {ruta.path} (usa /consulta o /columnas)"})
+            except (ValueError, FileNotFoundError) as error:
+                self.enviar(400, {'error': str(error)})
+            except Exception as error:
+                registro.error(f"ERROR en {self.path}: {error}")
+                self.enviar(500, {'error': f"{type(error).__name__}: {error}"})
+
+        def do_GET(self):
+            def leer_consulta(parametros):
+                if 'q' in parametros:
+                    return parametros['q'][0]
+                return armar_consulta(parametros.get('filtro', []), parametros.get('agrupar', []),
+                                      parametros.get('medida', []))
+            self.atender(leer_consulta)
+
+        def do_POST(self):
+            def leer_consulta(parametros):
+                largo = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(largo).decode('utf-8')
+            self.atender(leer_consulta)
+
+        def log_message(self, formato, *argumentos):
+            registro.debug(f"{self.address_string()} {formato % argumentos}")
+
+    return ManejadorConsultas
+
+def servir(host='127.0.0.1', puerto=PUERTO_SERVICIO):
+    """Atender consultas por HTTP hasta Ctrl+C (un hilo por petición, dataset y caché compartidos)"""
+
+    from http.server import ThreadingHTTPServer
+
+    dataset = abrir_dataset()
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador())
+    registro.info(f"Servicio de consultas en http://{host}:{servidor.server_port} "
+                  f"({CONFIGURACION_SERVICIO['directorio']}, {len(dataset.files)} archivos)")
+    registro.info("   GET /columnas | GET /consulta?q=<json> | POST /consulta (Ctrl+C para terminar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        registro.info("Servicio detenido")
+    finally:
+        servidor.server_close()
+
+def leer_argumentos():
+    """Opciones de la línea de comandos"""
+
+    parser = argparse.ArgumentParser(description="Consultas sobre el dataset procesado (CLI o servicio HTTP local)")
+    parser.add_argument('--directorio', default=DIRECTORIO_DATASET, help="dataset Parquet particionado")
+    parser.add_argument('--consulta', help="consulta completa en JSON")
+    parser.add_argument('--filtro', action='append', default=[], help="condición, ej: tempo>140 o main_genre=Latin")
+    parser.add_argument('--agrupar', action='append', default=[],
+                        help=f"columna de grupo ({', '.join(COLUMNAS_GRUPO)})")
+    parser.add_argument('--medida', action='append', default=[], help="medida y funciones, ej: energy:mean,std")
+    parser.add_argument('--json', action='store_true', help="escribir el resultado en JSON")
+    parser.add_argument('--servir', action='store_true', help="atender consultas por HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=PUERTO_SERVICIO)
+    parser.add_argument('--quiet', action='store_true', help="solo advertencias y errores")
+    opciones = parser.parse_args()
+
+    if opciones.consulta and (opciones.filtro or opciones.agrupar or opciones.medida):
+        parser.error("--consulta no se combina con --filtro, --agrupar ni --medida")
+    return opciones
+
+if __name__ == "__main__":
+    opciones = leer_argumentos()
+    configurar_registro('silencioso' if opciones.quiet else None)
+    configurar_servicio(directorio=opciones.directorio)
+
+    if opciones.servir:
+        servir(opciones.host, opciones.puerto)
+        sys.exit(0)
+
+    try:
+        consulta = opciones.consulta or armar_consulta(opciones.filtro, opciones.agrupar, opciones.medida)
+        respuesta = responder(consulta)
+    except (ValueError, FileNotFoundError) as error:
+        print(f"ERROR: {error}", file=sys.stderr)
+        sys.exit(2)
+
+    if opciones.json:
+        print(json.dumps(respuesta, ensure_ascii=False, allow_nan=False, indent=2))
+    else:
+        import pandas as pd
+
+        print(pd.DataFrame(respuesta['filas'], columns=respuesta['columnas']).to_string(index=False))
+        print(f"\n{len(respuesta['filas'])} filas en {respuesta['milisegundos']:.1f} ms")
@@ -3,345 +3,437 @@
 """
 Script para verificar la calidad de los datos procesados
 Nivel: Desarrollador
+
+Las verificaciones son reglas declaradas como datos en REGLAS_CALIDAD
+(rango, nulos, correlación, mínimo por grupo, balance, ...). Todas se
+evalúan juntas:
+- se arma una tabla con lo que necesita cada regla (valores, indicadores
+  de fuera de rango, nulos, productos para correlaciones)
+- se agrupa una sola vez por década × género
+- cada regla se resuelve sumando las celdas de esa tabla (todo el
+  dataset, por década o por género), sin volver a recorrer los datos.
+
+El resultado es un reporte (diccionario de tablas) que se puede usar
+desde otros scripts; mostrar_reporte() lo imprime.
 """
 
 import pandas as pd
 import numpy as np
 import os
+import logging
 
-def verificar_distribuciones(df):
-    """Verificar que las distribuciones de intensidad tienen sentido"""
-    
-    print("=== VERIFICACION DE DISTRIBUCIONES ===")
-    
-    if 'intensity_weighted' in df.columns and 'release_decade' in df.columns:
-        # Ver estadísticas básicas por década
-        for decada in sorted(df['release_decade'].unique()):
-            if pd.notna(decada):
-                datos_decada = df[df['release_decade'] == decada]['intensity_weighted']
-                print(f"\n{decada}:")
-                print(f"  Promedio: {datos_decada.mean():.3f}")
-                print(f"  Mediana: {datos_decada.median():.3f}")
-                print(f"  Minimo: {datos_decada.min():.3f}")
-                print(f"  Maximo: {datos_decada.max():.3f}")
-                print(f"  Canciones: {len(datos_decada):,}")
-        
-        return True
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return False
+from resumenes import factorizar, etiquetar, funcion_columna
+from instrumentacion import instrumentar
+from registro import obtener_registro, mostrar_detalle
 
-def verificar_tendencia_temporal(df):
-    """Verificar que la tendencia temporal tiene sentido"""
-    
-    print("\n=== VERIFICACION DE TENDENCIA TEMPORAL ===")
-    
-    if 'intensity_weighted' in df.columns and 'release_decade' in df.columns:
-        # Calcular intensidad promedio por década
-        intensidad_por_decada = df.groupby('release_decade')['intensity_weighted'].mean().sort_index()
-        
-        print("Intensidad promedio por década:")
-        for decada, intensidad in intensidad_por_decada.items():
-            if pd.notna(decada) and decada != 'Unknown':
-                print(f"  {decada}: {intensidad:.3f}")
-        
-        # Ver si hay tendencia creciente
-        decadas_numericas = []
-        intensidades = []
-        
-        for decada, intensidad in intensidad_por_decada.items():
-            if pd.notna(decada) and decada != 'Unknown':
-                año = int(decada.replace('s', ''))
-                decadas_numericas.append(año)
-                intensidades.append(intensidad)
-        
-        # Calcular correlación entre año e intensidad
-        if len(decadas_numericas) > 1:
-            correlacion = np.corrcoef(decadas_numericas, intensidades)[0, 1]
-            print(f"\nCorrelación año-intensidad: {correlacion:.3f}")
-            
-            if correlacion > 0.3:
-                print("RESULTADO: Hay tendencia creciente (la música se volvió más intensa con el tiempo)")
-            elif correlacion < -0.3:
-                print("RESULTADO: Hay tendencia decreciente (la música se volvió menos intensa con el tiempo)")
-            else:
-                print("RESULTADO: No hay tendencia clara")
-        
-        return True
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return False
+registro = obtener_registro(__name__)
 
-def verificar_coherencia_generos(df):
-    """Verificar que los géneros tienen valores de intensidad coherentes"""
-    
-    print("\n=== VERIFICACION DE COHERENCIA DE GENEROS ===")
-    
-    if 'intensity_weighted' in df.columns and 'main_genre' in df.columns:
-        # Intensidad promedio por género
-        intensidad_por_genero = df.groupby('main_genre')['intensity_weighted'].mean().sort_values(ascending=False)
-        
-        print("Intensidad promedio por género:")
-        for genero, intensidad in intensidad_por_genero.items():
-            print(f"  {genero}: {intensidad:.3f}")
-        
-        # Verificar que los géneros "intensos" tienen valores altos
-        generos_intensos = ['Electronic', 'Hip-Hop', 'Rock']
-        generos_tranquilos = ['Jazz', 'Classical', 'Country']
-        
-        print(f"\nGéneros que deberían ser intensos: {generos_intensos}")
-        print(f"Géneros que deberían ser tranquilos: {generos_tranquilos}")
-        
-        # Verificar coherencia
-        for genero in generos_intensos:
-            if genero in intensidad_por_genero.index:
-                intensidad = intensidad_por_genero[genero]
-                if intensidad > 0.6:
-                    print(f"  OK: {genero} es intenso ({intensidad:.3f})")
-                else:
-                    print(f"  ADVERTENCIA: {genero} no es tan intenso como esperado ({intensidad:.3f})")
-        
-        for genero in generos_tranquilos:
-            if genero in intensidad_por_genero.index:
-                intensidad = intensidad_por_genero[genero]
-                if intensidad < 0.5:
-                    print(f"  OK: {genero} es tranquilo ({intensidad:.3f})")
-                else:
-                    print(f"  ADVERTENCIA: {genero} es más intenso de lo esperado ({intensidad:.3f})")
-        
-        return True
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return False
+# Claves de la tabla agrupada: las reglas por grupo usan una de ellas
+CLAVES_CALIDAD = ['release_decade', 'main_genre']
 
-def verificar_reglas_basicas(df):
-    """Verificar que los datos cumplen reglas básicas"""
-    
-    print("\n=== VERIFICACION DE REGLAS BASICAS ===")
-    
-    errores = []
-    
-    # 1. No debe haber fechas futuras
-    if 'release_year' in df.columns:
-        fechas_futuras = (df['release_year'] > 2024).sum()
-        if fechas_futuras > 0:
-            errores.append(f"ERROR: {fechas_futuras} canciones tienen fechas futuras (> 2024)")
-        else:
-            print("OK: No hay fechas futuras")
-    
-    # 2. Energy debe estar entre 0 y 1
-    if 'energy' in df.columns:
-        energy_fuera_rango = ((df['energy'] < 0) | (df['energy'] > 1)).sum()
-        if energy_fuera_rango > 0:
-            errores.append(f"ERROR: {energy_fuera_rango} canciones tienen energy fuera de rango (0-1)")
-        else:
-            print("OK: Todos los valores de energy están entre 0 y 1")
-    
-    # 3. Loudness_normalized debe estar entre 0 y 1
-    if 'loudness_normalized' in df.columns:
-        loudness_fuera_rango = ((df['loudness_normalized'] < 0) | (df['loudness_normalized'] > 1)).sum()
-        if loudness_fuera_rango > 0:
-            errores.append(f"ERROR: {loudness_fuera_rango} canciones tienen loudness_normalized fuera de rango (0-1)")
-        else:
-            print("OK: Todos los valores de loudness_normalized están entre 0 y 1")
-    
-    # 4. Energy y loudness deben estar correlacionados positivamente
-    if 'energy' in df.columns and 'loudness' in df.columns:
-        correlacion = df['energy'].corr(df['loudness'])
-        if correlacion < 0.3:
-            errores.append(f"ERROR: Correlación energy-loudness muy baja: {correlacion:.3f} (debería ser > 0.3)")
-        elif correlacion > 0.7:
-            errores.append(f"ADVERTENCIA: Correlación energy-loudness muy alta: {correlacion:.3f} (puede indicar redundancia)")
-        else:
-            print(f"OK: Correlación energy-loudness normal: {correlacion:.3f}")
-    
-    # Mostrar errores si los hay
-    if errores:
-        print("\nERRORES ENCONTRADOS:")
-        for error in errores:
-            print(f"  {error}")
+# Nivel de registro con que se muestra el resultado de cada regla
+NIVELES_RESULTADO = {'OK': logging.INFO, 'INFO': logging.INFO, 'ADVERTENCIA': logging.WARNING, 'ERROR': logging.ERROR}
+
+# Reglas de calidad. El nivel es 'ERROR' (hace fallar la verificación),
+# 'ADVERTENCIA' o 'INFO' (solo se informa). Tipos:
+# - 'rango': ningún valor de la columna fuera de [minimo, maximo]
+# - 'nulos': ninguna de las columnas con más de 'maximo' nulos
+# - 'correlacion': correlación entre dos columnas dentro de [minimo, maximo]
+# - 'minimo_por_grupo': cada grupo con al menos 'minimo' canciones
+# - 'proporcion_por_grupo': en cada grupo, la media de una columna
+#   booleana (proporción de verdaderos) dentro de [minimo, maximo]
+# - 'media_por_grupo': la media de la columna en los grupos indicados
+#   dentro de [minimo, maximo]
+# - 'balance': el grupo más grande (o los 'top' más grandes) con a lo
+#   sumo 'maximo' de las canciones
+# - 'tendencia': correlación entre la década y la media de la columna
+#   (informativa)
+REGLAS_CALIDAD = [
+    {'nombre': 'fechas_futuras', 'tipo': 'rango', 'columna': 'release_year', 'maximo': 2024,
+     'nivel': 'ERROR', 'descripcion': 'No debe haber fechas futuras (> 2024)'},
+    {'nombre': 'energy_en_rango', 'tipo': 'rango', 'columna': 'energy', 'minimo': 0, 'maximo': 1,
+     'nivel': 'ERROR', 'descripcion': 'Energy entre 0 y 1'},
+    {'nombre': 'loudness_normalized_en_rango', 'tipo': 'rango', 'columna': 'loudness_normalized',
+     'minimo': 0, 'maximo': 1, 'nivel': 'ERROR', 'descripcion': 'Loudness_normalized entre 0 y 1'},
+    {'nombre': 'sin_nulos_criticos', 'tipo': 'nulos', 'columnas': ['energy', 'loudness', 'intensity_weighted'],
+     'maximo': 0, 'nivel': 'ERROR', 'descripcion': 'Sin nulos en energy, loudness e intensidad'},
+    {'nombre': 'correlacion_energy_loudness', 'tipo': 'correlacion', 'columnas': ['energy', 'loudness'],
+     'minimo': 0.3, 'nivel': 'ERROR', 'descripcion': 'Energy y loudness correlacionados (> 0.3)'},
+    # Como antes, una correlación muy alta también hace fallar la verificación
+    {'nombre': 'redundancia_energy_loudness', 'tipo': 'correlacion', 'columnas': ['energy', 'loudness'],
+     'maximo': 0.7, 'nivel': 'ERROR', 'descripcion': 'Energy y loudness no redundantes (< 0.7)'},
+    {'nombre': 'canciones_por_decada', 'tipo': 'minimo_por_grupo', 'grupo': 'release_decade', 'minimo': 500,
+     'nivel': 'ADVERTENCIA', 'descripcion': 'Al menos 500 canciones por década'},
+    {'nombre': 'canciones_por_genero', 'tipo': 'minimo_por_grupo', 'grupo': 'main_genre', 'minimo': 1000,
+     'nivel': 'ADVERTENCIA', 'descripcion': 'Al menos 1000 canciones por género'},
+    {'nombre': 'completitud_por_decada', 'tipo': 'proporcion_por_grupo', 'grupo': 'release_decade',
+     'columna': 'is_complete', 'minimo': 0.8, 'nivel': 'ADVERTENCIA',
+     'descripcion': 'Al menos 80% de canciones completas por década'},
+    {'nombre': 'completitud_por_genero', 'tipo': 'proporcion_por_grupo', 'grupo': 'main_genre',
+     'columna': 'is_complete', 'minimo': 0.8, 'nivel': 'ADVERTENCIA',
+     'descripcion': 'Al menos 80% de canciones completas por género'},
+    {'nombre': 'balance_temporal', 'tipo': 'balance', 'grupo': 'release_decade', 'maximo': 0.5,
+     'nivel': 'ADVERTENCIA', 'descripcion': 'Ninguna década con más del 50% de los datos'},
+    {'nombre': 'balance_generos', 'tipo': 'balance', 'grupo': 'main_genre', 'top': 5, 'maximo': 0.7,
+     'nivel': 'ADVERTENCIA', 'descripcion': 'Los 5 géneros principales con menos del 70% de los datos'},
+    {'nombre': 'generos_intensos', 'tipo': 'media_por_grupo', 'grupo': 'main_genre', 'columna': 'intensity_weighted',
+     'grupos': ['Electronic', 'Hip-Hop', 'Rock'], 'minimo': 0.6, 'nivel': 'ADVERTENCIA',
+     'descripcion': 'Géneros intensos con intensidad media > 0.6'},
+    {'nombre': 'generos_tranquilos', 'tipo': 'media_por_grupo', 'grupo': 'main_genre', 'columna': 'intensity_weighted',
+     'grupos': ['Jazz', 'Classical', 'Country'], 'maximo': 0.5, 'nivel': 'ADVERTENCIA',
+     'descripcion': 'Géneros tranquilos con intensidad media < 0.5'},
+    {'nombre': 'tendencia_temporal', 'tipo': 'tendencia', 'grupo': 'release_decade', 'columna': 'intensity_weighted',
+     'nivel': 'INFO', 'descripcion': 'Tendencia de la intensidad a lo largo de las décadas'}
+]
+
+# Columnas que siempre se agregan, para las tablas por década y por género
+MEDIDAS_CALIDAD = ['intensity_weighted', 'is_complete']
+
+def columnas_de_reglas(reglas):
+    """Columnas que necesita cada tipo de agregado (medidas, rangos, nulos, correlaciones)"""
+
+    medidas = list(MEDIDAS_CALIDAD)
+    for regla in reglas:
+        if regla['tipo'] in ('proporcion_por_grupo', 'media_por_grupo', 'tendencia') and regla['columna'] not in medidas:
+            medidas.append(regla['columna'])
+
+    return medidas
+
+@instrumentar
+def agrupar_para_reglas(df, reglas):
+    """Agrupar una sola vez por década × género todo lo que usan las reglas
+
+    Devuelve una fila por celda con las claves y, según las reglas:
+    - por medida: cantidad, suma, mínimo y máximo
+    - por regla de rango: filas fuera de rango
+    - por regla de nulos: nulos de cada columna
+    - por regla de correlación: filas con ambos valores y sus sumas,
+      sumas de cuadrados y suma de productos.
+    Todas estas columnas se pueden sumar entre celdas.
+    """
+
+    tabla = {}
+    etiquetas = {}
+    for clave in CLAVES_CALIDAD:
+        tabla[clave], etiquetas[clave] = factorizar(df[clave])
+
+    # Las medidas guardan cantidad, suma, mínimo y máximo; lo demás solo se suma
+    tabla['filas'] = np.ones(len(df), dtype='int64')
+    agregaciones = {'filas': ['sum']}
+
+    for medida in columnas_de_reglas(reglas):
+        if medida not in df.columns:
+            continue
+        valores = df[medida].to_numpy(dtype='float64', na_value=np.nan)
+        tabla[medida] = valores
+        agregaciones[medida] = ['count', 'sum', 'min', 'max']
+
+    for regla in reglas:
+        nombre = regla['nombre']
+
+        if regla['tipo'] == 'rango' and regla['columna'] in df.columns:
+            valores = df[regla['columna']].to_numpy(dtype='float64', na_value=np.nan)
+            fuera = np.zeros(len(df), dtype=bool)
+            if 'minimo' in regla:
+                fuera |= valores < regla['minimo']
+            if 'maximo' in regla:
+                fuera |= valores > regla['maximo']
+            tabla[f"{nombre}_fuera"] = fuera.astype('int64')
+            agregaciones[f"{nombre}_fuera"] = ['sum']
+
+        elif regla['tipo'] == 'nulos':
+            for columna in regla['columnas']:
+                if columna in df.columns and f"nulos_{columna}" not in tabla:
+                    tabla[f"nulos_{columna}"] = df[columna].isna().to_numpy().astype('int64')
+                    agregaciones[f"nulos_{columna}"] = ['sum']
+
+        elif regla['tipo'] == 'correlacion' and all(columna in df.columns for columna in regla['columnas']):
+            x, y = (df[columna].to_numpy(dtype='float64', na_value=np.nan) for columna in regla['columnas'])
+            ambos = ~(np.isnan(x) | np.isnan(y))
+            x, y = np.where(ambos, x, 0), np.where(ambos, y, 0)
+            for sufijo, valores in [('n', ambos.astype('int64')), ('x', x), ('y', y),
+                                    ('xx', x * x), ('yy', y * y), ('xy', x * y)]:
+                tabla[f"{nombre}_{sufijo}"] = valores
+                agregaciones[f"{nombre}_{sufijo}"] = ['sum']
+
+    celdas = pd.DataFrame(tabla).groupby(CLAVES_CALIDAD).agg(agregaciones)
+    celdas.columns = ['_'.join(columna) for columna in celdas.columns]
+    celdas = celdas.rename(columns={f"{columna}_sum": columna for columna, funciones in agregaciones.items()
+                                    if funciones == ['sum']})
+
+    # Pasar los códigos de cada celda a sus etiquetas
+    claves = pd.DataFrame({clave: etiquetar(celdas.index.get_level_values(clave).to_numpy(), etiquetas[clave])
+                           for clave in CLAVES_CALIDAD})
+
+    return pd.concat([claves, celdas.reset_index(drop=True)], axis=1)
+
+def sumar_celdas(celdas, grupo=None):
+    """Sumar las celdas de todo el dataset (una fila) o por grupo (sin el grupo 'sin valor')"""
+
+    funciones = {columna: funcion_columna(columna) for columna in celdas.columns if columna not in CLAVES_CALIDAD}
+
+    if grupo is None:
+        return celdas.agg(funciones)
+
+    return celdas.groupby(grupo, observed=True).agg(funciones)
+
+def fuera_de_limites(valor, regla):
+    """Saber si un valor queda fuera de [minimo, maximo] de la regla"""
+
+    if pd.isna(valor):
         return False
+    return ('minimo' in regla and valor < regla['minimo']) or ('maximo' in regla and valor > regla['maximo'])
+
+def texto_limite(regla):
+    """Límite de la regla como texto (ej: '>= 0.3', '0 a 1')"""
+
+    if 'minimo' in regla and 'maximo' in regla:
+        return f"{regla['minimo']} a {regla['maximo']}"
+    if 'minimo' in regla:
+        return f">= {regla['minimo']}"
+    if 'maximo' in regla:
+        return f"<= {regla['maximo']}"
+    return ''
+
+def correlacion_desde_sumas(n, x, y, xx, yy, xy):
+    """Correlación de Pearson a partir de las sumas"""
+
+    if n < 2:
+        return np.nan
+    covarianza = n * xy - x * y
+    varianzas = (n * xx - x * x) * (n * yy - y * y)
+    return covarianza / np.sqrt(varianzas) if varianzas > 0 else np.nan
+
+def evaluar_regla(regla, celdas, total):
+    """Evaluar una regla con la tabla agrupada; devuelve una lista de resultados
+
+    Cada resultado es un diccionario con la regla, el grupo (o None),
+    el valor medido y si cumple.
+    """
+
+    tipo = regla['tipo']
+    resultados = []
+
+    def agregar(valor, cumple, grupo=None):
+        resultados.append({'regla': regla['nombre'], 'tipo': tipo, 'nivel': regla['nivel'], 'grupo': grupo,
+                           'valor': valor, 'limite': texto_limite(regla), 'cumple': bool(cumple),
+                           'descripcion': regla['descripcion']})
+
+    if tipo == 'rango':
+        if f"{regla['nombre']}_fuera" in total:
+            fuera = int(total[f"{regla['nombre']}_fuera"])
+            agregar(fuera, fuera == 0)
+
+    elif tipo == 'nulos':
+        for columna in regla['columnas']:
+            if f"nulos_{columna}" in total:
+                nulos = int(total[f"nulos_{columna}"])
+                agregar(nulos, nulos <= regla['maximo'], columna)
+
+    elif tipo == 'correlacion':
+        if f"{regla['nombre']}_n" in total:
+            sumas = [total[f"{regla['nombre']}_{sufijo}"] for sufijo in ['n', 'x', 'y', 'xx', 'yy', 'xy']]
+            correlacion = correlacion_desde_sumas(*sumas)
+            agregar(correlacion, not fuera_de_limites(correlacion, regla))
+
+    elif tipo == 'minimo_por_grupo':
+        for grupo, fila in sumar_celdas(celdas, regla['grupo']).iterrows():
+            agregar(int(fila['filas']), fila['filas'] >= regla['minimo'], grupo)
+
+    elif tipo in ('proporcion_por_grupo', 'media_por_grupo'):
+        columna = regla['columna']
+        if f"{columna}_count" in celdas.columns:
+            por_grupo = sumar_celdas(celdas, regla['grupo'])
+            grupos = regla.get('grupos', list(por_grupo.index))
+            for grupo in grupos:
+                if grupo in por_grupo.index and por_grupo.loc[grupo, f"{columna}_count"] > 0:
+                    media = por_grupo.loc[grupo, f"{columna}_sum"] / por_grupo.loc[grupo, f"{columna}_count"]
+                    agregar(media, not fuera_de_limites(media, regla), grupo)
+
+    elif tipo == 'balance':
+        cantidades = sumar_celdas(celdas, regla['grupo'])['filas'].sort_values(ascending=False)
+        if cantidades.sum() > 0:
+            proporcion = cantidades.head(regla.get('top', 1)).sum() / cantidades.sum()
+            grupo = cantidades.index[0] if regla.get('top', 1) == 1 else f"top {regla['top']}"
+            agregar(proporcion, not fuera_de_limites(proporcion, regla), grupo)
+
+    elif tipo == 'tendencia':
+        columna = regla['columna']
+        if f"{columna}_count" in celdas.columns:
+            por_grupo = sumar_celdas(celdas, regla['grupo'])
+            medias = (por_grupo[f"{columna}_sum"] / por_grupo[f"{columna}_count"]).dropna()
+            if len(medias) > 1:
+                anios = [int(str(decada).replace('s', '')) for decada in medias.index]
+                agregar(np.corrcoef(anios, medias.to_numpy())[0, 1], True)
+
     else:
-        print("\nRESULTADO: Todas las reglas básicas se cumplen")
-        return True
-
-def verificar_completitud_por_decada(df):
-    """Verificar que tenemos suficientes datos por década"""
-    
-    print("\n=== VERIFICACION DE COMPLETITUD POR DECADA ===")
-    
-    if 'release_decade' in df.columns and 'is_complete' in df.columns:
-        completitud_decada = df.groupby('release_decade').agg({
-            'is_complete': 'mean',  # % de canciones completas
-            'track_id': 'count'     # Número de canciones
-        })
-        
-        print("Completitud por década:")
-        for decada, row in completitud_decada.iterrows():
-            if pd.notna(decada):
-                canciones = row['track_id']
-                completitud = row['is_complete'] * 100
-                
-                print(f"  {decada}: {canciones:,} canciones, {completitud:.1f}% completas")
-                
-                # Verificar criterios
-                if canciones < 500:
-                    print(f"    ADVERTENCIA: Pocas canciones (< 500)")
-                elif canciones < 1000:
-                    print(f"    OK: Cantidad aceptable (500-1000)")
-                else:
-                    print(f"    EXCELENTE: Buena cantidad (> 1000)")
-                
-                if completitud < 80:
-                    print(f"    ADVERTENCIA: Baja completitud (< 80%)")
-                else:
-                    print(f"    OK: Buena completitud (> 80%)")
-        
-        return completitud_decada
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return None
-
-def verificar_completitud_por_genero(df):
-    """Verificar que tenemos suficientes datos por género"""
-    
-    print("\n=== VERIFICACION DE COMPLETITUD POR GENERO ===")
-    
-    if 'main_genre' in df.columns and 'is_complete' in df.columns:
-        completitud_genero = df.groupby('main_genre').agg({
-            'is_complete': 'mean',
-            'track_id': 'count'
-        }).sort_values('track_id', ascending=False)
-        
-        print("Completitud por género:")
-        for genero, row in completitud_genero.iterrows():
-            canciones = row['track_id']
-            completitud = row['is_complete'] * 100
-            
-            print(f"  {genero}: {canciones:,} canciones, {completitud:.1f}% completas")
-            
-            # Verificar criterios
-            if canciones < 1000:
-                print(f"    ADVERTENCIA: Pocas canciones (< 1000)")
-            else:
-                print(f"    OK: Buena cantidad (> 1000)")
-            
-            if completitud < 80:
-                print(f"    ADVERTENCIA: Baja completitud (< 80%)")
-            else:
-                print(f"    OK: Buena completitud (> 80%)")
-        
-        return completitud_genero
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return None
-
-def verificar_balance_temporal(df):
-    """Verificar que los datos están balanceados por década"""
-    
-    print("\n=== VERIFICACION DE BALANCE TEMPORAL ===")
-    
-    if 'release_decade' in df.columns:
-        # Distribución por década
-        distribucion_decada = df['release_decade'].value_counts(normalize=True).sort_index()
-        
-        print("Distribución por década:")
-        for decada, porcentaje in distribucion_decada.items():
-            if pd.notna(decada):
-                print(f"  {decada}: {porcentaje*100:.1f}%")
-        
-        # Verificar si hay desbalance severo
-        max_porcentaje = distribucion_decada.max()
-        if max_porcentaje > 0.5:
-            print(f"\nADVERTENCIA: Una década representa el {max_porcentaje*100:.1f}% de los datos")
-            print("   Esto puede crear sesgo en el análisis")
-        else:
-            print(f"\nOK: Balance temporal aceptable (máximo: {max_porcentaje*100:.1f}%)")
-        
-        return distribucion_decada
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return None
-
-def verificar_balance_generos(df):
-    """Verificar que los géneros están balanceados"""
-    
-    print("\n=== VERIFICACION DE BALANCE DE GENEROS ===")
-    
-    if 'main_genre' in df.columns:
-        # Distribución por género
-        distribucion_genero = df['main_genre'].value_counts(normalize=True)
-        
-        print("Distribución por género:")
-        for genero, porcentaje in distribucion_genero.items():
-            print(f"  {genero}: {porcentaje*100:.1f}%")
-        
-        # Verificar concentración en top géneros
-        top_5_porcentaje = distribucion_genero.head(5).sum()
-        if top_5_porcentaje > 0.7:
-            print(f"\nADVERTENCIA: Los top 5 géneros representan el {top_5_porcentaje*100:.1f}% de los datos")
-            print("   Esto puede crear sesgo hacia ciertos géneros")
+        raise ValueError(f"Tipo de regla desconocido: {tipo}")
+
+    return resultados
+
+def tabla_por_grupo(celdas, grupo):
+    """Canciones, intensidad (media, mínimo, máximo) y completitud de cada grupo"""
+
+    por_grupo = sumar_celdas(celdas, grupo)
+    tabla = pd.DataFrame({'canciones': por_grupo['filas']}, index=por_grupo.index)
+
+    if 'intensity_weighted_count' in por_grupo.columns:
+        tabla['intensidad_media'] = por_grupo['intensity_weighted_sum'] / por_grupo['intensity_weighted_count']
+        tabla['intensidad_min'] = por_grupo['intensity_weighted_min']
+        tabla['intensidad_max'] = por_grupo['intensity_weighted_max']
+    if 'is_complete_count' in por_grupo.columns:
+        tabla['completitud'] = por_grupo['is_complete_sum'] / por_grupo['is_complete_count']
+
+    return tabla
+
+@instrumentar
+def verificar_calidad(df, reglas=None):
+    """Evaluar todas las reglas de calidad con una sola agrupación del dataset
+
+    Devuelve un reporte (diccionario):
+    - 'resultados': una fila por regla (y grupo) con valor, límite y si cumple
+    - 'por_decada' y 'por_genero': canciones, intensidad y completitud
+    - 'ok': True si ninguna regla de nivel ERROR falló
+    """
+
+    reglas = REGLAS_CALIDAD if reglas is None else reglas
+
+    faltantes = [clave for clave in CLAVES_CALIDAD if clave not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas necesarias para verificar la calidad: {faltantes}")
+
+    celdas = agrupar_para_reglas(df, reglas)
+    total = sumar_celdas(celdas)
+
+    resultados = []
+    for regla in reglas:
+        resultados.extend(evaluar_regla(regla, celdas, total))
+
+    resultados = pd.DataFrame(resultados, columns=['regla', 'tipo', 'nivel', 'grupo', 'valor', 'limite',
+                                                   'cumple', 'descripcion'])
+    errores = resultados[(resultados['nivel'] == 'ERROR') & ~resultados['cumple']]
+
+    return {
+        'resultados': resultados,
+        'por_decada': tabla_por_grupo(celdas, 'release_decade'),
+        'por_genero': tabla_por_grupo(celdas, 'main_genre').sort_values('canciones', ascending=False),
+        'canciones': int(total['filas']),
+        'ok': errores.empty
+    }
+
+# Tipos de regla cuyo valor es una cantidad de filas
+TIPOS_CONTEO = ['rango', 'nulos', 'minimo_por_grupo']
+
+def formatear_valor(valor, tipo):
+    """Valor de un resultado como texto (las cantidades sin decimales)"""
+
+    if tipo in TIPOS_CONTEO:
+        return f"{int(valor):,}"
+    return f"{valor:.3f}"
+
+def describir_tendencia(correlacion):
+    """Texto con el sentido de la tendencia según la correlación"""
+
+    if correlacion > 0.3:
+        return "creciente (la música se volvió más intensa con el tiempo)"
+    if correlacion < -0.3:
+        return "decreciente (la música se volvió menos intensa con el tiempo)"
+    return "sin tendencia clara"
+
+def mostrar_reporte(reporte):
+    """Imprimir el reporte de calidad
+
+    Las tablas por década y por género solo se muestran en modo detalle.
+    Cada regla sale con el nivel de su resultado: las que fallan como
+    advertencia o error, así se ven también en modo silencioso.
+    """
+
+    if mostrar_detalle():
+        registro.debug("=== CANCIONES E INTENSIDAD POR DECADA ===")
+        for decada, fila in reporte['por_decada'].iterrows():
+            linea = f"  {decada}: {int(fila['canciones']):,} canciones"
+            if 'intensidad_media' in fila:
+                linea += (f", intensidad {fila['intensidad_media']:.3f} "
+                          f"({fila['intensidad_min']:.3f} - {fila['intensidad_max']:.3f})")
+            if 'completitud' in fila:
+                linea += f", {fila['completitud'] * 100:.1f}% completas"
+            registro.debug(linea)
+
+        registro.debug("\n=== CANCIONES E INTENSIDAD POR GENERO ===")
+        for genero, fila in reporte['por_genero'].iterrows():
+            linea = f"  {genero}: {int(fila['canciones']):,} canciones"
+            if 'intensidad_media' in fila:
+                linea += f", intensidad {fila['intensidad_media']:.3f}"
+            if 'completitud' in fila:
+                linea += f", {fila['completitud'] * 100:.1f}% completas"
+            registro.debug(linea)
+        registro.debug("")
+
+    registro.info("=== REGLAS DE CALIDAD ===")
+    for regla, resultados in reporte['resultados'].groupby('regla', sort=False):
+        primera = resultados.iloc[0]
+        fallidas = resultados[~resultados['cumple']]
+        estado = 'OK' if fallidas.empty else primera['nivel']
+        nivel = NIVELES_RESULTADO[estado]
+        valor = formatear_valor(primera['valor'], primera['tipo'])
+
+        if primera['tipo'] == 'tendencia':
+            registro.info(f"INFO: {primera['descripcion']}: {describir_tendencia(primera['valor'])} (correlación {valor})")
+        elif len(resultados) == 1:
+            grupo = f"{primera['grupo']}: " if primera['grupo'] is not None else ''
+            registro.log(nivel, f"{estado}: {primera['descripcion']} ({grupo}{valor}, límite {primera['limite']})")
         else:
-            print(f"\nOK: Balance de géneros aceptable (top 5: {top_5_porcentaje*100:.1f}%)")
-        
-        return distribucion_genero
-    else:
-        print("ERROR: Faltan columnas necesarias")
-        return None
-
-def verificar_todo():
-    """Función principal para verificar todo"""
-    
-    print("VERIFICANDO CALIDAD DE LOS DATOS")
-    print("=" * 60)
-    
-    # Cargar el dataset con variables de intensidad
-    from crear_intensidad import crear_variables_intensidad
-    
-    print("Cargando dataset con variables de intensidad...")
-    resultado = crear_variables_intensidad()
-    
-    if resultado is None:
-        print("ERROR: No se pudo cargar el dataset")
-        return False
-    
-    df, resumen_decada, resumen_decada_genero, stats_genero = resultado
-    
-    print(f"Dataset cargado: {len(df):,} canciones")
-    
-    # Ejecutar todas las verificaciones
-    print("\n" + "="*60)
-    print("EJECUTANDO VERIFICACIONES")
-    print("="*60)
-    
-    # Verificaciones estadísticas
-    verificar_distribuciones(df)
-    verificar_tendencia_temporal(df)
-    verificar_coherencia_generos(df)
-    
-    # Verificaciones de reglas básicas
-    reglas_ok = verificar_reglas_basicas(df)
-    
-    # Verificaciones de completitud
-    verificar_completitud_por_decada(df)
-    verificar_completitud_por_genero(df)
-    
-    # Verificaciones de balance
-    verificar_balance_temporal(df)
-    verificar_balance_generos(df)
-    
-    print(f"\n{'='*60}")
-    print("VERIFICACION COMPLETADA")
-    print(f"{'='*60}")
-    
-    if reglas_ok:
-        print("RESULTADO FINAL: Los datos están listos para análisis")
-        print("OK: Todas las verificaciones pasaron exitosamente")
+            registro.log(nivel, f"{estado}: {primera['descripcion']} "
+                                f"({len(resultados) - len(fallidas)}/{len(resultados)} cumplen)")
+            for grupo, valor, tipo, limite in zip(fallidas['grupo'], fallidas['valor'], fallidas['tipo'],
+                                                  fallidas['limite']):
+                registro.log(nivel, f"    {grupo}: {formatear_valor(valor, tipo)} (límite {limite})")
+
+def verificar_todo(df=None):
+    """Función principal para verificar todo
+
+    Recibe el dataset con variables de intensidad en memoria; si se
+    ejecuta solo, lo crea primero. Devuelve True si ninguna regla de
+    nivel ERROR falló.
+    """
+
+    registro.info("VERIFICANDO CALIDAD DE LOS DATOS")
+    registro.info("=" * 60)
+
+    if df is None:
+        from crear_intensidad import crear_variables_intensidad
+
+        registro.info("Cargando dataset con variables de intensidad...")
+        resultado = crear_variables_intensidad()
+
+        if resultado is None:
+            registro.error("ERROR: No se pudo cargar el dataset")
+            return False
+
+        df = resultado[0]
+
+    registro.info(f"Dataset cargado: {len(df):,} canciones")
+
+    # Evaluar todas las reglas de una vez
+    registro.info("\n" + "="*60)
+    registro.info("EJECUTANDO VERIFICACIONES")
+    registro.info("="*60)
+
+    reporte = verificar_calidad(df)
+    mostrar_reporte(reporte)
+
+    registro.info(f"\n{'='*60}")
+    registro.info("VERIFICACION COMPLETADA")
+    registro.info(f"{'='*60}")
+
+    if reporte['ok']:
+        registro.info("RESULTADO FINAL: Los datos están listos para análisis")
+        registro.info("OK: Todas las verificaciones pasaron exitosamente")
     else:
-        print("RESULTADO FINAL: Hay problemas que deben corregirse")
-        print("ERROR: Algunas verificaciones fallaron")
-    
-    return reglas_ok
+        registro.info("RESULTADO FINAL: Hay problemas que deben corregirse")
+        registro.error("ERROR: Algunas verificaciones fallaron")
+
+    return reporte['ok']
 
 if __name__ == "__main__":
     resultado = verificar_todo()